@@ -0,0 +1,166 @@
+""" Benchmark - per stage latency (decode, validate-in, convert, validate-out, encode) and throughput of every converter Lambda function handler.
+
+Realistic Kinesis Firehose events are generated for every handler with a configurable batch size and payload size (words of content per record). Every stage of the FirehoseTransformer is timed separately:
+- decode: base64 decoding and json parsing of a record.
+- validate-in: validation of a decoded payload against the input schema.
+- convert: the converter's convert_batch hook. It runs once per batch as in the transformer, so its per record latency is the batch time divided by the batch size.
+- validate-out: validation of a converted payload against the output schema.
+- encode: json serialisation and base64 encoding of a converted payload.
+
+The stage that takes the largest share of the batch time is marked. The complete lambda_handler is timed as well, so the overhead that is not covered by the stages (event validation, logging, response bookkeeping) is visible.
+
+    Typical usage example:
+        python benchmarks/bench_converter_stages.py --batch-size 500 --payload-words 256
+        python benchmarks/bench_converter_stages.py --handlers ner_label_to_train --payload-words 32 128 512
+"""
+import os
+import sys
+import argparse
+import base64
+import importlib
+import json
+import logging
+import random
+import time
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../src"))
+from validator_registry import validate
+
+HANDLERS = [
+    "class_crude_to_label",
+    "ner_crude_to_label",
+    "ner_label_to_train",
+    "squad_crude_to_label",
+    "squad_label_to_train"]
+STAGES = ["decode", "validate-in", "convert", "validate-out", "encode"]
+WORDS = ["machine", "learning", "has", "made", "tremendous", "progress", "over", "the", "past", "decade", "in", "London",
+    "Paris", "diagnosis", "of", "COVID-19", "based", "on", "lab", "tests", "and", "the", "field", "data", "was", "collected", "by", "Acme", "Corp", "."]
+ENTITY_TYPES = ["LOC", "ORG", "PER", "MISC"]
+RECORD = {"filename": "s3://bucket/benchmark.pdf", "filetype": "pdf", "title": "Machine Learning: Diagnosis of COVID-19 based on Lab Tests"}
+
+def create_text(rng:random.Random, words:int) -> str:
+    """Creates a text of words random words."""
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def create_spans(rng:random.Random, text:str, every:int=10) -> List[List]:
+    """Creates non overlapping single word (start, end, entity type) spans for roughly every n-th word of a text."""
+    spans = []
+    start = 0
+    for i, word in enumerate(text.split(" ")):
+        if i % every == every - 1:
+            spans.append([start, start + len(word), rng.choice(ENTITY_TYPES)])
+        start += len(word) + 1
+    return spans
+
+def create_qas(rng:random.Random, text:str, every:int=50) -> List[Dict]:
+    """Creates one question with an extractive answer for roughly every n words of a text."""
+    qas = []
+    words = text.split(" ")
+    for i in range(0, len(words), every):
+        answer = " ".join(words[i:i + 3])
+        qas.append({"question": " What is said about " + rng.choice(WORDS) + "? ", "answers": [{"answer_start": text.find(answer), "text": answer}]})
+    return qas
+
+def create_payload(handler:str, rng:random.Random, index:int, words:int) -> Dict:
+    """Creates a payload of a handler's input format with words words of content."""
+    text = create_text(rng, words)
+    payload = dict(RECORD, index=index, id="57639482-160721-1931_" + str(index))
+    if handler == "class_crude_to_label":
+        payload.update(content=text, label=rng.choice(["scientific_context", "other"]))
+    elif handler == "ner_crude_to_label":
+        payload.update(content=text, label=[[str(start), str(end), "U-" + label] for start, end, label in create_spans(rng, text)])
+    elif handler == "ner_label_to_train":
+        payload.update(text=text, label=create_spans(rng, text))
+    elif handler == "squad_crude_to_label":
+        payload.update(content=text, label=create_qas(rng, text))
+    else:
+        payload.update(context=text, qas=create_qas(rng, text))
+    return payload
+
+def create_event(handler:str, batch_size:int, words:int, seed:int=0) -> Dict:
+    """Creates a Kinesis Firehose transformation event of batch_size records."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(batch_size):
+        data = base64.b64encode(json.dumps(create_payload(handler, rng, i, words)).encode('utf-8'))
+        records.append({"recordId": "4958335403156088821410004329663235129661046325138109235400000" + str(i), "approximateArrivalTimestamp": 1625155200000, "data": data})
+    return {"invocationId": "benchmark", "region": "eu-west-1", "records": records}
+
+def percentile(values:List[float], fraction:float) -> float:
+    """Returns the nearest rank percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def time_each(fn:Callable, items:List, latencies:List[float]) -> List:
+    """Applies fn to every item, appending every call's duration in seconds to latencies, and returns the results."""
+    results = []
+    for item in items:
+        start_time = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - start_time)
+    return results
+
+def run_stages(transformer, event:Dict, repeat:int) -> Dict[str, Dict]:
+    """Runs the stages of a transformer repeat times on an event and returns the per record latencies and the batch times of every stage."""
+    latencies = {stage: [] for stage in STAGES}
+    batch_seconds = {stage: [] for stage in STAGES}
+    records = event["records"]
+    for _ in range(repeat):
+        counts = {stage: len(latencies[stage]) for stage in STAGES}
+        payloads = time_each(lambda record: json.loads(base64.b64decode(record['data'])), records, latencies["decode"])
+        time_each(lambda payload: validate(payload, transformer.input_schema), payloads, latencies["validate-in"])
+        start_time = time.perf_counter()
+        converted_payloads = transformer._convert_batch(payloads)
+        convert_seconds = time.perf_counter() - start_time
+        latencies["convert"].extend([convert_seconds / len(payloads)] * len(payloads))
+        time_each(transformer._validate_output, converted_payloads, latencies["validate-out"])
+        time_each(lambda payload: base64.b64encode(json.dumps(payload).encode('utf-8')), converted_payloads, latencies["encode"])
+        for stage in STAGES:
+            batch_seconds[stage].append(sum(latencies[stage][counts[stage]:]))
+    return {stage: {"latencies": latencies[stage], "seconds": min(batch_seconds[stage])} for stage in STAGES}
+
+def run_handler(lambda_handler:Callable, event:Dict, repeat:int) -> List[float]:
+    """Runs a Lambda function handler repeat times on an event and returns the invocation durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        lambda_handler(event, None)
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--handlers", nargs="+", default=HANDLERS, choices=HANDLERS)
+    arg_parser.add_argument("--batch-size", type=int, default=500)
+    arg_parser.add_argument("--payload-words", nargs="+", type=int, default=[64, 512], help="words of content per record, one run per value")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    logging.basicConfig(stream=open(os.devnull, "w"), level=logging.INFO)
+    for handler in args.handlers:
+        module = importlib.import_module(handler + "_lambda_function")
+        for words in args.payload_words:
+            event = create_event(handler, args.batch_size, words, args.seed)
+            record_bytes = sum(len(record["data"]) for record in event["records"]) / len(event["records"])
+            module.lambda_handler(event, None)
+            stages = run_stages(module.transformer, event, args.repeat)
+            durations = run_handler(module.lambda_handler, event, args.repeat)
+            total_seconds = sum(stage["seconds"] for stage in stages.values())
+            dominant = max(STAGES, key=lambda stage: stages[stage]["seconds"])
+            print("{handler}, batch size {batch_size}, {words} words/record, {record_bytes:.0f} bytes/record".format(
+                handler=handler, batch_size=args.batch_size, words=words, record_bytes=record_bytes))
+            print("  " + "stage".ljust(16) + "ms/batch".ljust(12) + "share".ljust(10) + "records/s".ljust(14) + "p50 us".ljust(12) + "p99 us".ljust(12))
+            for stage in STAGES:
+                seconds = stages[stage]["seconds"]
+                latencies = stages[stage]["latencies"]
+                print("  " + stage.ljust(16) + "{:.2f}".format(seconds * 1000).ljust(12) + "{:.0%}".format(seconds / total_seconds).ljust(10)
+                    + "{:.0f}".format(args.batch_size / seconds).ljust(14) + "{:.1f}".format(percentile(latencies, 0.5) * 1e6).ljust(12)
+                    + "{:.1f}".format(percentile(latencies, 0.99) * 1e6).ljust(12) + ("<- dominant" if stage == dominant else ""))
+            print("  " + "lambda_handler".ljust(16) + "{:.2f}".format(min(durations) * 1000).ljust(12) + "{:.0%}".format(min(durations) / total_seconds).ljust(10)
+                + "{:.0f}".format(args.batch_size / min(durations)).ljust(14) + "{:.1f}".format(percentile(durations, 0.5) * 1e6 / args.batch_size).ljust(12)
+                + "{:.1f}".format(percentile(durations, 0.99) * 1e6 / args.batch_size).ljust(12) + "(per record)")
+            print("")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+""" Benchmark - Kinesis Firehose transformation throughput (records/sec) of the per record handler loop versus the batch FirehoseTransformer.
+
+    Typical usage example:
+        python benchmarks/bench_firehose_transformer.py --batch-size 500 --repeat 5
+"""
+import os
+import sys
+import argparse
+import base64
+import json
+import logging
+import time
+from jsonschema import validate as jsonschema_validate
+
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../src"))
+from converters import ClassificationCrudeToLabel, NerLabelToTrain, SquadLabelToTrain
+from schema_validators import (
+    FIREHOSE_SCHEMA,
+    CLASS_CRUDE_SCHEMA,
+    CLASS_LABEL_SCHEMA,
+    NER_LABEL_SCHEMA,
+    NER_TRAIN_SCHEMA,
+    SQUAD_LABEL_SCHEMA,
+    SQUAD_TRAIN_SCHEMA
+)
+from firehose_transformer import FirehoseTransformer
+
+logger = logging.getLogger()
+
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+QAS = [{"question": "What has made progress?", "answers": [{"answer_start": 0, "text": CONTENT}]}]
+RECORD = {"filename": "s3://bucket/test.pdf", "filetype": "pdf", "index": 12345, "id": "57639482-160721-1931_1"}
+
+CASES = [
+    ("class_crude_to_label", ClassificationCrudeToLabel, CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA, None, dict(RECORD, content=CONTENT, label="scientific_context")),
+    ("ner_label_to_train", NerLabelToTrain, NER_LABEL_SCHEMA, NER_TRAIN_SCHEMA, None, dict(RECORD, text=CONTENT, label=[[4, 9, "U-LOC"]])),
+    ("squad_label_to_train", SquadLabelToTrain, SQUAD_LABEL_SCHEMA, SQUAD_TRAIN_SCHEMA, "data", dict(RECORD, context=CONTENT, qas=QAS)),
+]
+
+def create_event(payload:dict, batch_size:int) -> dict:
+    data = base64.b64encode(json.dumps(payload).encode('utf-8'))
+    return {"invocationId": "benchmark", "records": [{"recordId": str(i), "data": data} for i in range(batch_size)]}
+
+def per_record_handler(event:dict, converter, input_schema:dict, output_schema:dict, output_list_key:str) -> dict:
+    """The per record loop every converter Lambda function handler used before the FirehoseTransformer."""
+    output = []
+    jsonschema_validate(event, FIREHOSE_SCHEMA)
+    for record in event["records"]:
+        logger.info("recordId: " + record['recordId'])
+        payload = json.loads(base64.b64decode(record['data']))
+        jsonschema_validate(payload, input_schema)
+        converted_payload = converter.convert(payload)
+        if output_list_key:
+            [jsonschema_validate(i, output_schema) for i in converted_payload[output_list_key]]
+        else:
+            jsonschema_validate(converted_payload, output_schema)
+        output.append({'recordId': record['recordId'], 'result': 'Ok', 'data': base64.b64encode(json.dumps(converted_payload).encode('utf-8'))})
+    return {'records': output}
+
+def records_per_second(fn, event:dict, repeat:int) -> float:
+    """Returns the best records/sec of repeat runs of fn(event)."""
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        fn(event)
+        duration = time.perf_counter() - start_time
+        best = duration if best is None else min(best, duration)
+    return len(event["records"]) / best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--batch-size", type=int, default=500)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+    logging.basicConfig(stream=open(os.devnull, "w"), level=logging.INFO)
+    print("records/sec, batch size {batch_size}".format(batch_size=args.batch_size))
+    print("handler".ljust(28) + "per record loop".ljust(20) + "FirehoseTransformer".ljust(20) + "speedup")
+    for name, converter_class, input_schema, output_schema, output_list_key, payload in CASES:
+        event = create_event(payload, args.batch_size)
+        converter = converter_class()
+        transformer = FirehoseTransformer(converter=converter, input_schema=input_schema, output_schema=output_schema, output_list_key=output_list_key)
+        before = records_per_second(lambda e: per_record_handler(e, converter, input_schema, output_schema, output_list_key), event, args.repeat)
+        after = records_per_second(transformer.transform, event, args.repeat)
+        print(name.ljust(28) + "{:.0f}".format(before).ljust(20) + "{:.0f}".format(after).ljust(20) + "{:.1f}x".format(after / before))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+""" Benchmark - per record json schema validation cost before (jsonschema.validate) and after (validator registry).
+
+    Typical usage example:
+        python benchmarks/bench_validation.py --iterations 2000
+"""
+import os
+import sys
+import argparse
+import timeit
+from jsonschema import validate as jsonschema_validate
+
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../src"))
+from schema_validators import (
+    CLASS_CRUDE_SCHEMA,
+    CLASS_LABEL_SCHEMA,
+    NER_CRUDE_SCHEMA,
+    NER_LABEL_SCHEMA,
+    NER_TRAIN_SCHEMA,
+    SQUAD_CRUDE_SCHEMA,
+    SQUAD_LABEL_SCHEMA,
+    SQUAD_TRAIN_SCHEMA
+)
+from validator_registry import JSONSCHEMA_BACKEND, FASTJSONSCHEMA_BACKEND, fastjsonschema, get_validator
+
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+QAS = [{"question": "What has made progress?", "answers": [{"answer_start": 0, "text": CONTENT}]}]
+RECORD = {"filename": "s3://bucket/test.pdf", "filetype": "pdf", "index": 12345, "id": "57639482-160721-1931_1"}
+
+CASES = [
+    ("class_crude", CLASS_CRUDE_SCHEMA, dict(RECORD, content=CONTENT, label="scientific_context")),
+    ("class_label", CLASS_LABEL_SCHEMA, dict(RECORD, sentence1=CONTENT, sentence2=None, label="scientific_context")),
+    ("ner_crude", NER_CRUDE_SCHEMA, dict(RECORD, content=CONTENT, label=[[4, 9, "U-LOC"]])),
+    ("ner_label", NER_LABEL_SCHEMA, dict(RECORD, text=CONTENT, label=[["4", "9", "U-LOC"]])),
+    ("ner_train", NER_TRAIN_SCHEMA, dict(RECORD, text=CONTENT.split(" "), label=["O"] * 13)),
+    ("squad_crude", SQUAD_CRUDE_SCHEMA, dict(RECORD, content=CONTENT, label=QAS)),
+    ("squad_label", SQUAD_LABEL_SCHEMA, dict(RECORD, context=CONTENT, qas=QAS)),
+    ("squad_train", SQUAD_TRAIN_SCHEMA, dict(RECORD, context=CONTENT, question=QAS[0]["question"], answers={"answer_start": [0], "text": [CONTENT]})),
+]
+
+def per_record_us(fn, iterations:int) -> float:
+    """Returns the best of three runs of fn in microseconds per call."""
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--iterations", type=int, default=1000)
+    args = arg_parser.parse_args()
+    backends = [JSONSCHEMA_BACKEND]
+    if fastjsonschema is not None:
+        backends.append(FASTJSONSCHEMA_BACKEND)
+    header = ["schema", "jsonschema.validate"] + ["registry[" + backend + "]" for backend in backends]
+    print("per record validation cost (us), {iterations} iterations".format(iterations=args.iterations))
+    print("".join(column.ljust(28) for column in header))
+    for name, schema, instance in CASES:
+        row = [name, per_record_us(lambda: jsonschema_validate(instance, schema), args.iterations)]
+        for backend in backends:
+            validator = get_validator(schema, backend=backend)
+            row.append(per_record_us(lambda: validator(instance), args.iterations))
+        print(row[0].ljust(28) + "".join("{:.1f}".format(value).ljust(28) for value in row[1:]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules in src import each other flat (e.g. "from tokenizer_backends import ..."), as they do in the deployed Lambda package
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/src"))
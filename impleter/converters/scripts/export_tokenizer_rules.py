@@ -0,0 +1,46 @@
+""" Exports spaCy's English tokenizer rules (prefix, suffix and infix patterns, URL pattern and special cases) to src/tokenizer_rules_en.json, which the regex tokenizer backend loads so that it does not need spaCy at runtime.
+
+Rerun the script after upgrading spaCy and commit the regenerated file together with the upgrade, so that the regex backend keeps the same tokenization as the spacy backend.
+
+    Typical usage example:
+        python scripts/export_tokenizer_rules.py
+"""
+import os
+import json
+import argparse
+
+SCRIPTS_DIR = os.path.realpath(os.path.dirname(__file__))
+RULES_PATH = os.path.realpath(SCRIPTS_DIR + "/../src/tokenizer_rules_en.json")
+
+def pattern_of(function) -> str:
+    """Returns the pattern of a bound re.Pattern method (e.g. prefix_search) or None."""
+    return None if function is None else function.__self__.pattern
+
+def export_rules() -> dict:
+    """Returns the tokenizer rules of a blank spaCy English pipeline."""
+    import spacy
+    from spacy.attrs import ORTH
+    from spacy.lang.en import English
+    tokenizer = English().tokenizer
+    special_cases = {string: [substring[ORTH] for substring in substrings] for string, substrings in sorted(tokenizer.rules.items())}
+    return {
+        "spacy_version": spacy.__version__,
+        "prefix": pattern_of(tokenizer.prefix_search),
+        "suffix": pattern_of(tokenizer.suffix_search),
+        "infix": pattern_of(tokenizer.infix_finditer),
+        "token_match": pattern_of(tokenizer.token_match),
+        "url_match": pattern_of(tokenizer.url_match),
+        "special_cases": special_cases}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--output", default=RULES_PATH)
+    args = arg_parser.parse_args()
+    rules = export_rules()
+    with open(args.output, "w", encoding="utf-8") as fp:
+        json.dump(rules, fp, ensure_ascii=False, indent=1)
+        fp.write("\n")
+    print("spaCy {version} rules with {count} special cases written to {path}".format(version=rules["spacy_version"], count=len(rules["special_cases"]), path=args.output))
+
+if __name__ == "__main__":
+    main()
@@ -42,17 +42,19 @@ The Kinesis Firehose dictionary payload representations are transformed into the
         print(str(actual))
 """
 from typing import Any, Dict
-from jsonschema import validate
-from schema_validators import FIREHOSE_SCHEMA, CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA
+from schema_validators import CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA
 from converters import ClassificationCrudeToLabel
-import sys
-import base64
-import json
+from firehose_transformer import FirehoseTransformer
+from profiling import InvocationProfiler
 import logging
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+profiler = InvocationProfiler.from_env()
 
+transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA)
+
+@profiler.profile
 def lambda_handler(event: Dict[str, Any], context):
     """Kinesis Firehose compatible Lambda function handler that converts crude/raw dictionary into a text classification dictionary 
 
@@ -64,35 +66,4 @@ def lambda_handler(event: Dict[str, Any], context):
 
     Raises:
     """
-    output = []
-    converter = ClassificationCrudeToLabel()
-    validate(event, FIREHOSE_SCHEMA)
-    for record in event["records"]:
-        try:
-            logger.info("recordId: " + record['recordId'])
-            payload = base64.b64decode(record['data'])
-            payload = json.loads(payload)
-            validate(payload, CLASS_CRUDE_SCHEMA)
-            converted_payload = converter.convert(payload) 
-            validate(converted_payload, CLASS_LABEL_SCHEMA)
-            converted_payload = json.dumps(converted_payload)
-            converted_payload = converted_payload.encode('utf-8')
-            output_record = {
-                'recordId': record['recordId'],
-                'result': 'Ok',
-                'data': base64.b64encode(converted_payload)
-            }
-            output.append(output_record)
-        except Exception:
-            ex_type, ex_value, ex_traceback = sys.exc_info()
-            logger.error("recordId: {recordId}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(recordId=record['recordId'], ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
-            output_record = {
-                'recordId': record['recordId'],
-                'result': 'Nok',
-                'data': record["data"],
-                'exception_type': ex_type,
-                'exception_value': ex_value,
-                'exception_traceback': ex_traceback
-            }
-            output.append(output_record)
-    return {'records': output}
+    return transformer.transform(event)
@@ -18,14 +18,16 @@ The payload representations are then transformed into one of the following machi
         out_dict = converter.convert(example_dict)
 """
 import abc
-from uuid import uuid4
-from typing import List, Dict
-from datetime import datetime
-from spacy.util import get_lang_class
-from spacy.training import offsets_to_biluo_tags
+import hashlib
+from typing import Any, List, Dict, Union
+from tokenizer_backends import Token, AbstractTokenizer, get_tokenizer, offsets_to_biluo_tags
+from instrumentation import NULL_TIMER
 
-ML_FILE_DATETIME = "%Y%m%d_%H%M%S"
+CONVERTER_VERSION = "1.0.0"
+ID_LENGTH = 32
 ID_KEY = "id"
+CHUNK_ID_KEY = "chunk_id"
+INDEX_KEY = "index"
 DATA_KEY = "data"
 TITLE_KEY = "title"
 PARAGRAPHS_KEY = "paragraphs"
@@ -42,18 +44,29 @@ ANSWER_START_KEY = "answer_start"
 TEXT_KEY = "text"
 VERSION_KEY = "version"
 LABEL_KEY = "label"
+TOKENIZATION_STAGE = "tokenization"
+DICT_BUILDING_STAGE = "dict_building"
 
 
-def create_file_datetime() -> str:
-    """function that generates a file date time
+def create_content_id(*parts:Any) -> str:
+    """function that generates a deterministic id from its parts
+    Args:
+        parts: Values that identify the content (e.g. the parser chunk id, question index and converter version)
     Returns:
-        str: String in a yyyymmdd_hhmmss format
+        str: Hexadecimal string of ID_LENGTH characters
     """
-    return str(uuid4()) + "-" + datetime.now().strftime(ML_FILE_DATETIME)
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:ID_LENGTH]
 
 class AbstractConverter(object):
-    """AbstractConverter"""
+    """AbstractConverter
+
+    Attributes:
+        version: A string type converter version.
+        timer: A StageTimer type timer of the batch that is being converted. The FirehoseTransformer sets it for the duration of a batch, converters mark their internal stages on it.
+    """
     __metaclass__ = abc.ABCMeta
+    version = CONVERTER_VERSION
+    timer = NULL_TIMER
 
     @abc.abstractmethod
     def convert_list(self, input_list:List[Dict]):
@@ -65,6 +78,25 @@ class AbstractConverter(object):
         """convert"""
         return
 
+    def convert_batch(self, input_list:List[Dict]) -> List[Union[Dict, Exception, None]]:
+        """Converts a batch of dictionaries, isolating per dictionary failures. Converters override this hook to apply vectorised or batched processing.
+
+        Args:
+        input_list: Input list of dictionaries
+
+        Returns:
+        List with one element per input dictionary - the converted dictionary, None if the dictionary should be dropped or the exception raised while converting it.
+
+        Raises:
+        """
+        output_list = []
+        for input_dict in input_list:
+            try:
+                output_list.append(self.convert(input_dict))
+            except Exception as ex:
+                output_list.append(ex)
+        return output_list
+
 
 class ClassificationCrudeToLabel(AbstractConverter):
     """Raw (crude) dictionary to classification converter.
@@ -179,16 +211,16 @@ class NerLabelToTrain(AbstractConverter):
 
     Attributes:
         lang: A string type for language contained in the content_key - English (en) by default.
+        tokenizer: AbstractTokenizer type tokenizer backend. Defaults to the backend selected with the NER_TOKENIZER environment variable.
         id_key: A string type key name of the payload's unique id.
         content_key: A string type key name of the payload's content.
         label_key: A sring type key name for the NER BILUO labels.
         output_list: List type that contains the converted input_dict_list.
     """
-    def __init__(self, lang:str="en", text_key:str=TEXT_KEY, label_key:str=LABEL_KEY):
+    def __init__(self, lang:str="en", text_key:str=TEXT_KEY, label_key:str=LABEL_KEY, tokenizer:AbstractTokenizer=None):
         self.narrative_text = None
         self.doc = None
-        cls = get_lang_class(lang)
-        self.nlp = cls()
+        self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer(lang=lang)
         self.text_key = text_key
         self.label_key = label_key
         self.output_list = []
@@ -220,12 +252,55 @@ class NerLabelToTrain(AbstractConverter):
         Raises:
         """
         narrative_text = input_dict[self.text_key]
+        return self._convert_doc(input_dict, self.tokenizer.tokenize(narrative_text))
+
+    def convert_batch(self, input_list:List[Dict]) -> List[Union[Dict, Exception, None]]:
+        """Converts a batch of NER BILUO dictionaries, tokenising all texts in a single tokenizer batch.
+
+        Args:
+        input_list: Input list of NER BILUO dictionaries
+
+        Returns:
+        List with one element per input dictionary - the NER tokenised dictionary or the exception raised while converting it.
+
+        Raises:
+        """
+        output_list = [None] * len(input_list)
+        texts = []
+        positions = []
+        for i, input_dict in enumerate(input_list):
+            try:
+                texts.append(input_dict[self.text_key])
+                positions.append(i)
+            except Exception as ex:
+                output_list[i] = ex
+        self.timer.mark(TOKENIZATION_STAGE)
+        tokens_list = self.tokenizer.tokenize_batch(texts)
+        self.timer.mark(DICT_BUILDING_STAGE)
+        for position, tokens in zip(positions, tokens_list):
+            try:
+                output_list[position] = self._convert_doc(input_list[position], tokens)
+            except Exception as ex:
+                output_list[position] = ex
+        return output_list
+
+    def _convert_doc(self, input_dict:Dict, tokens:List[Token]) -> Dict:
+        """Converts a NER BILUO dictionary and its tokens to a Hugging Face NER tokenised dictionary.
+
+        Args:
+        input_dict: Input NER BILUO dictionary
+        tokens: List of (text, start, end) tokens of the input dictionary's text
+
+        Returns:
+        NER tokenised dictionary.
+
+        Raises:
+        """
         labels = input_dict[self.label_key]
         if len(labels) > 0:
             labels = [[int(elem) if i<2 and isinstance(elem, str) else elem for i, elem in enumerate(label)] for label in labels if len(label) == 3]
-        doc = self.nlp(narrative_text)
-        tags = offsets_to_biluo_tags(doc, labels)
-        doc_list = [i.text for i in doc]
+        tags = offsets_to_biluo_tags(tokens, labels)
+        doc_list = [token[0] for token in tokens]
         tags = ['-'.join(i.split('-')[1:]) if len(i.split('-')) > 2 else i for i in tags]
         out_dict = {self.text_key: doc_list, self.label_key: tags}
         for key, value in input_dict.items():
@@ -348,6 +423,8 @@ class SquadLabelToTrain(AbstractConverter):
         """
         output_list = []
         id_key = input_dict.get(ID_KEY, None)
+        index = input_dict.get(INDEX_KEY, None)
+        chunk_id = input_dict.get(CHUNK_ID_KEY, None) or create_content_id(id_key, index)
         context = input_dict.get(CONTEXT_KEY, None)
         qas = input_dict.get(QAS_KEY, [])
         for i, qa in enumerate(qas):
@@ -368,9 +445,9 @@ class SquadLabelToTrain(AbstractConverter):
                 output_list[existing_question_idx][ANSWERS_KEY][ANSWER_START_KEY] = output_list[existing_question_idx][ANSWERS_KEY][ANSWER_START_KEY] + answer_start
                 output_list[existing_question_idx][ANSWERS_KEY][TEXT_KEY] = output_list[existing_question_idx][ANSWERS_KEY][TEXT_KEY] + text
             else:
-                squad_payload = {ID_KEY: id_key + "_" + create_file_datetime() + "_" + str(i), TITLE_KEY: self.title, CONTEXT_KEY: context, QUESTION_KEY: question, ANSWERS_KEY: {ANSWER_START_KEY: answer_start, TEXT_KEY: text}}
+                squad_payload = {ID_KEY: id_key + "_" + str(index) + "_" + str(i), CHUNK_ID_KEY: create_content_id(chunk_id, i, self.version), TITLE_KEY: self.title, CONTEXT_KEY: context, QUESTION_KEY: question, ANSWERS_KEY: {ANSWER_START_KEY: answer_start, TEXT_KEY: text}}
                 for key, value in input_dict.items():
-                    if key not in [ID_KEY, CONTEXT_KEY, QAS_KEY]:
+                    if key not in [ID_KEY, CHUNK_ID_KEY, CONTEXT_KEY, QAS_KEY]:
                         squad_payload[key] = value                
                 output_list.append(squad_payload)
         return {DATA_KEY: output_list}
@@ -0,0 +1,337 @@
+""" Kinesis Firehose record transformation - File containing functionality that applies a converter to a whole Kinesis Firehose transformation batch.
+
+The batch is processed in three passes:
+- decode: every record is base64 decoded, json parsed and validated against the input schema.
+- convert: the decoded payloads are handed to the converter's convert_batch hook in one call.
+- encode: every converted payload is validated against the output schema, json serialised and base64 encoded.
+
+Every record is returned with a Kinesis Firehose compatible result - Ok, Nok (processing failed) or Dropped (the converter returned None).
+
+The encoded response size is tracked while encoding, reserving room for a pointer record for every record that is still to be encoded. A converted payload that is larger than the Firehose record limit, or that would push the response over the Lambda response limit, is written to the configured spill store and replaced by a small pointer record. If no spill store is configured the record is returned as Nok, so that only that record is retried instead of the whole batch failing. Nok and Dropped records echo the original record data only while it fits into the response; otherwise they are returned without data (Kinesis Firehose keeps the original record of a failed record), so the response never exceeds the limit.
+
+Retried batches can be answered from an optional result cache keyed by the record data and the converter version. Cached records skip the decode, validation and conversion work.
+
+The time spent in every stage (decode, validate_input, convert, validate_output, encode and the converter's own stages such as tokenization) is accumulated per batch and emitted through the configured metrics sink.
+
+    Typical usage example:
+        from converters import ClassificationCrudeToLabel
+        from schema_validators import CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA
+        from firehose_transformer import FirehoseTransformer
+        transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA)
+
+        def lambda_handler(event, context):
+            return transformer.transform(event)
+"""
+import os
+import sys
+import time
+import base64
+import logging
+from typing import Any, Dict, List
+from schema_validators import FIREHOSE_SCHEMA
+from validator_registry import ValidationPolicy, validate
+from spill_stores import AbstractSpillStore, spill_store_from_env
+from result_cache import ResultCache, result_cache_from_env
+from instrumentation import NULL_TIMER, Instrumentation, instrumentation_from_env
+from json_codec import loads, dumps_bytes
+
+logger = logging.getLogger()
+
+RESULT_OK = "Ok"
+RESULT_NOK = "Nok"
+RESULT_DROPPED = "Dropped"
+MAX_RESPONSE_BYTES = 6000000
+MAX_RECORD_BYTES = 1024000
+RECORD_OVERHEAD_BYTES = 64
+POINTER_RECORD_BYTES = 768
+MAX_EXCEPTION_VALUE_LENGTH = 256
+ID_KEY = "id"
+INDEX_KEY = "index"
+SPILLED_KEY = "spilled"
+SPILL_LOCATION_KEY = "spill_location"
+SPILL_BYTES_KEY = "spill_bytes"
+CONVERTER_COMPONENT = "converter"
+DECODE_STAGE = "decode"
+VALIDATE_INPUT_STAGE = "validate_input"
+CONVERT_STAGE = "convert"
+VALIDATE_OUTPUT_STAGE = "validate_output"
+ENCODE_STAGE = "encode"
+
+class FirehoseTransformer(object):
+    """Kinesis Firehose transformation batch processor.
+
+    Attributes:
+        converter: An AbstractConverter type converter applied to the records' payloads.
+        input_schema: A dictionary type json schema of the input payloads.
+        output_schema: A dictionary type json schema of the converted payloads.
+        output_list_key: An optional string type key name. If set, every element of the converted payload's list under this key is validated against output_schema instead of the payload itself.
+        validation_policy: A ValidationPolicy type policy that decides which validations run per record.
+        spill_store: An optional AbstractSpillStore type store for payloads that do not fit into the response. Defaults to the store configured in the environment.
+        max_response_bytes: An integer type limit of the encoded response size. Defaults to the MAX_RESPONSE_BYTES environment variable or 6,000,000 bytes (Lambda allows 6 MiB).
+        max_record_bytes: An integer type limit of a single converted payload. Defaults to the MAX_RECORD_BYTES environment variable or 1,024,000 bytes (the Firehose record limit).
+        result_cache: An optional ResultCache type cache of converted payloads that answers retried records. Defaults to the cache configured in the environment.
+        converter_version: A string type version of the converter, including its tokenizer backend if it has one, part of the result cache key.
+        instrumentation: An Instrumentation type that emits the stage timings of every batch. Defaults to the instrumentation configured in the environment.
+        last_metrics: A dictionary type with the counters of the last transformed batch.
+    """
+    def __init__(self, converter, input_schema:Dict, output_schema:Dict, output_list_key:str=None, validation_policy:ValidationPolicy=None,
+            spill_store:AbstractSpillStore=None, max_response_bytes:int=None, max_record_bytes:int=None, result_cache:ResultCache=None,
+            instrumentation:Instrumentation=None):
+        """__init__"""
+        self.converter = converter
+        self.input_schema = input_schema
+        self.output_schema = output_schema
+        self.output_list_key = output_list_key
+        self.validation_policy = validation_policy or ValidationPolicy.from_env()
+        self.spill_store = spill_store or spill_store_from_env()
+        self.max_response_bytes = max_response_bytes or int(os.getenv("MAX_RESPONSE_BYTES", MAX_RESPONSE_BYTES))
+        self.max_record_bytes = max_record_bytes or int(os.getenv("MAX_RECORD_BYTES", MAX_RECORD_BYTES))
+        self.result_cache = result_cache or result_cache_from_env()
+        self.converter_version = type(converter).__name__ + "-" + str(getattr(converter, "version", ""))
+        tokenizer = getattr(converter, "tokenizer", None)
+        if tokenizer is not None:
+            self.converter_version += "-" + str(getattr(tokenizer, "name", None) or type(tokenizer).__name__)
+        self.instrumentation = instrumentation or instrumentation_from_env(CONVERTER_COMPONENT)
+        self.last_metrics = dict()
+
+    def _failed_record(self, record:Dict, exc_info:tuple) -> Dict:
+        """Creates a Nok output record and logs the failure.
+
+        Args:
+        record: Input Kinesis Firehose record
+        exc_info: sys.exc_info() style tuple of the failure
+
+        Returns:
+        dict
+
+        Raises:
+        """
+        ex_type, ex_value, ex_traceback = exc_info
+        logger.error("recordId: {recordId}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(recordId=record['recordId'], ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+        return {
+            'recordId': record['recordId'],
+            'result': RESULT_NOK,
+            'data': record['data'],
+            'exception_type': ex_type.__name__,
+            'exception_value': str(ex_value)[:MAX_EXCEPTION_VALUE_LENGTH]
+        }
+
+    def _record_bytes(self, output_record:Dict) -> int:
+        """Estimates the number of bytes an output record adds to the json encoded response.
+
+        Args:
+        output_record: Output Kinesis Firehose record
+
+        Returns:
+        int
+
+        Raises:
+        """
+        return RECORD_OVERHEAD_BYTES + sum(len(key) + len(value) for key, value in output_record.items())
+
+    def _fit_echoed_data(self, output_record:Dict, used_bytes:int) -> int:
+        """Drops the echoed data of a Nok or Dropped output record if the record would push the response over the limit.
+
+        Args:
+        output_record: Nok or Dropped output Kinesis Firehose record
+        used_bytes: Bytes of the response so far, including the reservation for the records still to be encoded
+
+        Returns:
+        int (bytes the output record adds to the response)
+
+        Raises:
+        """
+        record_bytes = self._record_bytes(output_record)
+        if used_bytes + record_bytes > self.max_response_bytes:
+            output_record['data'] = ""
+            record_bytes = self._record_bytes(output_record)
+        return record_bytes
+
+    def _spill(self, event:Dict, record:Dict, payload_bytes:bytes, converted_payload:Dict=None) -> Dict:
+        """Writes a converted payload to the spill store and creates an Ok output record with a pointer payload.
+
+        Args:
+        event: Kinesis Firehose event
+        record: Input Kinesis Firehose record
+        payload_bytes: Json encoded converted payload
+        converted_payload: Converted payload. It is decoded from payload_bytes if it is not passed (cached payloads).
+
+        Returns:
+        dict
+
+        Raises:
+            ValueError: If no spill store is configured
+        """
+        if self.spill_store is None:
+            raise ValueError("converted payload of {size} bytes does not fit into the response and no spill store is configured".format(size=len(payload_bytes)))
+        key = "{invocation_id}/{record_id}.json".format(invocation_id=event.get('invocationId', 'invocation'), record_id=record['recordId'])
+        location = self.spill_store.put(key, payload_bytes)
+        if converted_payload is None:
+            converted_payload = loads(payload_bytes)
+        pointer_payload = {SPILLED_KEY: True, SPILL_LOCATION_KEY: location, SPILL_BYTES_KEY: len(payload_bytes)}
+        for pointer_key in [ID_KEY, INDEX_KEY]:
+            if pointer_key in converted_payload:
+                pointer_payload[pointer_key] = converted_payload[pointer_key]
+        return {
+            'recordId': record['recordId'],
+            'result': RESULT_OK,
+            'data': base64.b64encode(dumps_bytes(pointer_payload))
+        }
+
+    def _validate_output(self, payload:Dict) -> None:
+        """Validates a converted payload against the output schema.
+
+        Args:
+        payload: Converted payload
+
+        Returns:
+
+        Raises:
+            Exception: If the payload is invalid
+        """
+        if self.output_list_key is None:
+            validate(payload, self.output_schema)
+        elif isinstance(payload[self.output_list_key], list):
+            for element in payload[self.output_list_key]:
+                validate(element, self.output_schema)
+        else:
+            validate(payload[self.output_list_key], self.output_schema)
+
+    def _convert_batch(self, payloads:List[Dict]) -> List[Any]:
+        """Converts the decoded payloads with the converter's batch hook, falling back to per payload conversion if the batch hook fails as a whole.
+
+        Args:
+        payloads: List of decoded payloads
+
+        Returns:
+        List with one element per payload - the converted payload, None or an exception.
+
+        Raises:
+        """
+        try:
+            converted_payloads = self.converter.convert_batch(payloads)
+            if len(converted_payloads) != len(payloads):
+                raise ValueError("convert_batch returned {actual} payloads for {expected} records".format(actual=len(converted_payloads), expected=len(payloads)))
+            return converted_payloads
+        except Exception:
+            ex_type, ex_value, ex_traceback = sys.exc_info()
+            logger.warning("batch conversion failed, converting records one by one. exception_type: {ex_type}, exception_value: {ex_value}".format(ex_type=ex_type, ex_value=ex_value))
+        converted_payloads = []
+        for payload in payloads:
+            try:
+                converted_payloads.append(self.converter.convert(payload))
+            except Exception as ex:
+                converted_payloads.append(ex)
+        return converted_payloads
+
+    def transform(self, event:Dict[str, Any]) -> Dict:
+        """Transforms a Kinesis Firehose transformation event.
+
+        Args:
+        event: Kinesis Firehose event
+
+        Returns:
+        dict (Kinesis Firehose compatible transformation response)
+
+        Raises:
+            Exception: If the event is not a valid Kinesis Firehose event
+        """
+        start_time = time.perf_counter()
+        timer = self.instrumentation.timer()
+        timer.mark(DECODE_STAGE)
+        self.converter.timer = timer
+        validate(event, FIREHOSE_SCHEMA)
+        records = event["records"]
+        output = [None] * len(records)
+        cache_keys = dict()
+        cached_payloads = dict()
+        positions = []
+        payloads = []
+        output_validations = []
+        for i, record in enumerate(records):
+            timer.mark(DECODE_STAGE)
+            if self.result_cache is not None:
+                cache_keys[i] = self.result_cache.make_key(record['data'], self.converter_version)
+                cached_payload = self.result_cache.get(cache_keys[i])
+                if cached_payload is not None:
+                    cached_payloads[i] = cached_payload
+                    continue
+            try:
+                payload = loads(base64.b64decode(record['data']))
+                validate_input, validate_output = self.validation_policy.select()
+                if validate_input:
+                    timer.mark(VALIDATE_INPUT_STAGE)
+                    validate(payload, self.input_schema)
+            except Exception:
+                output[i] = self._failed_record(record, sys.exc_info())
+                continue
+            positions.append(i)
+            payloads.append(payload)
+            output_validations.append(validate_output)
+        timer.mark(CONVERT_STAGE)
+        converted_payloads = self._convert_batch(payloads)
+        timer.mark(ENCODE_STAGE)
+        encode_items = [(position, None, payload_bytes, False) for position, payload_bytes in cached_payloads.items()]
+        encode_items.extend(zip(positions, converted_payloads, [None] * len(positions), output_validations))
+        encode_items.extend((position, None, None, False) for position, output_record in enumerate(output) if output_record is not None)
+        encode_items.sort(key=lambda encode_item: encode_item[0])
+        response_bytes = 0
+        spilled = 0
+        for i, (position, converted_payload, payload_bytes, validate_output) in enumerate(encode_items):
+            record = records[position]
+            reserved_bytes = (len(encode_items) - i - 1) * POINTER_RECORD_BYTES
+            if output[position] is not None:
+                response_bytes += self._fit_echoed_data(output[position], response_bytes + reserved_bytes)
+                continue
+            if converted_payload is None and payload_bytes is None:
+                output[position] = {'recordId': record['recordId'], 'result': RESULT_DROPPED, 'data': record['data']}
+                response_bytes += self._fit_echoed_data(output[position], response_bytes + reserved_bytes)
+                continue
+            try:
+                if payload_bytes is None:
+                    if isinstance(converted_payload, Exception):
+                        raise converted_payload
+                    if validate_output:
+                        timer.mark(VALIDATE_OUTPUT_STAGE)
+                        self._validate_output(converted_payload)
+                        timer.mark(ENCODE_STAGE)
+                    payload_bytes = dumps_bytes(converted_payload)
+                    if self.result_cache is not None:
+                        self.result_cache.put(cache_keys[position], payload_bytes)
+                output_record = {
+                    'recordId': record['recordId'],
+                    'result': RESULT_OK,
+                    'data': base64.b64encode(payload_bytes)
+                }
+                record_bytes = self._record_bytes(output_record)
+                if len(payload_bytes) > self.max_record_bytes or response_bytes + record_bytes + reserved_bytes > self.max_response_bytes:
+                    output_record = self._spill(event, record, payload_bytes, converted_payload=converted_payload)
+                    record_bytes = self._record_bytes(output_record)
+                    if response_bytes + record_bytes + reserved_bytes > self.max_response_bytes:
+                        raise ValueError("pointer record does not fit into the response")
+                    spilled += 1
+                output[position] = output_record
+            except Exception:
+                output[position] = self._failed_record(record, sys.exc_info())
+                record_bytes = self._fit_echoed_data(output[position], response_bytes + reserved_bytes)
+            response_bytes += record_bytes
+        timer.stop()
+        self.converter.timer = NULL_TIMER
+        if self.instrumentation.enabled:
+            self.instrumentation.emit(timer, type(self.converter).__name__, sum(len(record['data']) for record in records), len(records))
+        results = [output_record['result'] for output_record in output]
+        cache_hits = len(cached_payloads)
+        self.last_metrics = {
+            "records": len(records),
+            "ok": results.count(RESULT_OK),
+            "nok": results.count(RESULT_NOK),
+            "dropped": results.count(RESULT_DROPPED),
+            "spilled": spilled,
+            "cache_hits": cache_hits,
+            "cache_hit_ratio": cache_hits / len(records) if records and self.result_cache is not None else 0.0,
+            "response_bytes": response_bytes,
+            "duration_ms": (time.perf_counter() - start_time) * 1000
+        }
+        logger.info("invocationId: {invocation_id}, records: {records}, ok: {ok}, nok: {nok}, dropped: {dropped}, spilled: {spilled}, cache_hits: {cache_hits}, cache_hit_ratio: {cache_hit_ratio:.2f}, response_bytes: {response_bytes}, duration_ms: {duration_ms:.1f}".format(
+            invocation_id=event.get('invocationId', None), **self.last_metrics))
+        return {'records': output}
@@ -0,0 +1,298 @@
+""" Instrumentation - File containing functionality that times the internal stages of parsing and conversion and emits them as structured metrics.
+
+A StageTimer accumulates the duration of named stages while a document (or a Firehose batch) is processed. Calling mark(stage) closes the running stage and opens the next one, so a stage that is entered many times (e.g. chunking every page of a PDF) is summed up. When instrumentation is disabled the shared NULL_TIMER is used instead, whose methods do nothing, so the overhead is a no-op method call per stage transition.
+
+At the end of the document one metric per stage is emitted through a pluggable sink:
+- EmfMetricsSink: CloudWatch embedded metric format (EMF) json log lines.
+- StatsdMetricsSink: StatsD compatible UDP datagrams.
+- InMemoryMetricsSink: keeps the metrics in a list (tests and benchmarks).
+
+    Typical usage example:
+        from instrumentation import Instrumentation, InMemoryMetricsSink
+        instrumentation = Instrumentation(sink=InMemoryMetricsSink(), component="parser")
+        timer = instrumentation.timer()
+        timer.mark("read")
+        input_obj = input_bytes.decode("utf-8")
+        timer.mark("chunking")
+        str_list = input_obj.split(" ")
+        timer.stop()
+        instrumentation.emit(timer, document_type="txt", input_bytes=len(input_bytes), chunks=len(str_list))
+        print(instrumentation.sink.metrics)
+"""
+import abc
+import os
+import sys
+import json
+import time
+import socket
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger()
+
+DEFAULT_NAMESPACE = "WordStash"
+DEFAULT_STATSD_HOST = "127.0.0.1"
+DEFAULT_STATSD_PORT = 8125
+EMF_SINK = "emf"
+STATSD_SINK = "statsd"
+MEMORY_SINK = "memory"
+NONE_SINK = "none"
+METRICS_SINKS = [EMF_SINK, STATSD_SINK, MEMORY_SINK, NONE_SINK]
+DIMENSION_KEYS = ["component", "document_type", "stage"]
+
+class StageTimer(object):
+    """Accumulates the durations of named stages.
+
+    Attributes:
+        durations: A dictionary type with the accumulated seconds per stage name, in the order the stages were first entered.
+    """
+    def __init__(self):
+        """__init__"""
+        self.durations = dict()
+        self._stage = None
+        self._start_time = 0.0
+
+    def mark(self, stage:str) -> None:
+        """Closes the running stage and opens the next one.
+
+        Args:
+        stage: Name of the stage that starts now
+
+        Returns:
+
+        Raises:
+        """
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.durations[self._stage] = self.durations.get(self._stage, 0.0) + now - self._start_time
+        self._stage = stage
+        self._start_time = now
+
+    def stop(self) -> None:
+        """Closes the running stage."""
+        self.mark(None)
+
+class NullStageTimer(StageTimer):
+    """Stage timer of disabled instrumentation that does not record anything."""
+    def mark(self, stage:str) -> None:
+        """mark"""
+        pass
+
+    def stop(self) -> None:
+        """stop"""
+        pass
+
+NULL_TIMER = NullStageTimer()
+
+class AbstractMetricsSink(object):
+    """AbstractMetricsSink"""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def emit(self, metrics:List[Dict]) -> None:
+        """emit"""
+        return
+
+class InMemoryMetricsSink(AbstractMetricsSink):
+    """Metrics sink that keeps the metrics in memory.
+
+    Attributes:
+        metrics: A list type of the emitted metric dictionaries.
+    """
+    def __init__(self):
+        """__init__"""
+        self.metrics = list()
+
+    def emit(self, metrics:List[Dict]) -> None:
+        """Appends metrics to the metrics list.
+
+        Args:
+        metrics: List of metric dictionaries
+
+        Returns:
+
+        Raises:
+        """
+        self.metrics.extend(metrics)
+
+    def clear(self) -> None:
+        """Removes all metrics."""
+        self.metrics = list()
+
+class EmfMetricsSink(AbstractMetricsSink):
+    """CloudWatch embedded metric format (EMF) sink. Lambda forwards the json lines written to stdout to CloudWatch Logs, which extracts the metrics.
+
+    Attributes:
+        namespace: A string type CloudWatch metric namespace.
+        stream: A file like object the json lines are written to. Defaults to stdout.
+    """
+    def __init__(self, namespace:str=DEFAULT_NAMESPACE, stream=None):
+        """__init__"""
+        self.namespace = namespace
+        self.stream = stream
+
+    def emit(self, metrics:List[Dict]) -> None:
+        """Writes one EMF json line per metric.
+
+        Args:
+        metrics: List of metric dictionaries
+
+        Returns:
+
+        Raises:
+        """
+        stream = self.stream or sys.stdout
+        timestamp = int(time.time() * 1000)
+        for metric in metrics:
+            emf_dict = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [{
+                        "Namespace": self.namespace,
+                        "Dimensions": [DIMENSION_KEYS],
+                        "Metrics": [
+                            {"Name": "duration_ms", "Unit": "Milliseconds"},
+                            {"Name": "input_bytes", "Unit": "Bytes"},
+                            {"Name": "chunks", "Unit": "Count"}]
+                    }]
+                }
+            }
+            emf_dict.update(metric)
+            stream.write(json.dumps(emf_dict) + "\n")
+        stream.flush()
+
+class StatsdMetricsSink(AbstractMetricsSink):
+    """StatsD compatible UDP sink. Every metric is sent as a timer (duration) and two gauges (input bytes, chunks) named {prefix}.{component}.{document_type}.{stage}.
+
+    Attributes:
+        host: A string type StatsD host name.
+        port: An integer type StatsD UDP port.
+        prefix: A string type metric name prefix.
+    """
+    def __init__(self, host:str=DEFAULT_STATSD_HOST, port:int=DEFAULT_STATSD_PORT, prefix:str=DEFAULT_NAMESPACE.lower()):
+        """__init__"""
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def format(self, metric:Dict) -> str:
+        """Formats a metric as StatsD lines.
+
+        Args:
+        metric: Metric dictionary
+
+        Returns:
+        string
+
+        Raises:
+        """
+        name = ".".join([self.prefix] + [str(metric[key]).replace(".", "_").replace(":", "_") for key in DIMENSION_KEYS])
+        return "{name}.duration_ms:{duration_ms:.3f}|ms\n{name}.input_bytes:{input_bytes}|g\n{name}.chunks:{chunks}|g".format(name=name, **metric)
+
+    def emit(self, metrics:List[Dict]) -> None:
+        """Sends one datagram per metric. Send failures are logged and ignored, metrics must never fail a document.
+
+        Args:
+        metrics: List of metric dictionaries
+
+        Returns:
+
+        Raises:
+        """
+        for metric in metrics:
+            try:
+                self._socket.sendto(self.format(metric).encode("utf-8"), (self.host, self.port))
+            except OSError:
+                ex_type, ex_value, ex_traceback = sys.exc_info()
+                logger.warning("statsd host: {host}, port: {port}, exception_type: {ex_type}, exception_value: {ex_value}".format(host=self.host, port=self.port, ex_type=ex_type, ex_value=ex_value))
+
+class Instrumentation(object):
+    """Creates stage timers and emits their durations as metrics.
+
+    Attributes:
+        sink: An optional AbstractMetricsSink type sink. Instrumentation is disabled if it is None.
+        component: A string type name of the instrumented component (parser or converter).
+    """
+    def __init__(self, sink:AbstractMetricsSink=None, component:str="parser"):
+        """__init__"""
+        self.sink = sink
+        self.component = component
+
+    @property
+    def enabled(self) -> bool:
+        """True if a sink is configured."""
+        return self.sink is not None
+
+    def timer(self) -> StageTimer:
+        """Creates a stage timer, or returns the shared no-op timer if instrumentation is disabled.
+
+        Returns:
+        StageTimer
+
+        Raises:
+        """
+        if self.sink is None:
+            return NULL_TIMER
+        return StageTimer()
+
+    def emit(self, timer:StageTimer, document_type:str, input_bytes:int, chunks:int) -> None:
+        """Emits one metric per stage of a timer.
+
+        Args:
+        timer: StageTimer of the document
+        document_type: Document type (file type or converter name)
+        input_bytes: Size of the input in bytes
+        chunks: Number of chunks (or records) produced
+
+        Returns:
+
+        Raises:
+        """
+        if self.sink is None or not timer.durations:
+            return
+        self.sink.emit([{
+            "component": self.component,
+            "document_type": document_type,
+            "stage": stage,
+            "input_bytes": input_bytes,
+            "chunks": chunks,
+            "duration_ms": seconds * 1000} for stage, seconds in timer.durations.items()])
+
+def metrics_sink_from_env() -> Optional[AbstractMetricsSink]:
+    """Creates the metrics sink configured with the METRICS_SINK environment variable (emf, statsd, memory or none).
+
+    Returns:
+        The configured metrics sink or None if instrumentation is disabled
+
+    Raises:
+        ValueError: If the sink name is unknown
+    """
+    name = os.getenv("METRICS_SINK", NONE_SINK).lower()
+    if name not in METRICS_SINKS:
+        raise ValueError("unknown metrics sink: " + str(name) + ". Must be one of " + str(METRICS_SINKS))
+    if name == EMF_SINK:
+        return EmfMetricsSink(namespace=os.getenv("METRICS_NAMESPACE", DEFAULT_NAMESPACE))
+    if name == STATSD_SINK:
+        return StatsdMetricsSink(host=os.getenv("STATSD_HOST", DEFAULT_STATSD_HOST), port=int(os.getenv("STATSD_PORT", DEFAULT_STATSD_PORT)))
+    if name == MEMORY_SINK:
+        return InMemoryMetricsSink()
+    return None
+
+_default_instrumentation = dict()
+
+def instrumentation_from_env(component:str) -> Instrumentation:
+    """Returns the instrumentation of a component configured in the environment. It is created once per process, so that all parsers of a (warm) Lambda container share one sink.
+
+    Args:
+        component: Name of the instrumented component
+
+    Returns:
+        Instrumentation
+
+    Raises:
+        ValueError: If the configured sink name is unknown
+    """
+    if component not in _default_instrumentation:
+        _default_instrumentation[component] = Instrumentation(sink=metrics_sink_from_env(), component=component)
+    return _default_instrumentation[component]
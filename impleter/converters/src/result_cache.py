@@ -0,0 +1,258 @@
+""" Result cache - File containing functionality that caches converted Kinesis Firehose payloads so that retried transformation batches are not converted again.
+
+When a transformation invocation fails or times out, Kinesis Firehose sends the same records again. The cache is keyed by the hash of the record data and the converter version, so a retried record is answered from the cache. The cache has two levels:
+- an in-process LRU that lives as long as the warm Lambda container.
+- an optional local disk or S3 tier that is shared between containers. Tier errors (e.g. AccessDenied for a missing S3 key without s3:ListBucket) are logged and treated as a miss on get and ignored on put, so the cache never fails a record.
+
+    Typical usage example:
+        from result_cache import ResultCache, LocalDiskCacheTier
+        result_cache = ResultCache(max_entries=1024, tier=LocalDiskCacheTier("/tmp/result-cache"))
+        key = result_cache.make_key(b"eyJpZCI6ICI1NzYzOTQ4MiJ9", "NerLabelToTrain-1.0.0")
+        if result_cache.get(key) is None:
+            result_cache.put(key, b'{"id": "57639482"}')
+        print(result_cache.hit_ratio)
+"""
+import abc
+import os
+import sys
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional, Union
+
+logger = logging.getLogger()
+
+class AbstractCacheTier(object):
+    """AbstractCacheTier"""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def get(self, key:str) -> Optional[bytes]:
+        """get"""
+        return
+
+    @abc.abstractmethod
+    def put(self, key:str, value:bytes) -> None:
+        """put"""
+        return
+
+class LocalDiskCacheTier(AbstractCacheTier):
+    """Local disk cache tier (e.g. the Lambda /tmp directory).
+
+    Attributes:
+        directory: A string type directory the cached payloads are written to.
+    """
+    def __init__(self, directory:str):
+        """__init__"""
+        self.directory = directory
+
+    def _path(self, key:str) -> str:
+        """Returns the file path of a cache key."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key:str) -> Optional[bytes]:
+        """Reads a cached payload.
+
+        Args:
+        key: Cache key
+
+        Returns:
+        Payload bytes or None if the key is not cached
+
+        Raises:
+        """
+        try:
+            with open(self._path(key), "rb") as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key:str, value:bytes) -> None:
+        """Writes a payload to the cache.
+
+        Args:
+        key: Cache key
+        value: Payload bytes
+
+        Returns:
+
+        Raises:
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(value)
+
+class S3CacheTier(AbstractCacheTier):
+    """S3 cache tier. Every in-process miss costs a GetObject and every conversion a PutObject, so the tier is intended for expensive converters.
+
+    Attributes:
+        bucket: A string type S3 bucket name.
+        prefix: A string type S3 key prefix of the cached payloads.
+    """
+    def __init__(self, bucket:str, prefix:str="", s3_client=None):
+        """__init__"""
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created on first use."""
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    def get(self, key:str) -> Optional[bytes]:
+        """Reads a cached payload.
+
+        Args:
+        key: Cache key
+
+        Returns:
+        Payload bytes or None if the key is not cached
+
+        Raises:
+        """
+        try:
+            return self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def put(self, key:str, value:bytes) -> None:
+        """Writes a payload to the cache.
+
+        Args:
+        key: Cache key
+        value: Payload bytes
+
+        Returns:
+
+        Raises:
+        """
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=value)
+
+class ResultCache(object):
+    """Two level (in-process LRU and optional shared tier) cache of converted payloads.
+
+    Attributes:
+        max_entries: An integer type maximum number of payloads kept in process.
+        tier: An optional AbstractCacheTier type shared cache tier.
+        hits: An integer type number of lookups answered from the in-process LRU or the tier.
+        tier_hits: An integer type number of lookups answered from the tier.
+        misses: An integer type number of lookups that were not cached.
+        tier_errors: An integer type number of tier reads and writes that failed.
+    """
+    def __init__(self, max_entries:int=1024, tier:AbstractCacheTier=None):
+        """__init__"""
+        self.max_entries = max_entries
+        self.tier = tier
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.tier_hits = 0
+        self.misses = 0
+        self.tier_errors = 0
+
+    @staticmethod
+    def make_key(data:Union[str, bytes], version:str) -> str:
+        """Creates the cache key of a record.
+
+        Args:
+        data: Base64 encoded Kinesis Firehose record data
+        version: Converter version string
+
+        Returns:
+        Hex encoded sha256 of the version and the data
+
+        Raises:
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(version.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _remember(self, key:str, value:bytes) -> None:
+        """Adds a payload to the in-process LRU, evicting the least recently used payload if it is full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _tier_error(self, operation:str, key:str) -> None:
+        """Logs and counts a failed tier read or write."""
+        self.tier_errors += 1
+        ex_type, ex_value, ex_traceback = sys.exc_info()
+        logger.warning("result cache tier {operation} failed, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}".format(operation=operation, key=key, ex_type=ex_type, ex_value=ex_value))
+
+    def get(self, key:str) -> Optional[bytes]:
+        """Looks up a payload, first in process and then in the tier. A failing tier read counts as a miss.
+
+        Args:
+        key: Cache key
+
+        Returns:
+        Payload bytes or None if the key is not cached
+
+        Raises:
+        """
+        value = self.entries.get(key, None)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.tier is not None:
+            try:
+                value = self.tier.get(key)
+            except Exception:
+                self._tier_error("get", key)
+            if value is not None:
+                self._remember(key, value)
+                self.hits += 1
+                self.tier_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key:str, value:bytes) -> None:
+        """Caches a payload in process and in the tier. A failing tier write is logged and ignored.
+
+        Args:
+        key: Cache key
+        value: Payload bytes
+
+        Returns:
+
+        Raises:
+        """
+        self._remember(key, value)
+        if self.tier is not None:
+            try:
+                self.tier.put(key, value)
+            except Exception:
+                self._tier_error("put", key)
+
+def result_cache_from_env() -> Optional[ResultCache]:
+    """Creates the result cache configured with the RESULT_CACHE_* environment variables.
+
+    Returns:
+        The configured result cache or None if RESULT_CACHE_ENABLED is not set
+
+    Raises:
+    """
+    if os.getenv("RESULT_CACHE_ENABLED", "false").lower() not in ("yes", "true", "t", "1"):
+        return None
+    tier = None
+    if os.getenv("RESULT_CACHE_S3_BUCKET", None):
+        tier = S3CacheTier(bucket=os.getenv("RESULT_CACHE_S3_BUCKET"), prefix=os.getenv("RESULT_CACHE_S3_PREFIX", ""))
+    elif os.getenv("RESULT_CACHE_DIR", None):
+        tier = LocalDiskCacheTier(directory=os.getenv("RESULT_CACHE_DIR"))
+    return ResultCache(max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024)), tier=tier)
@@ -0,0 +1,103 @@
+""" Spill stores - File containing functionality that stores converted payloads that do not fit into a Kinesis Firehose transformation response.
+
+The payload is written to S3 (or a local directory stand-in) and the Firehose record is replaced by a small pointer record that references the stored payload.
+
+    Typical usage example:
+        from spill_stores import S3SpillStore
+        spill_store = S3SpillStore(bucket="word-stash-spill", prefix="ner-label-train/")
+        location = spill_store.put("invocation-id/record-id.json", b'{"id": "57639482-160721-1931"}')
+        print(location)
+"""
+import abc
+import os
+from typing import Optional
+
+class AbstractSpillStore(object):
+    """AbstractSpillStore"""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def put(self, key:str, body:bytes) -> str:
+        """put"""
+        return
+
+class S3SpillStore(AbstractSpillStore):
+    """S3 spill store.
+
+    Attributes:
+        bucket: A string type S3 bucket name.
+        prefix: A string type S3 key prefix of the spilled payloads.
+    """
+    def __init__(self, bucket:str, prefix:str="", s3_client=None):
+        """__init__"""
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created on first use so that the converters do not need boto3 unless spilling is configured."""
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    def put(self, key:str, body:bytes) -> str:
+        """Writes a payload to S3.
+
+        Args:
+        key: Key of the payload relative to the prefix
+        body: Payload bytes
+
+        Returns:
+        S3 uri of the stored payload
+
+        Raises:
+        """
+        s3_key = self.prefix + key
+        self.s3_client.put_object(Bucket=self.bucket, Key=s3_key, Body=body, ContentType="application/json")
+        return "s3://" + self.bucket + "/" + s3_key
+
+class LocalSpillStore(AbstractSpillStore):
+    """Local directory spill store, used as an S3 stand-in when running locally.
+
+    Attributes:
+        directory: A string type directory the payloads are written to.
+    """
+    def __init__(self, directory:str):
+        """__init__"""
+        self.directory = directory
+
+    def put(self, key:str, body:bytes) -> str:
+        """Writes a payload to the local directory.
+
+        Args:
+        key: Key of the payload relative to the directory
+        body: Payload bytes
+
+        Returns:
+        Absolute path of the stored payload
+
+        Raises:
+        """
+        path = os.path.abspath(os.path.join(self.directory, key))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(body)
+        return path
+
+def spill_store_from_env() -> Optional[AbstractSpillStore]:
+    """Creates the spill store configured with the SPILL_S3_BUCKET/SPILL_S3_PREFIX or SPILL_LOCAL_DIR environment variables.
+
+    Returns:
+        The configured spill store or None if spilling is not configured
+
+    Raises:
+    """
+    bucket = os.getenv("SPILL_S3_BUCKET", None)
+    if bucket:
+        return S3SpillStore(bucket=bucket, prefix=os.getenv("SPILL_S3_PREFIX", ""))
+    directory = os.getenv("SPILL_LOCAL_DIR", None)
+    if directory:
+        return LocalSpillStore(directory=directory)
+    return None
@@ -48,17 +48,19 @@ The Kinesis Firehose dictionary payload representations are transformed into the
         print("converted_payload: " + str(converted_payload))
 """
 from typing import Any, Dict
-from jsonschema import validate
-from schema_validators import FIREHOSE_SCHEMA, SQUAD_TRAIN_SCHEMA, SQUAD_LABEL_SCHEMA
+from schema_validators import SQUAD_LABEL_SCHEMA, SQUAD_TRAIN_SCHEMA
 from converters import SquadLabelToTrain
-import sys
-import base64
-import json
+from firehose_transformer import FirehoseTransformer
+from profiling import InvocationProfiler
 import logging
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+profiler = InvocationProfiler.from_env()
 
+transformer = FirehoseTransformer(converter=SquadLabelToTrain(), input_schema=SQUAD_LABEL_SCHEMA, output_schema=SQUAD_TRAIN_SCHEMA, output_list_key="data")
+
+@profiler.profile
 def lambda_handler(event: Dict[str, Any], context):
     """Kinesis Firehose compatible Lambda function handler that converts a SQuAD question-answer annotator dictionary to Hugging Face Transformer question-answer dictionary converter
 
@@ -69,38 +71,4 @@ def lambda_handler(event: Dict[str, Any], context):
         dict (Kinesis Firehose compatible converted Hugging Face Transformer question-answer dictionary)
     Raises:
     """
-    output = []
-    converter = SquadLabelToTrain()
-    validate(event, FIREHOSE_SCHEMA)
-    for record in event["records"]:
-        try:
-            logger.info("recordId: " + record['recordId'])
-            payload = base64.b64decode(record['data'])
-            payload = json.loads(payload)
-            validate(payload, SQUAD_LABEL_SCHEMA)
-            converted_payload = converter.convert(payload)
-            if isinstance(converted_payload['data'], list):
-                [validate(i, SQUAD_TRAIN_SCHEMA) for i in converted_payload['data']]
-            else:
-                validate(converted_payload['data'], SQUAD_TRAIN_SCHEMA)
-            converted_payload = json.dumps(converted_payload)
-            converted_payload = converted_payload.encode('utf-8')
-            output_record = {
-                'recordId': record['recordId'],
-                'result': 'Ok',
-                'data': base64.b64encode(converted_payload)
-            }
-            output.append(output_record)
-        except Exception:
-            ex_type, ex_value, ex_traceback = sys.exc_info()
-            logger.error("recordId: {recordId}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(recordId=record['recordId'], ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
-            output_record = {
-                'recordId': record['recordId'],
-                'result': 'Nok',
-                'data': record["data"],
-                'exception_type': ex_type,
-                'exception_value': ex_value,
-                'exception_traceback': ex_traceback
-            }
-            output.append(output_record)
-    return {'records': output}
\ No newline at end of file
+    return transformer.transform(event)
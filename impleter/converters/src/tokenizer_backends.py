@@ -0,0 +1,356 @@
+""" Tokenizer backends - File containing the pluggable tokenizers used by the NER converters and a BILUO span alignment that works on any of them.
+
+The following backends are available and selected with the NER_TOKENIZER environment variable:
+- spacy (default): spaCy's rule based tokenizer for the configured language.
+- regex: a pure Python tokenizer that does not need spaCy. It runs spaCy's tokenizer algorithm on spaCy's English prefix, suffix, infix, URL and special case rules, which are exported to tokenizer_rules_en.json by scripts/export_tokenizer_rules.py, and produces the same tokens as the spacy backend. Regenerate the rules file whenever spaCy is upgraded.
+
+A token is a (text, start character offset, end character offset) tuple.
+
+    Typical usage example:
+        from tokenizer_backends import get_tokenizer, offsets_to_biluo_tags
+        tokenizer = get_tokenizer("regex")
+        tokens = tokenizer.tokenize("I like London.")
+        tags = offsets_to_biluo_tags(tokens, [(7, 13, "LOC")])
+        print(tags)
+"""
+import abc
+import os
+import re
+import json
+import warnings
+from bisect import bisect_right
+from typing import Iterable, List, Tuple, Union
+
+Token = Tuple[str, int, int]
+
+SPACY_TOKENIZER = "spacy"
+REGEX_TOKENIZER = "regex"
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "tokenizer_rules_en.json")
+MAX_CACHE_SIZE = 100000
+
+class AbstractTokenizer(object):
+    """AbstractTokenizer
+
+    Attributes:
+        name: A string type backend name, part of the converter's result cache key.
+    """
+    __metaclass__ = abc.ABCMeta
+    name = None
+
+    @abc.abstractmethod
+    def tokenize(self, text:str) -> List[Token]:
+        """tokenize"""
+        return
+
+    def tokenize_batch(self, texts:List[str]) -> List[List[Token]]:
+        """Tokenizes a batch of texts.
+
+        Args:
+        texts: List of texts
+
+        Returns:
+        List of token lists, one per text.
+
+        Raises:
+        """
+        return [self.tokenize(text) for text in texts]
+
+class SpacyTokenizer(AbstractTokenizer):
+    """spaCy tokenizer backend. spaCy is imported when the backend is created, so deployments that use another backend do not need it.
+
+    Attributes:
+        lang: A string type spaCy language code - English (en) by default.
+        nlp: spaCy blank Language object of the language.
+    """
+    name = SPACY_TOKENIZER
+
+    def __init__(self, lang:str="en"):
+        """__init__"""
+        from spacy.util import get_lang_class
+        self.lang = lang
+        self.nlp = get_lang_class(lang)()
+
+    def _doc_tokens(self, doc) -> List[Token]:
+        """Converts a spaCy Doc into tokens."""
+        return [(token.text, token.idx, token.idx + len(token.text)) for token in doc]
+
+    def tokenize(self, text:str) -> List[Token]:
+        """Tokenizes a text with spaCy.
+
+        Args:
+        text: Input text
+
+        Returns:
+        List of tokens.
+
+        Raises:
+        """
+        return self._doc_tokens(self.nlp(text))
+
+    def tokenize_batch(self, texts:List[str]) -> List[List[Token]]:
+        """Tokenizes a batch of texts in a single spaCy pipe pass.
+
+        Args:
+        texts: List of texts
+
+        Returns:
+        List of token lists, one per text.
+
+        Raises:
+        """
+        return [self._doc_tokens(doc) for doc in self.nlp.pipe(texts)]
+
+class RegexTokenizer(AbstractTokenizer):
+    """Regular expression tokenizer backend - a pure Python port of spaCy's tokenizer algorithm running on the rules exported from spaCy (see scripts/export_tokenizer_rules.py).
+
+    Whitespace is handled like spaCy does - a single space after a token belongs to the token, any other whitespace run becomes a token of its own. Every other run is looked up in the special cases (e.g. "Mr.", "don't"), then prefixes and suffixes are split off repeatedly, the remainder is split on infixes, and finally special cases that span several tokens (e.g. ":)") are merged back.
+
+    Attributes:
+        rules_path: A string type path of the exported rules file.
+        special_cases: A dict of special case strings to their token texts.
+        special_patterns: A dict of first token text to the (token texts, special case string) pairs that are retokenized after the affix split.
+        cache: A dict of already tokenized runs to their token texts, filled up to MAX_CACHE_SIZE entries.
+    """
+    name = REGEX_TOKENIZER
+
+    def __init__(self, rules_path:str=DEFAULT_RULES_PATH):
+        """__init__"""
+        self.rules_path = rules_path
+        with open(rules_path, "r", encoding="utf-8") as fp:
+            rules = json.load(fp)
+        self.prefix_search = re.compile(rules["prefix"]).search if rules["prefix"] else None
+        self.suffix_search = re.compile(rules["suffix"]).search if rules["suffix"] else None
+        self.infix_finditer = re.compile(rules["infix"]).finditer if rules["infix"] else None
+        self.token_match = re.compile(rules["token_match"]).match if rules["token_match"] else None
+        self.url_match = re.compile(rules["url_match"]).match if rules["url_match"] else None
+        self.special_cases = {}
+        self.special_patterns = {}
+        self.cache = {}
+        self.space_pattern = re.compile(r"\s+")
+        for string, substrings in rules["special_cases"].items():
+            self.special_cases[string] = substrings
+            if self._affix_length(self.prefix_search, string) or self._affix_length(self.suffix_search, string) or self._has_infix(string) or " " in string:
+                pattern = tuple(self._split_span(string, False))
+                self.special_patterns.setdefault(pattern[0], []).append((pattern, string))
+
+    @staticmethod
+    def _affix_length(search, string:str) -> int:
+        """Returns the length of the prefix or suffix found by search, 0 if there is none."""
+        if search is None:
+            return 0
+        match = search(string)
+        return (match.end() - match.start()) if match is not None else 0
+
+    def _has_infix(self, string:str) -> bool:
+        """Returns whether the infix pattern matches the string."""
+        return self.infix_finditer is not None and any(True for _ in self.infix_finditer(string))
+
+    def _split_span(self, span:str, with_special_cases:bool=True) -> List[str]:
+        """Returns the token texts of a whitespace or non whitespace run, like spaCy's Tokenizer._tokenize."""
+        if with_special_cases and span in self.special_cases:
+            return list(self.special_cases[span])
+        prefixes = []
+        suffixes = []
+        string = span
+        last_size = 0
+        while string and len(string) != last_size:
+            if self.token_match and self.token_match(string):
+                break
+            if with_special_cases and string in self.special_cases:
+                break
+            last_size = len(string)
+            pre_len = self._affix_length(self.prefix_search, string)
+            if pre_len:
+                prefix = string[:pre_len]
+                minus_pre = string[pre_len:]
+                if minus_pre and with_special_cases and minus_pre in self.special_cases:
+                    string = minus_pre
+                    prefixes.append(prefix)
+                    break
+            suf_len = self._affix_length(self.suffix_search, string[pre_len:])
+            if suf_len:
+                suffix = string[-suf_len:]
+                minus_suf = string[:-suf_len]
+                if minus_suf and with_special_cases and minus_suf in self.special_cases:
+                    string = minus_suf
+                    suffixes.append(suffix)
+                    break
+            if pre_len and suf_len and (pre_len + suf_len) <= len(string):
+                string = string[pre_len:-suf_len]
+                prefixes.append(prefix)
+                suffixes.append(suffix)
+            elif pre_len:
+                string = minus_pre
+                prefixes.append(prefix)
+            elif suf_len:
+                string = minus_suf
+                suffixes.append(suffix)
+        texts = prefixes
+        if string:
+            if with_special_cases and string in self.special_cases:
+                texts.extend(self.special_cases[string])
+            elif (self.token_match and self.token_match(string)) or (self.url_match and self.url_match(string)):
+                texts.append(string)
+            else:
+                start = 0
+                for match in (self.infix_finditer(string) if self.infix_finditer else ()):
+                    infix_start, infix_end = match.span()
+                    if infix_start == 0:
+                        continue
+                    if infix_start != start:
+                        texts.append(string[start:infix_start])
+                    if infix_start != infix_end:
+                        texts.append(string[infix_start:infix_end])
+                    start = infix_end
+                if string[start:]:
+                    texts.append(string[start:])
+        texts.extend(reversed(suffixes))
+        return texts
+
+    def _tokenize_span(self, text:str, start:int, end:int, tokens:List[Token]) -> None:
+        """Appends the tokens of the run text[start:end]."""
+        span = text[start:end]
+        texts = self.cache.get(span)
+        if texts is None:
+            texts = self._split_span(span)
+            if len(self.cache) < MAX_CACHE_SIZE:
+                self.cache[span] = texts
+        for token_text in texts:
+            tokens.append((token_text, start, start + len(token_text)))
+            start += len(token_text)
+
+    def _apply_special_cases(self, text:str, tokens:List[Token]) -> List[Token]:
+        """Merges the special cases that span several tokens, longest and then leftmost first, like spaCy's Tokenizer._apply_special_cases."""
+        matches = []
+        for i, (token_text, _, _) in enumerate(tokens):
+            for pattern, string in self.special_patterns.get(token_text, ()):
+                if len(pattern) == 1 or tuple(token[0] for token in tokens[i:i + len(pattern)]) == pattern:
+                    matches.append((i, i + len(pattern), string))
+        if not matches:
+            return tokens
+        seen = set()
+        filtered = {}
+        for match_start, match_end, string in sorted(matches, key=lambda match: (match[0] - match[1], match[0])):
+            if match_start not in seen and match_end - 1 not in seen:
+                filtered[match_start] = (match_end, string)
+            seen.update(range(match_start, match_end))
+        output = []
+        i = 0
+        while i < len(tokens):
+            if i not in filtered:
+                output.append(tokens[i])
+                i += 1
+                continue
+            match_end, string = filtered[i]
+            position = tokens[i][1]
+            if text[position:tokens[match_end - 1][2]] != string:
+                output.extend(tokens[i:match_end])
+            else:
+                for token_text in self.special_cases[string]:
+                    output.append((token_text, position, position + len(token_text)))
+                    position += len(token_text)
+            i = match_end
+        return output
+
+    def tokenize(self, text:str) -> List[Token]:
+        """Tokenizes a text.
+
+        Args:
+        text: Input text
+
+        Returns:
+        List of tokens.
+
+        Raises:
+        """
+        tokens = []
+        position = 0
+        for space in self.space_pattern.finditer(text):
+            space_start, space_end = space.span()
+            if space_start > position:
+                self._tokenize_span(text, position, space_start, tokens)
+                if text[space_start] == " ":
+                    space_start += 1
+            if space_end > space_start:
+                self._tokenize_span(text, space_start, space_end, tokens)
+            position = space_end
+        if position < len(text):
+            self._tokenize_span(text, position, len(text), tokens)
+        return self._apply_special_cases(text, tokens)
+
+TOKENIZER_BACKENDS = {
+    SPACY_TOKENIZER: SpacyTokenizer,
+    REGEX_TOKENIZER: RegexTokenizer
+}
+
+def get_tokenizer(name:str=None, lang:str="en") -> AbstractTokenizer:
+    """Function that creates a tokenizer backend.
+
+    Args:
+        name: Backend name (spacy or regex). Defaults to the NER_TOKENIZER environment variable or spacy.
+        lang: Language code used by the spaCy backend
+
+    Returns:
+        AbstractTokenizer
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    name = (name or os.getenv("NER_TOKENIZER", SPACY_TOKENIZER)).lower()
+    if name not in TOKENIZER_BACKENDS:
+        raise ValueError("unknown tokenizer backend: " + str(name) + ". Must be one of " + str(list(TOKENIZER_BACKENDS.keys())))
+    if name == SPACY_TOKENIZER:
+        return SpacyTokenizer(lang=lang)
+    return TOKENIZER_BACKENDS[name]()
+
+def offsets_to_biluo_tags(tokens:List[Token], entities:Iterable[Tuple[int, int, Union[str, int]]], missing:str="O") -> List[str]:
+    """Function that encodes character offset entity spans into per token BILUO tags. The output matches spacy.training.offsets_to_biluo_tags for the same tokens.
+
+    Args:
+        tokens: List of (text, start, end) tokens
+        entities: Sequence of (start, end, label) character offset triples
+        missing: Tag used for tokens whose tokenisation does not align with an entity span
+
+    Returns:
+        A list of tags - "O", "{action}-{label}" where action is one of B, I, L or U, or "-" where the tokenisation does not align with an entity span.
+
+    Raises:
+        ValueError: If entity spans overlap
+    """
+    entities = list(entities)
+    starts = {start: i for i, (_, start, _) in enumerate(tokens)}
+    ends = {end: i for i, (_, _, end) in enumerate(tokens)}
+    biluo = ["-" for _ in tokens]
+    labelled_spans = []
+    for start_char, end_char, label in entities:
+        if not label:
+            for start, i in starts.items():
+                if start >= start_char and start < end_char:
+                    biluo[i] = "O"
+            continue
+        for span_start, span_end, span_label in labelled_spans:
+            if start_char < span_end and span_start < end_char:
+                raise ValueError("Trying to set conflicting doc.ents: '{span1}' and '{span2}'. A token can only be part of one entity.".format(span1=(span_start, span_end, span_label), span2=(start_char, end_char, label)))
+        labelled_spans.append((start_char, end_char, label))
+        start_token = starts.get(start_char)
+        end_token = ends.get(end_char)
+        if start_token is not None and end_token is not None:
+            if start_token == end_token:
+                biluo[start_token] = "U-" + str(label)
+            else:
+                biluo[start_token] = "B-" + str(label)
+                for i in range(start_token + 1, end_token):
+                    biluo[i] = "I-" + str(label)
+                biluo[end_token] = "L-" + str(label)
+    spans = sorted((start_char, end_char) for start_char, end_char, _ in entities if end_char > start_char)
+    span_starts = [start_char for start_char, _ in spans]
+    max_span_end = []
+    for _, end_char in spans:
+        max_span_end.append(max(end_char, max_span_end[-1]) if max_span_end else end_char)
+    for i, (_, start, end) in enumerate(tokens):
+        candidate = bisect_right(span_starts, end - 1) - 1
+        if candidate < 0 or end <= start or max_span_end[candidate] <= start:
+            biluo[i] = missing
+    if "-" in biluo and missing != "-":
+        warnings.warn("Some entities could not be aligned in the text. Use `spacy.training.offsets_to_biluo_tags` to check the alignment. Misaligned entities ('-') will be ignored during training. Entities: " + str(entities)[:50])
+    return biluo
@@ -0,0 +1,178 @@
+""" Schema validator registry - File containing functionality that compiles json schemas once per process and decides which payload validations run.
+
+jsonschema.validate() checks the schema and builds a new validator every time it is called. The registry compiles each schema the first time it is used and reuses the compiled validator for the lifetime of the (warm) Lambda container. The following backends are supported:
+- jsonschema (default): the draft validator class is resolved and the schema is checked once.
+- fastjsonschema (optional): the schema is compiled to generated Python code. fastjsonschema implements draft-07 and silently ignores draft 2019-09/2020-12 keywords such as prefixItems, so schemas that use one of them are compiled with jsonschema instead and a warning is logged.
+
+    Typical usage example:
+        from schema_validators import CLASS_CRUDE_SCHEMA
+        from validator_registry import ValidationPolicy, validate
+        validation_policy = ValidationPolicy.from_env()
+        example_dict = {
+            "id": "57639482-160721-1931",
+            "index": 0,
+            "content": "The field of machine learning has made tremendous progress over the past decade"
+        }
+        validate_input, validate_output = validation_policy.select()
+        if validate_input:
+            validate(example_dict, CLASS_CRUDE_SCHEMA)
+"""
+import os
+import random
+import logging
+from typing import Any, Callable, Dict, Set, Tuple
+from jsonschema.validators import validator_for
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+logger = logging.getLogger()
+
+JSONSCHEMA_BACKEND = "jsonschema"
+FASTJSONSCHEMA_BACKEND = "fastjsonschema"
+VALIDATE_ALL = "all"
+VALIDATE_INPUT = "input"
+VALIDATE_OUTPUT = "output"
+VALIDATE_NONE = "none"
+VALIDATION_MODES = [VALIDATE_ALL, VALIDATE_INPUT, VALIDATE_OUTPUT, VALIDATE_NONE]
+FASTJSONSCHEMA_UNSUPPORTED_KEYWORDS = frozenset(["prefixItems", "$defs", "$dynamicRef", "$dynamicAnchor", "$recursiveRef", "$recursiveAnchor",
+    "dependentRequired", "dependentSchemas", "unevaluatedItems", "unevaluatedProperties", "minContains", "maxContains"])
+
+_validator_cache = dict()
+
+def unsupported_keywords(schema:Any, keywords:Set[str]=FASTJSONSCHEMA_UNSUPPORTED_KEYWORDS) -> Set[str]:
+    """Function that returns the keywords of a json schema (including its subschemas) that are in the given set.
+
+    Args:
+        schema: Json schema dictionary
+        keywords: Set of keyword names
+
+    Returns:
+        Set of the keywords used by the schema
+
+    Raises:
+    """
+    found = set()
+    if isinstance(schema, dict):
+        found.update(keyword for keyword in schema if keyword in keywords)
+        for key, value in schema.items():
+            if key not in ("properties", "patternProperties", "definitions", "$defs"):
+                found.update(unsupported_keywords(value, keywords))
+            elif isinstance(value, dict):
+                for subschema in value.values():
+                    found.update(unsupported_keywords(subschema, keywords))
+    elif isinstance(schema, list):
+        for element in schema:
+            found.update(unsupported_keywords(element, keywords))
+    return found
+
+def compile_schema(schema:Dict, backend:str=JSONSCHEMA_BACKEND) -> Callable[[Any], Any]:
+    """Function that compiles a json schema into a validator callable. Schemas with keywords that fastjsonschema does not enforce are compiled with jsonschema.
+
+    Args:
+        schema: Json schema dictionary
+        backend: Validator backend name (jsonschema or fastjsonschema)
+
+    Returns:
+        A callable that raises an exception if the instance passed to it is invalid
+
+    Raises:
+        ValueError: If the backend is unknown
+        ImportError: If the fastjsonschema backend is requested but not installed
+    """
+    if backend == FASTJSONSCHEMA_BACKEND:
+        if fastjsonschema is None:
+            raise ImportError("fastjsonschema backend requested but the fastjsonschema package is not installed")
+        keywords = unsupported_keywords(schema)
+        if not keywords:
+            return fastjsonschema.compile(schema)
+        logger.warning("fastjsonschema does not enforce the keywords {keywords}, the schema is compiled with jsonschema".format(keywords=sorted(keywords)))
+        backend = JSONSCHEMA_BACKEND
+    if backend != JSONSCHEMA_BACKEND:
+        raise ValueError("unknown schema validator backend: " + str(backend))
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema).validate
+
+def get_validator(schema:Dict, backend:str=None) -> Callable[[Any], Any]:
+    """Function that returns the compiled validator of a json schema, compiling it on first use.
+
+    Schemas are module level constants, so they are cached by identity. The schema is kept alive by the cache so its id cannot be reused.
+
+    Args:
+        schema: Json schema dictionary
+        backend: Validator backend name. Defaults to the SCHEMA_VALIDATOR_BACKEND environment variable or jsonschema.
+
+    Returns:
+        A callable that raises an exception if the instance passed to it is invalid
+
+    Raises:
+    """
+    backend = backend or os.getenv("SCHEMA_VALIDATOR_BACKEND", JSONSCHEMA_BACKEND)
+    cache_key = (id(schema), backend)
+    cache_entry = _validator_cache.get(cache_key, None)
+    if cache_entry is None:
+        cache_entry = (schema, compile_schema(schema, backend=backend))
+        _validator_cache[cache_key] = cache_entry
+    return cache_entry[1]
+
+def validate(instance:Any, schema:Dict, backend:str=None) -> None:
+    """Drop-in replacement of jsonschema.validate that uses the cached compiled validator.
+
+    Args:
+        instance: Instance to validate
+        schema: Json schema dictionary
+        backend: Validator backend name
+
+    Returns:
+
+    Raises:
+        jsonschema.ValidationError or fastjsonschema.JsonSchemaException: If the instance is invalid
+    """
+    get_validator(schema, backend=backend)(instance)
+
+class ValidationPolicy(object):
+    """Policy that decides which payload validations run for a record.
+
+    Attributes:
+        mode: A string type validation mode - all, input (input payloads only), output (output payloads only) or none.
+        sample_rate: A float type fraction (0.0 - 1.0) of records that are validated.
+    """
+    def __init__(self, mode:str=VALIDATE_ALL, sample_rate:float=1.0, rng:random.Random=None):
+        """__init__"""
+        if mode not in VALIDATION_MODES:
+            raise ValueError("validation mode must be one of " + str(VALIDATION_MODES) + ", got: " + str(mode))
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("validation sample rate must be between 0.0 and 1.0, got: " + str(sample_rate))
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_env(cls) -> "ValidationPolicy":
+        """Creates a validation policy from the VALIDATION_MODE and VALIDATION_SAMPLE_RATE environment variables.
+
+        Returns:
+        ValidationPolicy
+
+        Raises:
+        """
+        mode = os.getenv("VALIDATION_MODE", VALIDATE_ALL).lower()
+        sample_rate = float(os.getenv("VALIDATION_SAMPLE_RATE", 1.0))
+        return cls(mode=mode, sample_rate=sample_rate)
+
+    def select(self) -> Tuple[bool, bool]:
+        """Decides which validations run for the next record.
+
+        Returns:
+        tuple (validate input boolean, validate output boolean)
+
+        Raises:
+        """
+        if self.mode == VALIDATE_NONE:
+            return False, False
+        if self.sample_rate < 1.0 and self.rng.random() >= self.sample_rate:
+            return False, False
+        return self.mode in (VALIDATE_ALL, VALIDATE_INPUT), self.mode in (VALIDATE_ALL, VALIDATE_OUTPUT)
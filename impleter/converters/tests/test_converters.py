@@ -9,6 +9,7 @@ from src.converters import (
     QUESTION_KEY,
     ANSWERS_KEY,
     ANSWER_START_KEY,
+    CHUNK_ID_KEY,
     ClassificationCrudeToLabel,
     NerCrudeToLabel,
     NerLabelToTrain,
@@ -66,4 +67,15 @@ def test_squad():
     text = out_train_list[-1][DATA_KEY][0][DATA_KEY][0][ANSWERS_KEY][TEXT_KEY][0]
     assert question == qas[0]["question"]
     assert answer_start == qas[0]["answers"][0]["answer_start"]
-    assert text == qas[0]["answers"][0]["text"]
\ No newline at end of file
+    assert text == qas[0]["answers"][0]["text"]
+
+def test_squad_train_ids_are_deterministic():
+    qas = [{"question": "What has made progress?", "answers": [{"answer_start": 0, "text": "The field"}]},
+        {"question": "Over which period?", "answers": [{"answer_start": 68, "text": "the past decade"}]}]
+    test_dict = dict(TEST_PAYLOAD, index=3, chunk_id="0123456789abcdef0123456789abcdef", qas=qas)
+    first = SquadLabelToTrain().convert(test_dict)[DATA_KEY]
+    second = SquadLabelToTrain().convert(dict(test_dict))[DATA_KEY]
+    assert first == second
+    assert [out_dict["id"] for out_dict in first] == ["57639482-160721-1931_3_0", "57639482-160721-1931_3_1"]
+    assert len(set(out_dict[CHUNK_ID_KEY] for out_dict in first)) == 2
+    assert all(out_dict[CHUNK_ID_KEY] != test_dict[CHUNK_ID_KEY] for out_dict in first)
@@ -0,0 +1,125 @@
+import base64
+import json
+import boto3
+from moto import mock_s3
+from src.firehose_transformer import RESULT_OK, RESULT_NOK, RESULT_DROPPED, SPILLED_KEY, SPILL_LOCATION_KEY, FirehoseTransformer
+from src.spill_stores import LocalSpillStore, S3SpillStore
+from src.converters import ClassificationCrudeToLabel, NerLabelToTrain
+from src.schema_validators import CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA, NER_LABEL_SCHEMA, NER_TRAIN_SCHEMA
+from src.instrumentation import Instrumentation, InMemoryMetricsSink
+
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+
+def create_event(payloads:list) -> dict:
+    return {
+        "invocationId": "invocation-1",
+        "records": [{"recordId": str(i), "data": base64.b64encode(json.dumps(payload).encode('utf-8'))} for i, payload in enumerate(payloads)]
+    }
+
+class DroppingConverter(ClassificationCrudeToLabel):
+    def convert(self, input_dict:dict) -> dict:
+        if input_dict["index"] == 1:
+            return None
+        return super().convert(input_dict)
+
+def test_transform_returns_ok_nok_and_dropped_results():
+    transformer = FirehoseTransformer(converter=DroppingConverter(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA)
+    event = create_event([
+        {"id": "a", "index": 0, "content": CONTENT, "label": "scientific_context"},
+        {"id": "a", "index": 1, "content": CONTENT, "label": "scientific_context"},
+        {"id": "a", "content": CONTENT}])
+    actual = transformer.transform(event)
+    assert [record["recordId"] for record in actual["records"]] == ["0", "1", "2"]
+    assert [record["result"] for record in actual["records"]] == [RESULT_OK, RESULT_DROPPED, RESULT_NOK]
+    assert json.loads(base64.b64decode(actual["records"][0]["data"]))["sentence1"] == CONTENT
+    assert actual["records"][1]["data"] == event["records"][1]["data"]
+    assert actual["records"][2]["data"] == event["records"][2]["data"]
+    assert actual["records"][2]["exception_type"] == "ValidationError"
+
+def test_transform_batches_ner_tokenisation():
+    transformer = FirehoseTransformer(converter=NerLabelToTrain(), input_schema=NER_LABEL_SCHEMA, output_schema=NER_TRAIN_SCHEMA)
+    event = create_event([
+        {"id": "a", "index": 0, "text": CONTENT, "label": [[4, 9, "U-LOC"]]},
+        {"id": "a", "index": 1, "text": CONTENT, "label": [["x", 9, "U-LOC"]]},
+        {"id": "a", "index": 2, "text": "Machine learning", "label": []}])
+    actual = transformer.transform(event)
+    assert [record["result"] for record in actual["records"]] == [RESULT_OK, RESULT_NOK, RESULT_OK]
+    first = json.loads(base64.b64decode(actual["records"][0]["data"]))
+    assert first["label"][:2] == ["O", "U-LOC"]
+    last = json.loads(base64.b64decode(actual["records"][2]["data"]))
+    assert last["text"] == ["Machine", "learning"]
+
+def test_transform_emits_stage_metrics():
+    sink = InMemoryMetricsSink()
+    converter = NerLabelToTrain()
+    transformer = FirehoseTransformer(converter=converter, input_schema=NER_LABEL_SCHEMA, output_schema=NER_TRAIN_SCHEMA, instrumentation=Instrumentation(sink=sink, component="converter"))
+    event = create_event([{"id": "a", "index": i, "text": CONTENT, "label": [[4, 9, "U-LOC"]]} for i in range(3)])
+    transformer.transform(event)
+    stages = {metric["stage"]: metric for metric in sink.metrics}
+    assert set(stages.keys()) == {"decode", "validate_input", "convert", "tokenization", "dict_building", "validate_output", "encode"}
+    assert stages["tokenization"]["document_type"] == "NerLabelToTrain"
+    assert stages["tokenization"]["component"] == "converter"
+    assert stages["tokenization"]["chunks"] == 3
+    assert stages["tokenization"]["input_bytes"] == sum(len(record["data"]) for record in event["records"])
+    assert converter.timer.durations == {}
+
+def test_transform_falls_back_to_per_record_conversion():
+    class BrokenBatchConverter(ClassificationCrudeToLabel):
+        def convert_batch(self, input_list):
+            raise RuntimeError("batch hook failure")
+    transformer = FirehoseTransformer(converter=BrokenBatchConverter(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA)
+    actual = transformer.transform(create_event([{"id": "a", "index": 0, "content": CONTENT, "label": None}]))
+    assert actual["records"][0]["result"] == RESULT_OK
+
+def create_large_event(count:int) -> dict:
+    return create_event([{"id": "a", "index": i, "content": CONTENT * 10, "label": None} for i in range(count)])
+
+def test_transform_spills_payloads_that_do_not_fit_into_the_response(tmp_path):
+    transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA,
+        spill_store=LocalSpillStore(str(tmp_path)), max_response_bytes=8000)
+    actual = transformer.transform(create_large_event(8))
+    assert [record["result"] for record in actual["records"]] == [RESULT_OK] * 8
+    payloads = [json.loads(base64.b64decode(record["data"])) for record in actual["records"]]
+    assert payloads[0]["sentence1"] == CONTENT * 10
+    spilled = [payload for payload in payloads if payload.get(SPILLED_KEY) is True]
+    assert len(spilled) > 0
+    for payload in spilled:
+        with open(payload[SPILL_LOCATION_KEY]) as fp:
+            spilled_payload = json.load(fp)
+        assert spilled_payload["sentence1"] == CONTENT * 10
+        assert spilled_payload["index"] == payload["index"]
+    response_bytes = sum(len(record["data"]) for record in actual["records"])
+    assert response_bytes < 8000
+
+def test_transform_fails_only_oversized_records_without_spill_store(monkeypatch):
+    monkeypatch.delenv("SPILL_S3_BUCKET", raising=False)
+    monkeypatch.delenv("SPILL_LOCAL_DIR", raising=False)
+    transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA, max_record_bytes=500)
+    event = create_event([{"id": "a", "index": 0, "content": CONTENT, "label": None}, {"id": "a", "index": 1, "content": CONTENT * 10, "label": None}])
+    actual = transformer.transform(event)
+    assert [record["result"] for record in actual["records"]] == [RESULT_OK, RESULT_NOK]
+
+def test_response_stays_under_the_limit_without_spill_store(monkeypatch):
+    monkeypatch.delenv("SPILL_S3_BUCKET", raising=False)
+    monkeypatch.delenv("SPILL_LOCAL_DIR", raising=False)
+    transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA, max_response_bytes=200000)
+    payloads = [{"id": "a", "index": i, "content": CONTENT * 250, "label": None} for i in range(20)]
+    event = create_event(payloads[:10] + [{"index": 10, "content": CONTENT * 250}] + payloads[11:])
+    actual = transformer.transform(event)
+    results = [record["result"] for record in actual["records"]]
+    assert results[0] == RESULT_OK and results[-1] == RESULT_NOK
+    assert len(results) == 20
+    encoded_bytes = len(json.dumps(actual, default=lambda value: value.decode("utf-8")))
+    assert encoded_bytes <= 200000
+    assert transformer.last_metrics["response_bytes"] <= 200000
+
+def test_s3_spill_store(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_s3():
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket="spill-bucket")
+        spill_store = S3SpillStore(bucket="spill-bucket", prefix="spill/", s3_client=s3_client)
+        location = spill_store.put("invocation-1/0.json", b'{"id": "a"}')
+        assert location == "s3://spill-bucket/spill/invocation-1/0.json"
+        assert s3_client.get_object(Bucket="spill-bucket", Key="spill/invocation-1/0.json")["Body"].read() == b'{"id": "a"}'
@@ -283,14 +283,14 @@ def test_squad_label_to_train_returns_correct_value():
     actual = squad_label_to_train_lambda_function.lambda_handler(valid_input_event, context)
     actual = convert_base64_to_dict(actual)
     print("actual: " + str(actual))
-    actual["records"][0]["data"]["data"][0]["id"] = "CORTICAI-57639482-160721-1931_1"
     assert actual == {
         "records": [
             {
                 "recordId": "49583354031560888214100043296632351296610463251381092354000000",
                 "data": {   
                         "data": [{
-                            "id": "CORTICAI-57639482-160721-1931_1",
+                            "id": "CORTICAI-57639482-160721-1931_1_12345_0",
+                            "chunk_id": "54a4e36147bb50c9ecd4a13fb951770c",
                             "index": 12345,
                             "filename": "/Users/eugenetan/Downloads/EY/papers/pdf//CORTICAI-57639482-160721-1931.pdf",
                             "section_0": "Machine Learning: Diagnosis of COVID-19 based on Lab Tests",
@@ -0,0 +1,80 @@
+import base64
+import json
+from src.result_cache import AbstractCacheTier, ResultCache, LocalDiskCacheTier
+from src.firehose_transformer import RESULT_OK, FirehoseTransformer
+from src.converters import ClassificationCrudeToLabel, NerLabelToTrain
+from src.tokenizer_backends import RegexTokenizer
+from src.schema_validators import CLASS_CRUDE_SCHEMA, CLASS_LABEL_SCHEMA, NER_LABEL_SCHEMA, NER_TRAIN_SCHEMA
+
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+
+class CountingConverter(ClassificationCrudeToLabel):
+    def __init__(self):
+        super().__init__()
+        self.convert_count = 0
+
+    def convert(self, input_dict:dict) -> dict:
+        self.convert_count += 1
+        return super().convert(input_dict)
+
+class FailingTier(AbstractCacheTier):
+    def get(self, key:str) -> bytes:
+        raise PermissionError("AccessDenied")
+
+    def put(self, key:str, value:bytes) -> None:
+        raise PermissionError("AccessDenied")
+
+def create_event(count:int) -> dict:
+    return {
+        "invocationId": "invocation-1",
+        "records": [{"recordId": str(i), "data": base64.b64encode(json.dumps({"id": "a", "index": i, "content": CONTENT, "label": None}).encode('utf-8'))} for i in range(count)]
+    }
+
+def test_cache_key_depends_on_version():
+    assert ResultCache.make_key(b"data", "1.0.0") == ResultCache.make_key("data", "1.0.0")
+    assert ResultCache.make_key(b"data", "1.0.0") != ResultCache.make_key(b"data", "1.0.1")
+
+def test_lru_evicts_least_recently_used_entry():
+    result_cache = ResultCache(max_entries=2)
+    result_cache.put("a", b"1")
+    result_cache.put("b", b"2")
+    assert result_cache.get("a") == b"1"
+    result_cache.put("c", b"3")
+    assert result_cache.get("b") is None
+    assert result_cache.get("a") == b"1"
+    assert result_cache.get("c") == b"3"
+    assert result_cache.hits == 3
+    assert result_cache.misses == 1
+
+def test_local_disk_tier_is_shared_between_caches(tmp_path):
+    ResultCache(tier=LocalDiskCacheTier(str(tmp_path))).put("abcdef", b"payload")
+    result_cache = ResultCache(tier=LocalDiskCacheTier(str(tmp_path)))
+    assert result_cache.get("abcdef") == b"payload"
+    assert result_cache.tier_hits == 1
+    assert result_cache.get("abcdef") == b"payload"
+    assert result_cache.tier_hits == 1
+
+def test_retried_batch_is_answered_from_cache():
+    converter = CountingConverter()
+    transformer = FirehoseTransformer(converter=converter, input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA, result_cache=ResultCache())
+    first = transformer.transform(create_event(5))
+    assert transformer.last_metrics["cache_hits"] == 0
+    retried = transformer.transform(create_event(6))
+    assert converter.convert_count == 6
+    assert transformer.last_metrics["cache_hits"] == 5
+    assert transformer.last_metrics["cache_hit_ratio"] == 5 / 6
+    assert [record["result"] for record in retried["records"]] == [RESULT_OK] * 6
+    assert retried["records"][:5] == first["records"]
+
+def test_failing_tier_does_not_fail_records():
+    result_cache = ResultCache(tier=FailingTier())
+    transformer = FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA, result_cache=result_cache)
+    actual = transformer.transform(create_event(3))
+    assert [record["result"] for record in actual["records"]] == [RESULT_OK] * 3
+    assert result_cache.misses == 3
+    assert result_cache.tier_errors == 6
+
+def test_cache_version_depends_on_tokenizer_backend():
+    transformer = FirehoseTransformer(converter=NerLabelToTrain(tokenizer=RegexTokenizer()), input_schema=NER_LABEL_SCHEMA, output_schema=NER_TRAIN_SCHEMA, output_list_key="data", result_cache=ResultCache())
+    assert transformer.converter_version.endswith("-regex")
+    assert FirehoseTransformer(converter=ClassificationCrudeToLabel(), input_schema=CLASS_CRUDE_SCHEMA, output_schema=CLASS_LABEL_SCHEMA).converter_version == "ClassificationCrudeToLabel-" + str(ClassificationCrudeToLabel().version)
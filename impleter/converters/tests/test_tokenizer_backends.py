@@ -0,0 +1,86 @@
+import os
+import re
+import glob
+import json
+import warnings
+import pytest
+from spacy.training import offsets_to_biluo_tags as spacy_offsets_to_biluo_tags
+from src.tokenizer_backends import SpacyTokenizer, RegexTokenizer, get_tokenizer, offsets_to_biluo_tags
+from src.converters import NerLabelToTrain
+
+CORPUS = [
+    ("The field of machine learning has made tremendous progress over the past decade", [[4, 9, "LOC"], [13, 29, "FIELD"]]),
+    ("API: generate password is required", [[5, 21, "SUPPORTING_ACTIVITY"]]),
+    ("I like London.", [[7, 13, "LOC"]]),
+    ("Don't stop-believing in the 3.5% (approx) COVID-19 $100...", [[42, 50, "DISEASE"], [6, 10, ""]]),
+    ("state-of-the-art, isn't it? 10:30 1,000", [[34, 39, "NUMBER"]]),
+    ("Contact john@example.com or http://example.org/a.", [[8, 24, "EMAIL"]]),
+    ("We're done; they'll go. I'm ok, you've seen it's John's.", [[49, 53, "PERSON"]]),
+    ("a  b\nc \n d ", []),
+]
+DATA_DIR = os.path.realpath(os.path.dirname(__file__) + "/data")
+REVIEWED_TEXTS = ["2022-02-03", "id", "Mr. Smith, e.g. this", "5pm 10km", "ASIC’s", "U.S. I'd can't :) http://example.org/a."]
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+def fixture_texts():
+    """Returns every string of the parser fixtures in tests/data, the lines and paragraphs of example.txt and the texts of CORPUS and REVIEWED_TEXTS."""
+    texts = []
+    for path in sorted(glob.glob(DATA_DIR + "/*.json")):
+        with open(path, "r", encoding="utf-8") as fp:
+            texts.extend(_strings(json.load(fp)))
+    with open(DATA_DIR + "/example.txt", "r", encoding="utf-8") as fp:
+        example = fp.read()
+    texts.extend([example] + example.splitlines() + example.split("\n\n"))
+    return texts + [text for text, _ in CORPUS] + REVIEWED_TEXTS
+
+def fixture_entities(text):
+    """Returns the capitalised words of a text as entities, whether or not they align with token boundaries."""
+    return [[match.start(), match.end(), "ENT"] for match in re.finditer(r"[A-Z][\w.-]+", text)]
+
+def test_regex_tokens_match_spacy():
+    spacy_tokenizer = SpacyTokenizer()
+    regex_tokenizer = RegexTokenizer()
+    texts = fixture_texts()
+    for text in texts:
+        assert regex_tokenizer.tokenize(text) == spacy_tokenizer.tokenize(text), text
+    assert regex_tokenizer.tokenize_batch(texts) == spacy_tokenizer.tokenize_batch(texts)
+
+def test_biluo_tags_match_spacy():
+    spacy_tokenizer = SpacyTokenizer()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for text, entities in CORPUS + [(text, fixture_entities(text)) for text in fixture_texts()]:
+            expected = spacy_offsets_to_biluo_tags(spacy_tokenizer.nlp(text), entities)
+            assert offsets_to_biluo_tags(spacy_tokenizer.tokenize(text), entities) == expected
+            assert offsets_to_biluo_tags(RegexTokenizer().tokenize(text), entities) == expected
+
+def test_biluo_tags_reject_overlapping_entities():
+    tokens = RegexTokenizer().tokenize("I like London.")
+    with pytest.raises(ValueError):
+        offsets_to_biluo_tags(tokens, [[7, 13, "LOC"], [2, 9, "X"]])
+
+def test_tokenizer_is_selected_per_deployment(monkeypatch):
+    monkeypatch.setenv("NER_TOKENIZER", "regex")
+    assert isinstance(get_tokenizer(), RegexTokenizer)
+    assert type(NerLabelToTrain().tokenizer).__name__ == "RegexTokenizer"
+    monkeypatch.delenv("NER_TOKENIZER")
+    assert isinstance(get_tokenizer(), SpacyTokenizer)
+    with pytest.raises(ValueError):
+        get_tokenizer("unknown")
+
+def test_ner_label_to_train_output_does_not_depend_on_backend():
+    texts = [(text, entities) for text, entities in CORPUS] + [(text, fixture_entities(text)) for text in fixture_texts()]
+    input_list = [{"id": "a", "index": i, "text": text, "label": entities} for i, (text, entities) in enumerate(texts)]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = NerLabelToTrain(tokenizer=SpacyTokenizer()).convert_batch(input_list)
+        assert NerLabelToTrain(tokenizer=RegexTokenizer()).convert_batch(input_list) == expected
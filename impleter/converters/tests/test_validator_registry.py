@@ -0,0 +1,65 @@
+import random
+import pytest
+from jsonschema import ValidationError
+from src.schema_validators import CLASS_CRUDE_SCHEMA, NER_LABEL_SCHEMA
+from src.validator_registry import (
+    VALIDATE_ALL,
+    VALIDATE_INPUT,
+    VALIDATE_OUTPUT,
+    VALIDATE_NONE,
+    FASTJSONSCHEMA_BACKEND,
+    JSONSCHEMA_BACKEND,
+    ValidationPolicy,
+    get_validator,
+    unsupported_keywords,
+    validate
+)
+
+VALID_PAYLOAD = {
+    "id": "57639482-160721-1931",
+    "index": 0,
+    "content": "The field of machine learning has made tremendous progress over the past decade"
+}
+
+def test_validator_is_compiled_once():
+    validator = get_validator(CLASS_CRUDE_SCHEMA)
+    assert get_validator(CLASS_CRUDE_SCHEMA) is validator
+
+def test_validate_raises_on_invalid_payload():
+    validate(VALID_PAYLOAD, CLASS_CRUDE_SCHEMA)
+    invalid_payload = dict(VALID_PAYLOAD)
+    del invalid_payload["id"]
+    with pytest.raises(ValidationError):
+        validate(invalid_payload, CLASS_CRUDE_SCHEMA)
+
+def test_backends_agree_on_prefix_items_violation():
+    valid_payload = {"id": "a", "index": 0, "text": "API: generate password is required", "label": [[5, 21, "SUPPORTING_ACTIVITY"]]}
+    invalid_payload = dict(valid_payload, label=[[5, 21, 7]])
+    assert unsupported_keywords(NER_LABEL_SCHEMA) == {"prefixItems"}
+    assert unsupported_keywords(CLASS_CRUDE_SCHEMA) == set()
+    for backend in [JSONSCHEMA_BACKEND, FASTJSONSCHEMA_BACKEND]:
+        validate(valid_payload, NER_LABEL_SCHEMA, backend=backend)
+        with pytest.raises(ValidationError):
+            validate(invalid_payload, NER_LABEL_SCHEMA, backend=backend)
+
+def test_validation_policy_modes():
+    assert ValidationPolicy(mode=VALIDATE_ALL).select() == (True, True)
+    assert ValidationPolicy(mode=VALIDATE_INPUT).select() == (True, False)
+    assert ValidationPolicy(mode=VALIDATE_OUTPUT).select() == (False, True)
+    assert ValidationPolicy(mode=VALIDATE_NONE).select() == (False, False)
+    with pytest.raises(ValueError):
+        ValidationPolicy(mode="sometimes")
+
+def test_validation_policy_sample_rate():
+    policy = ValidationPolicy(sample_rate=0.25, rng=random.Random(7))
+    selected = [policy.select() for _ in range(4000)]
+    validated = len([i for i in selected if i == (True, True)])
+    assert validated + selected.count((False, False)) == 4000
+    assert 800 < validated < 1200
+
+def test_validation_policy_from_env(monkeypatch):
+    monkeypatch.setenv("VALIDATION_MODE", "Input")
+    monkeypatch.setenv("VALIDATION_SAMPLE_RATE", "0.5")
+    policy = ValidationPolicy.from_env()
+    assert policy.mode == VALIDATE_INPUT
+    assert policy.sample_rate == 0.5
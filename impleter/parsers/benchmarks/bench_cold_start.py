@@ -0,0 +1,209 @@
+""" Benchmark - cold start cost (import time per top-level dependency and first invocation latency) of every parser Lambda function.
+
+Every Lambda function module is imported in a fresh interpreter started with -X importtime, as it is on a cold Lambda container. The self time of every imported module is summed per top-level package (pandas, pdfminer, boto3, ...), so the breakdown adds up to the total import time. After the import the handler is invoked twice on a tiny fixture document in a mocked S3 bucket: the first invocation includes the lazy initialisation (boto3 resource models, parser internals), the second one is warm.
+
+The results are compared with the baseline in benchmarks/baselines/cold_start.json, which is committed so that startup regressions show up in review. Timings depend on the interpreter and the machine, so --check only fails on a regression if the baseline is authoritative, i.e. it was recorded with --authoritative on the Lambda runtime (TARGET_PYTHON) and the check runs on the same Python version and architecture. Against any other baseline regressions are reported but do not fail the check. The committed baseline was recorded on a development machine and is not authoritative.
+
+    Typical usage example:
+        python benchmarks/bench_cold_start.py
+        python benchmarks/bench_cold_start.py --check --tolerance 0.25
+        python benchmarks/bench_cold_start.py --update-baseline --authoritative
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+BENCHMARKS_DIR = os.path.realpath(os.path.dirname(__file__))
+SRC_DIR = os.path.realpath(BENCHMARKS_DIR + "/../src")
+DATA_DIR = os.path.realpath(BENCHMARKS_DIR + "/../tests/data")
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baselines", "cold_start.json")
+IMPORT_MARKER = "--- lambda function imported ---"
+FIXTURE_BUCKET = "word-stash-cold-start"
+HANDLERS = {
+    "csv_dict_lambda_function": "example.csv",
+    "docx_dict_lambda_function": "example.docx",
+    "email_dict_lambda_function": "example.eml",
+    "ner_label_dict_lambda_function": "example_ner_annotated.jsonl",
+    "pdf_dict_lambda_function": "example.pdf",
+    "squad_label_dict_lambda_function": "example_squad_annotated.json",
+    "txt_dict_lambda_function": "example.txt",
+    "xlsx_dict_lambda_function": "example.xlsx"}
+TOP_DEPENDENCIES = 6
+MIN_REGRESSION_MS = 20.0
+TARGET_PYTHON = "3.8"
+CASE_SCRIPT = """import sys, time
+sys.path.insert(0, {src_dir!r})
+start_time = time.perf_counter()
+import {module}
+import_seconds = time.perf_counter() - start_time
+sys.stderr.write({marker!r} + "\\n")
+sys.path.insert(0, {benchmarks_dir!r})
+import bench_cold_start
+bench_cold_start.invoke_case({module!r}, import_seconds)
+"""
+
+def local_modules() -> List[str]:
+    """Returns the module names of the package's src directory."""
+    return [filename[:-3] for filename in os.listdir(SRC_DIR) if filename.endswith(".py")]
+
+def parse_importtime(stderr:str, local:List[str]) -> Dict[str, float]:
+    """Sums the -X importtime self times (ms) per top-level package up to the import marker. Modules of the src directory are reported as "(local)".
+
+    Args:
+        stderr: Standard error of an interpreter started with -X importtime
+        local: Module names of the src directory
+
+    Returns:
+        Dictionary of milliseconds per top-level package
+
+    Raises:
+    """
+    dependencies = dict()
+    for line in stderr.splitlines():
+        if line.startswith(IMPORT_MARKER):
+            break
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        root = name.strip().split(".")[0]
+        root = "(local)" if root in local else root
+        dependencies[root] = dependencies.get(root, 0.0) + int(self_us) / 1000
+    return dependencies
+
+def prepare_invocation(module):
+    """Uploads the fixture document of a parser Lambda function to a mocked S3 bucket and returns its S3 event. The mock stays active for the rest of the interpreter."""
+    import boto3
+    from moto import mock_s3
+    for name, value in [("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"), ("AWS_DEFAULT_REGION", "us-east-1")]:
+        os.environ.setdefault(name, value)
+    os.environ["DESTINATION_BUCKET"] = FIXTURE_BUCKET
+    mock_s3().start()
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket=FIXTURE_BUCKET)
+    fixture = HANDLERS[module.__name__]
+    key = "cold-start/fixture." + module.file_extension
+    with open(os.path.join(DATA_DIR, fixture), "rb") as fp:
+        s3_client.put_object(Bucket=FIXTURE_BUCKET, Key=key, Body=fp.read())
+    return {"Records": [{"s3": {"bucket": {"name": FIXTURE_BUCKET}, "object": {"key": key}}}]}
+
+def invoke_case(module_name:str, import_seconds:float) -> None:
+    """Invokes an imported Lambda function twice on its fixture and prints the timings as json. Runs in the fresh interpreter."""
+    import time
+    import resource
+    module = sys.modules[module_name]
+    rss_after_import_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    event = prepare_invocation(module)
+    seconds = []
+    for _ in range(2):
+        start_time = time.perf_counter()
+        module.lambda_handler(event, None)
+        seconds.append(time.perf_counter() - start_time)
+    print(json.dumps({
+        "import_ms": import_seconds * 1000,
+        "first_invocation_ms": seconds[0] * 1000,
+        "warm_invocation_ms": seconds[1] * 1000,
+        "rss_after_import_mb": rss_after_import_mb,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+def run_case(module:str, repeat:int) -> Dict:
+    """Runs a Lambda function repeat times, each in a fresh interpreter, and returns the median timings and import breakdown."""
+    script = CASE_SCRIPT.format(src_dir=SRC_DIR, benchmarks_dir=BENCHMARKS_DIR, module=module, marker=IMPORT_MARKER)
+    local = local_modules()
+    runs = []
+    breakdowns = []
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", script], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        runs.append(json.loads(completed.stdout.decode("utf-8").splitlines()[-1]))
+        breakdowns.append(parse_importtime(completed.stderr.decode("utf-8"), local))
+    result = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    dependencies = set(dependency for breakdown in breakdowns for dependency in breakdown)
+    result["dependencies_ms"] = dict(sorted(((dependency, statistics.median(breakdown.get(dependency, 0.0) for breakdown in breakdowns)) for dependency in dependencies), key=lambda item: -item[1]))
+    return result
+
+def git_commit() -> str:
+    """Returns the current git commit or None outside of a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def regressions(result:Dict, baseline:Dict, tolerance:float) -> List[str]:
+    """Returns the timings of a result that regressed by more than tolerance (and MIN_REGRESSION_MS) against the baseline."""
+    regressed = []
+    for key in ["import_ms", "first_invocation_ms"]:
+        if key in baseline and result[key] > baseline[key] * (1 + tolerance) and result[key] - baseline[key] > MIN_REGRESSION_MS:
+            regressed.append("{key} {before:.0f} -> {after:.0f}".format(key=key, before=baseline[key], after=result[key]))
+    return regressed
+
+def baseline_problems(document:Dict) -> List[str]:
+    """Returns the reasons why a baseline cannot fail the check: it is not authoritative, was not recorded on TARGET_PYTHON or was recorded on another Python version or architecture than the current one. An empty list means that the baseline is authoritative here."""
+    problems = []
+    if not document.get("authoritative"):
+        problems.append("not authoritative")
+    recorded = ".".join(str(document.get("python", "")).split(".")[:2])
+    if recorded != TARGET_PYTHON:
+        problems.append("recorded on Python {recorded}, the Lambda runtime is Python {target}".format(recorded=recorded or "?", target=TARGET_PYTHON))
+    if recorded != ".".join(platform.python_version_tuple()[:2]):
+        problems.append("recorded on Python {recorded}, running Python {current}".format(recorded=recorded or "?", current=platform.python_version()))
+    if document.get("machine") != platform.machine():
+        problems.append("recorded on {recorded}, running on {current}".format(recorded=document.get("machine"), current=platform.machine()))
+    return problems
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--handlers", nargs="+", default=list(HANDLERS), choices=list(HANDLERS))
+    arg_parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per handler, the median is reported")
+    arg_parser.add_argument("--baseline", default=BASELINE_PATH)
+    arg_parser.add_argument("--update-baseline", action="store_true", help="writes the results as the new baseline")
+    arg_parser.add_argument("--check", action="store_true", help="exits with status 1 if a handler regressed against an authoritative baseline")
+    arg_parser.add_argument("--authoritative", action="store_true", help="marks the new baseline as recorded on the Lambda runtime, so that --check fails on it")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown that counts as a regression")
+    args = arg_parser.parse_args()
+    document = dict()
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            document = json.load(fp)
+    baseline = document.get("handlers", dict())
+    problems = baseline_problems(document) if baseline else []
+    results = dict()
+    regressed = dict()
+    width = max(len(module) for module in args.handlers) + 2
+    print("handler".ljust(width) + "import ms".ljust(12) + "first ms".ljust(12) + "warm ms".ljust(12) + "RSS MB".ljust(10) + "vs baseline")
+    for module in args.handlers:
+        result = run_case(module, args.repeat)
+        results[module] = result
+        comparison = ""
+        if module in baseline:
+            comparison = "{:+.0%} import, {:+.0%} first".format(result["import_ms"] / baseline[module]["import_ms"] - 1, result["first_invocation_ms"] / baseline[module]["first_invocation_ms"] - 1)
+            regressed[module] = regressions(result, baseline[module], args.tolerance)
+            if regressed[module]:
+                comparison += "  REGRESSION: " + ", ".join(regressed[module])
+        print(module.ljust(width) + "{:.0f}".format(result["import_ms"]).ljust(12) + "{:.0f}".format(result["first_invocation_ms"]).ljust(12)
+            + "{:.1f}".format(result["warm_invocation_ms"]).ljust(12) + "{:.0f}".format(result["peak_rss_mb"]).ljust(10) + comparison)
+    print("")
+    print("import time per top-level dependency (ms, self time of all its modules)")
+    for module, result in results.items():
+        dependencies = list(result["dependencies_ms"].items())
+        top = ", ".join("{name} {ms:.0f}".format(name=name, ms=ms) for name, ms in dependencies[:TOP_DEPENDENCIES])
+        other = sum(ms for _, ms in dependencies[TOP_DEPENDENCIES:])
+        print("  " + module.ljust(width) + top + ", other {:.0f}".format(other))
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as fp:
+            json.dump({"commit": git_commit(), "created_at": datetime.utcnow().isoformat(), "python": platform.python_version(), "machine": platform.machine(),
+                "repeat": args.repeat, "authoritative": args.authoritative, "handlers": results}, fp, indent=2)
+        print("baseline written to " + args.baseline)
+    if problems:
+        print("")
+        print("baseline {path} is {problems}: regressions are informational and do not fail --check".format(path=args.baseline, problems="; ".join(problems)))
+    if args.check and any(regressed.values()) and not problems:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+""" Benchmark - end-to-end effect of the JSON codec (src/json_codec.py) on every Lambda function.
+
+Every Lambda function is imported and invoked in a fresh interpreter per codec, with the JSON_CODEC environment variable set to the codec. The fixture event of bench_cold_start.py is reused; Kinesis Firehose events are repeated to --records records so that the per record encoding dominates. The first (cold) invocation is discarded and the median of the following --invocations warm invocations is reported per codec, together with the speedup of every codec against the standard library json module.
+
+    Typical usage example:
+        python benchmarks/bench_json_codec.py
+        python benchmarks/bench_json_codec.py --codecs json orjson --invocations 50
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict
+
+BENCHMARKS_DIR = os.path.realpath(os.path.dirname(__file__))
+SRC_DIR = os.path.realpath(BENCHMARKS_DIR + "/../src")
+sys.path.insert(0, BENCHMARKS_DIR)
+from bench_cold_start import HANDLERS
+
+BASELINE_CODEC = "json"
+CASE_SCRIPT = """import sys
+sys.path.insert(0, {src_dir!r})
+sys.path.insert(0, {benchmarks_dir!r})
+import {module}
+import bench_json_codec
+bench_json_codec.invoke_case({module!r}, {invocations!r}, {records!r})
+"""
+
+def repeat_records(event:Dict, records:int) -> Dict:
+    """Repeats the records of a Kinesis Firehose event to the given number of records with unique record ids. Other events are returned unchanged."""
+    if "records" not in event:
+        return event
+    template = event["records"]
+    event["records"] = [dict(template[i % len(template)], recordId=str(i)) for i in range(records)]
+    return event
+
+def invoke_case(module_name:str, invocations:int, records:int) -> None:
+    """Invokes an imported Lambda function once cold and invocations times warm on its fixture and prints the timings as json. Runs in the fresh interpreter."""
+    import time
+    import statistics
+    import json_codec
+    from bench_cold_start import prepare_invocation
+    module = sys.modules[module_name]
+    event = repeat_records(prepare_invocation(module), records)
+    module.lambda_handler(event, None)
+    seconds = []
+    for _ in range(invocations):
+        start_time = time.perf_counter()
+        module.lambda_handler(event, None)
+        seconds.append(time.perf_counter() - start_time)
+    print(json.dumps({"codec": json_codec.codec.name, "median_ms": statistics.median(seconds) * 1000, "min_ms": min(seconds) * 1000}))
+
+def run_case(module:str, codec:str, invocations:int, records:int) -> Dict:
+    """Runs a Lambda function in a fresh interpreter with the given JSON codec and returns its timings."""
+    script = CASE_SCRIPT.format(src_dir=SRC_DIR, benchmarks_dir=BENCHMARKS_DIR, module=module, invocations=invocations, records=records)
+    environment = dict(os.environ, JSON_CODEC=codec)
+    completed = subprocess.run([sys.executable, "-c", script], check=True, env=environment, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return json.loads(completed.stdout.decode("utf-8").splitlines()[-1])
+
+def available_codecs():
+    """Returns the codecs that can be imported in this environment."""
+    sys.path.insert(0, SRC_DIR)
+    import json_codec
+    return [BASELINE_CODEC] + [name for name in json_codec.JSON_CODEC_BACKENDS if name != BASELINE_CODEC and json_codec.orjson is not None]
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--handlers", nargs="+", default=list(HANDLERS), choices=list(HANDLERS))
+    arg_parser.add_argument("--codecs", nargs="+", default=None, help="defaults to every installed codec")
+    arg_parser.add_argument("--invocations", type=int, default=20, help="warm invocations per handler and codec, the median is reported")
+    arg_parser.add_argument("--records", type=int, default=500, help="records per Kinesis Firehose event")
+    args = arg_parser.parse_args()
+    codecs = args.codecs or available_codecs()
+    width = max(len(module) for module in args.handlers) + 2
+    print("handler".ljust(width) + "".join((codec + " ms").ljust(14) for codec in codecs) + "speedup vs " + BASELINE_CODEC)
+    for module in args.handlers:
+        results = {codec: run_case(module, codec, args.invocations, args.records) for codec in codecs}
+        speedups = ["{codec} {speedup:.2f}x".format(codec=codec, speedup=results[BASELINE_CODEC]["median_ms"] / result["median_ms"])
+            for codec, result in results.items() if codec != BASELINE_CODEC and BASELINE_CODEC in results]
+        print(module.ljust(width) + "".join("{:.2f}".format(result["median_ms"]).ljust(14) for result in results.values()) + ", ".join(speedups))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+""" Benchmark - peak memory of every crude parser against input size, with the largest safe document per Lambda memory setting.
+
+Every parser parses synthetic documents of growing size (benchmarks/corpus_generator.py, --scales), each in a fresh interpreter. Two peaks are recorded per document:
+- traced: the tracemalloc peak of the Python allocations of parse_bytes. It is deterministic and used to detect superlinear growth.
+- RSS: the peak resident set size while parsing (sampled from /proc every millisecond and from ru_maxrss), relative to the interpreter after its imports. This includes the memory of C extensions (pandas, lxml) that tracemalloc does not see.
+
+The traced peak is split into a fixed part and a part per input byte (least squares line), so that the fixed cost of a parser (e.g. the pdfminer layout machinery) does not look like a large multiple on small documents. A parser is flagged if the growth exponent of its traced peak above the smallest document (log-log fit of the increments against the input size increments) is above --max-exponent, or if it needs more than --max-multiple bytes per input byte. The model is scaled by the RSS / traced ratio of the largest document and extrapolated to the largest safe input per Lambda memory setting, keeping --headroom of the memory free. The interpreter baseline is measured locally, the Lambda runtime adds to it, so the safe sizes are an upper bound.
+
+    Typical usage example:
+        python benchmarks/bench_parser_memory.py --formats pdf docx --scales 1 2 4 8
+        python benchmarks/bench_parser_memory.py --check --max-multiple 20
+"""
+import os
+import sys
+import json
+import math
+import argparse
+import platform
+import subprocess
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+BENCHMARKS_DIR = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(BENCHMARKS_DIR)
+from corpus_generator import SCALED_GENERATORS, generate_scaled
+from bench_parsers import PARSER_CLASSES, WORD_COUNT_LIMIT, count_chunks, git_commit
+
+MEMORY_SETTINGS_MB = [128, 256, 512, 1024, 2048]
+RSS_SAMPLE_INTERVAL = 0.001
+MB = 1024 * 1024
+
+def current_rss() -> int:
+    """Returns the current resident set size in bytes, or 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+class RssSampler(object):
+    """Samples the resident set size of the process in a thread and keeps the peak.
+
+    Attributes:
+        peak: An integer type peak resident set size in bytes.
+    """
+    def __init__(self, interval:float=RSS_SAMPLE_INTERVAL):
+        """__init__"""
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        """Sampler thread loop."""
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def run_case(file_ext:str, scale:int, seed:int) -> Dict:
+    """Parses a generated document in this interpreter, first under RSS sampling and then under tracemalloc, and returns the peaks."""
+    import resource
+    import tracemalloc
+    sys.path.append(os.path.realpath(BENCHMARKS_DIR + "/../src"))
+    import parsers
+    parser_class = getattr(parsers, PARSER_CLASSES[file_ext])
+    parser_class(word_count_limit=WORD_COUNT_LIMIT).parse_bytes(generate_scaled(file_ext, 1, seed))
+    input_bytes = generate_scaled(file_ext, scale, seed)
+    rss_base = current_rss()
+    maxrss_base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    with RssSampler() as sampler:
+        out_dict = parser_class(word_count_limit=WORD_COUNT_LIMIT).parse_bytes(input_bytes)
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    rss_peak = max(sampler.peak, maxrss if maxrss > maxrss_base else 0)
+    chunks = count_chunks(out_dict)
+    del out_dict
+    tracemalloc.start()
+    parser_class(word_count_limit=WORD_COUNT_LIMIT).parse_bytes(input_bytes)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "bytes": len(input_bytes),
+        "chunks": chunks,
+        "traced_peak_bytes": traced_peak,
+        "rss_base_bytes": rss_base,
+        "rss_delta_bytes": max(rss_peak - rss_base, 0),
+        "peak_rss_bytes": rss_peak}
+
+def run_isolated(file_ext:str, scale:int, seed:int) -> Dict:
+    """Runs run_case in a fresh interpreter."""
+    output = subprocess.run([sys.executable, os.path.realpath(__file__), "--case", file_ext, str(scale), "--seed", str(seed)],
+        check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode("utf-8").splitlines()[-1])
+
+def linear_fit(sizes:List[float], peaks:List[float]) -> Tuple[float, float]:
+    """Returns the least squares (intercept, slope) of peak over size."""
+    mean_x = sum(sizes) / len(sizes)
+    mean_y = sum(peaks) / len(peaks)
+    variance = sum((x - mean_x) ** 2 for x in sizes)
+    if variance == 0:
+        return mean_y, 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(sizes, peaks)) / variance
+    return mean_y - slope * mean_x, slope
+
+def growth_exponent(sizes:List[float], peaks:List[float]) -> float:
+    """Returns the least squares slope of log(peak increment) over log(size increment) relative to the smallest document - 1.0 is linear growth, 2.0 quadratic."""
+    points = [(math.log(size - sizes[0]), math.log(peak - peaks[0])) for size, peak in zip(sizes[1:], peaks[1:]) if size > sizes[0] and peak > peaks[0]]
+    if len(points) < 2:
+        return float("nan")
+    intercept, slope = linear_fit([x for x, _ in points], [y for _, y in points])
+    return slope
+
+def memory_model(cases:List[Dict], max_exponent:float) -> Dict:
+    """Fits the peak memory of one parser against the input size.
+
+    Args:
+        cases: Results of one parser ordered by input size
+        max_exponent: Growth exponent above which the growth is modelled as superlinear
+
+    Returns:
+        Dictionary with the fixed bytes, bytes per input byte, growth exponent and RSS / traced ratio
+
+    Raises:
+    """
+    sizes = [case["bytes"] for case in cases]
+    peaks = [case["traced_peak_bytes"] for case in cases]
+    fixed, per_byte = linear_fit(sizes, peaks)
+    exponent = growth_exponent(sizes, peaks)
+    largest = cases[-1]
+    return {
+        "fixed_bytes": max(fixed, 0.0),
+        "bytes_per_input_byte": max(per_byte, 0.0),
+        "growth_exponent": exponent,
+        "superlinear": not math.isnan(exponent) and exponent > max_exponent,
+        "rss_ratio": max(1.0, largest["rss_delta_bytes"] / largest["traced_peak_bytes"]) if largest["traced_peak_bytes"] else 1.0}
+
+def safe_input_bytes(cases:List[Dict], model:Dict, memory_mb:int, headroom:float) -> float:
+    """Extrapolates the largest input whose peak RSS stays below memory_mb minus headroom.
+
+    Linear parsers are extrapolated with their fixed and per byte cost, superlinear ones with the power law of their increments above the smallest document. Both are scaled by the RSS / traced ratio.
+
+    Args:
+        cases: Results of one parser ordered by input size
+        model: memory_model of the parser
+        memory_mb: Lambda memory setting
+        headroom: Fraction of the memory setting that is kept free
+
+    Returns:
+        Input size in bytes (0 if the baseline and the fixed cost do not fit)
+
+    Raises:
+    """
+    budget = (memory_mb * MB * (1 - headroom) - cases[-1]["rss_base_bytes"]) / model["rss_ratio"]
+    if not model["superlinear"]:
+        if budget <= model["fixed_bytes"] or model["bytes_per_input_byte"] == 0:
+            return 0.0
+        return (budget - model["fixed_bytes"]) / model["bytes_per_input_byte"]
+    smallest = cases[0]
+    largest = cases[-1]
+    exponent = model["growth_exponent"]
+    if budget <= smallest["traced_peak_bytes"]:
+        return 0.0
+    scale = (largest["traced_peak_bytes"] - smallest["traced_peak_bytes"]) / (largest["bytes"] - smallest["bytes"]) ** exponent
+    return smallest["bytes"] + ((budget - smallest["traced_peak_bytes"]) / scale) ** (1 / exponent)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--formats", nargs="+", default=list(SCALED_GENERATORS), choices=list(SCALED_GENERATORS))
+    arg_parser.add_argument("--scales", nargs="+", type=int, default=[1, 2, 4, 8], help="document sizes as multiples of the smallest document")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--max-exponent", type=float, default=1.2, help="growth exponent above which a parser is flagged as superlinear")
+    arg_parser.add_argument("--max-multiple", type=float, default=30.0, help="traced peak / input size above which a parser is flagged")
+    arg_parser.add_argument("--memory-settings", nargs="+", type=int, default=MEMORY_SETTINGS_MB, help="Lambda memory settings (MB) of the safe size table")
+    arg_parser.add_argument("--headroom", type=float, default=0.2, help="fraction of the memory setting kept free")
+    arg_parser.add_argument("--output", default=None, help="JSON file the results are written to, defaults to benchmarks/results/parser-memory-{commit}.json")
+    arg_parser.add_argument("--check", action="store_true", help="exits with status 1 if a parser is flagged")
+    arg_parser.add_argument("--case", nargs=2, default=None, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]), args.seed)))
+        return
+    results = dict()
+    print("format".ljust(8) + "scale".ljust(7) + "input MB".ljust(10) + "chunks".ljust(9) + "traced MB".ljust(11) + "x input".ljust(9) + "RSS +MB".ljust(10) + "peak RSS MB")
+    for file_ext in args.formats:
+        cases = list()
+        for scale in sorted(args.scales):
+            case = run_isolated(file_ext, scale, args.seed)
+            case["scale"] = scale
+            cases.append(case)
+            print(file_ext.ljust(8) + str(scale).ljust(7) + "{:.2f}".format(case["bytes"] / MB).ljust(10) + str(case["chunks"]).ljust(9)
+                + "{:.1f}".format(case["traced_peak_bytes"] / MB).ljust(11) + "{:.1f}".format(case["traced_peak_bytes"] / case["bytes"]).ljust(9)
+                + "{:.1f}".format(case["rss_delta_bytes"] / MB).ljust(10) + "{:.0f}".format(case["peak_rss_bytes"] / MB))
+        model = memory_model(cases, args.max_exponent)
+        flags = list()
+        if model["superlinear"]:
+            flags.append("superlinear")
+        if model["bytes_per_input_byte"] > args.max_multiple:
+            flags.append("over {:.0f}x input".format(args.max_multiple))
+        results[file_ext] = dict(model, cases=cases, flags=flags,
+            safe_input_bytes={str(memory_mb): safe_input_bytes(cases, model, memory_mb, args.headroom) for memory_mb in args.memory_settings})
+    print("")
+    print("largest safe input (MB) per Lambda memory setting, {:.0%} headroom".format(args.headroom))
+    print("format".ljust(8) + "fixed MB".ljust(10) + "x input".ljust(9) + "exponent".ljust(10) + "".join((str(memory_mb) + " MB").ljust(10) for memory_mb in args.memory_settings) + "flags")
+    for file_ext, result in results.items():
+        print(file_ext.ljust(8) + "{:.1f}".format(result["fixed_bytes"] / MB).ljust(10) + "{:.1f}".format(result["bytes_per_input_byte"]).ljust(9) + "{:.2f}".format(result["growth_exponent"]).ljust(10)
+            + "".join("{:.1f}".format(result["safe_input_bytes"][str(memory_mb)] / MB).ljust(10) for memory_mb in args.memory_settings)
+            + ("FLAGGED: " + ", ".join(result["flags"]) if result["flags"] else ""))
+    commit = git_commit()
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", "parser-memory-" + (commit or datetime.utcnow().strftime("%Y%m%d_%H%M%S")) + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump({"commit": commit, "created_at": datetime.utcnow().isoformat(), "python": platform.python_version(), "seed": args.seed, "headroom": args.headroom,
+            "max_exponent": args.max_exponent, "max_multiple": args.max_multiple, "results": results}, fp, indent=2)
+    print("results written to " + output)
+    if args.check and any(result["flags"] for result in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
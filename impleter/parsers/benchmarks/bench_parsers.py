@@ -0,0 +1,131 @@
+""" Benchmark - parse_bytes throughput (MB/s, chunks/s) and peak RSS of every crude parser per size class of the synthetic corpus.
+
+Every parser and size class runs in a fresh interpreter, so the peak RSS of a case is not inflated by the previous ones. The results are written as JSON (with the git commit) and can be compared with the results of another commit.
+
+    Typical usage example:
+        python benchmarks/bench_parsers.py --sizes small medium
+        python benchmarks/bench_parsers.py --sizes small medium --compare benchmarks/results/parsers-eb2cc79.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.realpath(os.path.dirname(__file__))
+sys.path.append(BENCHMARKS_DIR)
+from corpus_generator import SIZE_CLASSES, generate_corpus
+
+PARSER_CLASSES = {
+    "txt": "TxtToDictParser",
+    "csv": "CsvToDictParser",
+    "xlsx": "XlsxToDictParser",
+    "docx": "DocxToDictParser",
+    "pdf": "PdfToDictParser",
+    "eml": "EmailToDictParser"}
+WORD_COUNT_LIMIT = 256
+
+def count_chunks(out_dict:dict) -> int:
+    """Counts the chunks of a crude dictionary, including the chunks of email attachments."""
+    chunks = 0
+    for element in out_dict.get("data", []):
+        content = element.get("content", None)
+        if isinstance(content, list):
+            chunks += sum(len(attachment.get("content", [])) for attachment in content)
+        else:
+            chunks += 1
+    return chunks
+
+def run_case(path:str, file_ext:str, repeat:int) -> dict:
+    """Parses a corpus document repeat times in this interpreter and returns the best time, the chunk count and the RSS before and at the peak of parsing."""
+    import resource
+    sys.path.append(os.path.realpath(BENCHMARKS_DIR + "/../src"))
+    import parsers
+    with open(path, "rb") as fp:
+        input_bytes = fp.read()
+    rss_before_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    parser_class = getattr(parsers, PARSER_CLASSES[file_ext])
+    seconds = list()
+    chunks = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        out_dict = parser_class(word_count_limit=WORD_COUNT_LIMIT).parse_bytes(input_bytes)
+        seconds.append(time.perf_counter() - start_time)
+        chunks = count_chunks(out_dict)
+    return {
+        "bytes": len(input_bytes),
+        "chunks": chunks,
+        "seconds": min(seconds),
+        "rss_before_mb": rss_before_mb,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+def run_isolated(path:str, file_ext:str, repeat:int) -> dict:
+    """Runs run_case in a fresh interpreter."""
+    output = subprocess.run([sys.executable, os.path.realpath(__file__), "--case", path, file_ext, "--repeat", str(repeat)],
+        check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode("utf-8").splitlines()[-1])
+
+def git_commit() -> str:
+    """Returns the current git commit or None outside of a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--formats", nargs="+", default=list(PARSER_CLASSES), choices=list(PARSER_CLASSES))
+    arg_parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=SIZE_CLASSES)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--corpus-dir", default=None, help="directory of a generated corpus, defaults to a temporary directory")
+    arg_parser.add_argument("--output", default=None, help="JSON file the results are written to, defaults to benchmarks/results/parsers-{commit}.json")
+    arg_parser.add_argument("--compare", default=None, help="JSON results of another run to compare with")
+    arg_parser.add_argument("--case", nargs=2, default=None, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], args.repeat)))
+        return
+    baseline = dict()
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = {(result["format"], result["size"]): result for result in json.load(fp)["results"]}
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        corpus_dir = args.corpus_dir or temporary_dir
+        generate_corpus(corpus_dir, args.formats, args.sizes, args.seed)
+        results = list()
+        print("format".ljust(8) + "size".ljust(8) + "MB".ljust(10) + "chunks".ljust(10) + "MB/s".ljust(10) + "chunks/s".ljust(12) + "peak RSS MB".ljust(14) + ("vs baseline" if baseline else ""))
+        for file_ext in args.formats:
+            for size_class in args.sizes:
+                case = run_isolated(os.path.join(corpus_dir, size_class + "." + file_ext), file_ext, args.repeat)
+                result = {
+                    "format": file_ext,
+                    "size": size_class,
+                    "bytes": case["bytes"],
+                    "chunks": case["chunks"],
+                    "seconds": case["seconds"],
+                    "mb_per_second": case["bytes"] / 1e6 / case["seconds"],
+                    "chunks_per_second": case["chunks"] / case["seconds"],
+                    "rss_before_mb": case["rss_before_mb"],
+                    "peak_rss_mb": case["peak_rss_mb"]}
+                results.append(result)
+                comparison = ""
+                if (file_ext, size_class) in baseline:
+                    previous = baseline[(file_ext, size_class)]
+                    comparison = "{:+.0%} MB/s, {:+.1f} MB RSS".format(result["mb_per_second"] / previous["mb_per_second"] - 1, result["peak_rss_mb"] - previous["peak_rss_mb"])
+                print(file_ext.ljust(8) + size_class.ljust(8) + "{:.2f}".format(result["bytes"] / 1e6).ljust(10) + str(result["chunks"]).ljust(10) + "{:.2f}".format(result["mb_per_second"]).ljust(10)
+                    + "{:.0f}".format(result["chunks_per_second"]).ljust(12) + "{:.1f}".format(result["peak_rss_mb"]).ljust(14) + comparison)
+    commit = git_commit()
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", "parsers-" + (commit or datetime.utcnow().strftime("%Y%m%d_%H%M%S")) + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fp:
+        json.dump({"commit": commit, "created_at": datetime.utcnow().isoformat(), "python": platform.python_version(), "seed": args.seed,
+            "repeat": args.repeat, "word_count_limit": WORD_COUNT_LIMIT, "results": results}, fp, indent=2)
+    print("results written to " + output)
+
+if __name__ == "__main__":
+    main()
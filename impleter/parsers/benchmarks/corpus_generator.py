@@ -0,0 +1,269 @@
+""" Corpus generator - deterministic synthetic documents in every format the parsers support, for benchmarks.
+
+Every generator takes a seed and the size parameters of the document and returns the document bytes, so the same arguments always produce the same text. The size classes (small, medium and large) define the page, row, sheet, paragraph, table and attachment counts per format.
+
+    Typical usage example:
+        python benchmarks/corpus_generator.py --output-dir /tmp/corpus --sizes small medium
+"""
+import os
+import io
+import csv
+import random
+import zipfile
+import argparse
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List
+from xml.sax.saxutils import escape
+
+VOCABULARY = (
+    "the field of machine learning has made tremendous progress over past decade language models text documents data extraction "
+    "parser chunk payload annotation entity question answer context label training corpus sentence paragraph table sheet page "
+    "email attachment invoice report contract customer account order shipment delivery warehouse product price quantity total "
+    "amount date address city country london paris singapore sydney tokyo research analysis result method evaluation accuracy"
+).split()
+FIXED_DATE = "2021-07-16T19:31:00Z"
+
+def words(rng:random.Random, count:int) -> List[str]:
+    """Returns count words drawn from the vocabulary."""
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+def sentence(rng:random.Random, min_words:int=6, max_words:int=18) -> str:
+    """Returns a capitalised sentence with a full stop."""
+    text = " ".join(words(rng, rng.randint(min_words, max_words)))
+    return text[0].upper() + text[1:] + "."
+
+def generate_txt(words_count:int, seed:int=0) -> bytes:
+    """Generates a text file with paragraphs of about words_count words."""
+    rng = random.Random(seed)
+    paragraphs = list()
+    total = 0
+    while total < words_count:
+        paragraph = " ".join(sentence(rng) for _ in range(rng.randint(3, 8)))
+        total += paragraph.count(" ") + 1
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs).encode("utf-8")
+
+def table_rows(rng:random.Random, rows:int, columns:int) -> List[List]:
+    """Returns a header row and rows of text, integer and decimal cells."""
+    header = ["column_" + str(column) for column in range(columns)]
+    body = list()
+    for row in range(rows):
+        cells = list()
+        for column in range(columns):
+            if column % 3 == 0:
+                cells.append(" ".join(words(rng, rng.randint(1, 4))))
+            elif column % 3 == 1:
+                cells.append(rng.randint(0, 100000))
+            else:
+                cells.append(round(rng.uniform(0, 1000), 2))
+        body.append(cells)
+    return [header] + body
+
+def generate_csv(rows:int, columns:int=8, seed:int=0) -> bytes:
+    """Generates a CSV file with a header and rows x columns cells."""
+    rng = random.Random(seed)
+    output = io.StringIO()
+    csv.writer(output).writerows(table_rows(rng, rows, columns))
+    return output.getvalue().encode("utf-8")
+
+def generate_xlsx(sheets:int, rows:int, columns:int=8, seed:int=0) -> bytes:
+    """Generates an Excel workbook with sheets of rows x columns cells."""
+    from datetime import datetime
+    from openpyxl import Workbook
+    rng = random.Random(seed)
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet("sheet_" + str(sheet))
+        for row in table_rows(rng, rows, columns):
+            worksheet.append(row)
+    fixed_date = datetime.strptime(FIXED_DATE, "%Y-%m-%dT%H:%M:%SZ")
+    workbook.properties.created = fixed_date
+    workbook.properties.modified = fixed_date
+    output = io.BytesIO()
+    workbook.save(output)
+    return fixed_zip_dates(output.getvalue())
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>')
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" Target="docProps/core.xml"/>'
+    '</Relationships>')
+DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"></Relationships>')
+DOCX_CORE = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:dcterms="http://purl.org/dc/terms/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+    '<dc:title>Synthetic document</dc:title><dc:creator>word-stash</dc:creator>'
+    '<dcterms:created xsi:type="dcterms:W3CDTF">' + FIXED_DATE + '</dcterms:created>'
+    '</cp:coreProperties>')
+WORD_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+def docx_paragraph(text:str) -> str:
+    """Returns the WordprocessingML of a paragraph."""
+    return '<w:p><w:r><w:t xml:space="preserve">' + escape(text) + '</w:t></w:r></w:p>'
+
+def docx_table(rows:List[List]) -> str:
+    """Returns the WordprocessingML of a table."""
+    return '<w:tbl>' + "".join('<w:tr>' + "".join('<w:tc>' + docx_paragraph(str(cell)) + '</w:tc>' for cell in row) + '</w:tr>' for row in rows) + '</w:tbl>'
+
+def fixed_zip_dates(data:bytes) -> bytes:
+    """Rewrites a zip archive (docx, xlsx) with a fixed modification time of its entries, so that the archive bytes are deterministic."""
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for name in source.namelist():
+            info = zipfile.ZipInfo(name, date_time=(2021, 7, 16, 19, 31, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            target.writestr(info, source.read(name))
+    return output.getvalue()
+
+def generate_docx(paragraphs:int, tables:int=0, table_rows_count:int=10, seed:int=0) -> bytes:
+    """Generates a Word document with paragraphs and tables spread evenly between them."""
+    rng = random.Random(seed)
+    table_every = max(paragraphs // tables, 1) if tables else 0
+    body = list()
+    table_count = 0
+    for paragraph in range(paragraphs):
+        body.append(docx_paragraph(" ".join(sentence(rng) for _ in range(rng.randint(2, 6)))))
+        if table_every and (paragraph + 1) % table_every == 0 and table_count < tables:
+            body.append(docx_table(table_rows(rng, table_rows_count, 4)))
+            table_count += 1
+    document = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="' + WORD_NAMESPACE + '"><w:body>' + "".join(body) + '</w:body></w:document>'
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as docx:
+        for name, content in [("[Content_Types].xml", DOCX_CONTENT_TYPES), ("_rels/.rels", DOCX_RELS), ("word/_rels/document.xml.rels", DOCX_DOCUMENT_RELS),
+                ("word/document.xml", document), ("docProps/core.xml", DOCX_CORE)]:
+            docx.writestr(name, content)
+    return fixed_zip_dates(output.getvalue())
+
+def generate_pdf(pages:int, lines_per_page:int=45, seed:int=0) -> bytes:
+    """Generates a PDF with pages of text lines in the Helvetica base font."""
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = list()
+    for _ in range(pages):
+        lines = [" ".join(words(rng, rng.randint(8, 14))) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 12 TL 56 780 Td " + " ".join("(" + line + ") Tj T*" for line in lines) + " ET"
+        objects.append("<< /Length " + str(len(stream)) + " >>\nstream\n" + stream + "\nendstream")
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents " + str(len(objects)) + " 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = "<< /Type /Pages /Kids [" + " ".join(str(page_id) + " 0 R" for page_id in page_ids) + "] /Count " + str(pages) + " >>"
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = list()
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write((str(number) + " 0 obj\n" + obj + "\nendobj\n").encode("latin-1"))
+    xref_offset = output.tell()
+    output.write(("xref\n0 " + str(len(objects) + 1) + "\n0000000000 65535 f \n").encode("latin-1"))
+    for offset in offsets:
+        output.write(("%010d 00000 n \n" % offset).encode("latin-1"))
+    output.write(("trailer\n<< /Size " + str(len(objects) + 1) + " /Root 1 0 R >>\nstartxref\n" + str(xref_offset) + "\n%%EOF\n").encode("latin-1"))
+    return output.getvalue()
+
+def generate_eml(body_words:int, attachments:int=0, seed:int=0) -> bytes:
+    """Generates an email with an HTML body and txt, csv, docx and pdf attachments in turn."""
+    rng = random.Random(seed)
+    message = MIMEMultipart(boundary="===============word-stash-" + str(seed) + "==")
+    message["From"] = "sender@example.com"
+    message["To"] = "receiver@example.com"
+    message["Subject"] = sentence(rng, 3, 6)
+    message["Date"] = "Fri, 16 Jul 2021 19:31:00 +0000"
+    message["Message-ID"] = "<" + str(seed) + "@word-stash.example.com>"
+    paragraphs = generate_txt(body_words, seed).decode("utf-8").split("\n\n")
+    message.attach(MIMEText("<html><body>" + "".join("<p>" + paragraph + "</p>" for paragraph in paragraphs) + "</body></html>", "html"))
+    generators = [
+        ("txt", lambda i: generate_txt(500, seed + i)),
+        ("csv", lambda i: generate_csv(50, 6, seed + i)),
+        ("docx", lambda i: generate_docx(20, 1, 5, seed + i)),
+        ("pdf", lambda i: generate_pdf(2, 20, seed + i))]
+    for i in range(attachments):
+        file_ext, generator = generators[i % len(generators)]
+        attachment = MIMEApplication(generator(i), Name="attachment_" + str(i) + "." + file_ext)
+        attachment["Content-Disposition"] = 'attachment; filename="attachment_' + str(i) + '.' + file_ext + '"'
+        message.attach(attachment)
+    return message.as_bytes()
+
+SIZE_CLASSES = ["small", "medium", "large"]
+
+GENERATORS: Dict[str, Dict[str, Callable[[int], bytes]]] = {
+    "txt": {
+        "small": lambda seed: generate_txt(10000, seed),
+        "medium": lambda seed: generate_txt(100000, seed),
+        "large": lambda seed: generate_txt(1000000, seed)},
+    "csv": {
+        "small": lambda seed: generate_csv(1000, 8, seed),
+        "medium": lambda seed: generate_csv(10000, 8, seed),
+        "large": lambda seed: generate_csv(100000, 8, seed)},
+    "xlsx": {
+        "small": lambda seed: generate_xlsx(1, 500, 8, seed),
+        "medium": lambda seed: generate_xlsx(4, 2000, 8, seed),
+        "large": lambda seed: generate_xlsx(8, 10000, 8, seed)},
+    "docx": {
+        "small": lambda seed: generate_docx(100, 2, 10, seed),
+        "medium": lambda seed: generate_docx(1000, 10, 20, seed),
+        "large": lambda seed: generate_docx(10000, 50, 50, seed)},
+    "pdf": {
+        "small": lambda seed: generate_pdf(5, 45, seed),
+        "medium": lambda seed: generate_pdf(50, 45, seed),
+        "large": lambda seed: generate_pdf(250, 45, seed)},
+    "eml": {
+        "small": lambda seed: generate_eml(1000, 1, seed),
+        "medium": lambda seed: generate_eml(10000, 4, seed),
+        "large": lambda seed: generate_eml(50000, 16, seed)},
+}
+
+def generate(file_ext:str, size_class:str, seed:int=0) -> bytes:
+    """Generates the document of a format and size class."""
+    return GENERATORS[file_ext][size_class](seed)
+
+SCALED_GENERATORS: Dict[str, Callable[[int, int], bytes]] = {
+    "txt": lambda scale, seed: generate_txt(10000 * scale, seed),
+    "csv": lambda scale, seed: generate_csv(1000 * scale, 8, seed),
+    "xlsx": lambda scale, seed: generate_xlsx(1, 500 * scale, 8, seed),
+    "docx": lambda scale, seed: generate_docx(100 * scale, 2 * scale, 10, seed),
+    "pdf": lambda scale, seed: generate_pdf(5 * scale, 45, seed),
+    "eml": lambda scale, seed: generate_eml(1000 * scale, scale, seed),
+}
+
+def generate_scaled(file_ext:str, scale:int, seed:int=0) -> bytes:
+    """Generates a document of a format whose size grows linearly with scale (scale 1 is about the small size class)."""
+    return SCALED_GENERATORS[file_ext](scale, seed)
+
+def generate_corpus(output_dir:str, formats:List[str]=None, sizes:List[str]=None, seed:int=0) -> List[str]:
+    """Writes the documents of the formats and size classes to output_dir and returns their paths ({size_class}.{file_ext})."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = list()
+    for file_ext in formats or list(GENERATORS):
+        for size_class in sizes or SIZE_CLASSES:
+            path = os.path.join(output_dir, size_class + "." + file_ext)
+            with open(path, "wb") as fp:
+                fp.write(generate(file_ext, size_class, seed))
+            paths.append(path)
+    return paths
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--output-dir", required=True)
+    arg_parser.add_argument("--formats", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    arg_parser.add_argument("--sizes", nargs="+", default=SIZE_CLASSES, choices=SIZE_CLASSES)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    for path in generate_corpus(args.output_dir, args.formats, args.sizes, args.seed):
+        print(path.ljust(48) + "{:.2f} MB".format(os.path.getsize(path) / 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import boto3
 import os
 import pytest
+import sys
+
+# The modules in src import each other flat (e.g. "from s3_functions import ..."), as they do in the deployed Lambda package
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/src"))
 
 from moto import mock_s3
 
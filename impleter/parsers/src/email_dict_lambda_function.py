@@ -4,15 +4,18 @@ from typing import Any, Dict
 import os
 import sys
 import urllib.parse
-from s3_functions import read_s3_bytes, write_dict_to_s3
+from s3_functions import read_s3_bytes, write_bytes_to_s3, write_lines_to_s3, compression_extension, JSONL_OUTPUT_FORMAT, JSON_OUTPUT_FORMAT, NO_COMPRESSION
 from parsers import create_file_datetime, EmailToDictParser
+from profiling import InvocationProfiler
 import logging
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+profiler = InvocationProfiler.from_env()
 
 file_extension = "eml"
 
+@profiler.profile
 def lambda_handler(event: Dict[str, Any], context):
     """S3 event trigger compatible Lambda function handler that transforms an email(eml) file into a Crude json file and writes it to S3.
 
@@ -26,6 +29,9 @@ def lambda_handler(event: Dict[str, Any], context):
     destination_bucket = os.getenv("DESTINATION_BUCKET", None)
     word_count_limit = int(os.getenv("WORD_COUNT_LIMIT", 256))
     write_data_json_array_in_chunks_flag = os.getenv("WRITE_DATA_JSON_ARRAY_IN_CHUNKS_FLAG", "false").lower() in ("yes", "true", "t", "1")
+    write_header_once_flag = os.getenv("WRITE_HEADER_ONCE_FLAG", "false").lower() in ("yes", "true", "t", "1")
+    output_format = os.getenv("OUTPUT_FORMAT", JSON_OUTPUT_FORMAT).lower()
+    output_compression = os.getenv("OUTPUT_COMPRESSION", NO_COMPRESSION).lower()
     date_time = create_file_datetime()
     resp = list()
     for record in event['Records']:
@@ -38,15 +44,18 @@ def lambda_handler(event: Dict[str, Any], context):
             key = urllib.parse.unquote_plus(key)
             input_bytes = read_s3_bytes(bucket=bucket, key=key)
             parser = EmailToDictParser(word_count_limit=word_count_limit, meta_dict={"filename": os.path.join("s3://" + bucket, key), "filetype": file_extension})
-            out_dict = parser.parse_bytes(input_bytes=input_bytes)
-            if not write_data_json_array_in_chunks_flag:
+            document = parser.parse_bytes_to_document(input_bytes=input_bytes)
+            if output_format == JSONL_OUTPUT_FORMAT:
+                out_key = "-".join(key.split(".")) + "-" + date_time + "." + JSONL_OUTPUT_FORMAT + compression_extension(output_compression)
+                resp.append(write_lines_to_s3(bucket=destination_bucket, key=out_key, lines=parser.serialize_lines(document), compression=output_compression))
+            elif not write_data_json_array_in_chunks_flag:
                 out_key = "-".join(key.split(".")) + "-" + date_time + ".json"
-                resp.append(write_dict_to_s3(bucket=destination_bucket, key=out_key, input_dict=out_dict))
+                resp.append(write_bytes_to_s3(bucket=destination_bucket, key=out_key, input_bytes=parser.serialize(document, header_once=write_header_once_flag)))
             else:
-                for i, data_dict in enumerate(out_dict["data"]):
+                for i, chunk in enumerate(document.chunks):
                     index_str = "{:010d}".format(i)
                     out_key = "-".join(key.split(".")) + "-" + date_time + "-" + index_str + ".json"
-                    resp.append(write_dict_to_s3(bucket=destination_bucket, key=out_key, input_dict=data_dict))
+                    resp.append(write_bytes_to_s3(bucket=destination_bucket, key=out_key, input_bytes=parser.serialize(chunk)))
         except Exception:
             ex_type, ex_value, ex_traceback = sys.exc_info()
             logger.error("bucket: {bucket}, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
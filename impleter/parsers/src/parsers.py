@@ -21,11 +21,12 @@ Textual documents are ingested, and chunked json payload representations of the
 """
 
 import abc
+import os
+import hashlib
 import base64
 from pathlib import WindowsPath
 import unicodedata
 import re
-import json
 import html
 import mailparser
 import pandas as pd
@@ -34,21 +35,34 @@ from numpy.core.numeric import outer
 from io import BytesIO
 from pdfminer.layout import LTPage
 from pdfminer.high_level import extract_pages
-from typing import Any, List, Dict, Union
+from typing import Any, Iterator, List, Dict, Union
 from datetime import datetime
 from docx2python import docx2python
 from docx2python.docx_output import TablesList
 from mailparser import MailParser
+from instrumentation import NULL_TIMER, Instrumentation, instrumentation_from_env
+from json_codec import loads, dumps_bytes
 
 ML_FILE_DATETIME = "%Y%m%d_%H%M%S"
+PARSER_VERSION = "1.0.0"
+ID_LENGTH = 32
+DIGEST_BLOCK_SIZE = 1024 * 1024
 UNICODE_FORM = "NFKD"
 FILENAME_KEY = "filename"
 FILETYPE_KEY = "filetype"
 ID_KEY = "id"
+CHUNK_ID_KEY = "chunk_id"
 INDEX_KEY = "index"
 CONTENT_KEY = "content"
 DATA_KEY = "data"
 TIMESTAMP_KEY = "timestamp"
+HEADER_KEY = "header"
+PARSER_COMPONENT = "parser"
+READ_STAGE = "read"
+EXTRACTION_STAGE = "extraction"
+CHUNKING_STAGE = "chunking"
+DICT_BUILDING_STAGE = "dict_building"
+SERIALIZATION_STAGE = "serialization"
 
 def create_iso_utc_timestamp() -> str:
     """function that generates a current timestamp in the ISO format
@@ -65,6 +79,28 @@ def create_file_datetime() -> str:
     """
     return str(uuid4()) + "-" + datetime.now().strftime(ML_FILE_DATETIME)
 
+def create_content_id(*parts:Any) -> str:
+    """function that generates a deterministic id from its parts
+    Args:
+        parts: Values that identify the content (e.g. source URI, content digest, chunk index and parser version)
+    Returns:
+        str: Hexadecimal string of ID_LENGTH characters
+    """
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+def file_digest(filename:str) -> str:
+    """function that generates the sha256 hexadecimal digest of a file, reading it in blocks
+    Args:
+        filename: Filename of string type
+    Returns:
+        str: Hexadecimal sha256 digest
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fp:
+        for block in iter(lambda: fp.read(DIGEST_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 def split_str_by_word_count(input_str:str, word_count_limit:int=256, delimiter:chr=" ") -> List[str]:
     """Function that splits a string based on word count limit
 
@@ -85,33 +121,292 @@ def split_str_by_word_count(input_str:str, word_count_limit:int=256, delimiter:c
     str_list = [' '.join(str_list[i: i + word_count_limit]) for i in range(0, len(str_list), word_count_limit)]
     return str_list
 
+def create_chunk_id(document_id:str, index:int) -> str:
+    """function that generates the deterministic id of a chunk, which is used as the OpenSearch document id
+    Args:
+        document_id: Deterministic id of the chunk's document
+        index: Chunk index
+    Returns:
+        str: Hexadecimal string of ID_LENGTH characters
+    """
+    return create_content_id(document_id, index, PARSER_VERSION)
+
+class Chunk(object):
+    """Compact chunk of a parsed document. The per document metadata is shared by all chunks of a document and only materialised into a Crude chunk dictionary when the chunk is serialised.
+
+    Attributes:
+        header: A dictionary type with the metadata shared by the chunks of a document (meta_dict, timestamp, filetype, id, ...).
+        index: An integer type chunk index.
+        content: A string type chunk content, or a list of attachment dictionaries, or None for chunks without content (e.g. annotated SQuAD paragraphs).
+        extra: An optional dictionary type with the chunk's own keys (e.g. the page_id of a PDF chunk). Chunks of the same page or sheet share it. Header keys take precedence over extra keys.
+    """
+    __slots__ = ("header", "index", "content", "extra")
+
+    def __init__(self, header:Dict, index:int, content:Union[str, List, None]=None, extra:Dict=None):
+        """__init__"""
+        self.header = header
+        self.index = index
+        self.content = content
+        self.extra = extra
+
+    def to_dict(self, shared_header:Dict=None) -> Dict:
+        """Materialises the Crude chunk dictionary.
+
+        Args:
+        shared_header: Header that is written once per document. Its keys are left out of the chunk dictionary, except for the values the chunk's header overrides.
+
+        Returns:
+        dict
+
+        Raises:
+        """
+        out_dict = dict(self.extra) if self.extra else dict()
+        if shared_header is None:
+            out_dict.update(self.header)
+        else:
+            for key in shared_header:
+                out_dict.pop(key, None)
+            if self.header is not shared_header:
+                out_dict.update((key, value) for key, value in self.header.items() if key not in shared_header or shared_header[key] != value)
+        out_dict[INDEX_KEY] = self.index
+        out_dict[CHUNK_ID_KEY] = create_chunk_id(self.header.get(ID_KEY, None), self.index)
+        if self.content is not None:
+            out_dict[CONTENT_KEY] = self.content
+        return out_dict
+
+class ChunkedDocument(object):
+    """Compact representation of a parsed document - the document header is stored once and the chunks only hold their index, content and chunk specific keys.
+
+    Attributes:
+        header: A dictionary type with the metadata shared by the chunks of the document.
+        chunks: A list type of Chunk objects.
+    """
+    __slots__ = ("header", "chunks")
+
+    def __init__(self, header:Dict=None, chunks:List[Chunk]=None):
+        """__init__"""
+        self.header = header if header is not None else dict()
+        self.chunks = chunks if chunks is not None else list()
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def append(self, content:Union[str, List, None]=None, extra:Dict=None, header:Dict=None) -> Chunk:
+        """Appends a chunk with the next index.
+
+        Args:
+        content: Chunk content
+        extra: Chunk specific keys
+        header: Header of the chunk. Defaults to the document header.
+
+        Returns:
+        Chunk
+
+        Raises:
+        """
+        chunk = Chunk(self.header if header is None else header, len(self.chunks), content, extra)
+        self.chunks.append(chunk)
+        return chunk
+
+    def iter_dicts(self) -> Iterator[Dict]:
+        """Materialises the Crude chunk dictionaries one by one."""
+        for chunk in self.chunks:
+            yield chunk.to_dict()
+
+    def to_dict(self, header_once:bool=False) -> Dict:
+        """Materialises the Crude dictionary payload.
+
+        Args:
+        header_once: Writes the document header once under the header key instead of into every chunk
+
+        Returns:
+        dict
+
+        Raises:
+        """
+        if not header_once:
+            return { DATA_KEY: list(self.iter_dicts()) }
+        return { HEADER_KEY: self.header, DATA_KEY: [chunk.to_dict(self.header) for chunk in self.chunks] }
+
 class AbstractParser(object):
-    """AbstractParser"""
+    """AbstractParser
+
+    Attributes:
+        document_type: A string type document type of the parser's metrics.
+        instrumentation: An Instrumentation type that emits the stage timings (read, extraction, chunking, dict building and serialization) of every parsed document.
+        timer: A StageTimer type timer of the document that is being parsed.
+        source: An optional string type URI that identifies the document together with its content. Defaults to the filename of meta_dict.
+        document_id: A string type deterministic id of the document that is being parsed, derived from its source and content digest.
+        document: A ChunkedDocument type compact representation of the last parsed document.
+    """
     __metaclass__ = abc.ABCMeta
+    document_type = None
+    source = None
+    document_id = None
+    document = None
+    instrumentation = Instrumentation()
+    timer = NULL_TIMER
 
     @abc.abstractmethod
-    def _parse(self, input_obj:Any, word_count_limit:int, meta_dict:dict) -> Dict:
+    def _parse(self, input_obj:Any, word_count_limit:int, meta_dict:dict) -> ChunkedDocument:
         return
 
     @abc.abstractmethod
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
         return
 
     @abc.abstractmethod
-    def parse_file(self, filename:str) -> Dict:
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
         return
 
+    def parse_bytes(self, input_bytes:bytes) -> Dict:
+        """Converts bytes into a Crude dictionary payload.
+
+        Args:
+        input_bytes: Input bytes
+
+        Returns:
+        dict
+
+        Raises:
+        """
+        self.output_obj = self.parse_bytes_to_document(input_bytes).to_dict()
+        return self.output_obj
+
+    def parse_file(self, filename:str) -> Dict:
+        """Converts a file into a Crude dictionary payload.
+
+        Args:
+        filename: Filename of string type
+
+        Returns:
+        dict
+
+        Raises:
+        """
+        self.output_obj = self.parse_file_to_document(filename).to_dict()
+        return self.output_obj
+
+    def _create_document(self, meta_dict:dict, filetype:str) -> ChunkedDocument:
+        """Creates an empty compact document whose header holds the metadata of all its chunks.
+
+        Args:
+        meta_dict: Additional key value data of every chunk
+        filetype: File type of every chunk
+
+        Returns:
+        ChunkedDocument
+
+        Raises:
+        """
+        header = dict(meta_dict)
+        header[TIMESTAMP_KEY] = create_iso_utc_timestamp()
+        header[FILETYPE_KEY] = filetype
+        header[ID_KEY] = self.document_id
+        return ChunkedDocument(header)
+
+    def _start_timer(self, stage:str=READ_STAGE) -> None:
+        """Starts the stage timer of a document.
+
+        Args:
+        stage: Name of the first stage
+
+        Returns:
+
+        Raises:
+        """
+        self.timer = self.instrumentation.timer()
+        self.timer.mark(stage)
+
+    def _identify(self, digest:str) -> None:
+        """Sets the deterministic id of a document, so that parsing the same document again gives the same ids.
+
+        Args:
+        digest: Hexadecimal sha256 digest of the document's content
+
+        Returns:
+
+        Raises:
+        """
+        self.document_id = create_content_id(self.source or self.meta_dict.get(FILENAME_KEY, ""), digest)
+
+    def _emit_metrics(self, input_size:int) -> None:
+        """Stops the stage timer of a document and emits its stage timings.
+
+        Args:
+        input_size: Size of the parsed input in bytes
+
+        Returns:
+
+        Raises:
+        """
+        self.timer.stop()
+        self.instrumentation.emit(self.timer, self.document_type, input_size, len(self.document))
+
+    def serialize(self, input_dict:Union[Dict, ChunkedDocument, Chunk], header_once:bool=False) -> bytes:
+        """Serializes a Crude dictionary payload (or one of its chunks) to json bytes and emits the serialization timing. Compact documents and chunks are materialised here.
+
+        Args:
+        input_dict: Crude dictionary payload or chunk, or their compact representation
+        header_once: Writes the header of a compact document once instead of into every chunk
+
+        Returns:
+        bytes
+
+        Raises:
+        """
+        timer = self.instrumentation.timer()
+        timer.mark(SERIALIZATION_STAGE)
+        if isinstance(input_dict, ChunkedDocument):
+            input_dict = input_dict.to_dict(header_once=header_once)
+        elif isinstance(input_dict, Chunk):
+            input_dict = input_dict.to_dict()
+        output_bytes = dumps_bytes(input_dict)
+        timer.stop()
+        self.instrumentation.emit(timer, self.document_type, len(output_bytes), len(input_dict.get(DATA_KEY, [])) if DATA_KEY in input_dict else 1)
+        return output_bytes
+
+    def serialize_lines(self, input_dict:Union[Dict, ChunkedDocument]) -> Iterator[bytes]:
+        """Serializes a Crude dictionary payload to JSON lines, one complete Crude chunk per line, and emits the serialization timing once all lines are consumed. The chunks of a compact document are materialised one by one.
+
+        Args:
+        input_dict: Crude dictionary payload or its compact representation
+
+        Returns:
+        Iterator of json lines (bytes ending with a line feed)
+
+        Raises:
+        """
+        timer = self.instrumentation.timer()
+        timer.mark(SERIALIZATION_STAGE)
+        chunks = input_dict.iter_dicts() if isinstance(input_dict, ChunkedDocument) else input_dict[DATA_KEY]
+        output_size = 0
+        chunk_count = 0
+        for chunk in chunks:
+            line = dumps_bytes(chunk) + b"\n"
+            output_size += len(line)
+            chunk_count += 1
+            yield line
+        timer.stop()
+        self.instrumentation.emit(timer, self.document_type, output_size, chunk_count)
+
 class CsvToDictParser(AbstractParser):
     """CSV to Crude dictionary parser.
 
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "csv"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
     def _parse_sheet(self, df:pd.DataFrame) -> str:
@@ -131,8 +426,8 @@ class CsvToDictParser(AbstractParser):
         df = '\n'.join(df)
         return df
 
-    def _parse(self, input_obj:pd.DataFrame, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Converts a Pandas dataframe into a Crude dictionary payload.
+    def _parse(self, input_obj:pd.DataFrame, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Converts a Pandas dataframe into a compact Crude document.
 
         Args:
         input_obj: Input pandas data frame
@@ -140,59 +435,56 @@ class CsvToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
         sheet_obj = self._parse_sheet(input_obj)
-
+        self.timer.mark(CHUNKING_STAGE)
         str_list = split_str_by_word_count(sheet_obj, word_count_limit=word_count_limit)
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        self.timer.mark(DICT_BUILDING_STAGE)
+        document = self._create_document(meta_dict, "csv")
         for str_element in str_list:
-            element_dict = dict()
-            element_dict.update(meta_dict)
-            element_dict[TIMESTAMP_KEY] = timestamp
-            element_dict[FILETYPE_KEY]  = "csv"
-            element_dict[INDEX_KEY] = index
-            element_dict[ID_KEY] = id
-            element_dict[CONTENT_KEY] = str_element
-            output_obj.get(DATA_KEY, []).append(element_dict)
-            index += 1
-        return output_obj
+            document.append(str_element)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         bytes_io = BytesIO(input_bytes)
+        self.timer.mark(EXTRACTION_STAGE)
         input_obj = pd.read_csv(bytes_io)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
         input_obj = pd.read_csv(filename)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class DocxToDictParser(AbstractParser):
     """Word document (docx) to Crude dictionary parser.
@@ -200,11 +492,17 @@ class DocxToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "docx"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
     def _is_table(self, input_obj:List) -> bool:
@@ -254,8 +552,8 @@ class DocxToDictParser(AbstractParser):
             output_obj += '|'.join([k for j in doc_element for k in j]) + "\n"
         return output_obj
 
-    def _parse(self, input_obj:TablesList, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Method that parses a docx2python TablesList into a Crude dictionary payload.
+    def _parse(self, input_obj:TablesList, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Method that parses a docx2python TablesList into a compact Crude document.
 
         Args:
         input_obj: TablesList object
@@ -263,64 +561,64 @@ class DocxToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        document = self._create_document(meta_dict, "docx")
+        document.header.update(input_obj.core_properties)
+        document.header[ID_KEY] = self.document_id
         for docx_element in input_obj.document:
             content = None
             if self._is_table(docx_element):
                 content = self._parse_table(docx_element)
             else:
                 content = self._parse_paragraph(docx_element)
+            self.timer.mark(CHUNKING_STAGE)
             str_list = split_str_by_word_count(content, word_count_limit=word_count_limit)
+            self.timer.mark(DICT_BUILDING_STAGE)
             for str_element in str_list:
-                element_dict = dict()
-                element_dict.update(meta_dict)   
-                element_dict[TIMESTAMP_KEY] = timestamp
-                element_dict[FILETYPE_KEY] = "docx"
-                element_dict.update(input_obj.core_properties)
-                element_dict[INDEX_KEY] = index
-                element_dict[ID_KEY] = id
-                element_dict[CONTENT_KEY] = str_element
-                output_obj.get(DATA_KEY, []).append(element_dict)
-                index += 1
-        return output_obj
+                document.append(str_element)
+            self.timer.mark(EXTRACTION_STAGE)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         bytes_io = BytesIO(input_bytes)
+        self.timer.mark(EXTRACTION_STAGE)
         input_obj = docx2python(bytes_io)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
         input_obj = docx2python(filename)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class EmailToDictParser(AbstractParser):
     """Email to Crude dictionary parser.
@@ -328,11 +626,17 @@ class EmailToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "eml"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
     def _remove_html(self, input_obj:str):
@@ -382,7 +686,7 @@ class EmailToDictParser(AbstractParser):
             parser_class = parser_class_map.get(file_ext, None)
             if not parser_class:
                 continue
-            parser = parser_class(word_count_limit=word_count_limit, meta_dict=meta_dict)
+            parser = parser_class(word_count_limit=word_count_limit, meta_dict=meta_dict, instrumentation=self.instrumentation, source=self.document_id + "/" + filename)
             if binary:
                 payload = base64.b64decode(payload)
             attachment_dict = parser.parse_bytes(payload)
@@ -395,8 +699,8 @@ class EmailToDictParser(AbstractParser):
             output_obj.append(attachment_dict)
         return output_obj
 
-    def _parse(self, input_obj:MailParser, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Converts a MailParser object into a Crude dictionary payload.
+    def _parse(self, input_obj:MailParser, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Converts a MailParser object into a compact Crude document.
 
         Args:
         input_obj: Input MailParser object
@@ -404,69 +708,61 @@ class EmailToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
-        mail_dict = json.loads(input_obj.mail_json)
+        mail_dict = input_obj.mail
         body = self._remove_html(mail_dict.get("body", ""))
+        self.timer.mark(CHUNKING_STAGE)
         str_list = split_str_by_word_count(body, word_count_limit=word_count_limit)
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        self.timer.mark(DICT_BUILDING_STAGE)
+        document = self._create_document(meta_dict, "eml")
         for str_element in str_list:
-            element_dict = dict()
-            element_dict.update(meta_dict)
-            element_dict[TIMESTAMP_KEY] = timestamp
-            element_dict[FILETYPE_KEY]  = "eml"
-            element_dict[INDEX_KEY] = index
-            element_dict[ID_KEY] = id
-            str_element = str_element.replace('\r', '')
-            element_dict[CONTENT_KEY] = str_element
-            output_obj.get(DATA_KEY, []).append(element_dict)
-            index += 1
+            document.append(str_element.replace('\r', ''))
+        self.timer.mark(EXTRACTION_STAGE)
         if "attachments" in mail_dict.keys():
             if isinstance(mail_dict["attachments"], list):
-                element_dict = dict()
-                element_dict.update(meta_dict)
-                element_dict[TIMESTAMP_KEY] = timestamp
-                element_dict[FILETYPE_KEY]  = "attachments"
-                element_dict[INDEX_KEY] = index
-                element_dict[ID_KEY] = id
-                element_dict[CONTENT_KEY] = self._parse_attachment(mail_dict["attachments"], word_count_limit=word_count_limit)
-                output_obj.get(DATA_KEY, []).append(element_dict)
-        return output_obj
+                attachments_header = dict(document.header)
+                attachments_header[FILETYPE_KEY] = "attachments"
+                document.append(self._parse_attachment(mail_dict["attachments"], word_count_limit=word_count_limit), header=attachments_header)
+        return document
             
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         input_obj = mailparser.parse_from_bytes(input_bytes)
-        self.output_obj = self._parse(input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
         input_obj = mailparser.parse_from_file(filename)
-        self.output_obj = self._parse(input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class PdfToDictParser(AbstractParser):
     """PDF to Crude dictionary parser.
@@ -474,11 +770,17 @@ class PdfToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "pdf"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
     def _get_page_text(self, page_layout:LTPage) -> str:
@@ -498,8 +800,8 @@ class PdfToDictParser(AbstractParser):
                 page_text += element.get_text() + " "
         return page_text
 
-    def _parse(self, input_obj:LTPage, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Converts an LTPage object into a Crude dictionary payload.
+    def _parse(self, input_obj:LTPage, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Converts an LTPage object into a compact Crude document.
 
         Args:
         input_obj: Input LTPage object
@@ -507,61 +809,60 @@ class PdfToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        document = self._create_document(meta_dict, "pdf")
+        self.timer.mark(EXTRACTION_STAGE)
         for page_layout in input_obj:
-            element_dict = dict()
             page_text = self._get_page_text(page_layout)
+            self.timer.mark(CHUNKING_STAGE)
             str_list = split_str_by_word_count(page_text, word_count_limit=word_count_limit)
+            self.timer.mark(DICT_BUILDING_STAGE)
+            page_dict = {"page_id": page_layout.pageid}
             for str_element in str_list:
-                element_dict = dict()
-                element_dict.update(meta_dict)
-                element_dict[TIMESTAMP_KEY] = timestamp
-                element_dict[FILETYPE_KEY] = "pdf"
-                element_dict[INDEX_KEY] = index
-                element_dict[ID_KEY] = id
-                element_dict["page_id"] = page_layout.pageid
-                element_dict[CONTENT_KEY] = str_element
-                output_obj.get(DATA_KEY, []).append(element_dict)
-                index += 1
-        return output_obj 
+                document.append(str_element, extra=page_dict)
+            self.timer.mark(EXTRACTION_STAGE)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         bytes_io = BytesIO(input_bytes)
+        self.timer.mark(EXTRACTION_STAGE)
         input_obj = extract_pages(bytes_io)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj        
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document        
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
         input_obj = extract_pages(filename)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class TxtToDictParser(AbstractParser):
     """Text file to Crude dictionary parser.
@@ -569,15 +870,21 @@ class TxtToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "txt"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
-    def _parse(self, input_obj:str, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Converts an input string into a Crude dictionary payload.
+    def _parse(self, input_obj:str, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Converts an input string into a compact Crude document.
 
         Args:
         input_obj: Input string
@@ -585,57 +892,54 @@ class TxtToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
+        self.timer.mark(CHUNKING_STAGE)
         str_list = split_str_by_word_count(input_obj, word_count_limit=word_count_limit)
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        self.timer.mark(DICT_BUILDING_STAGE)
+        document = self._create_document(meta_dict, "txt")
         for str_element in str_list:
-            element_dict = dict()
-            element_dict.update(meta_dict)
-            element_dict[TIMESTAMP_KEY] = timestamp
-            element_dict[FILETYPE_KEY]  = "txt"
-            element_dict[INDEX_KEY] = index
-            element_dict[ID_KEY] = id
-            element_dict[CONTENT_KEY] = str_element
-            output_obj.get(DATA_KEY, []).append(element_dict)
-            index += 1
-        return output_obj
+            document.append(str_element)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         input_obj = input_bytes.decode("utf-8")
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(file_digest(filename))
         with open(filename, "r") as fp:
             input_obj = fp.read()
-            self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+            self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class XlsxToDictParser(AbstractParser):
     """Excel to Crude dictionary parser.
@@ -643,11 +947,17 @@ class XlsxToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "xlsx"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
     def _get_sheets(self, input_obj:str) -> List[str]:
@@ -684,8 +994,8 @@ class XlsxToDictParser(AbstractParser):
         df = '\n'.join(df)
         return df
 
-    def _parse(self, input_obj:Union[str, bytes], word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Converts an Excel string representation into a Crude dictionary payload.
+    def _parse(self, input_obj:Union[str, bytes], word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Converts an Excel string representation into a compact Crude document.
 
         Args:
         input_obj: Input pandas data frame
@@ -693,62 +1003,59 @@ class XlsxToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
+        self.timer.mark(EXTRACTION_STAGE)
         sheets = self._get_sheets(input_obj)
-
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
-
+        document = self._create_document(meta_dict, "xlsx")
         for sheet_name in sheets:
             df = pd.read_excel(input_obj, sheet_name=sheet_name)
             sheet_obj = self._parse_sheet(df)
+            self.timer.mark(CHUNKING_STAGE)
             str_list = split_str_by_word_count(sheet_obj, word_count_limit=word_count_limit)
+            self.timer.mark(DICT_BUILDING_STAGE)
+            sheet_dict = {"sheet_name": sheet_name}
             for str_element in str_list:
-                element_dict = dict()
-                element_dict.update(meta_dict)
-                element_dict[TIMESTAMP_KEY] = timestamp
-                element_dict[FILETYPE_KEY]  = "xlsx"
-                element_dict[INDEX_KEY] = index
-                element_dict[ID_KEY] = id
-                element_dict["sheet_name"] = sheet_name
-                element_dict[CONTENT_KEY] = str_element
-                output_obj.get(DATA_KEY, []).append(element_dict)
-                index += 1
-        return output_obj
+                document.append(str_element, extra=sheet_dict)
+            self.timer.mark(EXTRACTION_STAGE)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         bytes_io = BytesIO(input_bytes)
-        self.output_obj = self._parse(input_obj=bytes_io, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=bytes_io, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        self.output_obj = self._parse(input_obj=filename, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
+        self.document = self._parse(input_obj=filename, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class SQuADAnnotatedJsonToDictParser(AbstractParser):
     """Annotated SQuAD (https://rajpurkar.github.io/SQuAD-explorer/) to Crude dictionary parser.
@@ -756,15 +1063,21 @@ class SQuADAnnotatedJsonToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "squad_annotated"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
-    def _parse(self, input_obj:dict, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Method that parses a SQuAD dictionary into a Crude dictionary payload.
+    def _parse(self, input_obj:dict, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Method that parses a SQuAD dictionary into a compact Crude document.
 
         Args:
         input_obj: dictionary object
@@ -772,58 +1085,56 @@ class SQuADAnnotatedJsonToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        output_obj = { DATA_KEY: []}
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        self.timer.mark(DICT_BUILDING_STAGE)
+        document = self._create_document(meta_dict, "squad_annotated")
         for element_dict in input_obj.get(DATA_KEY, []):
             title = element_dict.get("title", None)
             for paragraph in element_dict.get("paragraphs", []):
                 out_dict = dict(paragraph)
                 out_dict["title"] = title
-                out_dict[FILETYPE_KEY]  = "squad_annotated"
-                out_dict[INDEX_KEY] = index
-                out_dict[ID_KEY] = id
-                out_dict.update(meta_dict)
-                out_dict[TIMESTAMP_KEY] = timestamp
-                output_obj.get(DATA_KEY, []).append(out_dict)
-                index += 1
-        return output_obj
+                document.append(extra=out_dict)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        input_obj = json.loads(input_bytes)
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
+        input_obj = loads(input_bytes)
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer(EXTRACTION_STAGE)
+        self._identify(file_digest(filename))
         with open(filename, "r") as fp:
-            input_obj = json.load(fp)
-            self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+            input_obj = loads(fp.read())
+            self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
 
 class NERAnnotatedJsonlToDictParser(AbstractParser):
     """Annotated BILUO Named Entity Recognition ((https://towardsdatascience.com/extend-named-entity-recogniser-ner-to-label-new-entities-with-spacy-339ee5979044)) to Crude dictionary parser.
@@ -831,15 +1142,21 @@ class NERAnnotatedJsonlToDictParser(AbstractParser):
     Attributes:
         word_count_limit: An integer type word count limit per dictionary payload. This attribute is related to the chunking of text (https://en.wikipedia.org/wiki/Chunking_(writing))
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
+        instrumentation: An optional Instrumentation type that emits the parser's stage timings. Defaults to the instrumentation configured in the environment.
+        source: An optional string type URI that identifies the document together with its content digest. Defaults to the filename of meta_dict.
     """
-    def __init__(self, word_count_limit:int=256, meta_dict:dict={}):
+    document_type = "ner_annotated"
+
+    def __init__(self, word_count_limit:int=256, meta_dict:dict={}, instrumentation:Instrumentation=None, source:str=None):
         """__init__"""
         self.word_count_limit = word_count_limit
         self.meta_dict = meta_dict
+        self.source = source
+        self.instrumentation = instrumentation or instrumentation_from_env(PARSER_COMPONENT)
         self.output_obj = { DATA_KEY: [] }
 
-    def _parse(self, input_obj:str, word_count_limit:int=256, meta_dict:dict={}) -> Dict:
-        """Method that parses a NER BILUO dictionary into a Crude dictionary payload.
+    def _parse(self, input_obj:str, word_count_limit:int=256, meta_dict:dict={}) -> ChunkedDocument:
+        """Method that parses a NER BILUO dictionary into a compact Crude document.
 
         Args:
         input_obj: dictionary object
@@ -847,53 +1164,51 @@ class NERAnnotatedJsonlToDictParser(AbstractParser):
         meta_dict: An optional dictionry containing addtional key value data that will be added to the dictionary.
 
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
-        input_obj = [json.loads(jline) for jline in input_obj.splitlines()]
-        output_obj = { DATA_KEY: []}
-        id = create_file_datetime()
-        timestamp = create_iso_utc_timestamp()
-        index = 0
+        self.timer.mark(EXTRACTION_STAGE)
+        input_obj = [loads(jline) for jline in input_obj.splitlines()]
+        self.timer.mark(DICT_BUILDING_STAGE)
+        document = self._create_document(meta_dict, "ner_annotated")
         for elem in input_obj:
-            element_dict = dict(elem)
-            element_dict.update(meta_dict)
-            element_dict[TIMESTAMP_KEY] = timestamp
-            element_dict[FILETYPE_KEY]  = "ner_annotated"
-            element_dict[INDEX_KEY] = index
-            element_dict[ID_KEY] = id
-            output_obj.get(DATA_KEY, []).append(element_dict)
-            index += 1
-        return output_obj
+            document.append(extra=elem)
+        return document
 
-    def parse_bytes(self, input_bytes:bytes) -> Dict:
-        """Converts bytes into a Crude dictionary payload.
+    def parse_bytes_to_document(self, input_bytes:bytes) -> ChunkedDocument:
+        """Converts bytes into a compact Crude document.
 
         Args:
         input_bytes: Input bytes
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(hashlib.sha256(input_bytes).hexdigest())
         input_obj = input_bytes.decode("utf-8")
-        self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
+        self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(len(input_bytes))
+        return self.document
 
-    def parse_file(self, filename:str) -> Dict:
-        """Converts a file into a Crude dictionary payload.
+    def parse_file_to_document(self, filename:str) -> ChunkedDocument:
+        """Converts a file into a compact Crude document.
 
         Args:
         filename: Filename of string type
         
         Returns:
-        dict
+        ChunkedDocument
 
         Raises:
         """
+        self._start_timer()
+        self._identify(file_digest(filename))
         with open(filename, "r") as fp:
             input_obj = fp.read()
-            self.output_obj = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
-        return self.output_obj
\ No newline at end of file
+            self.document = self._parse(input_obj=input_obj, word_count_limit=self.word_count_limit, meta_dict=self.meta_dict)
+        self._emit_metrics(os.path.getsize(filename))
+        return self.document
\ No newline at end of file
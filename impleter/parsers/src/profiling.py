@@ -0,0 +1,364 @@
+""" Profiling - File containing functionality that profiles Lambda function invocations with a low overhead sampling profiler.
+
+Profiling is opt-in. A configurable fraction of invocations is profiled (PROFILE_SAMPLE_RATE), and if a latency threshold is configured (PROFILE_LATENCY_THRESHOLD_MS) a fraction of the invocations (PROFILE_LATENCY_SAMPLE_RATE, all by default) is sampled and the profile is kept if the invocation is slower than the threshold. The sampler is a daemon thread that records the stack of the handler's thread every PROFILE_INTERVAL_MS milliseconds, so the handler itself is not traced and the overhead is independent of the number of function calls (pdfminer, pandas, docx2python).
+
+Every sampled invocation pays for starting and joining the sampler thread and for one stack walk of the handler's thread per interval, whether or not its profile is kept. With a latency threshold alone that is every invocation, so lower PROFILE_LATENCY_SAMPLE_RATE or raise PROFILE_INTERVAL_MS on latency sensitive functions.
+
+Only the handler's thread is sampled. Work that the handler hands to other threads (e.g. ThreadPoolExecutor workers of the batch publishers and the OpenSearch indexer) shows up as the handler waiting on a future or a lock, not as the frames of the worker threads.
+
+A kept profile is written as two objects under {prefix}{handler}/{timestamp}-{invocation}:
+- .folded: the sampled stacks in the collapsed stack format (one "frame;frame;frame count" line per stack), which flamegraph.pl, speedscope and inferno read.
+- .json: the handler name, the input object keys of the event, the duration, the reason the profile was kept and the number of samples, so that the slow input can be reproduced offline.
+
+    Typical usage example:
+        from profiling import InvocationProfiler
+        profiler = InvocationProfiler.from_env()
+
+        @profiler.profile
+        def lambda_handler(event, context):
+            ...
+"""
+import abc
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger()
+
+DEFAULT_INTERVAL_MS = 10.0
+MAX_STACK_DEPTH = 128
+REASON_SAMPLED = "sampled"
+REASON_LATENCY = "latency"
+PROFILE_DATETIME = "%Y%m%dT%H%M%S"
+
+class SamplingProfiler(object):
+    """Stack sampling profiler of a single thread. Frames are recorded with the line that was executing when the sample was taken.
+
+    Attributes:
+        interval: A float type sampling interval in seconds.
+        thread_id: An integer type identifier of the sampled thread. Defaults to the thread that calls start().
+        stacks: A Counter type with the number of samples per collapsed stack.
+        samples: An integer type number of samples taken.
+    """
+    def __init__(self, interval:float=DEFAULT_INTERVAL_MS / 1000):
+        """__init__"""
+        self.interval = interval
+        self.thread_id = None
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _collapse(self, frame) -> str:
+        """Collapses a frame and its callers into a "caller;...;callee" string.
+
+        Args:
+        frame: Innermost frame of the sampled thread
+
+        Returns:
+        string
+
+        Raises:
+        """
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            names.append("{function} ({filename}:{line})".format(function=code.co_name, filename=os.path.basename(code.co_filename), line=frame.f_lineno))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        """Sampler thread loop."""
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id, None)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+                self.samples += 1
+
+    def start(self, thread_id:int=None) -> None:
+        """Starts sampling a thread.
+
+        Args:
+        thread_id: Identifier of the sampled thread. Defaults to the calling thread.
+
+        Returns:
+
+        Raises:
+        """
+        self.thread_id = thread_id or threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def folded(self) -> str:
+        """Returns the sampled stacks in the collapsed stack format, most frequent stack first."""
+        return "".join("{stack} {count}\n".format(stack=stack, count=count) for stack, count in self.stacks.most_common())
+
+class AbstractProfileStore(object):
+    """AbstractProfileStore"""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def put(self, key:str, body:bytes) -> str:
+        """put"""
+        return
+
+class S3ProfileStore(AbstractProfileStore):
+    """S3 profile store.
+
+    Attributes:
+        bucket: A string type S3 bucket name.
+        prefix: A string type S3 key prefix of the profiles.
+    """
+    def __init__(self, bucket:str, prefix:str="", s3_client=None):
+        """__init__"""
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created on first use."""
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    def put(self, key:str, body:bytes) -> str:
+        """Writes a profile object to S3.
+
+        Args:
+        key: Key of the object relative to the prefix
+        body: Object bytes
+
+        Returns:
+        S3 uri of the stored object
+
+        Raises:
+        """
+        s3_key = self.prefix + key
+        self.s3_client.put_object(Bucket=self.bucket, Key=s3_key, Body=body)
+        return "s3://" + self.bucket + "/" + s3_key
+
+class LocalProfileStore(AbstractProfileStore):
+    """Local directory profile store.
+
+    Attributes:
+        directory: A string type directory the profiles are written to.
+    """
+    def __init__(self, directory:str):
+        """__init__"""
+        self.directory = directory
+
+    def put(self, key:str, body:bytes) -> str:
+        """Writes a profile object to the local directory.
+
+        Args:
+        key: Key of the object relative to the directory
+        body: Object bytes
+
+        Returns:
+        Path of the stored object
+
+        Raises:
+        """
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(body)
+        return path
+
+def profile_store_from_env() -> Optional[AbstractProfileStore]:
+    """Creates the profile store configured with the PROFILE_S3_BUCKET/PROFILE_S3_PREFIX or PROFILE_LOCAL_DIR environment variables.
+
+    Returns:
+        The configured profile store or None if profiling is not configured
+
+    Raises:
+    """
+    bucket = os.getenv("PROFILE_S3_BUCKET", None)
+    if bucket:
+        return S3ProfileStore(bucket=bucket, prefix=os.getenv("PROFILE_S3_PREFIX", ""))
+    directory = os.getenv("PROFILE_LOCAL_DIR", None)
+    if directory:
+        return LocalProfileStore(directory=directory)
+    return None
+
+def input_keys(event:Any) -> List[str]:
+    """Extracts the input object keys of a Lambda event - S3 notifications, EventBridge S3 events, SQS messages that wrap either, lists of {"bucket": ..., "key": ...} objects and Kinesis Firehose record ids.
+
+    Args:
+        event: Lambda event
+
+    Returns:
+        List of s3://bucket/key uris (or invocation/record ids of Firehose events)
+
+    Raises:
+    """
+    if isinstance(event, list):
+        return ["s3://" + str(element.get("bucket", None)) + "/" + str(element.get("key", None)) for element in event if isinstance(element, dict)]
+    if not isinstance(event, dict):
+        return []
+    keys = []
+    detail = event.get("detail", None)
+    if isinstance(detail, dict) and "object" in detail:
+        keys.append("s3://" + str(detail.get("bucket", {}).get("name", None)) + "/" + str(detail["object"].get("key", None)))
+    for record in event.get("Records", []) or []:
+        if "s3" in record:
+            keys.append("s3://" + str(record["s3"]["bucket"]["name"]) + "/" + str(record["s3"]["object"]["key"]))
+        elif "body" in record:
+            try:
+                keys.extend(input_keys(json.loads(record["body"])))
+            except ValueError:
+                continue
+    if "invocationId" in event:
+        keys.extend(str(event["invocationId"]) + "/" + str(record.get("recordId", None)) for record in event.get("records", []))
+    return keys
+
+class InvocationProfiler(object):
+    """Profiles a sampled fraction of Lambda function invocations and every invocation over a latency threshold.
+
+    Attributes:
+        store: An optional AbstractProfileStore type store of the kept profiles. Profiling is disabled if it is None.
+        sample_rate: A float type fraction of invocations that are profiled.
+        latency_threshold_ms: An optional float type latency threshold. Invocations are sampled (see latency_sample_rate) and their profile is kept if they are slower.
+        latency_sample_rate: A float type fraction of invocations that are sampled for the latency threshold. Defaults to every invocation.
+        interval_ms: A float type sampling interval in milliseconds.
+        rng: A random.Random type generator that selects the sampled invocations.
+        last_location: A string type location of the last kept profile's stacks, or None.
+    """
+    def __init__(self, store:AbstractProfileStore=None, sample_rate:float=0.0, latency_threshold_ms:float=None, interval_ms:float=DEFAULT_INTERVAL_MS, rng:random.Random=None, latency_sample_rate:float=1.0):
+        """__init__"""
+        self.store = store
+        self.sample_rate = sample_rate
+        self.latency_threshold_ms = latency_threshold_ms
+        self.latency_sample_rate = latency_sample_rate
+        self.interval_ms = interval_ms
+        self.rng = rng or random.Random()
+        self.last_location = None
+
+    @classmethod
+    def from_env(cls, store:AbstractProfileStore=None) -> "InvocationProfiler":
+        """Creates the profiler configured with the PROFILE_SAMPLE_RATE, PROFILE_LATENCY_THRESHOLD_MS, PROFILE_LATENCY_SAMPLE_RATE and PROFILE_INTERVAL_MS environment variables.
+
+        Args:
+        store: Profile store. Defaults to the store configured in the environment.
+
+        Returns:
+        InvocationProfiler
+
+        Raises:
+        """
+        latency_threshold_ms = os.getenv("PROFILE_LATENCY_THRESHOLD_MS", None)
+        return cls(
+            store=store or profile_store_from_env(),
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0.0)),
+            latency_threshold_ms=float(latency_threshold_ms) if latency_threshold_ms else None,
+            interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS)),
+            latency_sample_rate=float(os.getenv("PROFILE_LATENCY_SAMPLE_RATE", 1.0)))
+
+    @property
+    def enabled(self) -> bool:
+        """True if a store is configured and invocations are sampled or a latency threshold is set."""
+        return self.store is not None and (self.sample_rate > 0 or (self.latency_threshold_ms is not None and self.latency_sample_rate > 0))
+
+    def _write(self, handler_name:str, event:Any, profiler:SamplingProfiler, duration_ms:float, reason:str) -> str:
+        """Writes the stacks and the metadata of a kept profile.
+
+        Args:
+        handler_name: Name of the profiled handler
+        event: Lambda event of the invocation
+        profiler: SamplingProfiler of the invocation
+        duration_ms: Duration of the invocation
+        reason: Reason the profile is kept (sampled or latency)
+
+        Returns:
+        Location of the stacks object
+
+        Raises:
+        """
+        key = "{handler}/{timestamp}-{invocation}".format(handler=handler_name, timestamp=datetime.utcnow().strftime(PROFILE_DATETIME), invocation=uuid.uuid4().hex[:12])
+        location = self.store.put(key + ".folded", profiler.folded().encode("utf-8"))
+        metadata = {
+            "handler": handler_name,
+            "input_keys": input_keys(event),
+            "duration_ms": duration_ms,
+            "reason": reason,
+            "latency_threshold_ms": self.latency_threshold_ms,
+            "interval_ms": self.interval_ms,
+            "samples": profiler.samples,
+            "stacks": location}
+        self.store.put(key + ".json", json.dumps(metadata).encode("utf-8"))
+        return location
+
+    def run(self, handler:Callable, handler_name:str, event:Any, context:Any) -> Any:
+        """Runs a handler, profiling the invocation if it is sampled or watched for the latency threshold.
+
+        Args:
+        handler: Lambda function handler
+        handler_name: Name of the handler used in the profile keys
+        event: Lambda event
+        context: Lambda context
+
+        Returns:
+        The handler's response
+
+        Raises:
+            Exception: Any exception raised by the handler, after its profile has been written
+        """
+        sampled = self.sample_rate > 0 and self.rng.random() < self.sample_rate
+        watched = not sampled and self.latency_threshold_ms is not None and (self.latency_sample_rate >= 1.0 or self.rng.random() < self.latency_sample_rate)
+        if not sampled and not watched:
+            return handler(event, context)
+        profiler = SamplingProfiler(interval=self.interval_ms / 1000)
+        profiler.start()
+        start_time = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            profiler.stop()
+            reason = REASON_SAMPLED if sampled else REASON_LATENCY
+            if sampled or duration_ms > self.latency_threshold_ms:
+                try:
+                    self.last_location = self._write(handler_name, event, profiler, duration_ms, reason)
+                    logger.info("handler: {handler}, duration_ms: {duration_ms:.1f}, reason: {reason}, profile: {location}".format(handler=handler_name, duration_ms=duration_ms, reason=reason, location=self.last_location))
+                except Exception:
+                    ex_type, ex_value, ex_traceback = sys.exc_info()
+                    logger.warning("handler: {handler}, profile not written. exception_type: {ex_type}, exception_value: {ex_value}".format(handler=handler_name, ex_type=ex_type, ex_value=ex_value))
+
+    def profile(self, handler:Callable) -> Callable:
+        """Decorator that profiles a Lambda function handler. The handler is returned unchanged if profiling is disabled.
+
+        Args:
+        handler: Lambda function handler
+
+        Returns:
+        Lambda function handler
+
+        Raises:
+        """
+        if not self.enabled:
+            return handler
+        handler_name = handler.__module__.split(".")[-1] + "." + handler.__name__
+
+        @wraps(handler)
+        def profiled_handler(event:Any, context:Any) -> Any:
+            return self.run(handler, handler_name, event, context)
+        return profiled_handler
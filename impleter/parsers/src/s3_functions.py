@@ -1,5 +1,24 @@
+import io
+import gzip
 import boto3
-import json
+from typing import Iterable
+from json_codec import dumps_bytes
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_OUTPUT_FORMAT = "json"
+JSONL_OUTPUT_FORMAT = "jsonl"
+OUTPUT_FORMATS = [JSON_OUTPUT_FORMAT, JSONL_OUTPUT_FORMAT]
+NO_COMPRESSION = "none"
+GZIP_COMPRESSION = "gzip"
+ZSTD_COMPRESSION = "zstd"
+COMPRESSION_EXTENSIONS = {NO_COMPRESSION: "", GZIP_COMPRESSION: ".gz", ZSTD_COMPRESSION: ".zst"}
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 3
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
 
 def read_s3_bytes(bucket:str, key:str) -> bytes:
     output_bytes = None
@@ -11,5 +30,146 @@ def read_s3_bytes(bucket:str, key:str) -> bytes:
 def write_dict_to_s3(bucket:str, key:str, input_dict:dict) -> bytes:
     s3 = boto3.resource('s3')
     obj = s3.Object(bucket, key)
-    result = obj.put(Body=json.dumps(input_dict))
+    result = obj.put(Body=dumps_bytes(input_dict))
+    return result
+
+def write_bytes_to_s3(bucket:str, key:str, input_bytes:bytes) -> dict:
+    s3 = boto3.resource('s3')
+    obj = s3.Object(bucket, key)
+    result = obj.put(Body=input_bytes)
     return result
+
+def compression_extension(compression:str) -> str:
+    """Function that returns the key extension of a compression (e.g. ".gz").
+
+    Args:
+        compression: Compression name (none, gzip or zstd)
+
+    Returns:
+        str
+
+    Raises:
+        ValueError: If the compression is unknown or zstd is requested but zstandard is not installed
+    """
+    compression = (compression or NO_COMPRESSION).lower()
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError("unknown output compression: " + str(compression) + ". Must be one of " + str(list(COMPRESSION_EXTENSIONS)))
+    if compression == ZSTD_COMPRESSION and zstandard is None:
+        raise ValueError("output compression zstd requires the zstandard package")
+    return COMPRESSION_EXTENSIONS[compression]
+
+class S3PartWriter(object):
+    """Binary file-like object that uploads the bytes written to it to an S3 object in parts, so that at most one part is held in memory however large the object is. An object smaller than a part is written with a single put, a larger one with a multipart upload.
+
+    Attributes:
+        obj: boto3 S3 Object resource
+        part_size: Size of the uploaded parts in bytes (at least 5 MiB, the S3 minimum)
+        upload: boto3 MultipartUpload resource, or None until the first part is uploaded
+        parts: List of the uploaded parts' ETags and part numbers
+    """
+    def __init__(self, obj, part_size:int=MULTIPART_PART_SIZE):
+        """__init__"""
+        self.obj = obj
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload = None
+        self.parts = []
+
+    def write(self, data:bytes) -> int:
+        self.buffer += data
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _upload_part(self):
+        if self.upload is None:
+            self.upload = self.obj.initiate_multipart_upload()
+        part_number = len(self.parts) + 1
+        result = self.upload.Part(part_number).upload(Body=bytes(self.buffer))
+        self.parts.append({"ETag": result["ETag"], "PartNumber": part_number})
+        self.buffer = bytearray()
+
+    def close(self) -> dict:
+        """Writes the buffered bytes and completes the object.
+
+        Returns:
+            dict: The put_object or complete_multipart_upload response
+        """
+        if self.upload is None:
+            return self.obj.put(Body=bytes(self.buffer))
+        if self.buffer:
+            self._upload_part()
+        return self.upload.complete(MultipartUpload={"Parts": self.parts})
+
+    def abort(self):
+        """Aborts the multipart upload, if one was started, so that its parts are not kept (and billed) by S3."""
+        if self.upload is not None:
+            self.upload.abort()
+
+def write_compressed_lines(lines:Iterable[bytes], fileobj, compression:str=NO_COMPRESSION):
+    """Function that streams lines through a compressor into a binary file-like object.
+
+    Args:
+        lines: Iterable of lines (bytes)
+        fileobj: Binary file-like object the (compressed) lines are written to. It is not closed.
+        compression: Compression name (none, gzip or zstd)
+
+    Raises:
+        ValueError: If the compression is unknown or zstd is requested but zstandard is not installed
+    """
+    compression = (compression or NO_COMPRESSION).lower()
+    compression_extension(compression)
+    writer = fileobj
+    if compression == GZIP_COMPRESSION:
+        writer = gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+    elif compression == ZSTD_COMPRESSION:
+        writer = zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).stream_writer(fileobj, closefd=False)
+    for line in lines:
+        writer.write(line)
+    if writer is not fileobj:
+        writer.close()
+
+def compress_lines(lines:Iterable[bytes], compression:str=NO_COMPRESSION) -> bytes:
+    """Function that streams lines through a compressor into memory.
+
+    Args:
+        lines: Iterable of lines (bytes)
+        compression: Compression name (none, gzip or zstd)
+
+    Returns:
+        bytes
+
+    Raises:
+        ValueError: If the compression is unknown or zstd is requested but zstandard is not installed
+    """
+    buffer = io.BytesIO()
+    write_compressed_lines(lines, buffer, compression)
+    return buffer.getvalue()
+
+def write_lines_to_s3(bucket:str, key:str, lines:Iterable[bytes], compression:str=NO_COMPRESSION, part_size:int=MULTIPART_PART_SIZE) -> dict:
+    """Function that streams lines through a compressor to an S3 object, uploading the compressed output in parts of part_size bytes. The multipart upload is aborted if serializing or uploading fails.
+
+    Args:
+        bucket: S3 bucket name
+        key: S3 key
+        lines: Iterable of lines (bytes)
+        compression: Compression name (none, gzip or zstd)
+        part_size: Size of the uploaded parts in bytes
+
+    Returns:
+        dict: The put_object or complete_multipart_upload response
+
+    Raises:
+        ValueError: If the compression is unknown or zstd is requested but zstandard is not installed
+    """
+    s3 = boto3.resource('s3')
+    writer = S3PartWriter(s3.Object(bucket, key), part_size)
+    try:
+        write_compressed_lines(lines, writer, compression)
+        return writer.close()
+    except Exception:
+        writer.abort()
+        raise
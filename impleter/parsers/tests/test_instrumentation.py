@@ -0,0 +1,79 @@
+import os
+import io
+import json
+import socket
+from src.instrumentation import NULL_TIMER, StageTimer, Instrumentation, InMemoryMetricsSink, EmfMetricsSink, StatsdMetricsSink
+from src.parsers import TxtToDictParser, PdfToDictParser, EmailToDictParser
+
+def test_stage_timer_accumulates_repeated_stages():
+    timer = StageTimer()
+    timer.mark("chunking")
+    timer.mark("dict_building")
+    timer.mark("chunking")
+    timer.stop()
+    assert list(timer.durations.keys()) == ["chunking", "dict_building"]
+    assert all(seconds >= 0 for seconds in timer.durations.values())
+
+def test_disabled_instrumentation_uses_null_timer():
+    instrumentation = Instrumentation()
+    timer = instrumentation.timer()
+    timer.mark("read")
+    timer.stop()
+    instrumentation.emit(timer, "txt", 10, 1)
+    assert timer is NULL_TIMER
+    assert NULL_TIMER.durations == {}
+
+def test_txt_parser_emits_stage_metrics():
+    sink = InMemoryMetricsSink()
+    parser = TxtToDictParser(word_count_limit=2, instrumentation=Instrumentation(sink=sink))
+    input_bytes = b"one two three four five"
+    out_dict = parser.parse_bytes(input_bytes)
+    assert [metric["stage"] for metric in sink.metrics] == ["read", "chunking", "dict_building"]
+    for metric in sink.metrics:
+        assert metric["component"] == "parser"
+        assert metric["document_type"] == "txt"
+        assert metric["input_bytes"] == len(input_bytes)
+        assert metric["chunks"] == 3
+        assert metric["duration_ms"] >= 0
+    sink.clear()
+    output_bytes = parser.serialize(out_dict)
+    assert json.loads(output_bytes) == out_dict
+    assert sink.metrics[0]["stage"] == "serialization"
+    assert sink.metrics[0]["input_bytes"] == len(output_bytes)
+
+def test_pdf_file_parser_emits_extraction():
+    sink = InMemoryMetricsSink()
+    parser = PdfToDictParser(word_count_limit=100, instrumentation=Instrumentation(sink=sink))
+    parser.parse_file("tests/data/example.pdf")
+    stages = {metric["stage"]: metric for metric in sink.metrics}
+    assert set(stages.keys()) == {"extraction", "chunking", "dict_building"}
+    assert stages["extraction"]["input_bytes"] == os.path.getsize("tests/data/example.pdf")
+    assert stages["extraction"]["chunks"] == len(parser.output_obj["data"])
+
+def test_email_attachments_emit_their_own_metrics():
+    sink = InMemoryMetricsSink()
+    parser = EmailToDictParser(word_count_limit=100, instrumentation=Instrumentation(sink=sink))
+    parser.parse_file("tests/data/example.eml")
+    document_types = set(metric["document_type"] for metric in sink.metrics)
+    assert "eml" in document_types
+    assert len(document_types) > 1
+
+def test_emf_sink_writes_embedded_metric_format():
+    stream = io.StringIO()
+    sink = EmfMetricsSink(namespace="Test", stream=stream)
+    sink.emit([{"component": "parser", "document_type": "txt", "stage": "read", "input_bytes": 10, "chunks": 1, "duration_ms": 0.5}])
+    emf_dict = json.loads(stream.getvalue())
+    assert emf_dict["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "Test"
+    assert emf_dict["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["component", "document_type", "stage"]]
+    assert emf_dict["stage"] == "read"
+    assert emf_dict["duration_ms"] == 0.5
+
+def test_statsd_sink_sends_udp_datagrams():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    sink = StatsdMetricsSink(host="127.0.0.1", port=server.getsockname()[1], prefix="test")
+    sink.emit([{"component": "parser", "document_type": "pdf", "stage": "extraction", "input_bytes": 10, "chunks": 2, "duration_ms": 1.5}])
+    datagram = server.recv(4096).decode("utf-8")
+    server.close()
+    assert datagram.splitlines() == ["test.parser.pdf.extraction.duration_ms:1.500|ms", "test.parser.pdf.extraction.input_bytes:10|g", "test.parser.pdf.extraction.chunks:2|g"]
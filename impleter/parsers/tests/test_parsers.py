@@ -1,5 +1,8 @@
+import os
+import gzip
 import json
 import pytest
+import zstandard
 from src.parsers import (
     TxtToDictParser,
     CsvToDictParser,
@@ -10,6 +13,7 @@ from src.parsers import (
     SQuADAnnotatedJsonToDictParser,
     NERAnnotatedJsonlToDictParser
 )
+from src.s3_functions import compress_lines, write_lines_to_s3
 
 def delete_key_from_content(input_dict:dict, key:str) -> dict:
     for element in input_dict.get("data", []):
@@ -41,6 +45,7 @@ def test_csv_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -57,6 +62,7 @@ def test_csv_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -71,6 +77,7 @@ def test_docx_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -87,6 +94,7 @@ def test_docx_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -101,6 +109,7 @@ def test_email_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -117,6 +126,7 @@ def test_email_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -131,6 +141,7 @@ def test_pdf_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -147,6 +158,7 @@ def test_pdf_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -161,6 +173,7 @@ def test_txt_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -177,6 +190,7 @@ def test_txt_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -191,6 +205,7 @@ def test_xlsx_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -207,6 +222,7 @@ def test_xlsx_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -221,6 +237,7 @@ def test_ner_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -237,6 +254,7 @@ def test_ner_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
         assert out_dict == example_dict
@@ -251,6 +269,7 @@ def test_squad_file_parser(global_var):
     out_dict = parser.parse_file(test_fname)
     out_dict = delete_key_from_content(out_dict, "id")
     example_dict = delete_key_from_content(example_dict, "id")
+    out_dict = delete_key_from_content(out_dict, "chunk_id")
     out_dict = delete_key_from_content(out_dict, "timestamp")
     example_dict = delete_key_from_content(example_dict, "timestamp")
     assert out_dict == example_dict
@@ -267,6 +286,103 @@ def test_squad_bytes_parser(global_var):
         out_dict = parser.parse_bytes(input_bytes)
         out_dict = delete_key_from_content(out_dict, "id")
         example_dict = delete_key_from_content(example_dict, "id")
+        out_dict = delete_key_from_content(out_dict, "chunk_id")
         out_dict = delete_key_from_content(out_dict, "timestamp")
         example_dict = delete_key_from_content(example_dict, "timestamp")
-        assert out_dict == example_dict
\ No newline at end of file
+        assert out_dict == example_dict
+
+def chunk_ids(input_dict:dict) -> list:
+    ids = []
+    for element in input_dict.get("data", input_dict.get("content", [])):
+        ids.append(element["chunk_id"])
+        if isinstance(element.get("content", None), list):
+            for attachment in element["content"]:
+                ids.extend(chunk_ids(attachment))
+    return ids
+
+def test_ids_are_deterministic(global_var):
+    test_fname = "tests/data/example.eml"
+    with open(test_fname, 'rb') as fp:
+        input_bytes = fp.read()
+    meta_dict = {"filename": "s3://bucket/example.eml"}
+    first = EmailToDictParser(word_count_limit=pytest.email_word_count_limit, meta_dict=meta_dict).parse_bytes(input_bytes)
+    second = EmailToDictParser(word_count_limit=pytest.email_word_count_limit, meta_dict=meta_dict).parse_bytes(input_bytes)
+    assert first["data"][0]["id"] == second["data"][0]["id"]
+    assert chunk_ids(first) == chunk_ids(second)
+    assert len(set(chunk_ids(first))) == len(chunk_ids(first))
+    moved = EmailToDictParser(word_count_limit=pytest.email_word_count_limit, meta_dict={"filename": "s3://bucket/moved.eml"}).parse_bytes(input_bytes)
+    assert moved["data"][0]["id"] != first["data"][0]["id"]
+
+def test_file_and_bytes_ids_match(global_var):
+    test_fname = "tests/data/example.txt"
+    with open(test_fname, 'rb') as fp:
+        bytes_dict = TxtToDictParser(word_count_limit=pytest.txt_word_count_limit).parse_bytes(fp.read())
+    file_dict = TxtToDictParser(word_count_limit=pytest.txt_word_count_limit).parse_file(test_fname)
+    assert chunk_ids(bytes_dict) == chunk_ids(file_dict)
+    assert bytes_dict["data"][0]["id"] == file_dict["data"][0]["id"]
+
+@pytest.mark.parametrize("parser_class,test_fname", [
+    (EmailToDictParser, "tests/data/example.eml"),
+    (PdfToDictParser, "tests/data/example.pdf"),
+    (NERAnnotatedJsonlToDictParser, "tests/data/example_ner_annotated.jsonl")])
+def test_header_once_output_merges_back_to_chunks(parser_class, test_fname):
+    parser = parser_class(word_count_limit=50, meta_dict={"filename": "s3://bucket/" + os.path.basename(test_fname)})
+    with open(test_fname, 'rb') as fp:
+        document = parser.parse_bytes_to_document(fp.read())
+    compact_dict = json.loads(parser.serialize(document, header_once=True))
+    merged = [dict(compact_dict["header"], **chunk) for chunk in compact_dict["data"]]
+    assert merged == json.loads(parser.serialize(document))["data"]
+    if len(document) > 1:
+        assert len(parser.serialize(document, header_once=True)) < len(parser.serialize(document))
+
+@pytest.mark.parametrize("compression,decompress", [
+    ("none", lambda data: data),
+    ("gzip", gzip.decompress),
+    ("zstd", lambda data: zstandard.ZstdDecompressor().stream_reader(data).read())])
+def test_jsonl_output_has_one_chunk_per_line(compression, decompress):
+    parser = PdfToDictParser(word_count_limit=50, meta_dict={"filename": "s3://bucket/example.pdf"})
+    with open("tests/data/example.pdf", 'rb') as fp:
+        document = parser.parse_bytes_to_document(fp.read())
+    output_bytes = compress_lines(parser.serialize_lines(document), compression)
+    lines = decompress(output_bytes).splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(parser.serialize(document))["data"]
+    if compression != "none":
+        assert len(output_bytes) < sum(len(line) for line in lines)
+
+def test_jsonl_output_is_uploaded_in_parts(s3_client, monkeypatch):
+    # moto does not decode the aws-chunked upload_part bodies that botocore sends with checksums enabled
+    monkeypatch.setenv("AWS_REQUEST_CHECKSUM_CALCULATION", "when_required")
+    part_size = 5 * 1024 * 1024
+    lines = [b'{"index": %d, "content": "%s"}\n' % (i, b"x" * 1000) for i in range(12000)]
+    s3_client.create_bucket(Bucket="destination")
+    write_lines_to_s3("destination", "large.jsonl", iter(lines), part_size=part_size)
+    obj = s3_client.get_object(Bucket="destination", Key="large.jsonl")
+    assert obj["Body"].read() == b"".join(lines)
+    assert obj["ETag"].strip('"').endswith("-3")
+    write_lines_to_s3("destination", "small.jsonl", iter(lines[:10]), part_size=part_size)
+    assert s3_client.get_object(Bucket="destination", Key="small.jsonl")["Body"].read() == b"".join(lines[:10])
+    def failing_lines():
+        yield from lines
+        raise ValueError("serialization failed")
+    with pytest.raises(ValueError):
+        write_lines_to_s3("destination", "failed.jsonl", failing_lines(), part_size=part_size)
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket="destination")
+    assert "failed.jsonl" not in [item["Key"] for item in s3_client.list_objects_v2(Bucket="destination")["Contents"]]
+
+def test_lambda_writes_compressed_jsonl(s3_client, monkeypatch):
+    import txt_dict_lambda_function
+    s3_client.create_bucket(Bucket="source")
+    s3_client.create_bucket(Bucket="destination")
+    with open("tests/data/example.txt", 'rb') as fp:
+        s3_client.put_object(Bucket="source", Key="docs/example.txt", Body=fp.read())
+    monkeypatch.setenv("DESTINATION_BUCKET", "destination")
+    monkeypatch.setenv("OUTPUT_FORMAT", "jsonl")
+    monkeypatch.setenv("OUTPUT_COMPRESSION", "gzip")
+    txt_dict_lambda_function.lambda_handler({"Records": [{"s3": {"bucket": {"name": "source"}, "object": {"key": "docs/example.txt"}}}]}, None)
+    keys = [obj["Key"] for obj in s3_client.list_objects_v2(Bucket="destination")["Contents"]]
+    assert len(keys) == 1
+    assert keys[0].startswith("docs/example-txt-") and keys[0].endswith(".jsonl.gz")
+    lines = gzip.decompress(s3_client.get_object(Bucket="destination", Key=keys[0])["Body"].read()).splitlines()
+    chunks = [json.loads(line) for line in lines]
+    assert [chunk["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk["filename"] == "s3://source/docs/example.txt" for chunk in chunks)
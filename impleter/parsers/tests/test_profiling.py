@@ -0,0 +1,82 @@
+import os
+import re
+import json
+import time
+import random
+from src.profiling import SamplingProfiler, InvocationProfiler, LocalProfileStore, S3ProfileStore, input_keys
+
+S3_EVENT = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "slow.pdf"}}}]}
+
+def busy_handler(event, context):
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return "done"
+
+def test_sampling_profiler_collects_folded_stacks():
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start()
+    busy_handler(None, None)
+    profiler.stop()
+    assert profiler.samples > 0
+    lines = [int(line) for line in re.findall(r"busy_handler \(test_profiling.py:(\d+)\)", profiler.folded())]
+    assert lines and all(line > busy_handler.__code__.co_firstlineno for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in profiler.folded().splitlines())
+
+def test_disabled_profiler_returns_handler_unchanged():
+    assert InvocationProfiler().profile(busy_handler) is busy_handler
+    assert InvocationProfiler(store=LocalProfileStore("/tmp"), sample_rate=0.0).profile(busy_handler) is busy_handler
+
+def test_sampled_invocation_writes_profile_and_input_key(tmp_path):
+    profiler = InvocationProfiler(store=LocalProfileStore(str(tmp_path)), sample_rate=1.0, interval_ms=2)
+    assert profiler.profile(busy_handler)(S3_EVENT, None) == "done"
+    folded_path = profiler.last_location
+    assert os.path.basename(os.path.dirname(folded_path)) == "test_profiling.busy_handler"
+    with open(folded_path[:-len(".folded")] + ".json") as fp:
+        metadata = json.load(fp)
+    assert metadata["input_keys"] == ["s3://bucket/slow.pdf"]
+    assert metadata["reason"] == "sampled"
+    assert metadata["samples"] > 0
+    with open(folded_path) as fp:
+        assert "busy_handler" in fp.read()
+
+def test_latency_threshold_keeps_only_slow_invocations(tmp_path):
+    profiler = InvocationProfiler(store=LocalProfileStore(str(tmp_path)), sample_rate=0.0, latency_threshold_ms=50, interval_ms=2, rng=random.Random(0))
+    profiler.profile(lambda event, context: "fast")(S3_EVENT, None)
+    assert profiler.last_location is None
+    profiler.profile(busy_handler)(S3_EVENT, None)
+    with open(profiler.last_location[:-len(".folded")] + ".json") as fp:
+        assert json.load(fp)["reason"] == "latency"
+
+def test_latency_sample_rate_gates_the_sampler(tmp_path):
+    profiler = InvocationProfiler(store=LocalProfileStore(str(tmp_path)), latency_threshold_ms=50, latency_sample_rate=0.0)
+    assert profiler.profile(busy_handler) is busy_handler
+    profiler = InvocationProfiler(store=LocalProfileStore(str(tmp_path)), latency_threshold_ms=50, latency_sample_rate=0.5, interval_ms=2, rng=random.Random(0))
+    watched = 0
+    for _ in range(6):
+        profiler.last_location = None
+        profiler.profile(busy_handler)(S3_EVENT, None)
+        watched += profiler.last_location is not None
+    assert 0 < watched < 6
+
+def test_profile_is_written_when_handler_raises(tmp_path):
+    def failing_handler(event, context):
+        raise ValueError("broken document")
+    profiler = InvocationProfiler(store=LocalProfileStore(str(tmp_path)), sample_rate=1.0)
+    try:
+        profiler.profile(failing_handler)(S3_EVENT, None)
+    except ValueError:
+        pass
+    assert profiler.last_location is not None
+
+def test_s3_profile_store(s3_client):
+    s3_client.create_bucket(Bucket="profiles")
+    store = S3ProfileStore(bucket="profiles", prefix="parsers/", s3_client=s3_client)
+    assert store.put("handler/profile.folded", b"main 1\n") == "s3://profiles/parsers/handler/profile.folded"
+    assert s3_client.get_object(Bucket="profiles", Key="parsers/handler/profile.folded")["Body"].read() == b"main 1\n"
+
+def test_input_keys():
+    assert input_keys({"detail": {"bucket": {"name": "bucket"}, "object": {"key": "a.json"}}}) == ["s3://bucket/a.json"]
+    assert input_keys({"Records": [{"body": json.dumps(S3_EVENT)}]}) == ["s3://bucket/slow.pdf"]
+    assert input_keys([{"bucket": "bucket", "key": "b.json"}]) == ["s3://bucket/b.json"]
+    assert input_keys({"invocationId": "invocation-1", "records": [{"recordId": "1"}]}) == ["invocation-1/1"]
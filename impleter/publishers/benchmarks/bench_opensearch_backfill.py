@@ -0,0 +1,52 @@
+""" Benchmark - OpenSearch bulk load throughput (docs/sec) into an index with the default settings (refresh every second, one replica) versus the backfill settings (refresh disabled, no replicas), against the local OpenSearch cluster.
+
+Start the cluster with `make start-local` in the repository root and set OPENSEARCH_URL, OPENSEARCH_USERNAME, OPENSEARCH_PASSWORD and OPENSEARCH_VERIFY_CERTS=false. The benchmark is skipped when OPENSEARCH_URL is not set.
+
+    Typical usage example:
+        OPENSEARCH_URL=https://localhost:9200 OPENSEARCH_USERNAME=admin OPENSEARCH_PASSWORD=admin OPENSEARCH_VERIFY_CERTS=false python benchmarks/bench_opensearch_backfill.py --documents 100000
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../src"))
+from opensearch_indexer import OpenSearchConnection, BulkIndexer
+from opensearch_backfill import BACKFILL_REFRESH_INTERVAL, DEFAULT_REFRESH_INTERVAL
+
+INDEX = "word-stash-backfill-benchmark"
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+
+def run(connection:OpenSearchConnection, refresh_interval:str, replicas:int, args) -> dict:
+    """Loads the benchmark documents once into a fresh index and returns the docs/sec and bulk request latency percentiles."""
+    connection.perform("DELETE", "/" + INDEX, ignore=[404])
+    connection.perform("PUT", "/" + INDEX, body={"settings": {"index": {"refresh_interval": refresh_interval, "number_of_replicas": replicas}}})
+    start_time = time.perf_counter()
+    with BulkIndexer(connection, INDEX, max_workers=args.workers) as indexer:
+        indexer.add_many({"filename": "s3://bucket/test.pdf", "filetype": "pdf", "id": str(i // 100), "index": i % 100, "content": CONTENT} for i in range(args.documents))
+    connection.perform("PUT", "/" + INDEX + "/_settings", body={"index": {"refresh_interval": DEFAULT_REFRESH_INTERVAL, "number_of_replicas": 1}})
+    connection.perform("POST", "/" + INDEX + "/_refresh")
+    duration = time.perf_counter() - start_time
+    assert indexer.last_metrics["indexed"] == args.documents
+    connection.perform("DELETE", "/" + INDEX)
+    return {"docs_per_second": args.documents / duration, "latency_ms_p50": indexer.last_metrics["latency_ms_p50"], "latency_ms_p99": indexer.last_metrics["latency_ms_p99"]}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--documents", type=int, default=50000)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    args = arg_parser.parse_args()
+    if not os.getenv("OPENSEARCH_URL", None):
+        print("OPENSEARCH_URL is not set, skipping the OpenSearch backfill benchmark")
+        return
+    logging.basicConfig(stream=open(os.devnull, "w"), level=logging.INFO)
+    connection = OpenSearchConnection.from_env(maxsize=args.workers)
+    print("{documents} documents, {workers} bulk workers".format(**vars(args)))
+    print("settings".ljust(24) + "docs/sec".ljust(16) + "p50 bulk ms".ljust(16) + "p99 bulk ms")
+    for name, refresh_interval, replicas in [("default", DEFAULT_REFRESH_INTERVAL, 1), ("backfill", BACKFILL_REFRESH_INTERVAL, 0)]:
+        result = run(connection, refresh_interval, replicas, args)
+        print(name.ljust(24) + "{:.0f}".format(result["docs_per_second"]).ljust(16) + "{:.1f}".format(result["latency_ms_p50"]).ljust(16) + "{:.1f}".format(result["latency_ms_p99"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+""" Benchmark - publisher throughput (records/sec) and p99 put_record_batch latency of the threaded BatchPublisher versus the asyncio AsyncPublisherEngine, against local S3 and Kinesis Firehose stand-ins.
+
+The stand-ins add a fixed latency per call and the Firehose stand-in throttles every entry of a call while more than --capacity calls are in flight.
+
+    Typical usage example:
+        python benchmarks/bench_publisher_engine.py --objects 20 --records 2000 --capacity 8
+"""
+import os
+import sys
+import argparse
+import json
+import logging
+
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../src"))
+from schema_validators import CRUDE_SCHEMA
+from firehose_batcher import FirehoseBatcher
+from batch_publisher import BatchPublisher
+from async_publisher import AsyncPublisherEngine
+from local_services import LocalS3Client, LocalFirehoseClient
+
+BUCKET = "word-stash-crude"
+STREAM_NAME = "word-stash-crude"
+CONTENT = "The field of machine learning has made tremendous progress over the past decade"
+
+def create_s3_client(objects:int, records:int, latency:float) -> LocalS3Client:
+    s3_client = LocalS3Client(latency=latency)
+    for i in range(objects):
+        lines = [json.dumps({"filename": "s3://bucket/test.pdf", "filetype": "pdf", "id": str(i), "index": j, "content": CONTENT}) for j in range(records)]
+        s3_client.put_object(Bucket=BUCKET, Key=str(i) + ".jsonl", Body="\n".join(lines))
+    return s3_client
+
+def run(publisher_class, args) -> dict:
+    """Publishes the benchmark objects once and returns the records/sec and batch latency percentiles."""
+    s3_client = create_s3_client(args.objects, args.records, args.s3_latency)
+    firehose_client = LocalFirehoseClient(latency=args.firehose_latency, max_concurrent_calls=args.capacity)
+    batcher = FirehoseBatcher(firehose_client, STREAM_NAME, max_workers=args.workers, max_attempts=100, base_delay=0.01, max_delay=0.5)
+    publisher = publisher_class(CRUDE_SCHEMA, STREAM_NAME, s3_client=s3_client, firehose_client=firehose_client, batcher=batcher)
+    reports = publisher.publish([(BUCKET, str(i) + ".jsonl") for i in range(args.objects)])
+    assert all(report["success"] for report in reports)
+    metrics = getattr(publisher, "last_metrics", None) or batcher.last_metrics
+    return {"records_per_second": metrics["records"] / (metrics["duration_ms"] / 1000), "latency_ms_p99": metrics["latency_ms_p99"], "calls": firehose_client.calls}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--objects", type=int, default=20)
+    arg_parser.add_argument("--records", type=int, default=2000)
+    arg_parser.add_argument("--workers", type=int, default=16)
+    arg_parser.add_argument("--capacity", type=int, default=8)
+    arg_parser.add_argument("--s3-latency", type=float, default=0.02)
+    arg_parser.add_argument("--firehose-latency", type=float, default=0.02)
+    args = arg_parser.parse_args()
+    logging.basicConfig(stream=open(os.devnull, "w"), level=logging.INFO)
+    print("{objects} objects x {records} records, {workers} workers, Firehose capacity {capacity} concurrent calls".format(**vars(args)))
+    print("engine".ljust(24) + "records/sec".ljust(16) + "p99 batch ms".ljust(16) + "put_record_batch calls")
+    for name, publisher_class in [("BatchPublisher", BatchPublisher), ("AsyncPublisherEngine", AsyncPublisherEngine)]:
+        result = run(publisher_class, args)
+        print(name.ljust(24) + "{:.0f}".format(result["records_per_second"]).ljust(16) + "{:.1f}".format(result["latency_ms_p99"]).ljust(16) + str(result["calls"]))
+
+if __name__ == "__main__":
+    main()
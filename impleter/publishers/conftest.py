@@ -0,0 +1,25 @@
+import boto3
+import os
+import pytest
+import sys
+
+# The modules in src import each other flat (e.g. "from firehose_batcher import ..."), as they do in the deployed Lambda package
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/src"))
+
+from moto import mock_s3
+
+
+@pytest.fixture
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture
+def s3_client(aws_credentials):
+    with mock_s3():
+        conn = boto3.client("s3", region_name="us-east-1")
+        yield conn
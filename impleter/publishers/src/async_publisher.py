@@ -0,0 +1,309 @@
+""" Async publisher - File containing an asyncio publisher engine that pipelines S3 reads, validation and Kinesis Firehose sends.
+
+The engine runs three stages connected by bounded queues:
+- readers stream and validate the S3 objects in worker threads and put chunks of records on the record queue.
+- a packer splits the records into put_record_batch sized batches and puts them on the batch queue.
+- senders send the batches. The number of concurrent sends is limited by an additive increase / multiplicative decrease (AIMD) limiter that halves on throttling responses and grows by one after a full window of successful sends. A sender acquires the limiter before it takes a batch off the queue and holds it through the retries of the batch, so at most limit batches are held outside the queue.
+
+Memory is capped by the queue depths and the concurrency limit, because every stage blocks when the next queue is full and idle senders wait for the limiter. If a stage fails, the packer and the senders are cancelled, the record queue is drained until every reader has stopped at its next put, and only then the event loop is closed, so no worker thread is left blocked on the queue of a closed loop. The engine keeps the BatchPublisher interface, so publish() is a synchronous wrapper that can be called from the existing Lambda handlers.
+
+    Typical usage example:
+        from schema_validators import CRUDE_SCHEMA
+        from async_publisher import AsyncPublisherEngine
+        engine = AsyncPublisherEngine(CRUDE_SCHEMA, "word-stash-crude")
+        reports = engine.publish([("word-stash-crude", "example.jsonl")])
+        print(engine.last_metrics)
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Tuple, Union
+from validator_registry import ValidationPolicy
+from firehose_batcher import RECORD_TOO_LARGE_ERROR, RETRYABLE_ERROR_CODES, FirehoseBatcher, is_dead_letter, record_bytes, percentile
+from batch_publisher import DOCUMENT_PUBLISH_MODE, BatchPublisher
+from publish_manifest import PublishManifest
+
+logger = logging.getLogger()
+
+QUEUE_SIZE = 8
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+READ_CHUNK_RECORDS = 100
+READER_WAIT_SECONDS = 1.0
+
+class AdaptiveConcurrencyLimiter(object):
+    """AIMD concurrency limiter for asyncio tasks.
+
+    Attributes:
+        limit: An integer type current number of concurrent operations.
+        minimum: An integer type lower bound of the limit.
+        maximum: An integer type upper bound of the limit.
+        in_use: An integer type number of running operations.
+        throttle_events: An integer type number of throttled operations.
+    """
+    def __init__(self, initial:int=INITIAL_CONCURRENCY, minimum:int=1, maximum:int=MAX_CONCURRENCY):
+        """__init__"""
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_use = 0
+        self.throttle_events = 0
+        self._successes = 0
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        """Creates the condition in the running event loop on first use."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        """Waits until an operation may start."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+
+    def _observe(self, throttled:bool) -> None:
+        """Halves the limit if an attempt was throttled and increases it by one after limit successful attempts."""
+        if throttled:
+            self.throttle_events += 1
+            self._successes = 0
+            self.limit = max(self.minimum, self.limit // 2)
+        else:
+            self._successes += 1
+            if self._successes >= self.limit:
+                self._successes = 0
+                self.limit = min(self.maximum, self.limit + 1)
+
+    async def observe(self, throttled:bool) -> None:
+        """Records the outcome of an attempt of a running operation, adjusting the limit."""
+        condition = self._get_condition()
+        async with condition:
+            self._observe(throttled)
+            condition.notify_all()
+
+    async def release(self, throttled:bool=None) -> None:
+        """Ends an operation. If throttled is given, the outcome of its last attempt is recorded as well."""
+        condition = self._get_condition()
+        async with condition:
+            self.in_use -= 1
+            if throttled is not None:
+                self._observe(throttled)
+            condition.notify_all()
+
+class AsyncPublisherEngine(BatchPublisher):
+    """asyncio publisher engine with bounded queues and adaptive send concurrency.
+
+    Attributes:
+        queue_size: An integer type depth of the record chunk queue and of the batch queue.
+        initial_concurrency: An integer type initial number of concurrent put_record_batch calls.
+        max_concurrency: An integer type maximum number of concurrent put_record_batch calls.
+        last_metrics: A dictionary type with the counters, throughput and batch latency percentiles of the last publish call.
+    """
+    def __init__(self, schema:Dict, stream_name:str, s3_client=None, firehose_client=None, validation_policy:ValidationPolicy=None, batcher:FirehoseBatcher=None,
+            json_publish_mode:str=DOCUMENT_PUBLISH_MODE, max_fetch_workers:int=None, manifest:PublishManifest=None, queue_size:int=None, initial_concurrency:int=None,
+            max_concurrency:int=None):
+        """__init__"""
+        super().__init__(schema, stream_name, s3_client=s3_client, firehose_client=firehose_client, validation_policy=validation_policy, batcher=batcher,
+            json_publish_mode=json_publish_mode, max_fetch_workers=max_fetch_workers, manifest=manifest)
+        self.queue_size = queue_size or int(os.getenv("PUBLISH_QUEUE_SIZE", QUEUE_SIZE))
+        self.initial_concurrency = initial_concurrency or int(os.getenv("PUBLISH_INITIAL_CONCURRENCY", INITIAL_CONCURRENCY))
+        self.max_concurrency = max_concurrency or int(os.getenv("PUBLISH_MAX_CONCURRENCY", MAX_CONCURRENCY))
+        self.last_metrics = dict()
+
+    def publish(self, objects:List[Tuple]) -> List[Dict[str, Any]]:
+        """Synchronous wrapper of publish_async.
+
+        Args:
+        objects: List of (bucket, key) or (bucket, key, etag) tuples
+
+        Returns:
+        List of object reports (bucket, key, etag, records, sent, failed, dead_lettered, error, skipped, success), in the order of the objects
+
+        Raises:
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.publish_async(objects))
+        finally:
+            loop.close()
+
+    def _put(self, loop:asyncio.AbstractEventLoop, record_queue:asyncio.Queue, item:Tuple, stopped:threading.Event) -> None:
+        """Puts an item on the record queue from a worker thread. Blocks while the queue is full, waking up every READER_WAIT_SECONDS to give up once the pipeline has stopped.
+
+        Raises:
+        RuntimeError: If the pipeline stopped before the item was put
+        """
+        if stopped.is_set():
+            raise RuntimeError("publish pipeline stopped")
+        future = asyncio.run_coroutine_threadsafe(record_queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=READER_WAIT_SECONDS)
+            except FutureTimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    raise RuntimeError("publish pipeline stopped")
+
+    def _read(self, loop:asyncio.AbstractEventLoop, record_queue:asyncio.Queue, position:int, bucket:str, key:str, stopped:threading.Event) -> None:
+        """Streams an object's records onto the record queue in chunks. Runs in a worker thread and blocks while the queue is full, until the pipeline stops."""
+        chunk = list()
+        for record in self.iter_records(bucket, key):
+            chunk.append(record)
+            if len(chunk) >= READ_CHUNK_RECORDS:
+                self._put(loop, record_queue, (position, chunk), stopped)
+                chunk = list()
+        if chunk:
+            self._put(loop, record_queue, (position, chunk), stopped)
+
+    async def publish_async(self, objects:List[Tuple]) -> List[Dict[str, Any]]:
+        """Publishes the records of many S3 objects through the read, pack and send pipeline.
+
+        Args:
+        objects: List of (bucket, key) or (bucket, key, etag) tuples
+
+        Returns:
+        List of object reports (bucket, key, etag, records, sent, failed, dead_lettered, error, skipped, success), in the order of the objects
+
+        Raises:
+        """
+        start_time = time.perf_counter()
+        loop = asyncio.get_event_loop()
+        reports, pending = self._start_reports(objects)
+        record_queue = asyncio.Queue(maxsize=self.queue_size)
+        batch_queue = asyncio.Queue(maxsize=self.queue_size)
+        limiter = AdaptiveConcurrencyLimiter(self.initial_concurrency, maximum=self.max_concurrency)
+        fetch_semaphore = asyncio.Semaphore(self.max_fetch_workers)
+        latencies = list()
+        metrics = {"records": 0, "sent": 0, "failed": 0, "dead_lettered": 0, "batches": 0, "retries": 0}
+        executor = ThreadPoolExecutor(max_workers=self.max_fetch_workers + self.max_concurrency)
+        stopped = threading.Event()
+
+        async def read(position:int, bucket:str, key:str) -> None:
+            async with fetch_semaphore:
+                try:
+                    await loop.run_in_executor(executor, self._read, loop, record_queue, position, bucket, key, stopped)
+                except Exception:
+                    ex_type, ex_value, ex_traceback = sys.exc_info()
+                    reports[position]["error"] = ex_type.__name__ + ": " + str(ex_value)
+                    logger.error("bucket: {bucket}, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+        async def read_all() -> None:
+            await asyncio.gather(*[read(position, bucket, key) for position, bucket, key in pending])
+            await record_queue.put(None)
+
+        async def pack() -> None:
+            batch = list()
+            batch_bytes = 0
+            while True:
+                item = await record_queue.get()
+                if item is None:
+                    break
+                position, chunk = item
+                for record in chunk:
+                    size = record_bytes(record)
+                    if batch and (len(batch) >= self.batcher.max_records or batch_bytes + size > self.batcher.max_bytes):
+                        await batch_queue.put((time.perf_counter(), batch))
+                        batch = list()
+                        batch_bytes = 0
+                    batch.append((position, record))
+                    batch_bytes += size
+            if batch:
+                await batch_queue.put((time.perf_counter(), batch))
+            for _ in range(self.max_concurrency):
+                await batch_queue.put(None)
+
+        def account(position:int, entry:Dict) -> None:
+            report = reports[position]
+            report["records"] += 1
+            metrics["records"] += 1
+            if is_dead_letter(entry):
+                report["dead_lettered"] += 1
+                metrics["dead_lettered"] += 1
+            elif entry.get("ErrorCode", None):
+                report["failed"] += 1
+                metrics["failed"] += 1
+            else:
+                report["sent"] += 1
+                metrics["sent"] += 1
+
+        async def send_batch(batch:List[Tuple[int, Union[str, bytes]]]) -> None:
+            """Sends a batch and retries its failed entries. The caller holds a limiter slot for the whole batch."""
+            pending = list()
+            for position, record in batch:
+                if record_bytes(record) > self.batcher.max_record_bytes:
+                    logger.error("stream_name: {stream_name}, record_bytes: {size}, error_code: {error_code}, record dead-lettered".format(stream_name=self.stream_name, size=record_bytes(record), error_code=RECORD_TOO_LARGE_ERROR))
+                    account(position, {"ErrorCode": RECORD_TOO_LARGE_ERROR})
+                else:
+                    pending.append((position, record))
+            attempts = 0
+            while pending:
+                if attempts > 0:
+                    metrics["retries"] += 1
+                    await asyncio.sleep(self.batcher.backoff(attempts))
+                attempts += 1
+                try:
+                    resp = await loop.run_in_executor(executor, self.batcher._put_record_batch, [record for _, record in pending])
+                    entries = resp["RequestResponses"]
+                except Exception:
+                    ex_type, ex_value, ex_traceback = sys.exc_info()
+                    logger.error("stream_name: {stream_name}, records: {records}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(stream_name=self.stream_name, records=len(pending), ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+                    entries = [{"ErrorCode": ex_type.__name__, "ErrorMessage": str(ex_value)} for _ in pending]
+                    attempts = self.batcher.max_attempts
+                throttled = False
+                failed = list()
+                for (position, record), entry in zip(pending, entries):
+                    if entry.get("ErrorCode", None):
+                        throttled = throttled or entry["ErrorCode"] in RETRYABLE_ERROR_CODES
+                        if attempts < self.batcher.max_attempts:
+                            failed.append((position, record))
+                            continue
+                    account(position, entry)
+                await limiter.observe(throttled)
+                pending = failed
+
+        async def send() -> None:
+            while True:
+                await limiter.acquire()
+                try:
+                    item = await batch_queue.get()
+                    if item is None:
+                        break
+                    created, batch = item
+                    await send_batch(batch)
+                finally:
+                    await limiter.release()
+                latencies.append((time.perf_counter() - created) * 1000)
+                metrics["batches"] += 1
+
+        tasks = [asyncio.ensure_future(stage) for stage in [read_all(), pack()] + [send() for _ in range(self.max_concurrency)]]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            stopped.set()
+            for task in tasks[1:]:
+                task.cancel()
+            while not tasks[0].done():
+                while not record_queue.empty():
+                    record_queue.get_nowait()
+                await asyncio.wait([tasks[0]], timeout=READER_WAIT_SECONDS)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=False)
+        duration = time.perf_counter() - start_time
+        self._finish_reports(reports, duration * 1000)
+        metrics.update({
+            "throttle_events": limiter.throttle_events,
+            "concurrency_limit": limiter.limit,
+            "records_per_second": metrics["records"] / duration if duration else 0.0,
+            "latency_ms_p50": percentile(latencies, 50),
+            "latency_ms_p99": percentile(latencies, 99),
+            "duration_ms": duration * 1000})
+        self.last_metrics = metrics
+        logger.info("stream_name: {stream_name}, objects: {objects}, records: {records}, sent: {sent}, failed: {failed}, dead_lettered: {dead_lettered}, batches: {batches}, retries: {retries}, throttle_events: {throttle_events}, concurrency_limit: {concurrency_limit}, latency_ms_p99: {latency_ms_p99:.1f}, duration_ms: {duration_ms:.1f}".format(
+            stream_name=self.stream_name, objects=len(reports), **metrics))
+        return reports
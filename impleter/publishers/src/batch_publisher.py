@@ -0,0 +1,326 @@
+""" Batch publisher - File containing functionality that publishes many S3 objects to a Kinesis Firehose delivery stream in one invocation.
+
+A batch of object notifications (an SQS batch of S3 or EventBridge notifications, an S3 notification or a list of bucket/key pairs) is fetched concurrently and the records of all objects are packed into shared put_record_batch calls. The fetch workers stream the records of their objects into a buffer that is bounded by bytes (PUBLISH_MAX_PREFETCH_BYTES), so objects are never held as record lists and the workers wait while the sends catch up. Every object gets its own report, and SQS messages with a failed object are returned as batchItemFailures so that only they are retried.
+
+    Typical usage example:
+        from schema_validators import CRUDE_SCHEMA
+        from batch_publisher import BatchPublisher, parse_object_notifications, batch_item_failures
+        publisher = BatchPublisher(CRUDE_SCHEMA, "word-stash-crude")
+        notifications = parse_object_notifications({"objects": [{"bucket": "word-stash-crude", "key": "example.jsonl"}]})
+        reports = publisher.publish([(bucket, key, etag) for _, bucket, key, etag in notifications])
+        print(batch_item_failures(notifications, reports))
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from validator_registry import ValidationPolicy, validate
+from firehose_batcher import FirehoseBatcher, is_dead_letter
+from publishers import validated_records, validated_chunks, iter_chunks
+from s3_readers import iter_lines, split_key_extension, decompressed_stream
+from json_codec import loads
+from publish_manifest import PublishManifest, normalize_etag, publish_manifest_from_env
+
+logger = logging.getLogger()
+
+JSON_EXTENSION = "json"
+JSONL_EXTENSION = "jsonl"
+VALID_FILE_EXTENSIONS = [JSON_EXTENSION, JSONL_EXTENSION]
+CHUNKS_PUBLISH_MODE = "chunks"
+DOCUMENT_PUBLISH_MODE = "document"
+MAX_FETCH_WORKERS = 8
+MAX_PREFETCH_BYTES = 8 * 1024 * 1024
+
+Notification = Tuple[str, str, str, Optional[str]]
+
+def parse_object_notifications(event:Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Notification]:
+    """Function that extracts the S3 objects of a batch event.
+
+    The following events are supported:
+    - SQS batches whose message bodies are S3 or EventBridge notifications.
+    - S3 notifications ({"Records": [{"s3": ...}]}) and EventBridge notifications ({"detail": ...}).
+    - Lists of objects ({"objects": [{"bucket": ..., "key": ...}]} or a plain list).
+
+    Args:
+        event: Lambda event
+
+    Returns:
+        List of (item identifier, bucket, key, etag) tuples. The item identifier is the SQS message id or the s3:// uri of the object. The etag is None if the notification does not contain it.
+
+    Raises:
+        ValueError: If the event format is not supported
+    """
+    def from_message(message:Dict[str, Any], identifier:str=None) -> List[Notification]:
+        if "detail" in message:
+            bucket = message["detail"]["bucket"]["name"]
+            key = urllib.parse.unquote_plus(message["detail"]["object"]["key"])
+            return [(identifier or "s3://" + bucket + "/" + key, bucket, key, message["detail"]["object"].get("etag", None))]
+        if "Records" in message:
+            notifications = list()
+            for record in message["Records"]:
+                if record.get("eventSource", None) == "aws:sqs":
+                    notifications.extend(from_message(loads(record["body"]), record["messageId"]))
+                elif "s3" in record:
+                    bucket = record["s3"]["bucket"]["name"]
+                    key = urllib.parse.unquote_plus(record["s3"]["object"]["key"])
+                    notifications.append((identifier or "s3://" + bucket + "/" + key, bucket, key, record["s3"]["object"].get("eTag", None)))
+            return notifications
+        if "bucket" in message and "key" in message:
+            return [(identifier or "s3://" + message["bucket"] + "/" + message["key"], message["bucket"], message["key"], message.get("etag", None))]
+        if message.get("Event", None) == "s3:TestEvent":
+            return list()
+        raise ValueError("unsupported object notification: " + str(message)[:200])
+
+    if isinstance(event, list):
+        event = {"objects": event}
+    if "objects" in event:
+        notifications = list()
+        for obj in event["objects"]:
+            notifications.extend(from_message(obj))
+        return notifications
+    return from_message(event)
+
+def batch_item_failures(notifications:List[Notification], reports:List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Function that creates the batchItemFailures of a partial batch response.
+
+    Args:
+        notifications: List of (item identifier, bucket, key, etag) tuples
+        reports: List of object reports returned by BatchPublisher.publish, in the order of the notifications
+
+    Returns:
+        List of {"itemIdentifier": ...} dictionaries, one per item identifier with at least one failed object
+
+    Raises:
+    """
+    failed = list()
+    for (identifier, _, _, _), report in zip(notifications, reports):
+        if not report["success"] and identifier not in failed:
+            failed.append(identifier)
+    return [{"itemIdentifier": identifier} for identifier in failed]
+
+class RecordBuffer(object):
+    """Thread safe FIFO of (position, item) pairs that is bounded by the length of the buffered records. A put blocks while the buffer is full, unless the buffer is empty, so a single record larger than the bound still passes.
+
+    Attributes:
+        max_bytes: An integer type maximum total length of the buffered records.
+        buffered_bytes: An integer type total length of the buffered records.
+        closed: A boolean type that is set when the consumer stopped reading.
+    """
+    def __init__(self, max_bytes:int=MAX_PREFETCH_BYTES):
+        """__init__"""
+        self.max_bytes = max_bytes
+        self.buffered_bytes = 0
+        self._items = deque()
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def put(self, position:int, item:Any, size:int=0) -> bool:
+        """Appends an item of the given size, waiting while the buffer is full. Returns False without appending if the buffer was closed."""
+        with self._condition:
+            self._condition.wait_for(lambda: self.closed or not self._items or self.buffered_bytes + size <= self.max_bytes)
+            if self.closed:
+                return False
+            self._items.append((position, item, size))
+            self.buffered_bytes += size
+            self._condition.notify_all()
+            return True
+
+    def get(self) -> Tuple[int, Any]:
+        """Removes and returns the oldest (position, item) pair, waiting while the buffer is empty."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._items)
+            position, item, size = self._items.popleft()
+            self.buffered_bytes -= size
+            self._condition.notify_all()
+            return position, item
+
+    def close(self) -> None:
+        """Wakes up and rejects every waiting and later put, so that producers stop when the consumer stops early."""
+        with self._condition:
+            self.closed = True
+            self._items.clear()
+            self.buffered_bytes = 0
+            self._condition.notify_all()
+
+class BatchPublisher(object):
+    """Publisher of many S3 objects that shares the S3 and Firehose clients and the put_record_batch calls between them.
+
+    Attributes:
+        schema: A dictionary type json schema of the published payloads.
+        stream_name: A string type Kinesis Firehose delivery stream name.
+        s3_client: A boto3 S3 client.
+        firehose_client: A boto3 Firehose client.
+        validation_policy: A ValidationPolicy type policy that decides which payloads are validated.
+        batcher: A FirehoseBatcher type batcher that sends the records.
+        json_publish_mode: A string type publishing mode of JSON objects - chunks publishes every chunk of the data array, document the whole object.
+        max_fetch_workers: An integer type number of objects fetched concurrently.
+        max_prefetch_bytes: An integer type maximum length of the fetched records that wait to be sent.
+        manifest: An optional PublishManifest type manifest of published objects. Published object versions are skipped and successfully published ones are recorded. Defaults to the manifest configured in the environment.
+    """
+    def __init__(self, schema:Dict, stream_name:str, s3_client=None, firehose_client=None, validation_policy:ValidationPolicy=None, batcher:FirehoseBatcher=None,
+            json_publish_mode:str=DOCUMENT_PUBLISH_MODE, max_fetch_workers:int=None, manifest:PublishManifest=None, max_prefetch_bytes:int=None):
+        """__init__"""
+        import boto3
+        self.schema = schema
+        self.stream_name = stream_name
+        self.s3_client = s3_client or boto3.client('s3')
+        self.firehose_client = firehose_client or boto3.client('firehose', os.getenv("AWS_REGION", None))
+        self.validation_policy = validation_policy or ValidationPolicy.from_env()
+        self.batcher = batcher or FirehoseBatcher.from_env(self.firehose_client, stream_name)
+        self.json_publish_mode = json_publish_mode
+        self.max_fetch_workers = max_fetch_workers or int(os.getenv("PUBLISH_MAX_FETCH_WORKERS", MAX_FETCH_WORKERS))
+        self.max_prefetch_bytes = max_prefetch_bytes or int(os.getenv("PUBLISH_MAX_PREFETCH_BYTES", MAX_PREFETCH_BYTES))
+        self.manifest = manifest or publish_manifest_from_env()
+
+    def iter_records(self, bucket:str, key:str) -> Iterator[Union[str, bytes]]:
+        """Streams and validates the records of an S3 object.
+
+        Args:
+        bucket: S3 bucket name
+        key: S3 key
+
+        Returns:
+        Iterator of the object's valid records
+
+        Raises:
+        ValueError: If the object is not a (compressed) json or jsonl file
+        """
+        file_extension, compression = split_key_extension(key)
+        if file_extension not in VALID_FILE_EXTENSIONS:
+            raise ValueError("file must be [file_name].json or [file_name].jsonl, optionally with a .gz or .zst extension. Ignoring file: " + str(key))
+        body = decompressed_stream(self.s3_client.get_object(Bucket=bucket, Key=key)['Body'], compression)
+        if file_extension == JSONL_EXTENSION:
+            yield from validated_records(iter_lines(body), self.schema, self.validation_policy, bucket, key)
+            return
+        output_json = body.read()
+        if self.json_publish_mode == CHUNKS_PUBLISH_MODE:
+            yield from validated_chunks(iter_chunks(loads(output_json)), self.schema, self.validation_policy, bucket, key)
+            return
+        validate_input, _ = self.validation_policy.select()
+        if validate_input:
+            validate(loads(output_json), self.schema)
+        yield output_json
+
+    def _stream(self, buffer:RecordBuffer, position:int, bucket:str, key:str) -> None:
+        """Streams an object's records into the buffer, followed by None or by the exception that ended the object. Runs in a fetch worker thread."""
+        if buffer.closed:
+            return
+        try:
+            for record in self.iter_records(bucket, key):
+                if not buffer.put(position, record, len(record)):
+                    return
+            buffer.put(position, None)
+        except Exception as ex:
+            ex_type, ex_value, ex_traceback = sys.exc_info()
+            logger.error("bucket: {bucket}, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+            buffer.put(position, ex)
+
+    def _fetched(self, objects:List[Tuple[int, str, str]]) -> Iterator[Tuple[int, Union[str, bytes, Exception]]]:
+        """Fetches (position, bucket, key) objects concurrently and yields (position, record) pairs as the records are read, and (position, exception) for the objects that failed. At most max_prefetch_bytes of records are buffered."""
+        if not objects:
+            return
+        buffer = RecordBuffer(self.max_prefetch_bytes)
+        executor = ThreadPoolExecutor(max_workers=self.max_fetch_workers)
+        try:
+            for position, bucket, key in objects:
+                executor.submit(self._stream, buffer, position, bucket, key)
+            finished = 0
+            while finished < len(objects):
+                position, item = buffer.get()
+                if item is None or isinstance(item, Exception):
+                    finished += 1
+                if item is not None:
+                    yield position, item
+        finally:
+            buffer.close()
+            executor.shutdown(wait=True)
+
+    def _head_etag(self, bucket:str, key:str) -> Optional[str]:
+        """Returns the ETag of an object or None if it can not be read."""
+        try:
+            return normalize_etag(self.s3_client.head_object(Bucket=bucket, Key=key)["ETag"])
+        except Exception:
+            return None
+
+    def _start_reports(self, objects:List[Tuple]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str, str]]]:
+        """Creates the object reports and checks the manifest in bulk. Returns the reports and the (position, bucket, key) objects that have to be published."""
+        objects = [(obj[0], obj[1], normalize_etag(obj[2]) if len(obj) > 2 else None) for obj in objects]
+        if self.manifest is not None:
+            missing = [(bucket, key) for bucket, key, etag in objects if not etag]
+            if missing:
+                with ThreadPoolExecutor(max_workers=self.max_fetch_workers) as executor:
+                    etags = dict(zip(missing, executor.map(lambda obj: self._head_etag(*obj), missing)))
+                objects = [(bucket, key, etag or etags[(bucket, key)]) for bucket, key, etag in objects]
+        reports = [{"bucket": bucket, "key": key, "etag": etag, "records": 0, "sent": 0, "failed": 0, "dead_lettered": 0, "error": None, "skipped": False, "success": False} for bucket, key, etag in objects]
+        published = set()
+        if self.manifest is not None:
+            published = self.manifest.published([obj for obj in objects if obj[2]])
+        pending = list()
+        for position, obj in enumerate(objects):
+            if obj in published:
+                reports[position]["skipped"] = True
+                reports[position]["success"] = True
+                logger.info("Skipping already published s3 key: s3://" + os.path.join(str(obj[0]), str(obj[1])) + ", etag: " + str(obj[2]))
+            else:
+                pending.append((position, obj[0], obj[1]))
+        return reports, pending
+
+    def _finish_reports(self, reports:List[Dict[str, Any]], duration_ms:float) -> None:
+        """Sets the success flags of the published objects and records the successful ones in the manifest."""
+        for report in reports:
+            if report["skipped"]:
+                continue
+            report["success"] = report["error"] is None and report["failed"] == 0
+            if report["success"] and self.manifest is not None and report["etag"]:
+                try:
+                    self.manifest.record(report["bucket"], report["key"], report["etag"], report["records"], report["sent"], report["failed"], duration_ms, dead_lettered=report["dead_lettered"])
+                except Exception:
+                    ex_type, ex_value, ex_traceback = sys.exc_info()
+                    logger.error("bucket: {bucket}, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=report["bucket"], key=report["key"], ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+    def publish(self, objects:List[Tuple]) -> List[Dict[str, Any]]:
+        """Publishes the records of many S3 objects through shared put_record_batch calls.
+
+        Args:
+        objects: List of (bucket, key) or (bucket, key, etag) tuples
+
+        Returns:
+        List of object reports (bucket, key, etag, records, sent, failed, dead_lettered, error, skipped, success), in the order of the objects. An object succeeds when all its records were sent or dead-lettered.
+
+        Raises:
+        """
+        start_time = time.perf_counter()
+        reports, pending = self._start_reports(objects)
+        owners = list()
+
+        def records() -> Iterator[Union[str, bytes]]:
+            for position, item in self._fetched(pending):
+                if isinstance(item, Exception):
+                    reports[position]["error"] = type(item).__name__ + ": " + str(item)
+                    continue
+                owners.append(position)
+                yield item
+
+        record_position = 0
+        for resp in self.batcher.publish(records()):
+            for entry in resp["RequestResponses"]:
+                report = reports[owners[record_position]]
+                report["records"] += 1
+                if is_dead_letter(entry):
+                    report["dead_lettered"] += 1
+                elif entry.get("ErrorCode", None):
+                    report["failed"] += 1
+                else:
+                    report["sent"] += 1
+                record_position += 1
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        self._finish_reports(reports, duration_ms)
+        logger.info("stream_name: {stream_name}, objects: {objects}, skipped_objects: {skipped_objects}, failed_objects: {failed_objects}, records: {records}, dead_lettered: {dead_lettered}, duration_ms: {duration_ms:.1f}".format(
+            stream_name=self.stream_name, objects=len(reports), skipped_objects=sum(1 for report in reports if report["skipped"]),
+            failed_objects=sum(1 for report in reports if not report["success"]), records=record_position, dead_lettered=sum(report["dead_lettered"] for report in reports), duration_ms=duration_ms))
+        return reports
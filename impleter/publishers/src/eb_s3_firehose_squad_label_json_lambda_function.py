@@ -3,20 +3,35 @@
 from typing import Any, Dict
 import os
 import sys
+import time
 import urllib.parse
-import json
 import boto3
-from jsonschema import validate
 from schema_validators import SQUAD_LABEL_SCHEMA
+from validator_registry import ValidationPolicy, validate
+from firehose_batcher import FirehoseBatcher
+from publishers import record_published, validated_records
+from s3_readers import iter_lines, split_key_extension, decompressed_stream
+from json_codec import loads
+from batch_publisher import DOCUMENT_PUBLISH_MODE, BatchPublisher, parse_object_notifications, batch_item_failures
+from async_publisher import AsyncPublisherEngine
+from publish_manifest import publish_manifest_from_env
+from profiling import InvocationProfiler
 import logging
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
+profiler = InvocationProfiler.from_env()
+
+validation_policy = ValidationPolicy.from_env()
+publish_manifest = publish_manifest_from_env()
 
 json_extension = "json"
 jsonl_extension = "jsonl"
 valid_file_extensions = [json_extension, jsonl_extension]
 
+batch_publisher = None
+
+@profiler.profile
 def lambda_handler(event: Dict[str, Any], context):
     """Eventbridge compatible Lambda function that published SQuAD payloads stored in S3 to the Kinesis Firehose delivery stream.
 
@@ -24,7 +39,7 @@ def lambda_handler(event: Dict[str, Any], context):
         event: Eventbridge message (dict)
         context: Lambda context contains methods and properties that provide information about the invocation, function, and execution environment (dict)
     Returns:
-        list (Kinesis Firehose delivery stream response dict)
+        list (Kinesis Firehose delivery stream response dict, one per put_record_batch sized batch)
     Raises:
     """
     stream_name = os.getenv("STREAM_NAME", None)
@@ -32,35 +47,57 @@ def lambda_handler(event: Dict[str, Any], context):
     bucket = event['detail']['bucket']['name']
     key = event['detail']['object']['key']
     resp = list()
+    output_json = None
     logger.info("Processing s3 key: s3://" + os.path.join(str(bucket), str(key)))
     try:
-        file_extension = key.split(".")[-1]
+        file_extension, compression = split_key_extension(key)
         if file_extension not in valid_file_extensions:
             raise ValueError("file must be [file_name]."+ file_extension +". Ignoring file: " + str(key))
         key = urllib.parse.unquote_plus(key)
         s3 = boto3.resource('s3')
         obj = s3.Object(bucket, key)
-        output_json = obj.get()['Body'].read().decode("utf-8")
+        etag = event['detail']['object'].get('etag', None)
+        if publish_manifest is not None:
+            etag = etag or obj.e_tag
+            if publish_manifest.is_published(bucket, key, etag):
+                logger.info("Skipping already published s3 key: s3://" + os.path.join(str(bucket), str(key)) + ", etag: " + str(etag))
+                return resp
+        start_time = time.perf_counter()
         kinesis_client = boto3.client('firehose', region)
         if file_extension == jsonl_extension:
-            json_list = output_json.split('\n')
-            records = list()
-            for json_elem in json_list:
-                try:
-                    validate(json.loads(json_elem), SQUAD_LABEL_SCHEMA)
-                    records.append({"Data": json_elem})
-                except Exception:
-                    ex_type, ex_value, ex_traceback = sys.exc_info()
-                    logger.error("bucket: {bucket}, key: {key}, json_elem: {json_elem}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, json_elem=json_elem, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
-            resp.append(kinesis_client.put_record_batch(
-                DeliveryStreamName=stream_name,
-                Records=records))
+            json_list = iter_lines(decompressed_stream(obj.get()['Body'], compression))
+            batcher = FirehoseBatcher.from_env(kinesis_client, stream_name)
+            resp.extend(batcher.publish(validated_records(json_list, SQUAD_LABEL_SCHEMA, validation_policy, bucket, key)))
         else:
-            validate(json.loads(output_json), SQUAD_LABEL_SCHEMA)
+            output_json = decompressed_stream(obj.get()['Body'], compression).read()
+            validate_input, _ = validation_policy.select()
+            if validate_input:
+                validate(loads(output_json), SQUAD_LABEL_SCHEMA)
             resp.append(kinesis_client.put_record(
                 DeliveryStreamName=stream_name,
                 Record={"Data": output_json}))
+        if publish_manifest is not None:
+            record_published(publish_manifest, bucket, key, etag, resp, (time.perf_counter() - start_time) * 1000)
     except Exception:
         ex_type, ex_value, ex_traceback = sys.exc_info()
         logger.error("bucket: {bucket}, key: {key}, output_json: {output_json}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, output_json=output_json, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
     return resp
+
+@profiler.profile
+def batch_lambda_handler(event: Dict[str, Any], context):
+    """SQS, S3 and Eventbridge compatible Lambda function that publishes a batch of SQuAD payload objects stored in S3 to the Kinesis Firehose delivery stream. The objects are fetched concurrently and their records share put_record_batch calls.
+
+    Args:
+        event: SQS batch, S3 notification, Eventbridge message or list of {"bucket": ..., "key": ...} objects (dict)
+        context: Lambda context contains methods and properties that provide information about the invocation, function, and execution environment (dict)
+    Returns:
+        dict (batchItemFailures for SQS partial batch responses and one report per object)
+    Raises:
+    """
+    global batch_publisher
+    if batch_publisher is None:
+        publisher_class = AsyncPublisherEngine if os.getenv("PUBLISHER_ENGINE", "threads").lower() == "asyncio" else BatchPublisher
+        batch_publisher = publisher_class(SQUAD_LABEL_SCHEMA, os.getenv("STREAM_NAME", None), validation_policy=validation_policy, json_publish_mode=DOCUMENT_PUBLISH_MODE)
+    notifications = parse_object_notifications(event)
+    reports = batch_publisher.publish([(bucket, key, etag) for _, bucket, key, etag in notifications])
+    return {"batchItemFailures": batch_item_failures(notifications, reports), "objects": reports}
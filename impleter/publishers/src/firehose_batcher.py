@@ -0,0 +1,231 @@
+""" Firehose batcher - File containing functionality that publishes records to a Kinesis Firehose delivery stream in size-aware batches.
+
+A put_record_batch call accepts at most 500 records and 4 MiB, and a single record at most 1,000 KiB. The batcher splits the records by count and byte size, sends the batches concurrently and inspects FailedPutCount and the per entry ErrorCode of every response. Only the failed entries are sent again, with a jittered exponential backoff between attempts. Records that can never be delivered (records larger than the record limit) are dead-lettered: they are logged, not sent, and counted separately from the failed records, so that callers can tell them apart from failures that a retry may fix.
+
+    Typical usage example:
+        import boto3
+        from firehose_batcher import FirehoseBatcher
+        batcher = FirehoseBatcher(boto3.client('firehose'), "word-stash-crude")
+        responses = batcher.publish(['{"id": "57639482-160721-1931", "index": 0}', '{"id": "57639482-160721-1931", "index": 1}'])
+        print(batcher.last_metrics)
+"""
+import os
+import sys
+import math
+import time
+import random
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Union
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_RECORD_BYTES = 1000 * 1024
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 0.1
+MAX_DELAY_SECONDS = 5.0
+RECORD_TOO_LARGE_ERROR = "RecordTooLarge"
+PERMANENT_ERROR_CODES = [RECORD_TOO_LARGE_ERROR]
+RETRYABLE_ERROR_CODES = ["ServiceUnavailableException", "ThrottlingException", "InternalFailure", "ServiceUnavailable", "SlowDown"]
+
+Record = Union[str, bytes]
+
+def record_bytes(record:Record) -> int:
+    """Returns the size of a record's data in bytes."""
+    return len(record) if isinstance(record, bytes) else len(record.encode('utf-8'))
+
+def is_dead_letter(entry:Dict) -> bool:
+    """Returns True if a RequestResponses entry was rejected permanently, so that sending its record again can not succeed."""
+    return entry.get("ErrorCode", None) in PERMANENT_ERROR_CODES
+
+def percentile(values:List[float], q:float) -> float:
+    """Function that returns the nearest rank percentile of a list of values.
+
+    Args:
+        values: List of values
+        q: Percentile between 0 and 100
+
+    Returns:
+        float (0.0 for an empty list)
+
+    Raises:
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(math.ceil(q / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def split_batches(records:Iterable[Record], max_records:int=MAX_BATCH_RECORDS, max_bytes:int=MAX_BATCH_BYTES) -> Iterator[List[Record]]:
+    """Function that splits records into put_record_batch sized batches.
+
+    Args:
+        records: Iterable of record data (str or bytes)
+        max_records: Maximum number of records per batch
+        max_bytes: Maximum number of data bytes per batch
+
+    Returns:
+        Iterator of record lists
+
+    Raises:
+    """
+    batch = list()
+    batch_bytes = 0
+    for record in records:
+        size = record_bytes(record)
+        if batch and (len(batch) >= max_records or batch_bytes + size > max_bytes):
+            yield batch
+            batch = list()
+            batch_bytes = 0
+        batch.append(record)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+class FirehoseBatcher(object):
+    """Size-aware, concurrent Kinesis Firehose publisher that retries only the failed entries.
+
+    Attributes:
+        firehose_client: A boto3 Firehose client (or a stand-in with the same put_record_batch method).
+        stream_name: A string type Kinesis Firehose delivery stream name.
+        max_records: An integer type maximum number of records per put_record_batch call.
+        max_bytes: An integer type maximum number of data bytes per put_record_batch call.
+        max_record_bytes: An integer type maximum number of data bytes per record. Larger records are dead-lettered without being sent.
+        max_workers: An integer type number of batches sent concurrently.
+        max_attempts: An integer type maximum number of attempts per entry.
+        base_delay: A float type base backoff delay in seconds.
+        max_delay: A float type maximum backoff delay in seconds.
+        last_metrics: A dictionary type with the counters of the last publish call.
+    """
+    def __init__(self, firehose_client, stream_name:str, max_records:int=MAX_BATCH_RECORDS, max_bytes:int=MAX_BATCH_BYTES, max_record_bytes:int=MAX_RECORD_BYTES,
+            max_workers:int=MAX_WORKERS, max_attempts:int=MAX_ATTEMPTS, base_delay:float=BASE_DELAY_SECONDS, max_delay:float=MAX_DELAY_SECONDS,
+            rng:random.Random=None, sleep:Callable[[float], None]=time.sleep):
+        """__init__"""
+        self.firehose_client = firehose_client
+        self.stream_name = stream_name
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_record_bytes = max_record_bytes
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.last_metrics = dict()
+
+    @classmethod
+    def from_env(cls, firehose_client, stream_name:str) -> "FirehoseBatcher":
+        """Creates the batcher configured with the PUBLISH_MAX_WORKERS, PUBLISH_MAX_ATTEMPTS and PUBLISH_BASE_DELAY_SECONDS environment variables."""
+        return cls(firehose_client, stream_name,
+            max_workers=int(os.getenv("PUBLISH_MAX_WORKERS", MAX_WORKERS)),
+            max_attempts=int(os.getenv("PUBLISH_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+            base_delay=float(os.getenv("PUBLISH_BASE_DELAY_SECONDS", BASE_DELAY_SECONDS)))
+
+    def backoff(self, attempt:int) -> float:
+        """Returns the full jitter backoff delay before the given (1-based) retry attempt."""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _put_record_batch(self, records:List[Record]) -> Dict:
+        """Calls put_record_batch, turning a retryable call failure into a response in which every entry failed."""
+        try:
+            return self.firehose_client.put_record_batch(
+                DeliveryStreamName=self.stream_name,
+                Records=[{"Data": record} for record in records])
+        except ClientError as ex:
+            error_code = ex.response.get("Error", {}).get("Code", "")
+            if error_code not in RETRYABLE_ERROR_CODES:
+                raise
+            error_message = ex.response.get("Error", {}).get("Message", "")
+            return {
+                "FailedPutCount": len(records),
+                "RequestResponses": [{"ErrorCode": error_code, "ErrorMessage": error_message} for _ in records]}
+
+    def send_batch(self, records:List[Record]) -> Dict:
+        """Sends one batch, retrying only the failed entries until they succeed or max_attempts is reached.
+
+        Args:
+        records: List of record data that fits into one put_record_batch call
+
+        Returns:
+        put_record_batch compatible response dict with one RequestResponses entry per record (in order), the number of attempts and the number of dead-lettered records (DeadLetterCount, included in FailedPutCount)
+
+        Raises:
+        ClientError: If put_record_batch fails with an error that is not retryable
+        """
+        request_responses = [None] * len(records)
+        pending = list()
+        for position, record in enumerate(records):
+            if record_bytes(record) > self.max_record_bytes:
+                request_responses[position] = {"ErrorCode": RECORD_TOO_LARGE_ERROR, "ErrorMessage": "record exceeds " + str(self.max_record_bytes) + " bytes"}
+                logger.error("stream_name: {stream_name}, record_bytes: {size}, error_code: {error_code}, record dead-lettered".format(stream_name=self.stream_name, size=record_bytes(record), error_code=RECORD_TOO_LARGE_ERROR))
+            else:
+                pending.append(position)
+        attempts = 0
+        while pending and attempts < self.max_attempts:
+            if attempts > 0:
+                self.sleep(self.backoff(attempts))
+            attempts += 1
+            resp = self._put_record_batch([records[position] for position in pending])
+            failed = list()
+            for position, entry in zip(pending, resp["RequestResponses"]):
+                request_responses[position] = entry
+                if entry.get("ErrorCode", None):
+                    failed.append(position)
+            pending = failed
+        failed_put_count = sum(1 for entry in request_responses if entry.get("ErrorCode", None))
+        dead_letter_count = sum(1 for entry in request_responses if is_dead_letter(entry))
+        return {"FailedPutCount": failed_put_count, "RequestResponses": request_responses, "Attempts": attempts, "DeadLetterCount": dead_letter_count}
+
+    def publish(self, records:Iterable[Record]) -> List[Dict]:
+        """Publishes records in size-aware batches that are sent concurrently. At most two batches per worker are buffered, so records can be a (lazy) stream.
+
+        Args:
+        records: Iterable of record data (str or bytes)
+
+        Returns:
+        List of send_batch responses, one per batch in the order of the records
+
+        Raises:
+        """
+        start_time = time.perf_counter()
+        metrics = {"records": 0, "sent": 0, "failed": 0, "dead_lettered": 0, "batches": 0, "retries": 0}
+        responses = list()
+
+        latencies = list()
+
+        def collect(batch:List[Record], created:float, future) -> None:
+            try:
+                resp = future.result()
+            except Exception:
+                ex_type, ex_value, ex_traceback = sys.exc_info()
+                logger.error("stream_name: {stream_name}, records: {records}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(stream_name=self.stream_name, records=len(batch), ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+                resp = {"FailedPutCount": len(batch), "RequestResponses": [{"ErrorCode": ex_type.__name__, "ErrorMessage": str(ex_value)} for _ in batch], "Attempts": 0}
+            metrics["records"] += len(batch)
+            metrics["failed"] += resp["FailedPutCount"] - resp.get("DeadLetterCount", 0)
+            metrics["dead_lettered"] += resp.get("DeadLetterCount", 0)
+            metrics["sent"] += len(batch) - resp["FailedPutCount"]
+            metrics["batches"] += 1
+            metrics["retries"] += max(resp["Attempts"] - 1, 0)
+            latencies.append((time.perf_counter() - created) * 1000)
+            responses.append(resp)
+
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in split_batches(records, self.max_records, self.max_bytes):
+                if len(in_flight) >= 2 * self.max_workers:
+                    collect(*in_flight.popleft())
+                in_flight.append((batch, time.perf_counter(), executor.submit(self.send_batch, batch)))
+            while in_flight:
+                collect(*in_flight.popleft())
+        metrics["duration_ms"] = (time.perf_counter() - start_time) * 1000
+        metrics["latency_ms_p50"] = percentile(latencies, 50)
+        metrics["latency_ms_p99"] = percentile(latencies, 99)
+        self.last_metrics = metrics
+        logger.info("stream_name: {stream_name}, records: {records}, sent: {sent}, failed: {failed}, dead_lettered: {dead_lettered}, batches: {batches}, retries: {retries}, duration_ms: {duration_ms:.1f}".format(stream_name=self.stream_name, **metrics))
+        return responses
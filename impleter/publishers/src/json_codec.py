@@ -0,0 +1,82 @@
+""" JSON codec - File containing the JSON encoder/decoder used for payloads.
+
+The following backends are supported and selected with the JSON_CODEC environment variable:
+- orjson (default if installed): a fast JSON library written in Rust. It encodes to UTF-8 instead of ASCII escapes, and encodes NaN and Infinity as null. Non-str dict keys (e.g. the int keyed sheets and properties of parser metadata) are converted to strings as the standard library does, and objects orjson can not encode (e.g. integers over 64 bits) are encoded with the standard library.
+- json: the standard library module (used when orjson is not installed).
+
+    Typical usage example:
+        from json_codec import loads, dumps, dumps_bytes
+        example_dict = loads(b'{"id": "57639482-160721-1931", "index": 0}')
+        print(dumps(example_dict))
+        print(dumps_bytes(example_dict))
+"""
+import os
+import json
+from typing import Any, Callable, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_BACKEND = "orjson"
+STDLIB_BACKEND = "json"
+JSON_CODEC_BACKENDS = [ORJSON_BACKEND, STDLIB_BACKEND]
+
+class JsonCodec(object):
+    """JSON codec backend.
+
+    Attributes:
+        name: A string type backend name.
+        loads: Function that decodes a JSON str or bytes.
+        dumps: Function that encodes an object to a JSON str.
+        dumps_bytes: Function that encodes an object to UTF-8 JSON bytes.
+    """
+    def __init__(self, name:str, loads:Callable[[Union[str, bytes]], Any], dumps:Callable[[Any], str], dumps_bytes:Callable[[Any], bytes]):
+        """__init__"""
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.dumps_bytes = dumps_bytes
+
+def orjson_dumps_bytes(obj:Any) -> bytes:
+    """Encodes an object to UTF-8 JSON bytes with orjson, converting non-str dict keys like json.dumps, and falls back to the standard library for objects orjson can not encode."""
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return json.dumps(obj).encode("utf-8")
+
+def get_codec(name:str=None) -> JsonCodec:
+    """Function that creates a JSON codec.
+
+    Args:
+        name: Backend name (orjson or json). Defaults to the JSON_CODEC environment variable, orjson if it is installed, json otherwise.
+
+    Returns:
+        JsonCodec
+
+    Raises:
+        ValueError: If the backend is unknown or orjson is requested but not installed
+    """
+    name = (name or os.getenv("JSON_CODEC", ORJSON_BACKEND if orjson is not None else STDLIB_BACKEND)).lower()
+    if name not in JSON_CODEC_BACKENDS:
+        raise ValueError("unknown JSON codec: " + str(name) + ". Must be one of " + str(JSON_CODEC_BACKENDS))
+    if name == ORJSON_BACKEND:
+        if orjson is None:
+            raise ValueError("JSON codec orjson requires the orjson package")
+        return JsonCodec(name, orjson.loads, lambda obj: orjson_dumps_bytes(obj).decode("utf-8"), orjson_dumps_bytes)
+    return JsonCodec(name, json.loads, json.dumps, lambda obj: json.dumps(obj).encode("utf-8"))
+
+codec = get_codec()
+
+def loads(data:Union[str, bytes]) -> Any:
+    """Decodes a JSON str or bytes with the configured codec."""
+    return codec.loads(data)
+
+def dumps(obj:Any) -> str:
+    """Encodes an object to a JSON str with the configured codec."""
+    return codec.dumps(obj)
+
+def dumps_bytes(obj:Any) -> bytes:
+    """Encodes an object to UTF-8 JSON bytes with the configured codec."""
+    return codec.dumps_bytes(obj)
@@ -0,0 +1,321 @@
+""" Local services - File containing local stand-ins of the AWS services used by the publishers, for tests and benchmarks.
+
+LocalS3Client implements get_object of the boto3 S3 client on in-memory objects, with an optional first byte latency.
+
+LocalOpenSearchHttp implements the request method of a urllib3 PoolManager for the OpenSearch _bulk, document, count, index, settings, alias, point in time, sliced search and scroll APIs on in-memory indices. It can reject bulk items with 429 responses and can behave like an OpenSearch 1.x cluster without point in time search.
+
+LocalFirehoseClient implements put_record and put_record_batch of the boto3 Firehose client. It enforces the put_record_batch limits, keeps the delivered records in memory and can inject throttling, either per entry (ServiceUnavailableException error codes in RequestResponses) or for a whole call (a ClientError).
+
+    Typical usage example:
+        from local_services import LocalFirehoseClient
+        from firehose_batcher import FirehoseBatcher
+        firehose_client = LocalFirehoseClient(throttle_rate=0.2)
+        FirehoseBatcher(firehose_client, "word-stash-crude").publish(['{"id": "57639482-160721-1931"}'])
+        print(firehose_client.delivered["word-stash-crude"])
+"""
+import io
+import json
+import time
+import zlib
+import random
+import threading
+from uuid import uuid4
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+from botocore.exceptions import ClientError
+
+THROTTLING_ERROR_CODE = "ServiceUnavailableException"
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_RECORD_BYTES = 1000 * 1024
+
+class LocalS3Client(object):
+    """In-memory S3 client stand-in.
+
+    Attributes:
+        objects: A dictionary type with the object bytes per (bucket, key).
+        latency: A float type delay in seconds of every get_object call.
+    """
+    def __init__(self, latency:float=0.0):
+        """__init__"""
+        self.objects = dict()
+        self.latency = latency
+
+    def put_object(self, Bucket:str, Key:str, Body:bytes) -> Dict:
+        """put_object stand-in."""
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        return dict()
+
+    def get_object(self, Bucket:str, Key:str) -> Dict:
+        """get_object stand-in."""
+        if self.latency:
+            time.sleep(self.latency)
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}, "GetObject")
+        body = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+class LocalFirehoseClient(object):
+    """In-memory Kinesis Firehose client stand-in.
+
+    Attributes:
+        throttle_rate: A float type probability that an entry of a put_record_batch call is throttled.
+        throttle_calls: An integer type number of the next put_record_batch calls that fail as a whole with a throttling ClientError.
+        latency: A float type delay in seconds of every call.
+        max_concurrent_calls: An optional integer type number of concurrent put_record_batch calls above which every entry of a call is throttled.
+        delivered: A dictionary type with the list of delivered record data per delivery stream name.
+        calls: An integer type number of put_record and put_record_batch calls.
+    """
+    def __init__(self, throttle_rate:float=0.0, throttle_calls:int=0, latency:float=0.0, max_concurrent_calls:int=None, rng:random.Random=None):
+        """__init__"""
+        self.throttle_rate = throttle_rate
+        self.throttle_calls = throttle_calls
+        self.latency = latency
+        self.max_concurrent_calls = max_concurrent_calls
+        self.concurrent_calls = 0
+        self.rng = rng or random.Random(0)
+        self.delivered = dict()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _throttling_error(self, operation_name:str) -> ClientError:
+        """Creates the ClientError Firehose raises when a call is throttled."""
+        return ClientError({"Error": {"Code": THROTTLING_ERROR_CODE, "Message": "Slow down."}}, operation_name)
+
+    def _deliver(self, stream_name:str, data) -> None:
+        """Stores a delivered record."""
+        self.delivered.setdefault(stream_name, list()).append(data if isinstance(data, bytes) else data.encode('utf-8'))
+
+    def put_record(self, DeliveryStreamName:str, Record:Dict) -> Dict:
+        """put_record stand-in."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            self._deliver(DeliveryStreamName, Record["Data"])
+        return {"RecordId": str(uuid4()), "Encrypted": False}
+
+    def put_record_batch(self, DeliveryStreamName:str, Records:List[Dict]) -> Dict:
+        """put_record_batch stand-in."""
+        with self.lock:
+            self.concurrent_calls += 1
+            overloaded = self.max_concurrent_calls is not None and self.concurrent_calls > self.max_concurrent_calls
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.concurrent_calls -= 1
+        sizes = [len(record["Data"]) if isinstance(record["Data"], bytes) else len(record["Data"].encode('utf-8')) for record in Records]
+        if len(Records) > MAX_BATCH_RECORDS or sum(sizes) > MAX_BATCH_BYTES or max(sizes, default=0) > MAX_RECORD_BYTES:
+            raise ClientError({"Error": {"Code": "InvalidArgumentException", "Message": "batch exceeds the put_record_batch limits"}}, "PutRecordBatch")
+        with self.lock:
+            self.calls += 1
+            if self.throttle_calls > 0:
+                self.throttle_calls -= 1
+                raise self._throttling_error("PutRecordBatch")
+            request_responses = list()
+            for record in Records:
+                if overloaded or self.rng.random() < self.throttle_rate:
+                    request_responses.append({"ErrorCode": THROTTLING_ERROR_CODE, "ErrorMessage": "Slow down."})
+                else:
+                    self._deliver(DeliveryStreamName, record["Data"])
+                    request_responses.append({"RecordId": str(uuid4())})
+        failed_put_count = sum(1 for entry in request_responses if "ErrorCode" in entry)
+        return {"FailedPutCount": failed_put_count, "Encrypted": False, "RequestResponses": request_responses}
+
+class LocalResponse(object):
+    """urllib3 response stand-in with the status and data attributes."""
+    def __init__(self, status:int, body):
+        """__init__"""
+        self.status = status
+        self.data = json.dumps(body).encode('utf-8') if body is not None else b""
+
+class LocalOpenSearchHttp(object):
+    """In-memory OpenSearch HTTP stand-in for OpenSearchConnection.
+
+    Attributes:
+        indices: A dictionary type with the documents per id per index name.
+        settings: A dictionary type with the (string) index settings per index name.
+        mappings: A dictionary type with the mappings per index name.
+        aliases: A dictionary type with the set of index names per alias.
+        supports_pit: A boolean type that enables the point in time API (OpenSearch 2.4 and above).
+        reject_rate: A float type probability that a bulk item is rejected with 429.
+        latency: A float type delay in seconds of every request.
+        requests: A list type with the (method, path) of every request.
+    """
+    def __init__(self, reject_rate:float=0.0, latency:float=0.0, supports_pit:bool=True, rng:random.Random=None):
+        """__init__"""
+        self.indices = dict()
+        self.settings = dict()
+        self.mappings = dict()
+        self.aliases = dict()
+        self.supports_pit = supports_pit
+        self.contexts = dict()
+        self.reject_rate = reject_rate
+        self.latency = latency
+        self.rng = rng or random.Random(0)
+        self.requests = list()
+        self.lock = threading.Lock()
+
+    def request(self, method:str, url:str, body=None, headers:Dict=None) -> LocalResponse:
+        """PoolManager.request stand-in."""
+        if self.latency:
+            time.sleep(self.latency)
+        path = urlparse(url).path
+        params = {name: values[0] for name, values in parse_qs(urlparse(url).query).items()}
+        with self.lock:
+            self.requests.append((method, path))
+            parts = [part for part in path.split("/") if part]
+            payload = json.loads(body) if body and not (parts and parts[-1] == "_bulk") else dict()
+            if method == "POST" and parts and parts[-1] == "_bulk":
+                return LocalResponse(200, self._bulk(body))
+            if parts[-2:] == ["_search", "point_in_time"] and len(parts) == 3 and method == "POST":
+                if not self.supports_pit:
+                    return LocalResponse(405, {"error": "Incorrect HTTP method for uri [" + path + "] and method [POST], allowed: [DELETE]", "status": 405})
+                return LocalResponse(200, {"pit_id": self._open_context(parts[0]), "_shards": {"total": 1, "successful": 1, "failed": 0}})
+            if parts == ["_search", "point_in_time"] and method == "DELETE" or parts == ["_search", "scroll"] and method == "DELETE":
+                for context_id in payload.get("pit_id", payload.get("scroll_id", list())):
+                    self.contexts.pop(context_id, None)
+                return LocalResponse(200, {"succeeded": True})
+            if parts == ["_search"] and "pit" in payload:
+                return self._search(payload["pit"]["id"], payload)
+            if parts == ["_search", "scroll"]:
+                return self._search(payload["scroll_id"], None)
+            if len(parts) == 2 and parts[1] == "_search" and "scroll" in params:
+                if not self._resolve(parts[0]):
+                    return self._not_found(parts[0])
+                return self._search(self._open_context(parts[0], payload), None)
+            if method == "POST" and parts == ["_aliases"]:
+                return self._update_aliases(payload["actions"])
+            if method == "GET" and len(parts) == 2 and parts[0] == "_alias":
+                if parts[1] not in self.aliases:
+                    return self._not_found(parts[1])
+                return LocalResponse(200, {index: {"aliases": {parts[1]: dict()}} for index in sorted(self.aliases[parts[1]])})
+            if len(parts) == 1 and method == "PUT":
+                return self._create_index(parts[0], payload)
+            indices = self._resolve(parts[0]) if parts else list()
+            if not indices:
+                return self._not_found(parts[0] if parts else "")
+            if len(parts) == 1 and method == "GET":
+                return LocalResponse(200, {index: {
+                    "aliases": {alias: dict() for alias, members in self.aliases.items() if index in members},
+                    "mappings": self.mappings[index],
+                    "settings": {"index": dict(self.settings[index])}} for index in indices})
+            if len(parts) == 1 and method == "DELETE":
+                for index in indices:
+                    del self.indices[index], self.settings[index], self.mappings[index]
+                    for members in self.aliases.values():
+                        members.discard(index)
+                return LocalResponse(200, {"acknowledged": True})
+            if len(parts) == 2 and parts[1] == "_settings" and method == "PUT":
+                for index in indices:
+                    self.settings[index].update({name: str(value) for name, value in payload.get("index", payload).items()})
+                return LocalResponse(200, {"acknowledged": True})
+            if len(parts) == 2 and parts[1] == "_refresh":
+                return LocalResponse(200, {"_shards": {"total": 1, "successful": 1, "failed": 0}})
+            if len(parts) == 2 and parts[1] == "_count":
+                return LocalResponse(200, {"count": sum(len(self.indices[index]) for index in indices)})
+            if method == "GET" and len(parts) == 3 and parts[1] == "_doc":
+                document = self.indices[indices[0]].get(parts[2], None)
+                if document is None:
+                    return LocalResponse(404, {"_index": indices[0], "_id": parts[2], "found": False})
+                return LocalResponse(200, {"_index": indices[0], "_id": parts[2], "found": True, "_source": document})
+            return LocalResponse(400, {"error": {"type": "illegal_argument_exception", "reason": "unsupported request " + method + " " + path}})
+
+    def _open_context(self, name:str, scroll:Dict=None) -> str:
+        """Snapshots the documents of an index or alias for a point in time or scroll search."""
+        context_id = str(uuid4())
+        documents = sorted((doc_id, source) for index in self._resolve(name) for doc_id, source in self.indices[index].items())
+        self.contexts[context_id] = {"documents": documents, "scroll": scroll, "position": 0}
+        return context_id
+
+    def _search(self, context_id:str, payload:Optional[Dict]) -> LocalResponse:
+        """Returns the next page of a sliced point in time search (payload with search_after) or of a sliced scroll."""
+        if context_id not in self.contexts:
+            return LocalResponse(404, {"error": {"type": "search_context_missing_exception", "reason": "No search context found for id [" + context_id + "]"}, "status": 404})
+        context = self.contexts[context_id]
+        request = payload if payload is not None else context["scroll"]
+        sliced = request.get("slice", None)
+        hits = list()
+        start = payload.get("search_after", [-1])[0] + 1 if payload is not None else context["position"]
+        for position in range(start, len(context["documents"])):
+            doc_id, source = context["documents"][position]
+            if sliced and zlib.crc32(doc_id.encode('utf-8')) % sliced["max"] != sliced["id"]:
+                continue
+            if len(hits) >= request.get("size", 10):
+                break
+            hits.append({"_index": "snapshot", "_id": doc_id, "_source": source, "sort": [position]})
+            context["position"] = position + 1
+        if payload is None and not hits:
+            context["position"] = len(context["documents"])
+        resp = {"took": 1, "timed_out": False, "hits": {"total": {"value": len(hits), "relation": "gte"}, "hits": hits}}
+        if payload is None:
+            resp["_scroll_id"] = context_id
+        else:
+            resp["pit_id"] = context_id
+        return LocalResponse(200, resp)
+
+    def _not_found(self, name:str) -> LocalResponse:
+        """Creates the response of a missing index or alias."""
+        return LocalResponse(404, {"error": {"type": "index_not_found_exception", "reason": "no such index [" + name + "]"}, "status": 404})
+
+    def _resolve(self, name:str) -> List[str]:
+        """Returns the index names of an index or alias name."""
+        if name in self.indices:
+            return [name]
+        return sorted(self.aliases.get(name, set()))
+
+    def _create_index(self, index:str, payload:Dict) -> LocalResponse:
+        """Creates an index with the settings, mappings and aliases of the request."""
+        if index in self.indices or index in self.aliases:
+            return LocalResponse(400, {"error": {"type": "resource_already_exists_exception", "reason": "index [" + index + "] already exists"}, "status": 400})
+        self.indices[index] = dict()
+        self.settings[index] = {"number_of_shards": "1", "number_of_replicas": "1"}
+        self.settings[index].update({name: str(value) for name, value in payload.get("settings", dict()).get("index", payload.get("settings", dict())).items()})
+        self.mappings[index] = payload.get("mappings", dict())
+        for alias in payload.get("aliases", dict()):
+            self.aliases.setdefault(alias, set()).add(index)
+        return LocalResponse(200, {"acknowledged": True, "index": index})
+
+    def _update_aliases(self, actions:List[Dict]) -> LocalResponse:
+        """Applies add and remove alias actions atomically."""
+        aliases = {alias: set(members) for alias, members in self.aliases.items()}
+        for action in actions:
+            operation, target = next(iter(action.items()))
+            if target["index"] not in self.indices:
+                return self._not_found(target["index"])
+            if operation == "add":
+                if target["alias"] in self.indices:
+                    return LocalResponse(400, {"error": {"type": "invalid_alias_name_exception", "reason": "an index exists with the same name as the alias"}, "status": 400})
+                aliases.setdefault(target["alias"], set()).add(target["index"])
+            elif operation == "remove":
+                aliases.get(target["alias"], set()).discard(target["index"])
+        self.aliases = {alias: members for alias, members in aliases.items() if members}
+        return LocalResponse(200, {"acknowledged": True})
+
+    def _bulk(self, body:bytes) -> Dict:
+        """Applies index and create actions."""
+        lines = body.decode('utf-8').splitlines()
+        items = list()
+        for action_line, source_line in zip(lines[0::2], lines[1::2]):
+            op_type, action = next(iter(json.loads(action_line).items()))
+            index = (self._resolve(action["_index"]) or [action["_index"]])[0]
+            if index not in self.indices:
+                self._create_index(index, dict())
+            doc_id = action.get("_id", None) or str(uuid4())
+            documents = self.indices[index]
+            if self.rng.random() < self.reject_rate:
+                item = {"_index": index, "_id": doc_id, "status": 429, "error": {"type": "es_rejected_execution_exception", "reason": "rejected execution"}}
+            elif op_type == "create" and doc_id in documents:
+                item = {"_index": index, "_id": doc_id, "status": 409, "error": {"type": "version_conflict_engine_exception", "reason": "document already exists"}}
+            else:
+                try:
+                    source = json.loads(source_line)
+                except ValueError:
+                    item = {"_index": index, "_id": doc_id, "status": 400, "error": {"type": "mapper_parsing_exception", "reason": "failed to parse"}}
+                else:
+                    item = {"_index": index, "_id": doc_id, "status": 200 if doc_id in documents else 201, "result": "updated" if doc_id in documents else "created"}
+                    documents[doc_id] = source
+            items.append({op_type: item})
+        return {"took": 1, "errors": any(item[next(iter(item))]["status"] >= 300 for item in items), "items": items}
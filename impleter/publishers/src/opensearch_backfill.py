@@ -0,0 +1,362 @@
+""" OpenSearch backfill - File containing functionality that rebuilds an OpenSearch index from the parser outputs in S3 without downtime.
+
+A backfill creates a fresh versioned index ({alias}_v{version}) with the mappings and shard count of the index the alias points to, and with refresh disabled and no replicas. It bulk loads the S3 objects in parallel, restores the refresh interval and replicas, refreshes the index, checks the document count and swaps the alias to the new index in one atomic _aliases request. Readers and the Firehose delivery streams keep using the alias, so they see either the old or the new index. If any object or document fails, the alias is left unchanged and the new index is kept for inspection.
+
+The parser outputs are crude documents, so they are indexed as they are only into the crude alias. Label indices (e.g. ner_label) are rebuilt by passing the converter of the delivery stream's transformation Lambda (e.g. converters.NerCrudeToLabel of the converters package, or any object with the same convert_batch method), which converts the documents in batches before they are indexed. S3 objects that already hold converter outputs are indexed as they are with converted=True (--converted).
+
+The alias name must not be a concrete index. An index that was created by Firehose under the alias name (e.g. crude) has to be reindexed into a versioned index once before its first backfill.
+
+    Typical usage example:
+        from opensearch_indexer import OpenSearchConnection
+        from opensearch_backfill import OpenSearchBackfill
+        backfill = OpenSearchBackfill(OpenSearchConnection.from_env(), "crude")
+        report = backfill.run("word-stash-crude", prefix="2021/")
+        print(report)
+
+        python src/opensearch_backfill.py --alias crude --bucket word-stash-crude --prefix 2021/
+        PYTHONPATH=../converters/src python src/opensearch_backfill.py --alias ner_label --bucket word-stash-crude --prefix 2021/ --converter converters:NerCrudeToLabel
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import importlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from json_codec import loads, dumps
+from s3_readers import iter_lines, split_key_extension, decompressed_stream
+from publishers import iter_chunks
+from opensearch_indexer import MAX_ATTEMPTS, MAX_BULK_ACTIONS, MAX_BULK_BYTES, MAX_WORKERS, CHUNK_ID_KEY, OpenSearchConnection, BulkIndexer
+
+logger = logging.getLogger()
+
+JSON_EXTENSION = "json"
+JSONL_EXTENSION = "jsonl"
+CHUNKS_PUBLISH_MODE = "chunks"
+DOCUMENT_PUBLISH_MODE = "document"
+MAX_READ_WORKERS = 8
+CRUDE_ALIAS = "crude"
+CONVERT_BATCH_SIZE = 500
+VERSION_FORMAT = "%Y%m%d%H%M%S"
+BACKFILL_REFRESH_INTERVAL = "-1"
+DEFAULT_REFRESH_INTERVAL = "1s"
+DEFAULT_NUMBER_OF_REPLICAS = "1"
+
+class BackfillError(Exception):
+    """Raised when a backfill can not be started or its index is not complete."""
+
+def versioned_index_name(alias:str, version:str=None) -> str:
+    """Function that creates the name of a versioned index of an alias.
+
+    Args:
+        alias: Alias name (e.g. crude)
+        version: Version string, defaults to the current UTC time (yyyymmddhhmmss)
+
+    Returns:
+        str: {alias}_v{version}
+
+    Raises:
+    """
+    return alias + "_v" + (version or datetime.utcnow().strftime(VERSION_FORMAT))
+
+def load_converter(spec:str) -> Any:
+    """Function that creates a converter from its module and class name.
+
+    Args:
+        spec: module:class specification, e.g. converters:NerCrudeToLabel. The module has to be importable, e.g. with the converters package's src directory on PYTHONPATH.
+
+    Returns:
+        The converter instance
+
+    Raises:
+        ValueError: If the specification is not module:class
+    """
+    module_name, _, class_name = spec.partition(":")
+    if not module_name or not class_name:
+        raise ValueError("converter must be given as module:class, e.g. converters:NerCrudeToLabel. Got: " + str(spec))
+    return getattr(importlib.import_module(module_name), class_name)()
+
+class OpenSearchBackfill(object):
+    """Zero downtime rebuild of an aliased OpenSearch index from S3 parser outputs.
+
+    Attributes:
+        connection: An OpenSearchConnection type cluster connection.
+        alias: A string type alias name that readers and delivery streams use.
+        s3_client: A boto3 S3 client.
+        json_publish_mode: A string type indexing mode of JSON objects - chunks indexes every chunk of the data array, document the whole object.
+        max_read_workers: An integer type number of S3 objects read concurrently.
+        number_of_shards: An optional integer type number of primary shards of the new index. Defaults to the shards of the current index.
+        number_of_replicas: An optional integer type number of replicas restored after the load. Defaults to the replicas of the current index.
+        delete_old: A boolean type that deletes the previous indices after the alias swap.
+        indexer_options: A dictionary type with the BulkIndexer arguments.
+        converter: An optional converter whose convert_batch method turns the parser outputs into the documents of the index. Required for every alias but crude, unless converted is set.
+        converted: A boolean type that states that the S3 objects already hold documents in the format of the index.
+    """
+    def __init__(self, connection:OpenSearchConnection, alias:str, s3_client=None, json_publish_mode:str=DOCUMENT_PUBLISH_MODE, max_read_workers:int=MAX_READ_WORKERS,
+            number_of_shards:int=None, number_of_replicas:int=None, delete_old:bool=False, indexer_options:Dict[str, Any]=None,
+            converter:Any=None, converted:bool=False):
+        """__init__"""
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        self.connection = connection
+        self.alias = alias
+        self.s3_client = s3_client
+        self.json_publish_mode = json_publish_mode
+        self.max_read_workers = max_read_workers
+        self.number_of_shards = number_of_shards
+        self.number_of_replicas = number_of_replicas
+        self.delete_old = delete_old
+        self.indexer_options = indexer_options or dict()
+        self.converter = converter
+        self.converted = converted
+
+    def current_indices(self) -> List[str]:
+        """Returns the indices the alias points to.
+
+        Args:
+
+        Returns:
+        List of index names (empty if the alias does not exist)
+
+        Raises:
+        BackfillError: If the alias name is a concrete index
+        """
+        if self.alias in (self.connection.perform("GET", "/" + self.alias, ignore=[404]) or dict()):
+            raise BackfillError("[" + self.alias + "] is a concrete index, reindex it into a versioned index and alias it before the first backfill")
+        resp = self.connection.perform("GET", "/_alias/" + self.alias, ignore=[404]) or dict()
+        return sorted(index for index in resp if index not in ("error", "status"))
+
+    def index_template(self, indices:List[str]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Returns the settings and mappings of the new index, based on the current index.
+
+        Args:
+        indices: Current indices of the alias
+
+        Returns:
+        Tuple of the settings to restore after the load (number_of_shards, number_of_replicas, refresh_interval) and the mappings
+
+        Raises:
+        """
+        settings = {"number_of_shards": None, "number_of_replicas": DEFAULT_NUMBER_OF_REPLICAS, "refresh_interval": DEFAULT_REFRESH_INTERVAL}
+        mappings = dict()
+        if indices:
+            current = self.connection.perform("GET", "/" + indices[-1])[indices[-1]]
+            settings.update({name: value for name, value in current["settings"]["index"].items() if name in settings})
+            mappings = current.get("mappings", dict())
+        if self.number_of_shards is not None:
+            settings["number_of_shards"] = str(self.number_of_shards)
+        if self.number_of_replicas is not None:
+            settings["number_of_replicas"] = str(self.number_of_replicas)
+        return settings, mappings
+
+    def create_index(self, index:str, settings:Dict[str, str], mappings:Dict[str, Any]) -> None:
+        """Creates the new index with refresh disabled and without replicas.
+
+        Args:
+        index: New index name
+        settings: Settings of the current index (see index_template)
+        mappings: Mappings of the current index
+
+        Returns:
+
+        Raises:
+        OpenSearchError: If the index exists
+        """
+        index_settings = {"refresh_interval": BACKFILL_REFRESH_INTERVAL, "number_of_replicas": 0}
+        if settings["number_of_shards"]:
+            index_settings["number_of_shards"] = int(settings["number_of_shards"])
+        self.connection.perform("PUT", "/" + index, body={"settings": {"index": index_settings}, "mappings": mappings})
+
+    def restore_settings(self, index:str, settings:Dict[str, str]) -> None:
+        """Restores the refresh interval and replicas of the new index and refreshes it."""
+        self.connection.perform("PUT", "/" + index + "/_settings", body={"index": {"refresh_interval": settings["refresh_interval"], "number_of_replicas": int(settings["number_of_replicas"])}})
+        self.connection.perform("POST", "/" + index + "/_refresh")
+
+    def swap_alias(self, index:str, previous_indices:List[str]) -> None:
+        """Points the alias to the new index and removes it from the previous indices in one atomic request."""
+        actions = [{"remove": {"index": previous, "alias": self.alias}} for previous in previous_indices]
+        actions.append({"add": {"index": index, "alias": self.alias}})
+        self.connection.perform("POST", "/_aliases", body={"actions": actions})
+
+    def list_keys(self, bucket:str, prefix:str="") -> List[str]:
+        """Lists the json and jsonl objects (optionally gzip or zstd compressed) under an S3 prefix."""
+        keys = list()
+        for page in self.s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", list()) if split_key_extension(obj["Key"])[0] in (JSON_EXTENSION, JSONL_EXTENSION))
+        return keys
+
+    def read_documents(self, bucket:str, key:str) -> Iterator[Union[bytes, Dict[str, Any]]]:
+        """Streams the documents of an S3 parser output as they are stored.
+
+        Args:
+        bucket: S3 bucket name
+        key: S3 key
+
+        Returns:
+        Iterator of the JSON lines of a jsonl object, or of the chunks (or the whole object) of a json object
+
+        Raises:
+        ValueError: If the object is not a (compressed) json or jsonl file
+        """
+        file_extension, compression = split_key_extension(key)
+        if file_extension not in (JSON_EXTENSION, JSONL_EXTENSION):
+            raise ValueError("file must be [file_name].json or [file_name].jsonl, optionally with a .gz or .zst extension. Ignoring file: " + str(key))
+        body = decompressed_stream(self.s3_client.get_object(Bucket=bucket, Key=key)['Body'], compression)
+        if file_extension == JSONL_EXTENSION:
+            yield from iter_lines(body)
+        elif self.json_publish_mode == CHUNKS_PUBLISH_MODE:
+            yield from iter_chunks(loads(body.read()))
+        else:
+            yield body.read()
+
+    def _convert_batch(self, batch:List[Dict[str, Any]], key:str) -> Iterator[Dict[str, Any]]:
+        """Converts a batch of documents, dropping the documents the converter drops and raising on the first conversion failure."""
+        for position, output in enumerate(self.converter.convert_batch(batch)):
+            if isinstance(output, Exception):
+                raise ValueError("document " + str(position) + " of a batch of " + str(key) + " could not be converted: " + type(output).__name__ + ": " + str(output))
+            if output is not None:
+                yield output
+
+    def iter_documents(self, bucket:str, key:str) -> Iterator[Union[bytes, Dict[str, Any]]]:
+        """Streams the documents of an S3 parser output in the format of the index, converting them in batches of CONVERT_BATCH_SIZE documents if a converter is set.
+
+        Args:
+        bucket: S3 bucket name
+        key: S3 key
+
+        Returns:
+        Iterator of documents
+
+        Raises:
+        ValueError: If the object is not a (compressed) json or jsonl file or a document could not be converted
+        """
+        if self.converter is None:
+            yield from self.read_documents(bucket, key)
+            return
+        batch = list()
+        for document in self.read_documents(bucket, key):
+            batch.append(document if isinstance(document, dict) else loads(document))
+            if len(batch) >= CONVERT_BATCH_SIZE:
+                yield from self._convert_batch(batch, key)
+                batch = list()
+        if batch:
+            yield from self._convert_batch(batch, key)
+
+    def load(self, index:str, bucket:str, keys:List[str]) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+        """Bulk loads S3 objects into an index, reading the objects in parallel into one shared indexer.
+
+        Args:
+        index: Target index name
+        bucket: S3 bucket name
+        keys: S3 keys
+
+        Returns:
+        Tuple of the indexer metrics and the list of objects that could not be read
+
+        Raises:
+        """
+        indexer = BulkIndexer(self.connection, index, **self.indexer_options)
+        object_errors = list()
+
+        def load_object(key:str) -> None:
+            try:
+                indexer.add_many(self.iter_documents(bucket, key))
+            except Exception:
+                ex_type, ex_value, ex_traceback = sys.exc_info()
+                object_errors.append({"bucket": bucket, "key": key, "error": ex_type.__name__ + ": " + str(ex_value)})
+                logger.error("bucket: {bucket}, key: {key}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+        with ThreadPoolExecutor(max_workers=self.max_read_workers) as executor:
+            list(executor.map(load_object, keys))
+        metrics = indexer.close()
+        metrics["errors"] = indexer.last_errors
+        return metrics, object_errors
+
+    def run(self, bucket:str, prefix:str="", keys:List[str]=None, version:str=None) -> Dict[str, Any]:
+        """Rebuilds the aliased index from S3 parser outputs.
+
+        Args:
+        bucket: S3 bucket name
+        prefix: S3 key prefix of the parser outputs
+        keys: S3 keys to load instead of listing the prefix
+        version: Version of the new index, defaults to the current UTC time
+
+        Returns:
+        dict with the alias, new and previous indices, the number of objects, the indexer metrics, the document count, the per stage durations and whether the alias was swapped
+
+        Raises:
+        BackfillError: If the alias name is a concrete index, if a label index has neither a converter nor converted input, or if objects or documents failed (the alias is not swapped)
+        """
+        start_time = time.perf_counter()
+        if self.alias != CRUDE_ALIAS and self.converter is None and not self.converted:
+            raise BackfillError("[" + self.alias + "] is not the " + CRUDE_ALIAS + " index, pass the converter of its delivery stream (--converter) or confirm that the objects hold converted documents (--converted)")
+        previous_indices = self.current_indices()
+        index = versioned_index_name(self.alias, version)
+        settings, mappings = self.index_template(previous_indices)
+        keys = keys if keys is not None else self.list_keys(bucket, prefix)
+        self.create_index(index, settings, mappings)
+        logger.info("alias: {alias}, index: {index}, previous_indices: {previous_indices}, objects: {objects}".format(alias=self.alias, index=index, previous_indices=previous_indices, objects=len(keys)))
+        load_start_time = time.perf_counter()
+        metrics, object_errors = self.load(index, bucket, keys)
+        restore_start_time = time.perf_counter()
+        self.restore_settings(index, settings)
+        count = self.connection.perform("GET", "/" + index + "/_count")["count"]
+        report = {
+            "alias": self.alias,
+            "index": index,
+            "previous_indices": previous_indices,
+            "objects": len(keys),
+            "object_errors": object_errors,
+            "indexer": metrics,
+            "count": count,
+            "load_ms": (restore_start_time - load_start_time) * 1000,
+            "restore_ms": (time.perf_counter() - restore_start_time) * 1000,
+            "swapped": False}
+        if object_errors or metrics["failed"]:
+            logger.error("alias: {alias}, index: {index}, object_errors: {object_errors}, failed: {failed}, alias not swapped".format(alias=self.alias, index=index, object_errors=len(object_errors), failed=metrics["failed"]))
+            raise BackfillError("backfill of [" + index + "] is incomplete: " + dumps({key: report[key] for key in ("objects", "object_errors", "count")}))
+        self.swap_alias(index, previous_indices)
+        report["swapped"] = True
+        if self.delete_old:
+            for previous in previous_indices:
+                self.connection.perform("DELETE", "/" + previous)
+        report["duration_ms"] = (time.perf_counter() - start_time) * 1000
+        logger.info("alias: {alias}, index: {index}, documents: {count}, docs_per_second: {docs_per_second:.1f}, duration_ms: {duration_ms:.1f}".format(
+            alias=self.alias, index=index, count=count, docs_per_second=metrics["actions_per_second"], duration_ms=report["duration_ms"]))
+        return report
+
+def main(argv:Optional[List[str]]=None) -> Dict[str, Any]:
+    """Command line entry point. The connection is configured with the OPENSEARCH_* environment variables and the indexer with the INDEX_* environment variables."""
+    arg_parser = argparse.ArgumentParser(description="Rebuilds an aliased OpenSearch index from S3 parser outputs.")
+    arg_parser.add_argument("--alias", required=True, help="alias name, e.g. crude")
+    arg_parser.add_argument("--bucket", required=True, help="S3 bucket of the parser outputs")
+    arg_parser.add_argument("--prefix", default="", help="S3 key prefix of the parser outputs")
+    arg_parser.add_argument("--version", default=None, help="version of the new index, defaults to the current UTC time")
+    arg_parser.add_argument("--shards", type=int, default=None, help="number of primary shards, defaults to the shards of the current index")
+    arg_parser.add_argument("--replicas", type=int, default=None, help="number of replicas, defaults to the replicas of the current index")
+    arg_parser.add_argument("--read-workers", type=int, default=MAX_READ_WORKERS, help="number of S3 objects read concurrently")
+    arg_parser.add_argument("--json-publish-mode", default=DOCUMENT_PUBLISH_MODE, choices=[CHUNKS_PUBLISH_MODE, DOCUMENT_PUBLISH_MODE])
+    arg_parser.add_argument("--delete-old", action="store_true", help="delete the previous indices after the alias swap")
+    arg_parser.add_argument("--converter", default=None, help="module:class of the converter of label indices, e.g. converters:NerCrudeToLabel")
+    arg_parser.add_argument("--converted", action="store_true", help="the objects already hold documents in the format of the index")
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    indexer_options = {
+        "max_actions": int(os.getenv("INDEX_MAX_ACTIONS", MAX_BULK_ACTIONS)),
+        "max_bytes": int(os.getenv("INDEX_MAX_BYTES", MAX_BULK_BYTES)),
+        "max_workers": int(os.getenv("INDEX_MAX_WORKERS", MAX_WORKERS)),
+        "max_attempts": int(os.getenv("INDEX_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+        "id_key": os.getenv("INDEX_ID_KEY", CHUNK_ID_KEY) or None}
+    connection = OpenSearchConnection.from_env(maxsize=indexer_options["max_workers"])
+    backfill = OpenSearchBackfill(connection, args.alias, json_publish_mode=args.json_publish_mode, max_read_workers=args.read_workers,
+        number_of_shards=args.shards, number_of_replicas=args.replicas, delete_old=args.delete_old, indexer_options=indexer_options,
+        converter=load_converter(args.converter) if args.converter else None, converted=args.converted)
+    report = backfill.run(args.bucket, prefix=args.prefix, version=args.version)
+    print(dumps(report))
+    return report
+
+if __name__ == "__main__":
+    main()
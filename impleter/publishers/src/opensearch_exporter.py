@@ -0,0 +1,324 @@
+""" OpenSearch exporter - File containing functionality that exports training datasets from the *_train indices in parallel slices.
+
+The export opens one point in time (PIT) of the index and reads it with N sliced searches (search_after paging), one per worker. Clusters without the point in time API (OpenSearch below 2.4, e.g. the local 1.1 cluster) fall back to N sliced scrolls. Every slice streams its hits into sharded, compressed files of the document _source - the exact NerLabelToTrain / SquadLabelToTrain output that Firehose indexed - as gzip JSONL or, if pyarrow is installed, as Parquet.
+
+The export is resumable per slice: a slice writes its shards under temporary names, renames them when they are complete and then writes a slice marker with the shard names, document counts and sha256 checksums. A rerun skips the slices that have a marker and restarts the others. The manifest.json written at the end lists every shard.
+
+    Typical usage example:
+        from opensearch_indexer import OpenSearchConnection
+        from opensearch_exporter import SlicedExporter
+        exporter = SlicedExporter(OpenSearchConnection.from_env(), "ner_label_train", "/tmp/ner_label_train", slices=8)
+        manifest = exporter.export()
+        print(manifest["documents"])
+
+        python src/opensearch_exporter.py --index ner_label_train --output-dir /tmp/ner_label_train --slices 8
+"""
+import os
+import sys
+import gzip
+import time
+import hashlib
+import argparse
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from json_codec import loads, dumps, dumps_bytes
+from opensearch_indexer import OpenSearchConnection, OpenSearchError
+
+logger = logging.getLogger()
+
+JSONL_FORMAT = "jsonl"
+PARQUET_FORMAT = "parquet"
+PIT_MODE = "pit"
+SCROLL_MODE = "scroll"
+SLICES = 4
+PAGE_SIZE = 1000
+SHARD_DOCUMENTS = 100000
+KEEP_ALIVE = "5m"
+MANIFEST_FILE = "manifest.json"
+SLICES_DIRECTORY = "_slices"
+TEMPORARY_SUFFIX = ".tmp"
+FILE_EXTENSIONS = {JSONL_FORMAT: ".jsonl.gz", PARQUET_FORMAT: ".parquet"}
+
+def sha256_file(path:str) -> str:
+    """Returns the sha256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ShardWriter(object):
+    """Writer of the numbered shard files of one slice.
+
+    Attributes:
+        directory: A string type output directory.
+        prefix: A string type shard file name prefix.
+        output_format: A string type shard format - jsonl (gzip compressed JSON lines) or parquet.
+        shard_documents: An integer type maximum number of documents per shard.
+        shards: A list type with the name, document count, size and sha256 checksum of every completed shard.
+    """
+    def __init__(self, directory:str, prefix:str, output_format:str=JSONL_FORMAT, shard_documents:int=SHARD_DOCUMENTS):
+        """__init__"""
+        if output_format not in FILE_EXTENSIONS:
+            raise ValueError("output format must be one of " + str(list(FILE_EXTENSIONS)) + ": " + str(output_format))
+        if output_format == PARQUET_FORMAT:
+            try:
+                import pyarrow.parquet
+            except ImportError:
+                raise ValueError("parquet output requires the optional pyarrow package")
+        self.directory = directory
+        self.prefix = prefix
+        self.output_format = output_format
+        self.shard_documents = shard_documents
+        self.shards = list()
+        self._documents = list()
+        self._fp = None
+        self._count = 0
+
+    def _path(self) -> str:
+        """Returns the path of the current shard."""
+        return os.path.join(self.directory, self.prefix + "-" + str(len(self.shards)).zfill(5) + FILE_EXTENSIONS[self.output_format])
+
+    def write(self, source:Dict[str, Any]) -> None:
+        """Writes a document to the current shard and completes the shard when it is full."""
+        if self.output_format == JSONL_FORMAT:
+            if self._fp is None:
+                self._fp = gzip.open(self._path() + TEMPORARY_SUFFIX, "wb")
+            self._fp.write(dumps_bytes(source) + b"\n")
+        else:
+            self._documents.append(source)
+        self._count += 1
+        if self._count >= self.shard_documents:
+            self.complete_shard()
+
+    def complete_shard(self) -> None:
+        """Closes the current shard, renames it to its final name and records its checksum."""
+        if self._count == 0:
+            return
+        path = self._path()
+        if self.output_format == JSONL_FORMAT:
+            self._fp.close()
+            self._fp = None
+        else:
+            import pyarrow
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(self._documents), path + TEMPORARY_SUFFIX)
+            self._documents = list()
+        os.replace(path + TEMPORARY_SUFFIX, path)
+        self.shards.append({"file": os.path.basename(path), "documents": self._count, "bytes": os.path.getsize(path), "sha256": sha256_file(path)})
+        self._count = 0
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Completes the last shard and returns the shards."""
+        self.complete_shard()
+        return self.shards
+
+class SlicedExporter(object):
+    """Parallel sliced exporter of an OpenSearch index.
+
+    Attributes:
+        connection: An OpenSearchConnection type cluster connection.
+        index: A string type index or alias name (e.g. ner_label_train).
+        output_dir: A string type directory of the shards, slice markers and manifest.
+        slices: An integer type number of slices, each read by its own worker. A resumed export must use the same number of slices.
+        output_format: A string type shard format - jsonl or parquet.
+        shard_documents: An integer type maximum number of documents per shard.
+        page_size: An integer type number of hits per search request.
+        keep_alive: A string type keep alive of the point in time or scroll contexts.
+        mode: A string type search mode - pit, scroll or None to use pit when the cluster supports it.
+    """
+    def __init__(self, connection:OpenSearchConnection, index:str, output_dir:str, slices:int=SLICES, output_format:str=JSONL_FORMAT,
+            shard_documents:int=SHARD_DOCUMENTS, page_size:int=PAGE_SIZE, keep_alive:str=KEEP_ALIVE, mode:str=None):
+        """__init__"""
+        self.connection = connection
+        self.index = index
+        self.output_dir = output_dir
+        self.slices = slices
+        self.output_format = output_format
+        self.shard_documents = shard_documents
+        self.page_size = page_size
+        self.keep_alive = keep_alive
+        self.mode = mode
+
+    def _marker_path(self, slice_id:int) -> str:
+        """Returns the path of a slice marker."""
+        return os.path.join(self.output_dir, SLICES_DIRECTORY, "slice-" + str(slice_id).zfill(4) + ".json")
+
+    def _shard_prefix(self, slice_id:int) -> str:
+        """Returns the shard file name prefix of a slice."""
+        return self.index + "-" + str(slice_id).zfill(4)
+
+    def completed_slice(self, slice_id:int) -> Optional[Dict[str, Any]]:
+        """Returns the marker of a completed slice or None if the slice has to be exported."""
+        try:
+            with open(self._marker_path(slice_id), "rb") as fp:
+                marker = loads(fp.read())
+        except FileNotFoundError:
+            return None
+        if marker["slices"] != self.slices or marker["format"] != self.output_format:
+            raise ValueError("the export in " + self.output_dir + " was started with " + str(marker["slices"]) + " " + marker["format"] + " slices")
+        return marker
+
+    def _clear_slice(self, slice_id:int) -> None:
+        """Removes the shards of an incomplete slice."""
+        prefix = self._shard_prefix(slice_id) + "-"
+        for name in os.listdir(self.output_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.output_dir, name))
+
+    def open_pit(self) -> Optional[str]:
+        """Opens a point in time of the index.
+
+        Args:
+
+        Returns:
+        The point in time id or None if the cluster does not support point in time search
+
+        Raises:
+        OpenSearchError: If the index does not exist
+        """
+        status, resp = self.connection.request("POST", "/" + self.index + "/_search/point_in_time", params={"keep_alive": self.keep_alive})
+        if status == 404 and (resp or dict()).get("error", dict()).get("type", None) == "index_not_found_exception":
+            raise OpenSearchError(status, resp)
+        if status >= 400:
+            logger.info("index: {index}, status: {status}, point in time search is not supported, falling back to sliced scroll".format(index=self.index, status=status))
+            return None
+        return resp["pit_id"]
+
+    def iter_pit_hits(self, pit_id:str, slice_id:int) -> Iterator[Dict[str, Any]]:
+        """Streams the hits of a slice of a point in time with search_after paging."""
+        body = {"pit": {"id": pit_id, "keep_alive": self.keep_alive}, "size": self.page_size, "sort": ["_doc"], "track_total_hits": False}
+        if self.slices > 1:
+            body["slice"] = {"id": slice_id, "max": self.slices}
+        while True:
+            hits = self.connection.perform("POST", "/_search", body=body)["hits"]["hits"]
+            if not hits:
+                return
+            yield from hits
+            body["search_after"] = hits[-1]["sort"]
+
+    def iter_scroll_hits(self, slice_id:int) -> Iterator[Dict[str, Any]]:
+        """Streams the hits of a slice of a sliced scroll and clears the scroll."""
+        body = {"size": self.page_size, "sort": ["_doc"]}
+        if self.slices > 1:
+            body["slice"] = {"id": slice_id, "max": self.slices}
+        resp = self.connection.perform("POST", "/" + self.index + "/_search", body=body, params={"scroll": self.keep_alive})
+        scroll_id = resp["_scroll_id"]
+        try:
+            while resp["hits"]["hits"]:
+                yield from resp["hits"]["hits"]
+                resp = self.connection.perform("POST", "/_search/scroll", body={"scroll": self.keep_alive, "scroll_id": scroll_id})
+                scroll_id = resp.get("_scroll_id", scroll_id)
+        finally:
+            self.connection.request("DELETE", "/_search/scroll", body={"scroll_id": [scroll_id]})
+
+    def export_slice(self, slice_id:int, pit_id:Optional[str]) -> Dict[str, Any]:
+        """Exports one slice into shards and writes its marker.
+
+        Args:
+        slice_id: Slice number
+        pit_id: Point in time id or None to use a sliced scroll
+
+        Returns:
+        Slice marker with the slice number, document count, duration and shards
+
+        Raises:
+        """
+        start_time = time.perf_counter()
+        self._clear_slice(slice_id)
+        writer = ShardWriter(self.output_dir, self._shard_prefix(slice_id), self.output_format, self.shard_documents)
+        hits = self.iter_pit_hits(pit_id, slice_id) if pit_id else self.iter_scroll_hits(slice_id)
+        for hit in hits:
+            writer.write(hit["_source"])
+        shards = writer.close()
+        marker = {
+            "slice": slice_id,
+            "slices": self.slices,
+            "format": self.output_format,
+            "documents": sum(shard["documents"] for shard in shards),
+            "duration_ms": (time.perf_counter() - start_time) * 1000,
+            "shards": shards}
+        with open(self._marker_path(slice_id) + TEMPORARY_SUFFIX, "wb") as fp:
+            fp.write(dumps_bytes(marker))
+        os.replace(self._marker_path(slice_id) + TEMPORARY_SUFFIX, self._marker_path(slice_id))
+        logger.info("index: {index}, slice: {slice}, documents: {documents}, shards: {shards}, duration_ms: {duration_ms:.1f}".format(index=self.index, slice=slice_id, documents=marker["documents"], shards=len(shards), duration_ms=marker["duration_ms"]))
+        return marker
+
+    def export(self) -> Dict[str, Any]:
+        """Exports the slices that are not complete in parallel and writes the manifest.
+
+        Args:
+
+        Returns:
+        Manifest with the index, search mode, number of slices, format, total document count and the shards of every slice
+
+        Raises:
+        RuntimeError: If a slice failed (the completed slices are kept and skipped by the next run)
+        """
+        start_time = time.perf_counter()
+        os.makedirs(os.path.join(self.output_dir, SLICES_DIRECTORY), exist_ok=True)
+        markers = {slice_id: self.completed_slice(slice_id) for slice_id in range(self.slices)}
+        pending = [slice_id for slice_id, marker in markers.items() if marker is None]
+        mode = self.mode
+        pit_id = None
+        if pending and mode != SCROLL_MODE:
+            pit_id = self.open_pit()
+            if pit_id is None and mode == PIT_MODE:
+                raise OpenSearchError(400, "point in time search is not supported by the cluster")
+        mode = PIT_MODE if pit_id else SCROLL_MODE
+        errors = list()
+
+        def export_slice(slice_id:int) -> None:
+            try:
+                markers[slice_id] = self.export_slice(slice_id, pit_id)
+            except Exception:
+                ex_type, ex_value, ex_traceback = sys.exc_info()
+                errors.append(slice_id)
+                logger.error("index: {index}, slice: {slice}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(index=self.index, slice=slice_id, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+                list(executor.map(export_slice, pending))
+        finally:
+            if pit_id:
+                self.connection.request("DELETE", "/_search/point_in_time", body={"pit_id": [pit_id]})
+        if errors:
+            raise RuntimeError("slices " + str(sorted(errors)) + " of " + self.index + " failed, rerun the export to resume them")
+        manifest = {
+            "index": self.index,
+            "mode": mode,
+            "slices": self.slices,
+            "format": self.output_format,
+            "documents": sum(marker["documents"] for marker in markers.values()),
+            "resumed_slices": self.slices - len(pending),
+            "duration_ms": (time.perf_counter() - start_time) * 1000,
+            "exported_at": datetime.utcnow().isoformat(),
+            "shards": [dict(shard, slice=slice_id) for slice_id in range(self.slices) for shard in markers[slice_id]["shards"]]}
+        with open(os.path.join(self.output_dir, MANIFEST_FILE), "wb") as fp:
+            fp.write(dumps_bytes(manifest))
+        logger.info("index: {index}, mode: {mode}, slices: {slices}, documents: {documents}, shards: {shards}, duration_ms: {duration_ms:.1f}".format(
+            index=self.index, mode=mode, slices=self.slices, documents=manifest["documents"], shards=len(manifest["shards"]), duration_ms=manifest["duration_ms"]))
+        return manifest
+
+def main(argv:Optional[List[str]]=None) -> Dict[str, Any]:
+    """Command line entry point. The connection is configured with the OPENSEARCH_* environment variables."""
+    arg_parser = argparse.ArgumentParser(description="Exports an OpenSearch index in parallel slices into sharded, compressed files.")
+    arg_parser.add_argument("--index", required=True, help="index or alias name, e.g. ner_label_train")
+    arg_parser.add_argument("--output-dir", required=True, help="directory of the shards and the manifest")
+    arg_parser.add_argument("--slices", type=int, default=SLICES, help="number of slices exported in parallel")
+    arg_parser.add_argument("--format", default=JSONL_FORMAT, choices=[JSONL_FORMAT, PARQUET_FORMAT])
+    arg_parser.add_argument("--shard-documents", type=int, default=SHARD_DOCUMENTS, help="maximum number of documents per shard")
+    arg_parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="number of hits per search request")
+    arg_parser.add_argument("--mode", default=None, choices=[PIT_MODE, SCROLL_MODE], help="search mode, defaults to pit when the cluster supports it")
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    exporter = SlicedExporter(OpenSearchConnection.from_env(maxsize=args.slices), args.index, args.output_dir, slices=args.slices, output_format=args.format,
+        shard_documents=args.shard_documents, page_size=args.page_size, mode=args.mode)
+    manifest = exporter.export()
+    print(dumps({key: value for key, value in manifest.items() if key != "shards"}))
+    return manifest
+
+if __name__ == "__main__":
+    main()
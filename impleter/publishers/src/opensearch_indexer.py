@@ -0,0 +1,401 @@
+""" OpenSearch indexer - File containing functionality that writes parser and converter output straight to OpenSearch with the _bulk API.
+
+The Firehose delivery streams buffer records for up to 60 seconds before they reach OpenSearch. The bulk indexer is a sink for local backfills and low latency loads: documents are serialised into _bulk action lines once, buffered until a count or size limit is reached and sent by parallel workers over one pooled urllib3 connection. Documents are indexed under their deterministic chunk_id (set by the parsers and converters) as the _id, so loading the same parser output again overwrites the documents instead of duplicating them. The _bulk response is inspected per item. Items rejected with 429 (or a whole request that fails with 429/502/503/504) are sent again with a jittered exponential backoff, every other item error is counted and kept for the caller.
+
+    Typical usage example:
+        from opensearch_indexer import OpenSearchConnection, BulkIndexer
+        connection = OpenSearchConnection("https://localhost:9200", username="admin", password="admin", verify_certs=False)
+        with BulkIndexer(connection, "crude") as indexer:
+            indexer.add({"id": "57639482-160721-1931", "index": 0, "content": "Hello World"})
+        print(indexer.last_metrics)
+"""
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlencode
+import urllib3
+from json_codec import loads, dumps_bytes
+from firehose_batcher import percentile
+
+logger = logging.getLogger()
+
+MAX_BULK_ACTIONS = 1000
+MAX_BULK_BYTES = 5 * 1024 * 1024
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 0.1
+MAX_DELAY_SECONDS = 5.0
+MAX_ERRORS = 100
+POOL_MAXSIZE = 10
+TIMEOUT_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = [429, 502, 503, 504]
+JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+CHUNK_ID_KEY = "chunk_id"
+
+Document = Union[Dict[str, Any], str, bytes]
+
+class OpenSearchError(Exception):
+    """Raised when an OpenSearch request fails.
+
+    Attributes:
+        status: An integer type HTTP status code.
+        body: The decoded response body.
+    """
+    def __init__(self, status:int, body:Any):
+        """__init__"""
+        super().__init__("status: {status}, body: {body}".format(status=status, body=body))
+        self.status = status
+        self.body = body
+
+class OpenSearchConnection(object):
+    """Pooled HTTP connection to an OpenSearch cluster.
+
+    Attributes:
+        url: A string type cluster URL (e.g. https://localhost:9200).
+        http: A urllib3 PoolManager (or a stand-in with the same request method) shared by all threads.
+    """
+    def __init__(self, url:str, username:str=None, password:str=None, verify_certs:bool=True, ca_certs:str=None, maxsize:int=POOL_MAXSIZE,
+            timeout:float=TIMEOUT_SECONDS, http=None):
+        """__init__"""
+        self.url = url.rstrip("/")
+        self.headers = urllib3.make_headers(basic_auth=username + ":" + password) if username else dict()
+        if http is None:
+            if not verify_certs:
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            http = urllib3.PoolManager(
+                maxsize=maxsize,
+                block=True,
+                cert_reqs="CERT_REQUIRED" if verify_certs else "CERT_NONE",
+                ca_certs=ca_certs,
+                timeout=urllib3.Timeout(total=timeout),
+                retries=False)
+        self.http = http
+
+    @classmethod
+    def from_env(cls, maxsize:int=POOL_MAXSIZE) -> "OpenSearchConnection":
+        """Creates the connection configured with the OPENSEARCH_URL, OPENSEARCH_USERNAME, OPENSEARCH_PASSWORD, OPENSEARCH_VERIFY_CERTS and OPENSEARCH_CA_CERTS environment variables."""
+        return cls(os.getenv("OPENSEARCH_URL", "https://localhost:9200"),
+            username=os.getenv("OPENSEARCH_USERNAME", None),
+            password=os.getenv("OPENSEARCH_PASSWORD", None),
+            verify_certs=os.getenv("OPENSEARCH_VERIFY_CERTS", "true").lower() == "true",
+            ca_certs=os.getenv("OPENSEARCH_CA_CERTS", None),
+            maxsize=maxsize)
+
+    def request(self, method:str, path:str, body:Union[Dict, bytes]=None, params:Dict[str, Any]=None, content_type:str=JSON_CONTENT_TYPE) -> Tuple[int, Any]:
+        """Sends a request without raising on error status codes.
+
+        Args:
+        method: HTTP method
+        path: Request path (e.g. /crude/_bulk)
+        body: Request body, a dict is serialised to JSON
+        params: Query string parameters
+        content_type: Content type of the body
+
+        Returns:
+        Tuple of the HTTP status code and the decoded JSON response body (None for an empty body)
+
+        Raises:
+        urllib3.exceptions.HTTPError: If the cluster can not be reached
+        """
+        url = self.url + path
+        if params:
+            url += "?" + urlencode(params)
+        headers = dict(self.headers)
+        if body is not None:
+            headers["Content-Type"] = content_type
+            if isinstance(body, dict):
+                body = dumps_bytes(body)
+        resp = self.http.request(method, url, body=body, headers=headers)
+        data = resp.data
+        return resp.status, loads(data) if data else None
+
+    def perform(self, method:str, path:str, body:Union[Dict, bytes]=None, params:Dict[str, Any]=None, ignore:List[int]=None) -> Any:
+        """Sends a request and raises OpenSearchError on an error status code.
+
+        Args:
+        method: HTTP method
+        path: Request path
+        body: Request body, a dict is serialised to JSON
+        params: Query string parameters
+        ignore: Error status codes that are returned instead of raised
+
+        Returns:
+        The decoded JSON response body
+
+        Raises:
+        OpenSearchError: If the status code is 400 or larger and not ignored
+        """
+        status, data = self.request(method, path, body=body, params=params)
+        if status >= 400 and status not in (ignore or list()):
+            raise OpenSearchError(status, data)
+        return data
+
+def bulk_action(document:Document, index:str, doc_id:Optional[str]=None, op_type:str="index") -> bytes:
+    """Function that serialises a document into the two _bulk lines of an index or create action.
+
+    Args:
+        document: Document dict or its JSON serialisation (str or bytes, e.g. a JSON line of a parser output)
+        index: Target index name
+        doc_id: Document id or None to let OpenSearch generate one
+        op_type: index or create
+
+    Returns:
+        bytes with the action and source lines, each terminated by a newline
+
+    Raises:
+    """
+    action = {"_index": index}
+    if doc_id is not None:
+        action["_id"] = doc_id
+    if isinstance(document, dict):
+        source = dumps_bytes(document)
+    elif isinstance(document, str):
+        source = document.encode('utf-8')
+    else:
+        source = document
+    return dumps_bytes({op_type: action}) + b"\n" + source.rstrip(b"\n") + b"\n"
+
+def document_id(document:Document, id_key:str) -> Optional[str]:
+    """Function that returns the value of id_key of a document. JSON serialisations are only decoded if they contain the key name.
+
+    Args:
+        document: Document dict or its JSON serialisation (str or bytes)
+        id_key: Document key whose value is the document id
+
+    Returns:
+        The document id or None if the document has no id_key (or is not valid JSON)
+
+    Raises:
+    """
+    if isinstance(document, dict):
+        return document.get(id_key, None)
+    if isinstance(document, str):
+        document = document.encode('utf-8')
+    if b'"' + id_key.encode('utf-8') + b'"' not in document:
+        return None
+    try:
+        decoded = loads(document)
+    except ValueError:
+        return None
+    return decoded.get(id_key, None) if isinstance(decoded, dict) else None
+
+class BulkIndexer(object):
+    """Buffered, parallel OpenSearch _bulk sink with per item error handling.
+
+    Attributes:
+        connection: An OpenSearchConnection type connection shared by the workers.
+        index: A string type default target index name.
+        max_actions: An integer type number of buffered actions that triggers a flush.
+        max_bytes: An integer type number of buffered bytes that triggers a flush.
+        max_workers: An integer type number of _bulk requests sent concurrently.
+        max_attempts: An integer type maximum number of attempts per action.
+        id_key: An optional string type document key whose value is used as the document id. Defaults to the deterministic chunk_id of the parsers and converters, documents without it get an id generated by OpenSearch.
+        refresh: An optional string type refresh parameter of the _bulk requests (e.g. wait_for).
+        errors: A list type with up to MAX_ERRORS failed items of the current run.
+        last_errors: A list type with up to MAX_ERRORS failed items of the last run.
+        last_metrics: A dictionary type with the counters and request latency percentiles of the last run.
+    """
+    def __init__(self, connection:OpenSearchConnection, index:str, max_actions:int=MAX_BULK_ACTIONS, max_bytes:int=MAX_BULK_BYTES, max_workers:int=MAX_WORKERS,
+            max_attempts:int=MAX_ATTEMPTS, base_delay:float=BASE_DELAY_SECONDS, max_delay:float=MAX_DELAY_SECONDS, id_key:str=CHUNK_ID_KEY, refresh:str=None,
+            rng:random.Random=None, sleep:Callable[[float], None]=time.sleep):
+        """__init__"""
+        self.connection = connection
+        self.index = index
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.id_key = id_key
+        self.refresh = refresh
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.last_errors = list()
+        self.last_metrics = dict()
+        self._buffer = list()
+        self._buffer_bytes = 0
+        self._in_flight = deque()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._buffer_lock = threading.RLock()
+        self._reset()
+
+    @classmethod
+    def from_env(cls, connection:OpenSearchConnection, index:str, **kwargs) -> "BulkIndexer":
+        """Creates the indexer configured with the INDEX_MAX_ACTIONS, INDEX_MAX_BYTES, INDEX_MAX_WORKERS, INDEX_MAX_ATTEMPTS and INDEX_ID_KEY (empty to let OpenSearch generate the ids) environment variables."""
+        return cls(connection, index,
+            max_actions=int(os.getenv("INDEX_MAX_ACTIONS", MAX_BULK_ACTIONS)),
+            max_bytes=int(os.getenv("INDEX_MAX_BYTES", MAX_BULK_BYTES)),
+            max_workers=int(os.getenv("INDEX_MAX_WORKERS", MAX_WORKERS)),
+            max_attempts=int(os.getenv("INDEX_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+            id_key=os.getenv("INDEX_ID_KEY", CHUNK_ID_KEY) or None,
+            **kwargs)
+
+    def _reset(self) -> None:
+        """Resets the counters of a run."""
+        self.errors = list()
+        self._metrics = {"actions": 0, "indexed": 0, "failed": 0, "requests": 0, "retries": 0}
+        self._latencies = list()
+        self._start_time = time.perf_counter()
+
+    def __enter__(self) -> "BulkIndexer":
+        """__enter__"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        """__exit__"""
+        self.close()
+
+    def _backoff(self, attempt:int) -> float:
+        """Returns the full jitter backoff delay before the given (1-based) retry attempt."""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def add(self, document:Document, doc_id:Optional[str]=None, index:str=None) -> None:
+        """Buffers a document and flushes the buffer when the count or size limit is reached.
+
+        Args:
+        document: Document dict or its JSON serialisation (str or bytes)
+        doc_id: Document id. Defaults to the value of id_key of the document, or an id generated by OpenSearch
+        index: Target index name. Defaults to the indexer index
+
+        Returns:
+
+        Raises:
+        """
+        if doc_id is None and self.id_key is not None:
+            doc_id = document_id(document, self.id_key)
+        action = bulk_action(document, index or self.index, doc_id)
+        with self._buffer_lock:
+            if self._buffer and (len(self._buffer) >= self.max_actions or self._buffer_bytes + len(action) > self.max_bytes):
+                self.flush()
+            self._buffer.append(action)
+            self._buffer_bytes += len(action)
+
+    def add_many(self, documents:Iterable[Document]) -> None:
+        """Buffers many documents (see add)."""
+        for document in documents:
+            self.add(document)
+
+    def flush(self) -> None:
+        """Submits the buffered actions as one _bulk request. At most two requests per worker are in flight, so add blocks on a slow cluster. add and flush may be called from several threads."""
+        with self._buffer_lock:
+            if not self._buffer:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            while len(self._in_flight) >= 2 * self.max_workers:
+                self._in_flight.popleft().result()
+            self._in_flight.append(self._executor.submit(self.send_bulk, self._buffer))
+            self._buffer = list()
+            self._buffer_bytes = 0
+
+    def close(self) -> Dict[str, Any]:
+        """Flushes the buffer, waits for the requests in flight and returns the metrics of the run.
+
+        Args:
+
+        Returns:
+        dict with the number of actions, indexed and failed actions, requests and retries, the duration and the request latency percentiles
+
+        Raises:
+        """
+        self.flush()
+        while self._in_flight:
+            self._in_flight.popleft().result()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        metrics = dict(self._metrics)
+        metrics["duration_ms"] = (time.perf_counter() - self._start_time) * 1000
+        metrics["latency_ms_p50"] = percentile(self._latencies, 50)
+        metrics["latency_ms_p99"] = percentile(self._latencies, 99)
+        metrics["actions_per_second"] = metrics["actions"] / (metrics["duration_ms"] / 1000) if metrics["duration_ms"] else 0.0
+        self.last_metrics = metrics
+        self.last_errors = self.errors
+        logger.info("index: {index}, actions: {actions}, indexed: {indexed}, failed: {failed}, requests: {requests}, retries: {retries}, duration_ms: {duration_ms:.1f}".format(index=self.index, **metrics))
+        self._reset()
+        return metrics
+
+    def _account(self, indexed:int, failed:List[Dict], requests:int, retries:int, latency_ms:float) -> None:
+        """Adds the result of one _bulk request to the run counters."""
+        with self._lock:
+            self._metrics["actions"] += indexed + len(failed)
+            self._metrics["indexed"] += indexed
+            self._metrics["failed"] += len(failed)
+            self._metrics["requests"] += requests
+            self._metrics["retries"] += retries
+            self._latencies.append(latency_ms)
+            self.errors.extend(failed[:max(MAX_ERRORS - len(self.errors), 0)])
+
+    def send_bulk(self, actions:List[bytes]) -> Dict[str, Any]:
+        """Sends one _bulk request, retrying the rejected items until they succeed or max_attempts is reached.
+
+        Args:
+        actions: List of serialised actions (see bulk_action)
+
+        Returns:
+        dict with the number of indexed actions, the failed items and the number of attempts
+
+        Raises:
+        """
+        start_time = time.perf_counter()
+        params = {"refresh": self.refresh} if self.refresh else None
+        pending = list(range(len(actions)))
+        failed = list()
+        indexed = 0
+        attempts = 0
+        while pending and attempts < self.max_attempts:
+            if attempts > 0:
+                self.sleep(self._backoff(attempts))
+            attempts += 1
+            last_attempt = attempts >= self.max_attempts
+            try:
+                status, resp = self.connection.request("POST", "/_bulk", body=b"".join(actions[position] for position in pending), params=params, content_type=NDJSON_CONTENT_TYPE)
+            except Exception:
+                ex_type, ex_value, ex_traceback = sys.exc_info()
+                logger.error("index: {index}, actions: {actions}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(index=self.index, actions=len(pending), ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+                status, resp = 503, {"error": {"type": ex_type.__name__, "reason": str(ex_value)}}
+            if status >= 400:
+                if status in RETRYABLE_STATUS_CODES and not last_attempt:
+                    continue
+                failed.extend({"status": status, "error": (resp or dict()).get("error", None)} for _ in pending)
+                pending = list()
+                break
+            retry = list()
+            for position, item in zip(pending, resp["items"]):
+                result = next(iter(item.values()))
+                if result.get("status", 500) < 300:
+                    indexed += 1
+                elif result["status"] in RETRYABLE_STATUS_CODES and not last_attempt:
+                    retry.append(position)
+                else:
+                    failed.append({"status": result["status"], "_index": result.get("_index", None), "_id": result.get("_id", None), "error": result.get("error", None)})
+            pending = retry
+        self._account(indexed, failed, attempts, max(attempts - 1, 0), (time.perf_counter() - start_time) * 1000)
+        return {"indexed": indexed, "failed": failed, "attempts": attempts}
+
+def index_documents(connection:OpenSearchConnection, index:str, documents:Iterable[Document], **kwargs) -> Dict[str, Any]:
+    """Function that indexes documents with a BulkIndexer.
+
+    Args:
+        connection: OpenSearch connection
+        index: Target index name
+        documents: Iterable of document dicts or JSON serialisations
+        kwargs: BulkIndexer arguments
+
+    Returns:
+        dict with the metrics of the run
+
+    Raises:
+    """
+    indexer = BulkIndexer(connection, index, **kwargs)
+    indexer.add_many(documents)
+    return indexer.close()
@@ -0,0 +1,230 @@
+""" Publish manifest - File containing functionality that records which S3 objects were published, so that duplicate notifications and re-driven prefixes do not publish them again.
+
+A manifest entry is keyed by the bucket, key and ETag of the published object (a changed object has a new ETag and is published again) and records the number of records, sent, failed and dead-lettered records and the publishing time. Entries are stored as small JSON objects in S3 or in a local directory stand-in.
+
+    Typical usage example:
+        from publish_manifest import PublishManifest, S3ManifestStore
+        manifest = PublishManifest(S3ManifestStore(bucket="word-stash-manifest", prefix="crude/"))
+        if not manifest.is_published("word-stash-crude", "example.jsonl", "9b2cf535f27731c974343645a3985328"):
+            manifest.record("word-stash-crude", "example.jsonl", "9b2cf535f27731c974343645a3985328", records=10, sent=10, failed=0, duration_ms=120.5)
+"""
+import abc
+import os
+import hashlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+from json_codec import loads, dumps_bytes
+
+MAX_LOOKUP_WORKERS = 16
+
+ObjectVersion = Tuple[str, str, str]
+
+def normalize_etag(etag:Optional[str]) -> Optional[str]:
+    """Removes the quotes S3 puts around ETags in object metadata (notifications send them without quotes)."""
+    return etag.strip('"') if etag else etag
+
+class AbstractManifestStore(object):
+    """AbstractManifestStore"""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def get(self, entry_key:str) -> Optional[Dict]:
+        """get"""
+        return
+
+    @abc.abstractmethod
+    def put(self, entry_key:str, entry:Dict) -> None:
+        """put"""
+        return
+
+class S3ManifestStore(AbstractManifestStore):
+    """S3 manifest store.
+
+    Attributes:
+        bucket: A string type S3 bucket name.
+        prefix: A string type S3 key prefix of the manifest entries.
+    """
+    def __init__(self, bucket:str, prefix:str="", s3_client=None):
+        """__init__"""
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        """boto3 S3 client, created on first use."""
+        if self._s3_client is None:
+            import boto3
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    def get(self, entry_key:str) -> Optional[Dict]:
+        """Reads a manifest entry.
+
+        Args:
+        entry_key: Manifest entry key
+
+        Returns:
+        Manifest entry or None if the object was not published
+
+        Raises:
+        """
+        try:
+            return loads(self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + entry_key)['Body'].read())
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def put(self, entry_key:str, entry:Dict) -> None:
+        """Writes a manifest entry.
+
+        Args:
+        entry_key: Manifest entry key
+        entry: Manifest entry
+
+        Returns:
+
+        Raises:
+        """
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + entry_key, Body=dumps_bytes(entry))
+
+class LocalManifestStore(AbstractManifestStore):
+    """Local directory manifest store.
+
+    Attributes:
+        directory: A string type directory the manifest entries are written to.
+    """
+    def __init__(self, directory:str):
+        """__init__"""
+        self.directory = directory
+
+    def get(self, entry_key:str) -> Optional[Dict]:
+        """Reads a manifest entry.
+
+        Args:
+        entry_key: Manifest entry key
+
+        Returns:
+        Manifest entry or None if the object was not published
+
+        Raises:
+        """
+        try:
+            with open(os.path.join(self.directory, entry_key), "rb") as fp:
+                return loads(fp.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, entry_key:str, entry:Dict) -> None:
+        """Writes a manifest entry.
+
+        Args:
+        entry_key: Manifest entry key
+        entry: Manifest entry
+
+        Returns:
+
+        Raises:
+        """
+        path = os.path.join(self.directory, entry_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(dumps_bytes(entry))
+
+class PublishManifest(object):
+    """Manifest of published S3 objects.
+
+    Attributes:
+        store: An AbstractManifestStore type store of the manifest entries.
+        max_lookup_workers: An integer type number of concurrent lookups of a bulk check.
+    """
+    def __init__(self, store:AbstractManifestStore, max_lookup_workers:int=MAX_LOOKUP_WORKERS):
+        """__init__"""
+        self.store = store
+        self.max_lookup_workers = max_lookup_workers
+
+    @staticmethod
+    def entry_key(bucket:str, key:str, etag:str) -> str:
+        """Creates the manifest entry key of an object version.
+
+        Args:
+        bucket: S3 bucket name
+        key: S3 key
+        etag: S3 ETag
+
+        Returns:
+        Entry key ({sha256[:2]}/{sha256}.json of bucket, key and ETag)
+
+        Raises:
+        """
+        digest = hashlib.sha256("\0".join([bucket, key, normalize_etag(etag)]).encode('utf-8')).hexdigest()
+        return digest[:2] + "/" + digest + ".json"
+
+    def get(self, bucket:str, key:str, etag:str) -> Optional[Dict]:
+        """Returns the manifest entry of an object version or None if it was not published."""
+        return self.store.get(self.entry_key(bucket, key, etag))
+
+    def is_published(self, bucket:str, key:str, etag:str) -> bool:
+        """Returns True if the object version was published."""
+        return self.get(bucket, key, etag) is not None
+
+    def published(self, objects:Iterable[ObjectVersion]) -> Set[ObjectVersion]:
+        """Checks many object versions concurrently.
+
+        Args:
+        objects: Iterable of (bucket, key, etag) tuples
+
+        Returns:
+        Set of the (bucket, key, etag) tuples that were published
+
+        Raises:
+        """
+        objects = list(objects)
+        with ThreadPoolExecutor(max_workers=self.max_lookup_workers) as executor:
+            entries = list(executor.map(lambda obj: self.get(*obj), objects))
+        return set(obj for obj, entry in zip(objects, entries) if entry is not None)
+
+    def record(self, bucket:str, key:str, etag:str, records:int, sent:int, failed:int, duration_ms:float, dead_lettered:int=0) -> Dict:
+        """Records a published object version.
+
+        Args:
+        bucket: S3 bucket name
+        key: S3 key
+        etag: S3 ETag
+        records: Number of records of the object
+        sent: Number of records sent to Kinesis Firehose
+        failed: Number of records that failed
+        duration_ms: Publishing time in milliseconds
+        dead_lettered: Number of records that were rejected permanently and not sent
+
+        Returns:
+        The manifest entry
+
+        Raises:
+        """
+        entry = {
+            "bucket": bucket,
+            "key": key,
+            "etag": normalize_etag(etag),
+            "records": records,
+            "sent": sent,
+            "failed": failed,
+            "dead_lettered": dead_lettered,
+            "duration_ms": duration_ms,
+            "published_at": datetime.utcnow().isoformat()}
+        self.store.put(self.entry_key(bucket, key, etag), entry)
+        return entry
+
+def publish_manifest_from_env() -> Optional[PublishManifest]:
+    """Creates the publish manifest configured with the PUBLISH_MANIFEST_* environment variables.
+
+    Returns:
+        The configured manifest or None if neither PUBLISH_MANIFEST_S3_BUCKET nor PUBLISH_MANIFEST_DIR is set
+
+    Raises:
+    """
+    if os.getenv("PUBLISH_MANIFEST_S3_BUCKET", None):
+        return PublishManifest(S3ManifestStore(bucket=os.getenv("PUBLISH_MANIFEST_S3_BUCKET"), prefix=os.getenv("PUBLISH_MANIFEST_S3_PREFIX", "")))
+    if os.getenv("PUBLISH_MANIFEST_DIR", None):
+        return PublishManifest(LocalManifestStore(directory=os.getenv("PUBLISH_MANIFEST_DIR")))
+    return None
@@ -1,13 +1,116 @@
 """ Publisher functions
 """
+import sys
+import logging
 from uuid import uuid4
 from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Union
+from validator_registry import ValidationPolicy, validate
+from json_codec import loads, dumps_bytes
+from firehose_batcher import is_dead_letter
+
+logger = logging.getLogger()
 
 ML_FILE_DATETIME = "%Y%m%d_%H%M%S"
+DATA_KEY = "data"
+CONTENT_KEY = "content"
+HEADER_KEY = "header"
+_EXHAUSTED = object()
 
 def create_file_datetime() -> str:
     """function that generates a file date time
     Returns:
         str: String in a yyyymmdd_hhmmss format
     """
-    return str(uuid4()) + "-" + datetime.now().strftime(ML_FILE_DATETIME)
\ No newline at end of file
+    return str(uuid4()) + "-" + datetime.now().strftime(ML_FILE_DATETIME)
+
+def validated_records(json_list:Iterable[Union[str, bytes]], schema:Dict, validation_policy:ValidationPolicy, bucket:str=None, key:str=None) -> Iterator[Union[str, bytes]]:
+    """function that validates JSON lines lazily and yields the valid ones unchanged. Each validated line is parsed once with the configured JSON codec and the original line object is forwarded without copies. Lines that are not selected by the validation policy are not parsed. Invalid lines are logged and skipped.
+    Args:
+        json_list: Iterable of JSON lines (e.g. a streamed S3 object)
+        schema: json schema of the lines
+        validation_policy: policy that decides which lines are validated
+        bucket: S3 bucket name of the lines (for logging)
+        key: S3 key of the lines (for logging)
+    Returns:
+        Iterator of the valid JSON lines
+    """
+    for json_elem in json_list:
+        try:
+            validate_input, _ = validation_policy.select()
+            if validate_input:
+                validate(loads(json_elem), schema)
+            yield json_elem
+        except Exception:
+            ex_type, ex_value, ex_traceback = sys.exc_info()
+            logger.error("bucket: {bucket}, key: {key}, json_elem: {json_elem}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, json_elem=json_elem, ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+def iter_chunks(document:Dict[str, Any], data_key:str=DATA_KEY) -> Iterator[Dict[str, Any]]:
+    """function that iterates the chunks of a parser output document in order. Chunks whose content is a list (e.g. email attachments) are replaced by the chunks they contain. If the parser wrote the document header once ({"header": {...}, "data": [...]}), it is merged into every top-level chunk. A document without a chunk list (a per-chunk object written with WRITE_DATA_JSON_ARRAY_IN_CHUNKS_FLAG) is its own single chunk. Elements that are not objects (e.g. null) are logged and skipped.
+    Args:
+        document: parser output document ({"data": [chunk, ...]}) or a single chunk
+        data_key: key name of the document's chunk list
+    Returns:
+        Iterator of chunk dictionaries
+    """
+    header = document.get(HEADER_KEY, None)
+    if data_key in document:
+        chunks = document[data_key]
+    else:
+        chunks = [{name: value for name, value in document.items() if name != HEADER_KEY}]
+    stack = [iter(chunks)]
+    while stack:
+        chunk = next(stack[-1], _EXHAUSTED)
+        if chunk is _EXHAUSTED:
+            stack.pop()
+        elif not isinstance(chunk, dict):
+            logger.warning("Skipping chunk that is not an object: " + repr(chunk)[:100])
+        elif isinstance(chunk.get(CONTENT_KEY, None), list):
+            stack.append(iter(chunk[CONTENT_KEY]))
+        elif header and len(stack) == 1:
+            header_chunk = dict(header)
+            header_chunk.update(chunk)
+            yield header_chunk
+        else:
+            yield chunk
+
+def validated_chunks(chunks:Iterable[Dict[str, Any]], schema:Dict, validation_policy:ValidationPolicy, bucket:str=None, key:str=None) -> Iterator[bytes]:
+    """function that validates chunk dictionaries lazily and yields the valid ones encoded as JSON bytes. Invalid chunks are logged and skipped.
+    Args:
+        chunks: Iterable of chunk dictionaries
+        schema: json schema of the chunks
+        validation_policy: policy that decides which chunks are validated
+        bucket: S3 bucket name of the chunks (for logging)
+        key: S3 key of the chunks (for logging)
+    Returns:
+        Iterator of the valid chunks' JSON bytes
+    """
+    for chunk in chunks:
+        try:
+            validate_input, _ = validation_policy.select()
+            if validate_input:
+                validate(chunk, schema)
+            yield dumps_bytes(chunk)
+        except Exception:
+            ex_type, ex_value, ex_traceback = sys.exc_info()
+            logger.error("bucket: {bucket}, key: {key}, chunk_id: {chunk_id}, chunk_index: {chunk_index}, exception_type: {ex_type}, exception_value: {ex_value}, exception_traceback: {ex_traceback}".format(bucket=bucket, key=key, chunk_id=chunk.get("id", None), chunk_index=chunk.get("index", None), ex_type=ex_type, ex_value=ex_value, ex_traceback=ex_traceback))
+
+def record_published(manifest, bucket:str, key:str, etag:str, resp:List[Dict], duration_ms:float) -> bool:
+    """function that records an object in the publish manifest if all its records were sent or dead-lettered. Dead-lettered records (e.g. records over the Kinesis Firehose record limit) can not be delivered by a retry, so they do not keep the object out of the manifest.
+    Args:
+        manifest: PublishManifest of the published objects
+        bucket: S3 bucket name
+        key: S3 key
+        etag: S3 ETag of the object
+        resp: list of put_record and put_record_batch responses of the object
+        duration_ms: publishing time in milliseconds
+    Returns:
+        True if the object was recorded
+    """
+    entries = [entry for batch_resp in resp for entry in batch_resp.get("RequestResponses", [batch_resp])]
+    dead_lettered = sum(1 for entry in entries if is_dead_letter(entry))
+    failed = sum(1 for entry in entries if entry.get("ErrorCode", None)) - dead_lettered
+    if failed > 0:
+        return False
+    manifest.record(bucket, key, etag, records=len(entries), sent=len(entries) - dead_lettered, failed=failed, duration_ms=duration_ms, dead_lettered=dead_lettered)
+    return True
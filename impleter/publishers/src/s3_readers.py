@@ -0,0 +1,92 @@
+""" S3 readers - File containing functionality that streams S3 objects line by line.
+
+The object body is read in fixed size chunks and split into lines as it arrives, so the first records can be published after the first chunk and memory does not grow with the object size. Objects with a .gz (gzip) or .zst (zstd, requires the optional zstandard package) key extension are decompressed while they are streamed.
+
+    Typical usage example:
+        import boto3
+        from s3_readers import iter_lines, split_key_extension, decompressed_stream
+        key = "example.jsonl.gz"
+        file_extension, compression = split_key_extension(key)
+        body = boto3.resource('s3').Object("word-stash-crude", key).get()['Body']
+        for line in iter_lines(decompressed_stream(body, compression)):
+            print(line)
+"""
+import gzip
+from typing import BinaryIO, Iterator, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+GZIP_COMPRESSION = "gzip"
+ZSTD_COMPRESSION = "zstd"
+COMPRESSION_EXTENSIONS = {"gz": GZIP_COMPRESSION, "zst": ZSTD_COMPRESSION}
+
+def split_key_extension(key:str) -> Tuple[str, str]:
+    """Function that splits the file extension and the compression of an S3 key, e.g. "a.jsonl.gz" into ("jsonl", "gzip").
+
+    Args:
+        key: S3 key
+
+    Returns:
+        Tuple of the file extension and the compression (None if the key has no compression extension)
+
+    Raises:
+    """
+    parts = key.split(".")
+    compression = COMPRESSION_EXTENSIONS.get(parts[-1], None) if len(parts) > 2 else None
+    if compression is not None:
+        parts.pop()
+    return parts[-1], compression
+
+def decompressed_stream(stream:BinaryIO, compression:str=None) -> BinaryIO:
+    """Function that wraps a binary stream in a streaming decompressor.
+
+    Args:
+        stream: Binary file like object with a read(size) method (e.g. a botocore StreamingBody)
+        compression: Compression of the stream (gzip, zstd or None)
+
+    Returns:
+        Binary file like object of the decompressed bytes
+
+    Raises:
+        ValueError: If the compression is unknown or zstd is requested but zstandard is not installed
+    """
+    if compression is None:
+        return stream
+    if compression == GZIP_COMPRESSION:
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == ZSTD_COMPRESSION:
+        if zstandard is None:
+            raise ValueError("zstd compressed objects require the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise ValueError("unknown compression: " + str(compression) + ". Must be one of " + str(list(COMPRESSION_EXTENSIONS.values())))
+
+def iter_lines(stream:BinaryIO, chunk_size:int=CHUNK_SIZE) -> Iterator[bytes]:
+    """Function that reads a binary stream in chunks and yields its non empty lines.
+
+    Args:
+        stream: Binary file like object with a read(size) method (e.g. a botocore StreamingBody)
+        chunk_size: Number of bytes read per chunk
+
+    Returns:
+        Iterator of lines (bytes without the line ending)
+
+    Raises:
+    """
+    remainder = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if line:
+                yield line
+    remainder = remainder.rstrip(b"\r")
+    if remainder:
+        yield remainder
@@ -0,0 +1,76 @@
+import json
+import time
+import random
+import asyncio
+import threading
+import pytest
+from src.async_publisher import AdaptiveConcurrencyLimiter, AsyncPublisherEngine, percentile
+from src.firehose_batcher import FirehoseBatcher
+from src.local_services import LocalS3Client, LocalFirehoseClient
+from src.schema_validators import CRUDE_SCHEMA
+
+BUCKET = "word-stash-crude"
+STREAM_NAME = "word-stash-crude"
+
+def create_engine(s3_client, firehose_client, **kwargs) -> AsyncPublisherEngine:
+    batcher = FirehoseBatcher(firehose_client, STREAM_NAME, max_records=50, max_attempts=50, base_delay=0.001, max_delay=0.01, rng=random.Random(0))
+    return AsyncPublisherEngine(CRUDE_SCHEMA, STREAM_NAME, s3_client=s3_client, firehose_client=firehose_client, batcher=batcher, **kwargs)
+
+def test_percentile():
+    assert percentile([], 99) == 0.0
+    assert percentile(list(range(1, 101)), 50) == 50
+    assert percentile(list(range(1, 101)), 99) == 99
+
+def test_limiter_halves_on_throttling_and_grows_additively():
+    async def run(limiter):
+        await limiter.acquire()
+        await limiter.release(throttled=True)
+        assert limiter.limit == 4
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(throttled=False)
+        assert limiter.limit == 5
+        await limiter.acquire()
+        await limiter.observe(throttled=True)
+        assert limiter.limit == 2 and limiter.in_use == 1
+        await limiter.release()
+        assert limiter.limit == 2 and limiter.in_use == 0
+    limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=16)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(run(limiter))
+    loop.close()
+
+def test_engine_publishes_all_objects_and_adapts_to_throttling():
+    s3_client = LocalS3Client()
+    firehose_client = LocalFirehoseClient(latency=0.002, max_concurrent_calls=2)
+    lines = list()
+    for i in range(5):
+        object_lines = [json.dumps({"id": str(i), "index": j, "content": "chunk"}) for j in range(300)]
+        s3_client.put_object(Bucket=BUCKET, Key=str(i) + ".jsonl", Body="\n".join(object_lines))
+        lines.extend(object_lines)
+    engine = create_engine(s3_client, firehose_client, initial_concurrency=8, max_concurrency=8)
+    reports = engine.publish([(BUCKET, str(i) + ".jsonl") for i in range(5)] + [(BUCKET, "missing.jsonl")])
+    assert [report["sent"] for report in reports] == [300] * 5 + [0]
+    assert [report["success"] for report in reports] == [True] * 5 + [False]
+    assert sorted(firehose_client.delivered[STREAM_NAME]) == sorted(line.encode("utf-8") for line in lines)
+    assert engine.last_metrics["throttle_events"] > 0
+    assert engine.last_metrics["concurrency_limit"] < 8
+    assert engine.last_metrics["latency_ms_p99"] >= engine.last_metrics["latency_ms_p50"] > 0
+
+def test_readers_stop_when_a_sender_fails(monkeypatch):
+    from src import async_publisher
+    async def observe(limiter, throttled):
+        raise RuntimeError("sender failed")
+    monkeypatch.setattr(async_publisher, "READER_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(AdaptiveConcurrencyLimiter, "observe", observe)
+    s3_client = LocalS3Client()
+    for i in range(4):
+        s3_client.put_object(Bucket=BUCKET, Key=str(i) + ".jsonl", Body="\n".join(json.dumps({"id": str(i), "index": j, "content": "chunk"}) for j in range(2000)))
+    engine = create_engine(s3_client, LocalFirehoseClient(), queue_size=1, initial_concurrency=1, max_concurrency=1)
+    active_threads = threading.active_count()
+    with pytest.raises(RuntimeError):
+        engine.publish([(BUCKET, str(i) + ".jsonl") for i in range(4)])
+    deadline = time.time() + 5
+    while threading.active_count() > active_threads and time.time() < deadline:
+        time.sleep(0.01)
+    assert threading.active_count() == active_threads
@@ -0,0 +1,71 @@
+import json
+import random
+from src import batch_publisher
+from src.batch_publisher import CHUNKS_PUBLISH_MODE, BatchPublisher, RecordBuffer, parse_object_notifications, batch_item_failures
+from src.firehose_batcher import FirehoseBatcher
+from src.local_services import LocalFirehoseClient
+from src.schema_validators import CRUDE_SCHEMA
+
+BUCKET = "word-stash-crude"
+STREAM_NAME = "word-stash-crude"
+
+def create_lines(name:str, count:int) -> list:
+    return [json.dumps({"id": name, "index": i, "content": "chunk " + str(i)}) for i in range(count)]
+
+def create_sqs_message(message_id:str, key:str) -> dict:
+    body = {"Records": [{"eventSource": "aws:s3", "s3": {"bucket": {"name": BUCKET}, "object": {"key": key}}}]}
+    return {"messageId": message_id, "eventSource": "aws:sqs", "body": json.dumps(body)}
+
+def create_publisher(s3_client, firehose_client, **kwargs) -> BatchPublisher:
+    batcher = FirehoseBatcher(firehose_client, STREAM_NAME, rng=random.Random(0), sleep=lambda seconds: None)
+    return BatchPublisher(CRUDE_SCHEMA, STREAM_NAME, s3_client=s3_client, firehose_client=firehose_client, batcher=batcher, **kwargs)
+
+def test_parse_object_notifications():
+    event = {"Records": [create_sqs_message("m-1", "a+b.jsonl"), {"messageId": "m-2", "eventSource": "aws:sqs", "body": json.dumps({"detail": {"bucket": {"name": BUCKET}, "object": {"key": "c.json"}}})}]}
+    assert parse_object_notifications(event) == [("m-1", BUCKET, "a b.jsonl", None), ("m-2", BUCKET, "c.json", None)]
+    assert parse_object_notifications([{"bucket": BUCKET, "key": "d.jsonl", "etag": "e"}]) == [("s3://" + BUCKET + "/d.jsonl", BUCKET, "d.jsonl", "e")]
+
+def test_sqs_batch_shares_put_record_batch_calls(s3_client):
+    firehose_client = LocalFirehoseClient()
+    s3_client.create_bucket(Bucket=BUCKET)
+    lines = dict()
+    for name in ["a", "b", "c"]:
+        lines[name] = create_lines(name, 100)
+        s3_client.put_object(Bucket=BUCKET, Key=name + ".jsonl", Body="\n".join(lines[name]).encode("utf-8"))
+    notifications = parse_object_notifications({"Records": [create_sqs_message("m-" + name, name + ".jsonl") for name in ["a", "b", "missing", "c"]]})
+    reports = create_publisher(s3_client, firehose_client).publish([(bucket, key, etag) for _, bucket, key, etag in notifications])
+    assert firehose_client.calls == 1
+    assert [report["sent"] for report in reports] == [100, 100, 0, 100]
+    assert [report["success"] for report in reports] == [True, True, False, True]
+    assert reports[2]["error"].startswith("NoSuchKey")
+    assert batch_item_failures(notifications, reports) == [{"itemIdentifier": "m-missing"}]
+    delivered = firehose_client.delivered[STREAM_NAME]
+    for name in ["a", "b", "c"]:
+        assert [data for data in delivered if json.loads(data)["id"] == name] == [line.encode("utf-8") for line in lines[name]]
+
+def test_failed_records_are_reported_per_object(s3_client):
+    firehose_client = LocalFirehoseClient(throttle_rate=1.0)
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.put_object(Bucket=BUCKET, Key="a.json", Body=json.dumps({"data": [json.loads(line) for line in create_lines("a", 3)]}).encode("utf-8"))
+    reports = create_publisher(s3_client, firehose_client, json_publish_mode=CHUNKS_PUBLISH_MODE).publish([(BUCKET, "a.json")])
+    assert reports[0]["records"] == 3
+    assert reports[0]["failed"] == 3
+    assert not reports[0]["success"]
+
+def test_prefetch_is_bounded_by_bytes(s3_client, monkeypatch):
+    peaks = list()
+
+    class TrackedRecordBuffer(RecordBuffer):
+        def put(self, position, item, size=0):
+            accepted = super().put(position, item, size)
+            peaks.append(self.buffered_bytes)
+            return accepted
+
+    monkeypatch.setattr(batch_publisher, "RecordBuffer", TrackedRecordBuffer)
+    firehose_client = LocalFirehoseClient()
+    s3_client.create_bucket(Bucket=BUCKET)
+    for name in ["a", "b", "c", "d"]:
+        s3_client.put_object(Bucket=BUCKET, Key=name + ".jsonl", Body="\n".join(create_lines(name, 500)).encode("utf-8"))
+    reports = create_publisher(s3_client, firehose_client, max_fetch_workers=4, max_prefetch_bytes=2000).publish([(BUCKET, name + ".jsonl") for name in ["a", "b", "c", "d"]])
+    assert [report["sent"] for report in reports] == [500] * 4
+    assert max(peaks) <= 2000
@@ -0,0 +1,70 @@
+import random
+import pytest
+from botocore.exceptions import ClientError
+from src.firehose_batcher import RECORD_TOO_LARGE_ERROR, FirehoseBatcher, split_batches
+from src.local_services import LocalFirehoseClient
+
+STREAM_NAME = "word-stash-crude"
+
+def create_records(count:int, size:int=10) -> list:
+    return ['{"index": %d, "content": "%s"}' % (i, "x" * size) for i in range(count)]
+
+def create_batcher(firehose_client, **kwargs) -> FirehoseBatcher:
+    return FirehoseBatcher(firehose_client, STREAM_NAME, rng=random.Random(0), sleep=lambda seconds: None, **kwargs)
+
+def test_split_batches_by_count_and_bytes():
+    assert [len(batch) for batch in split_batches(create_records(1201))] == [500, 500, 201]
+    records = create_records(10, size=1000)
+    batches = list(split_batches(records, max_bytes=3 * len(records[0])))
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    assert [record for batch in batches for record in batch] == records
+
+def test_publish_splits_large_files():
+    firehose_client = LocalFirehoseClient()
+    batcher = create_batcher(firehose_client)
+    records = create_records(1201)
+    responses = batcher.publish(records)
+    assert [len(resp["RequestResponses"]) for resp in responses] == [500, 500, 201]
+    assert sorted(firehose_client.delivered[STREAM_NAME]) == sorted(record.encode('utf-8') for record in records)
+    assert batcher.last_metrics["sent"] == 1201
+    assert batcher.last_metrics["failed"] == 0
+
+def test_publish_retries_only_failed_entries():
+    firehose_client = LocalFirehoseClient(throttle_rate=0.3)
+    batcher = create_batcher(firehose_client, max_attempts=20)
+    records = create_records(1000)
+    responses = batcher.publish(records)
+    assert sum(resp["FailedPutCount"] for resp in responses) == 0
+    assert batcher.last_metrics["retries"] > 0
+    assert sorted(firehose_client.delivered[STREAM_NAME]) == sorted(record.encode('utf-8') for record in records)
+
+def test_publish_retries_throttled_calls():
+    firehose_client = LocalFirehoseClient(throttle_calls=2)
+    batcher = create_batcher(firehose_client, max_workers=1)
+    responses = batcher.publish(create_records(5))
+    assert responses[0]["FailedPutCount"] == 0
+    assert responses[0]["Attempts"] == 3
+    assert len(firehose_client.delivered[STREAM_NAME]) == 5
+
+def test_publish_reports_entries_that_keep_failing():
+    firehose_client = LocalFirehoseClient(throttle_rate=1.0)
+    batcher = create_batcher(firehose_client, max_attempts=3)
+    responses = batcher.publish(create_records(5))
+    assert responses[0]["FailedPutCount"] == 5
+    assert firehose_client.calls == 3
+    assert batcher.last_metrics["failed"] == 5
+
+def test_oversized_records_are_not_sent():
+    firehose_client = LocalFirehoseClient()
+    batcher = create_batcher(firehose_client, max_record_bytes=100)
+    responses = batcher.publish(create_records(2) + create_records(1, size=200))
+    assert responses[0]["FailedPutCount"] == 1
+    assert responses[0]["RequestResponses"][2]["ErrorCode"] == RECORD_TOO_LARGE_ERROR
+    assert responses[0]["DeadLetterCount"] == 1
+    assert batcher.last_metrics["dead_lettered"] == 1 and batcher.last_metrics["failed"] == 0
+    assert len(firehose_client.delivered[STREAM_NAME]) == 2
+
+def test_send_batch_raises_non_retryable_errors():
+    batcher = create_batcher(LocalFirehoseClient(), max_records=1000)
+    with pytest.raises(ClientError):
+        batcher.send_batch(create_records(501))
@@ -0,0 +1,68 @@
+import json
+import zstandard
+from src import eb_s3_firehose_crude_json_lambda_function, eb_s3_firehose_ner_label_json_lambda_function
+from src.local_services import LocalFirehoseClient
+
+BUCKET = "word-stash-ner-label"
+STREAM_NAME = "word-stash-ner-label"
+
+def create_event(key:str) -> dict:
+    return {"detail": {"bucket": {"name": BUCKET}, "object": {"key": key}}}
+
+def test_ner_label_jsonl_is_published_in_batches(s3_client, monkeypatch):
+    firehose_client = LocalFirehoseClient(throttle_rate=0.1)
+    monkeypatch.setenv("STREAM_NAME", STREAM_NAME)
+    monkeypatch.setenv("PUBLISH_BASE_DELAY_SECONDS", "0")
+    monkeypatch.setenv("PUBLISH_MAX_ATTEMPTS", "20")
+    monkeypatch.setattr(eb_s3_firehose_ner_label_json_lambda_function.boto3, "client", lambda service_name, region=None: firehose_client)
+    lines = [json.dumps({"id": "a", "index": i, "text": "API: generate password is required", "label": [[5, 21, "SUPPORTING_ACTIVITY"]]}) for i in range(1200)]
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.put_object(Bucket=BUCKET, Key="ner.jsonl", Body="\n".join(lines).encode("utf-8"))
+    resp = eb_s3_firehose_ner_label_json_lambda_function.lambda_handler(create_event("ner.jsonl"), None)
+    assert [len(batch_resp["RequestResponses"]) for batch_resp in resp] == [500, 500, 200]
+    assert sum(batch_resp["FailedPutCount"] for batch_resp in resp) == 0
+    assert sorted(firehose_client.delivered[STREAM_NAME]) == sorted(line.encode("utf-8") for line in lines)
+
+def test_invalid_lines_are_skipped(s3_client, monkeypatch):
+    firehose_client = LocalFirehoseClient()
+    monkeypatch.setenv("STREAM_NAME", STREAM_NAME)
+    monkeypatch.setattr(eb_s3_firehose_ner_label_json_lambda_function.boto3, "client", lambda service_name, region=None: firehose_client)
+    valid_line = json.dumps({"id": "a", "index": 0, "text": "API: generate password is required", "label": []})
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.put_object(Bucket=BUCKET, Key="ner.jsonl", Body=(valid_line + "\n{\"id\": 1}\n\n" + valid_line + "\n").encode("utf-8"))
+    resp = eb_s3_firehose_ner_label_json_lambda_function.lambda_handler(create_event("ner.jsonl"), None)
+    assert len(resp) == 1
+    assert firehose_client.delivered[STREAM_NAME] == [valid_line.encode("utf-8")] * 2
+
+def test_crude_json_is_published_as_document_or_chunk_by_chunk(s3_client, monkeypatch):
+    firehose_client = LocalFirehoseClient()
+    monkeypatch.setenv("STREAM_NAME", STREAM_NAME)
+    monkeypatch.setattr(eb_s3_firehose_crude_json_lambda_function.boto3, "client", lambda service_name, region=None: firehose_client)
+    chunks = [{"filetype": "eml", "index": i, "id": "email-1", "content": "chunk " + str(i)} for i in range(2)]
+    attachment_chunks = [{"filetype": "pdf", "index": i, "id": "pdf-1", "page_id": 1, "content": "page chunk " + str(i)} for i in range(2)]
+    document = {"data": chunks + [
+        {"filetype": "attachments", "index": 2, "id": "email-1", "content": [{"filename": "example.pdf", "filetype": "pdf", "content": attachment_chunks}]},
+        {"filetype": "eml", "index": 3, "content": "chunk without id"}]}
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.put_object(Bucket=BUCKET, Key="record.json", Body=json.dumps(chunks[0]).encode("utf-8"))
+    s3_client.put_object(Bucket=BUCKET, Key="crude.json", Body=json.dumps(document).encode("utf-8"))
+    eb_s3_firehose_crude_json_lambda_function.lambda_handler(create_event("record.json"), None)
+    assert [json.loads(data) for data in firehose_client.delivered.pop(STREAM_NAME)] == [chunks[0]]
+    monkeypatch.setattr(eb_s3_firehose_crude_json_lambda_function, "json_publish_mode", "chunks")
+    resp = eb_s3_firehose_crude_json_lambda_function.lambda_handler(create_event("crude.json"), None)
+    assert resp[0]["FailedPutCount"] == 0
+    delivered = [json.loads(data) for data in firehose_client.delivered[STREAM_NAME]]
+    assert delivered == chunks + attachment_chunks
+    eb_s3_firehose_crude_json_lambda_function.lambda_handler(create_event("record.json"), None)
+    assert json.loads(firehose_client.delivered[STREAM_NAME][-1]) == chunks[0]
+
+def test_compressed_jsonl_is_published(s3_client, monkeypatch):
+    firehose_client = LocalFirehoseClient()
+    monkeypatch.setenv("STREAM_NAME", STREAM_NAME)
+    monkeypatch.setattr(eb_s3_firehose_ner_label_json_lambda_function.boto3, "client", lambda service_name, region=None: firehose_client)
+    lines = [json.dumps({"id": "a", "index": i, "text": "API: generate password is required", "label": []}) for i in range(10)]
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.put_object(Bucket=BUCKET, Key="ner.jsonl.zst", Body=zstandard.ZstdCompressor().compress("\n".join(lines).encode("utf-8")))
+    resp = eb_s3_firehose_ner_label_json_lambda_function.lambda_handler(create_event("ner.jsonl.zst"), None)
+    assert sum(batch_resp["FailedPutCount"] for batch_resp in resp) == 0
+    assert firehose_client.delivered[STREAM_NAME] == [line.encode("utf-8") for line in lines]
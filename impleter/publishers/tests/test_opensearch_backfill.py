@@ -0,0 +1,109 @@
+import gzip
+import json
+import pytest
+from src.opensearch_indexer import OpenSearchConnection
+from src.opensearch_backfill import CHUNKS_PUBLISH_MODE, OpenSearchBackfill, BackfillError, load_converter, versioned_index_name
+from src.local_services import LocalOpenSearchHttp
+
+BUCKET = "word-stash-crude"
+ALIAS = "crude"
+
+class CrudeToLabel(object):
+    """Stand-in of the converters' crude to label converters, which drops chunk 0 and fails on content "invalid"."""
+    def __init__(self):
+        self.batch_sizes = list()
+
+    def convert_batch(self, input_list):
+        self.batch_sizes.append(len(input_list))
+        outputs = list()
+        for input_dict in input_list:
+            if input_dict["content"] == "invalid":
+                outputs.append(ValueError("invalid content"))
+            elif input_dict["index"] == 0:
+                outputs.append(None)
+            else:
+                outputs.append({"id": input_dict["id"], "index": input_dict["index"], "text": input_dict["content"], "label": []})
+        return outputs
+
+def put_outputs(s3_client) -> None:
+    s3_client.create_bucket(Bucket=BUCKET)
+    for i in range(3):
+        lines = [json.dumps({"id": "doc-" + str(i), "index": j, "content": "chunk"}) for j in range(40)]
+        body = "\n".join(lines).encode("utf-8")
+        if i == 2:
+            s3_client.put_object(Bucket=BUCKET, Key="2021/" + str(i) + ".jsonl.gz", Body=gzip.compress(body))
+        else:
+            s3_client.put_object(Bucket=BUCKET, Key="2021/" + str(i) + ".jsonl", Body=body)
+    document = {"data": [{"id": "doc-json", "index": j, "content": "chunk"} for j in range(5)]}
+    s3_client.put_object(Bucket=BUCKET, Key="2021/doc.json", Body=json.dumps(document).encode("utf-8"))
+    s3_client.put_object(Bucket=BUCKET, Key="2021/notes.txt", Body=b"ignored")
+
+def test_versioned_index_name():
+    assert versioned_index_name(ALIAS, "2") == "crude_v2"
+    assert versioned_index_name(ALIAS).startswith("crude_v2")
+
+def test_backfill_swaps_alias_and_restores_settings(s3_client):
+    put_outputs(s3_client)
+    http = LocalOpenSearchHttp()
+    connection = OpenSearchConnection("https://localhost:9200", http=http)
+    connection.perform("PUT", "/crude_v1", body={"settings": {"index": {"number_of_shards": 2, "number_of_replicas": 2}}, "mappings": {"properties": {"id": {"type": "keyword"}}}, "aliases": {ALIAS: {}}})
+    backfill = OpenSearchBackfill(connection, ALIAS, s3_client=s3_client, json_publish_mode=CHUNKS_PUBLISH_MODE, indexer_options={"max_actions": 25})
+    report = backfill.run(BUCKET, prefix="2021/", version="2")
+    assert report["swapped"] and report["objects"] == 4 and report["count"] == 125
+    assert report["previous_indices"] == ["crude_v1"]
+    assert http.aliases == {ALIAS: {"crude_v2"}}
+    assert http.settings["crude_v2"]["number_of_shards"] == "2"
+    assert http.settings["crude_v2"]["number_of_replicas"] == "2"
+    assert http.settings["crude_v2"]["refresh_interval"] == "1s"
+    assert http.mappings["crude_v2"] == {"properties": {"id": {"type": "keyword"}}}
+    assert ("PUT", "/crude_v2/_settings") in http.requests
+    assert connection.perform("GET", "/" + ALIAS + "/_count")["count"] == 125
+
+def test_backfill_keeps_alias_on_failure(s3_client):
+    put_outputs(s3_client)
+    http = LocalOpenSearchHttp()
+    connection = OpenSearchConnection("https://localhost:9200", http=http)
+    connection.perform("PUT", "/crude_v1", body={"aliases": {ALIAS: {}}})
+    backfill = OpenSearchBackfill(connection, ALIAS, s3_client=s3_client, json_publish_mode=CHUNKS_PUBLISH_MODE, delete_old=True)
+    with pytest.raises(BackfillError):
+        backfill.run(BUCKET, keys=["2021/0.jsonl", "2021/missing.jsonl"], version="2")
+    assert http.aliases == {ALIAS: {"crude_v1"}}
+    assert "crude_v1" in http.indices and "crude_v2" in http.indices
+
+def test_backfill_refuses_concrete_index():
+    http = LocalOpenSearchHttp()
+    connection = OpenSearchConnection("https://localhost:9200", http=http)
+    connection.perform("PUT", "/" + ALIAS)
+    with pytest.raises(BackfillError):
+        OpenSearchBackfill(connection, ALIAS, s3_client=object()).current_indices()
+
+def test_label_index_is_rebuilt_through_a_converter(s3_client):
+    put_outputs(s3_client)
+    http = LocalOpenSearchHttp()
+    connection = OpenSearchConnection("https://localhost:9200", http=http)
+    with pytest.raises(BackfillError):
+        OpenSearchBackfill(connection, "ner_label", s3_client=s3_client).run(BUCKET, prefix="2021/", version="1")
+    assert "ner_label_v1" not in http.indices
+    converter = CrudeToLabel()
+    backfill = OpenSearchBackfill(connection, "ner_label", s3_client=s3_client, json_publish_mode=CHUNKS_PUBLISH_MODE, converter=converter)
+    report = backfill.run(BUCKET, prefix="2021/", version="2")
+    assert report["swapped"] and report["count"] == 121
+    assert sorted(converter.batch_sizes) == [5, 40, 40, 40]
+    assert all(set(source) == {"id", "index", "text", "label"} for source in http.indices["ner_label_v2"].values())
+    assert OpenSearchBackfill(connection, "ner_label", s3_client=s3_client, converted=True).run(BUCKET, keys=["2021/0.jsonl"], version="3")["swapped"]
+
+def test_conversion_failure_keeps_alias(s3_client):
+    s3_client.create_bucket(Bucket=BUCKET)
+    lines = [json.dumps({"id": "doc", "index": j, "content": "invalid" if j == 3 else "chunk"}) for j in range(5)]
+    s3_client.put_object(Bucket=BUCKET, Key="2021/0.jsonl", Body="\n".join(lines).encode("utf-8"))
+    http = LocalOpenSearchHttp()
+    connection = OpenSearchConnection("https://localhost:9200", http=http)
+    backfill = OpenSearchBackfill(connection, "ner_label", s3_client=s3_client, converter=CrudeToLabel())
+    with pytest.raises(BackfillError):
+        backfill.run(BUCKET, prefix="2021/", version="1")
+    assert "ner_label" not in http.aliases
+
+def test_load_converter():
+    assert isinstance(load_converter("collections:OrderedDict"), dict)
+    with pytest.raises(ValueError):
+        load_converter("converters")
@@ -0,0 +1,54 @@
+import os
+import gzip
+import json
+import pytest
+from src.opensearch_indexer import OpenSearchConnection, index_documents
+from src.opensearch_exporter import SlicedExporter, sha256_file, MANIFEST_FILE
+from src.local_services import LocalOpenSearchHttp
+
+INDEX = "ner_label_train"
+
+def train_index(supports_pit:bool=True) -> OpenSearchConnection:
+    connection = OpenSearchConnection("https://localhost:9200", http=LocalOpenSearchHttp(supports_pit=supports_pit))
+    documents = [{"id": "doc-" + str(i), "text": ["Hello", "World"], "label": ["O", "U-LOC"]} for i in range(230)]
+    index_documents(connection, INDEX, documents, id_key="id")
+    return connection
+
+def read_shards(output_dir:str, manifest:dict) -> list:
+    documents = list()
+    for shard in manifest["shards"]:
+        path = os.path.join(output_dir, shard["file"])
+        assert sha256_file(path) == shard["sha256"]
+        with gzip.open(path, "rb") as fp:
+            lines = fp.read().splitlines()
+        assert len(lines) == shard["documents"]
+        documents.extend(json.loads(line) for line in lines)
+    return documents
+
+@pytest.mark.parametrize("supports_pit, mode", [(True, "pit"), (False, "scroll")])
+def test_sliced_export_writes_every_document_once(tmp_path, supports_pit, mode):
+    connection = train_index(supports_pit)
+    manifest = SlicedExporter(connection, INDEX, str(tmp_path), slices=3, shard_documents=50, page_size=20).export()
+    assert manifest["mode"] == mode and manifest["documents"] == 230
+    assert sorted(set(shard["slice"] for shard in manifest["shards"])) == [0, 1, 2]
+    documents = read_shards(str(tmp_path), manifest)
+    assert sorted(document["id"] for document in documents) == sorted("doc-" + str(i) for i in range(230))
+    assert documents[0]["label"] == ["O", "U-LOC"]
+    with open(os.path.join(str(tmp_path), MANIFEST_FILE)) as fp:
+        assert json.load(fp)["documents"] == 230
+    assert connection.http.contexts == dict()
+
+def test_sliced_export_resumes_incomplete_slices(tmp_path):
+    connection = train_index()
+    exporter = SlicedExporter(connection, INDEX, str(tmp_path), slices=3, shard_documents=50)
+    first = exporter.export()
+    os.remove(exporter._marker_path(1))
+    with open(os.path.join(str(tmp_path), exporter._shard_prefix(1) + "-00009.jsonl.gz.tmp"), "wb") as fp:
+        fp.write(b"partial")
+    resumed = exporter.export()
+    assert resumed["resumed_slices"] == 2
+    assert resumed["documents"] == first["documents"] == 230
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")]
+    assert len(read_shards(str(tmp_path), resumed)) == 230
+    with pytest.raises(ValueError):
+        SlicedExporter(connection, INDEX, str(tmp_path), slices=4).export()
@@ -0,0 +1,60 @@
+import os
+import json
+import random
+import pytest
+from src.opensearch_indexer import OpenSearchConnection, BulkIndexer, bulk_action, document_id, index_documents
+from src.local_services import LocalOpenSearchHttp
+
+INDEX = "crude"
+
+def local_connection(http:LocalOpenSearchHttp) -> OpenSearchConnection:
+    return OpenSearchConnection("https://localhost:9200", username="admin", password="admin", http=http)
+
+def test_bulk_action_lines():
+    action = bulk_action({"id": "a", "index": 0}, INDEX, "a-0")
+    lines = action.splitlines()
+    assert json.loads(lines[0]) == {"index": {"_index": INDEX, "_id": "a-0"}}
+    assert json.loads(lines[1]) == {"id": "a", "index": 0}
+    assert bulk_action(b'{"id": "a"}\n', INDEX).endswith(b'}\n{"id": "a"}\n')
+
+def test_indexer_flushes_by_count_and_size():
+    http = LocalOpenSearchHttp()
+    indexer = BulkIndexer(local_connection(http), INDEX, max_actions=10, max_workers=2, id_key="id")
+    indexer.add_many({"id": "doc-" + str(i), "content": "x" * 10} for i in range(35))
+    metrics = indexer.close()
+    assert metrics["indexed"] == 35 and metrics["failed"] == 0
+    assert metrics["requests"] == 4
+    assert sorted(http.indices[INDEX]) == sorted("doc-" + str(i) for i in range(35))
+    http = LocalOpenSearchHttp()
+    metrics = index_documents(local_connection(http), INDEX, ['{"content": "' + "x" * 100 + '"}' for _ in range(20)], max_bytes=1024)
+    assert metrics["indexed"] == 20 and metrics["requests"] > 2
+
+def test_indexer_retries_rejected_items_and_reports_errors():
+    http = LocalOpenSearchHttp(reject_rate=0.3, rng=random.Random(1))
+    indexer = BulkIndexer(local_connection(http), INDEX, max_actions=50, max_attempts=10, sleep=lambda _: None)
+    indexer.add_many({"index": i} for i in range(200))
+    indexer.add(b"not json")
+    metrics = indexer.close()
+    assert metrics["indexed"] == 200 and metrics["failed"] == 1 and metrics["retries"] > 0
+    assert indexer.last_errors[0]["status"] == 400
+    assert len(http.indices[INDEX]) == 200
+
+def test_reindexing_chunks_is_idempotent():
+    http = LocalOpenSearchHttp()
+    lines = [b'{"id": "a", "index": ' + str(i).encode() + b', "chunk_id": "chunk-' + str(i).encode() + b'"}\n' for i in range(30)]
+    for _ in range(2):
+        metrics = index_documents(local_connection(http), INDEX, lines + [{"chunk_id": "chunk-30"}], max_actions=7)
+        assert metrics["indexed"] == 31 and metrics["failed"] == 0
+    assert sorted(http.indices[INDEX]) == sorted("chunk-" + str(i) for i in range(31))
+    assert document_id('{"content": "chunk_id"}', "chunk_id") is None
+    assert document_id(b'{"chunk_id": ', "chunk_id") is None
+
+@pytest.mark.skipif(not os.getenv("OPENSEARCH_URL", None), reason="OPENSEARCH_URL is not set (make start-local)")
+def test_indexer_against_local_opensearch():
+    connection = OpenSearchConnection.from_env()
+    connection.perform("DELETE", "/word-stash-indexer-test", ignore=[404])
+    with BulkIndexer(connection, "word-stash-indexer-test", max_actions=100, id_key="id", refresh="wait_for") as indexer:
+        indexer.add_many({"id": "doc-" + str(i), "content": "Hello World"} for i in range(250))
+    assert indexer.last_metrics["indexed"] == 250
+    assert connection.perform("GET", "/word-stash-indexer-test/_count")["count"] == 250
+    connection.perform("DELETE", "/word-stash-indexer-test")
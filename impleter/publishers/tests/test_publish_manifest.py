@@ -0,0 +1,80 @@
+import json
+import random
+from src import eb_s3_firehose_crude_json_lambda_function
+from src.publish_manifest import PublishManifest, LocalManifestStore, S3ManifestStore
+from src.batch_publisher import BatchPublisher
+from src.firehose_batcher import RECORD_TOO_LARGE_ERROR, FirehoseBatcher
+from src.publishers import record_published
+from src.local_services import LocalFirehoseClient
+from src.schema_validators import CRUDE_SCHEMA
+
+BUCKET = "word-stash-crude"
+STREAM_NAME = "word-stash-crude"
+
+def put_jsonl(s3_client, key:str, count:int) -> None:
+    lines = [json.dumps({"id": key, "index": i, "content": "chunk"}) for i in range(count)]
+    s3_client.put_object(Bucket=BUCKET, Key=key, Body="\n".join(lines).encode("utf-8"))
+
+def test_manifest_is_keyed_by_etag(tmp_path):
+    manifest = PublishManifest(LocalManifestStore(str(tmp_path)))
+    entry = manifest.record(BUCKET, "a.jsonl", '"etag-1"', records=3, sent=3, failed=0, duration_ms=1.5)
+    assert entry["etag"] == "etag-1"
+    assert manifest.is_published(BUCKET, "a.jsonl", "etag-1")
+    assert not manifest.is_published(BUCKET, "a.jsonl", "etag-2")
+    assert manifest.get(BUCKET, "a.jsonl", '"etag-1"')["records"] == 3
+    assert manifest.published([(BUCKET, "a.jsonl", "etag-1"), (BUCKET, "a.jsonl", "etag-2"), (BUCKET, "b.jsonl", "etag-1")]) == {(BUCKET, "a.jsonl", "etag-1")}
+
+def test_batch_publisher_skips_published_objects(s3_client):
+    s3_client.create_bucket(Bucket=BUCKET)
+    s3_client.create_bucket(Bucket="word-stash-manifest")
+    for key in ["a.jsonl", "b.jsonl"]:
+        put_jsonl(s3_client, key, 10)
+    firehose_client = LocalFirehoseClient()
+    manifest = PublishManifest(S3ManifestStore("word-stash-manifest", prefix="crude/", s3_client=s3_client))
+    batcher = FirehoseBatcher(firehose_client, STREAM_NAME, rng=random.Random(0), sleep=lambda seconds: None)
+    publisher = BatchPublisher(CRUDE_SCHEMA, STREAM_NAME, s3_client=s3_client, firehose_client=firehose_client, batcher=batcher, manifest=manifest)
+    first = publisher.publish([(BUCKET, "a.jsonl"), (BUCKET, "b.jsonl")])
+    assert [report["skipped"] for report in first] == [False, False]
+    put_jsonl(s3_client, "b.jsonl", 5)
+    second = publisher.publish([(BUCKET, "a.jsonl"), (BUCKET, "b.jsonl")])
+    assert [report["skipped"] for report in second] == [True, False]
+    assert all(report["success"] for report in second)
+    assert len(firehose_client.delivered[STREAM_NAME]) == 25
+    assert manifest.get(BUCKET, "b.jsonl", second[1]["etag"])["sent"] == 5
+
+def test_lambda_handler_skips_duplicate_events(s3_client, tmp_path, monkeypatch):
+    s3_client.create_bucket(Bucket=BUCKET)
+    put_jsonl(s3_client, "a.jsonl", 10)
+    firehose_client = LocalFirehoseClient()
+    monkeypatch.setenv("STREAM_NAME", STREAM_NAME)
+    monkeypatch.setattr(eb_s3_firehose_crude_json_lambda_function, "publish_manifest", PublishManifest(LocalManifestStore(str(tmp_path))))
+    monkeypatch.setattr(eb_s3_firehose_crude_json_lambda_function.boto3, "client", lambda service_name, region=None: firehose_client)
+    event = {"detail": {"bucket": {"name": BUCKET}, "object": {"key": "a.jsonl"}}}
+    assert len(eb_s3_firehose_crude_json_lambda_function.lambda_handler(event, None)) == 1
+    assert eb_s3_firehose_crude_json_lambda_function.lambda_handler(event, None) == []
+    assert len(firehose_client.delivered[STREAM_NAME]) == 10
+
+def test_dead_lettered_records_do_not_block_the_manifest(s3_client, tmp_path):
+    s3_client.create_bucket(Bucket=BUCKET)
+    lines = [json.dumps({"id": "a", "index": i, "content": "chunk" * (100 if i == 2 else 1)}) for i in range(5)]
+    s3_client.put_object(Bucket=BUCKET, Key="a.jsonl", Body="\n".join(lines).encode("utf-8"))
+    firehose_client = LocalFirehoseClient()
+    manifest = PublishManifest(LocalManifestStore(str(tmp_path)))
+    batcher = FirehoseBatcher(firehose_client, STREAM_NAME, max_record_bytes=200, rng=random.Random(0), sleep=lambda seconds: None)
+    publisher = BatchPublisher(CRUDE_SCHEMA, STREAM_NAME, s3_client=s3_client, firehose_client=firehose_client, batcher=batcher, manifest=manifest)
+    first = publisher.publish([(BUCKET, "a.jsonl")])
+    assert first[0]["success"] and first[0]["sent"] == 4 and first[0]["dead_lettered"] == 1 and first[0]["failed"] == 0
+    assert batcher.last_metrics["dead_lettered"] == 1 and batcher.last_metrics["failed"] == 0
+    assert manifest.get(BUCKET, "a.jsonl", first[0]["etag"])["dead_lettered"] == 1
+    assert publisher.publish([(BUCKET, "a.jsonl")])[0]["skipped"]
+    assert len(firehose_client.delivered[STREAM_NAME]) == 4
+
+def test_record_published_waits_for_retryable_failures(tmp_path):
+    manifest = PublishManifest(LocalManifestStore(str(tmp_path)))
+    too_large = {"ErrorCode": RECORD_TOO_LARGE_ERROR, "ErrorMessage": "record exceeds 200 bytes"}
+    throttled = {"ErrorCode": "ServiceUnavailableException", "ErrorMessage": "Slow down."}
+    assert not record_published(manifest, BUCKET, "a.jsonl", "etag-1", [{"FailedPutCount": 2, "RequestResponses": [{"RecordId": "1"}, too_large, throttled]}], 1.0)
+    assert not manifest.is_published(BUCKET, "a.jsonl", "etag-1")
+    assert record_published(manifest, BUCKET, "a.jsonl", "etag-1", [{"FailedPutCount": 1, "RequestResponses": [{"RecordId": "1"}, too_large]}, {"RecordId": "2"}], 1.0)
+    entry = manifest.get(BUCKET, "a.jsonl", "etag-1")
+    assert (entry["records"], entry["sent"], entry["failed"], entry["dead_lettered"]) == (3, 2, 0, 1)
@@ -0,0 +1,63 @@
+import json
+import random
+import pytest
+from src.publishers import validated_records, validated_chunks, iter_chunks
+from src.validator_registry import ValidationPolicy, VALIDATE_ALL
+from src.schema_validators import CRUDE_SCHEMA
+from src.json_codec import JSON_CODEC_BACKENDS, get_codec
+
+LINES = [b'{"id": "a", "index": 0, "content": "caf\\u00e9"}', b'{"id": "a", "index": "1", "content": null}', b'not json', '{"id": "a", "index": 2, "content": null}']
+
+def test_validated_records_forward_the_original_lines():
+    policy = ValidationPolicy(mode=VALIDATE_ALL, sample_rate=1.0)
+    actual = list(validated_records(LINES, CRUDE_SCHEMA, policy))
+    assert len(actual) == 2
+    assert actual[0] is LINES[0]
+    assert actual[1] is LINES[3]
+
+def test_sampled_validation_skips_parsing():
+    policy = ValidationPolicy(mode=VALIDATE_ALL, sample_rate=0.0, rng=random.Random(0))
+    assert list(validated_records(LINES, CRUDE_SCHEMA, policy)) == LINES
+
+def test_validated_chunks_are_encoded_once():
+    policy = ValidationPolicy(mode=VALIDATE_ALL, sample_rate=1.0)
+    document = {"data": [{"id": "a", "index": 0, "content": "café"}, {"id": "a", "content": "no index"}]}
+    actual = list(validated_chunks(iter_chunks(document), CRUDE_SCHEMA, policy))
+    assert [json.loads(record) for record in actual] == document["data"][:1]
+
+@pytest.mark.parametrize("name", JSON_CODEC_BACKENDS)
+def test_json_codec_backends_round_trip(name):
+    pytest.importorskip(name)
+    codec = get_codec(name)
+    example_dict = {"id": "a", "index": 0, "content": "café", "label": [[0, 4, "U-LOC"]]}
+    assert codec.loads(codec.dumps(example_dict)) == example_dict
+    assert codec.loads(codec.dumps_bytes(example_dict)) == example_dict
+    assert json.loads(codec.dumps_bytes(example_dict).decode("utf-8")) == example_dict
+
+def test_json_codec_backends_encode_the_same_objects():
+    pytest.importorskip("orjson")
+    example_dict = {"sheets": {0: "Sheet1", 1: "Sheet2"}, "core_properties": {"revision": 3, None: "none", 2.5: "float"}, "content": "café", "size": 2 ** 70}
+    outputs = [get_codec(name).dumps_bytes(example_dict) for name in JSON_CODEC_BACKENDS]
+    assert json.loads(outputs[0]) == json.loads(outputs[1]) == json.loads(json.dumps(example_dict))
+    assert json.loads(get_codec("orjson").dumps({1: "a"})) == json.loads(get_codec("json").dumps({1: "a"}))
+
+def test_unknown_json_codec():
+    with pytest.raises(ValueError):
+        get_codec("unknown")
+
+def test_iter_chunks_merges_the_header_written_once():
+    document = {"header": {"id": "a", "filetype": "eml", "filename": "s3://bucket/a.eml"}, "data": [
+        {"index": 0, "content": "body"},
+        {"index": 1, "filetype": "attachments", "content": [{"id": "b", "index": 0, "filetype": "txt", "content": "attachment"}]}]}
+    assert list(iter_chunks(document)) == [
+        {"id": "a", "filetype": "eml", "filename": "s3://bucket/a.eml", "index": 0, "content": "body"},
+        {"id": "b", "index": 0, "filetype": "txt", "content": "attachment"}]
+
+def test_iter_chunks_of_a_per_chunk_object():
+    chunk = {"index": 0, "id": "a", "content": "x"}
+    assert list(iter_chunks(chunk)) == [chunk]
+    assert list(iter_chunks({"header": {"id": "a", "filetype": "txt"}, "index": 0, "content": "x"})) == [{"id": "a", "filetype": "txt", "index": 0, "content": "x"}]
+
+def test_iter_chunks_skips_null_elements():
+    document = {"data": [{"index": 0, "content": "a"}, None, {"index": 1, "content": [None, {"index": 0, "content": "b"}]}, {"index": 2, "content": "c"}]}
+    assert list(iter_chunks(document)) == [{"index": 0, "content": "a"}, {"index": 0, "content": "b"}, {"index": 2, "content": "c"}]
@@ -0,0 +1,46 @@
+import io
+import gzip
+import pytest
+import zstandard
+from src.s3_readers import iter_lines, split_key_extension, decompressed_stream
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data:bytes):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, size:int=-1) -> bytes:
+        self.reads += 1
+        return super().read(size)
+
+def test_iter_lines_joins_lines_across_chunks():
+    data = b'{"index": 0}\r\n{"index": 1}\n\n{"index": 2}\n{"index": 3}'
+    for chunk_size in [1, 3, 7, 1024]:
+        assert list(iter_lines(io.BytesIO(data), chunk_size=chunk_size)) == [b'{"index": 0}', b'{"index": 1}', b'{"index": 2}', b'{"index": 3}']
+    assert list(iter_lines(io.BytesIO(data + b"\n"))) == list(iter_lines(io.BytesIO(data)))
+    assert list(iter_lines(io.BytesIO(b""))) == []
+
+def test_iter_lines_streams_the_body():
+    stream = CountingStream(b"".join(b'{"index": %d}\n' % i for i in range(10000)))
+    lines = iter_lines(stream, chunk_size=1024)
+    assert next(lines) == b'{"index": 0}'
+    assert stream.reads == 1
+    assert sum(1 for _ in lines) == 9999
+
+def test_split_key_extension():
+    assert split_key_extension("2021/a.jsonl") == ("jsonl", None)
+    assert split_key_extension("2021/a.jsonl.gz") == ("jsonl", "gzip")
+    assert split_key_extension("2021/a-pdf-1.json.zst") == ("json", "zstd")
+    assert split_key_extension("2021/a.gz") == ("gz", None)
+
+@pytest.mark.parametrize("compression,compress", [
+    ("gzip", gzip.compress),
+    ("zstd", lambda data: zstandard.ZstdCompressor().compress(data))])
+def test_iter_lines_streams_compressed_bodies(compression, compress):
+    data = b"".join(b'{"index": %d}\n' % i for i in range(10000))
+    stream = CountingStream(compress(data))
+    lines = iter_lines(decompressed_stream(stream, compression), chunk_size=1024)
+    assert next(lines) == b'{"index": 0}'
+    assert sum(1 for _ in lines) == 9999
+    with pytest.raises(ValueError):
+        decompressed_stream(io.BytesIO(data), "lz4")